@@ -29,6 +29,15 @@ Usage Examples:
     
     # Load scenario from file
     python3 run_analysis_cli.py --load-scenario high_cost.json
+
+    # Keep imports and data warm between runs (runs are forwarded while it is up)
+    python3 run_analysis_cli.py --serve-daemon &
+    python3 run_analysis_cli.py --building-id 1234
+    python3 run_analysis_cli.py --stop-daemon
+
+Only the light config module is imported at startup; the analysis stack
+(pandas, matplotlib, seaborn and the analyzers) is imported by the run itself,
+so --show-config, --list-scenarios and the exports start in well under a second.
 """
 
 import argparse
@@ -40,7 +49,8 @@ from datetime import datetime
 project_root = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, os.path.join(project_root, 'src'))
 
-from config import get_config, update_config
+from config import get_config, update_config, reset_config
+from utils import cli_daemon
 
 def create_parser():
     """Create command line argument parser"""
@@ -113,6 +123,17 @@ Examples:
     output_group.add_argument('--export-readable', type=str,
                              help='Export current configuration to readable text file')
     
+    # Warm daemon
+    daemon_group = parser.add_argument_group('Daemon')
+    daemon_group.add_argument('--serve-daemon', action='store_true',
+                             help='Run a warm daemon that executes forwarded analysis runs')
+    daemon_group.add_argument('--stop-daemon', action='store_true',
+                             help='Stop a running daemon and exit')
+    daemon_group.add_argument('--no-daemon', action='store_true',
+                             help='Run in this process even if a daemon is listening')
+    daemon_group.add_argument('--daemon-socket', type=str, default=cli_daemon.DEFAULT_SOCKET_PATH,
+                             help='Unix socket of the daemon (default: %(default)s)')
+    
     return parser
 
 def apply_cli_parameters(args):
@@ -266,15 +287,70 @@ def export_config_readable(filename, config):
     
     print(f"📄 Configuration exported to readable file: {filename}")
 
-def main():
+def warm_daemon():
+    """Import the analysis stack and parse the data catalog once for the daemon"""
+    import run_unified_analysis_v2
+    from analysis.building_compliance_analyzer_v2 import EnhancedBuildingComplianceAnalyzer
+    
+    try:
+        EnhancedBuildingComplianceAnalyzer(get_config().config['building']['building_id'])
+    except Exception as e:
+        print(f"⚠️  Data catalog not preloaded: {e}")
+
+def daemon_main(argv):
+    """Entry point for runs forwarded to the daemon: fresh config, no re-forwarding"""
+    reset_config()
+    return main(list(argv) + ['--no-daemon'])
+
+def serve_daemon(socket_path):
+    """Run the warm daemon in the foreground"""
+    daemon = cli_daemon.CLIDaemon(daemon_main, socket_path, warm=warm_daemon)
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        print("\nDaemon stopped")
+
+def forward_to_daemon(argv, socket_path):
+    """
+    Run this invocation in a listening daemon
+    
+    Returns:
+        Exit code, or None when no daemon is listening
+    """
+    if cli_daemon.ping(socket_path) is None:
+        return None
+    response = cli_daemon.run_remote(argv, socket_path)
+    sys.stdout.write(response['stdout'])
+    sys.stderr.write(response['stderr'])
+    return response['exit_code']
+
+def needs_analysis(args):
+    """True when the invocation runs the analysis (not just config display/export)"""
+    return not (args.show_config or args.export_config or args.export_readable)
+
+def main(argv=None):
     """Main CLI function"""
     parser = create_parser()
-    args = parser.parse_args()
+    argv = sys.argv[1:] if argv is None else list(argv)
+    args = parser.parse_args(argv)
     
     # Handle special commands
     if args.list_scenarios:
         list_scenarios()
         return
+    if args.stop_daemon:
+        stopped = cli_daemon.shutdown(args.daemon_socket)
+        print("🛑 Daemon stopped" if stopped else "No daemon running")
+        return
+    if args.serve_daemon:
+        serve_daemon(args.daemon_socket)
+        return
+    if not args.no_daemon and needs_analysis(args):
+        exit_code = forward_to_daemon(argv, args.daemon_socket)
+        if exit_code is not None:
+            if exit_code:
+                sys.exit(exit_code)
+            return
     
     # Get configuration
     config = get_config()
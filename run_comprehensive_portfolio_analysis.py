@@ -34,6 +34,15 @@ sys.path.insert(0, project_root)
 from src.analysis.portfolio_risk_analyzer import PortfolioRiskAnalyzer
 from src.analysis.portfolio_risk_analyzer_improved import PortfolioRiskAnalyzer as ImprovedAnalyzer
 from src.analysis.building_compliance_analyzer_v2 import EnhancedBuildingComplianceAnalyzer
+from src.utils.results_store import ResultsStore
+from src.utils.penalty_cube import PenaltyMatrix
+from src.utils.penalty_rollup import PenaltyRollup
+
+# Per-building results persisted between runs (only changed buildings are recomputed)
+RESULTS_STORE_PATH = os.path.join(project_root, 'data', 'results_store', 'portfolio_results.sqlite')
+
+# Processes for the scenario analyses (None = all CPUs, 1 = one step after another)
+WORKERS = None
 
 def generate_executive_summary():
     """Generate high-level portfolio executive summary"""
@@ -82,8 +91,14 @@ def generate_executive_summary():
         print(f"❌ Error generating executive summary: {e}")
         return None
 
-def run_three_scenario_analysis(analyzer):
-    """Run the core three-scenario risk analysis"""
+def run_three_scenario_analysis(analyzer, store=None, workers=1):
+    """Run the core three-scenario risk analysis
+    
+    Args:
+        analyzer: Loaded PortfolioRiskAnalyzer
+        store: Optional ResultsStore - reuse stored results for unchanged buildings
+        workers: Processes for the scenario analyses (see generate_report)
+    """
     print("\n" + "=" * 80)
     print("📊 THREE-SCENARIO PENALTY RISK ANALYSIS")
     print("=" * 80)
@@ -101,7 +116,7 @@ def run_three_scenario_analysis(analyzer):
         print("   2. All ACO Path - All buildings opt into alternative")  
         print("   3. Hybrid Optimal - AI-driven pathway selection")
         
-        scenarios, fig = analyzer.generate_report(output_path)
+        scenarios, fig = analyzer.generate_report(output_path, store=store, workers=workers)
         
         # Calculate and display key metrics
         print("\n📈 SCENARIO RESULTS:")
@@ -111,25 +126,18 @@ def run_three_scenario_analysis(analyzer):
         
         for scenario_name, df in scenarios.items():
             if scenario_name in ['all_standard', 'all_aco', 'hybrid']:
-                # Calculate total NPV
-                npv_total = 0
-                penalty_cols = [col for col in df.columns if col.startswith('penalty_')]
-                
-                for col in penalty_cols:
-                    year = int(col.replace('penalty_', ''))
-                    year_penalty = df[col].sum()
-                    years_from_2025 = year - 2025
-                    if years_from_2025 >= 0:
-                        npv_total += year_penalty / (1.07 ** years_from_2025)
+                # Year totals and NPV come from the analyzer's penalty cube
+                penalties = analyzer.penalty_matrix(df)
+                npv_total = penalties.npv()
                 
                 # Key year penalties
-                penalty_2025 = df.get('penalty_2025', pd.Series([0])).sum()
-                penalty_2030 = df.get('penalty_2030', pd.Series([0])).sum()
-                penalty_2032 = df.get('penalty_2032', pd.Series([0])).sum()
+                penalty_2025 = penalties.total(2025)
+                penalty_2030 = penalties.total(2030)
+                penalty_2032 = penalties.total(2032)
                 
                 # Buildings at risk
-                buildings_at_risk_2025 = (df.get('penalty_2025', pd.Series([0])) > 0).sum()
-                buildings_at_risk_2030 = (df.get('penalty_2030', pd.Series([0])) > 0).sum()
+                buildings_at_risk_2025 = penalties.at_risk(2025)
+                buildings_at_risk_2030 = penalties.at_risk(2030)
                 
                 scenario_summary[scenario_name] = {
                     'npv_total': npv_total,
@@ -182,8 +190,14 @@ def run_three_scenario_analysis(analyzer):
         traceback.print_exc()
         return None, None
 
-def generate_time_series_analysis(scenarios):
-    """Generate detailed time series penalty analysis"""
+def generate_time_series_analysis(scenarios, analyzer=None):
+    """Generate detailed time series penalty analysis
+    
+    Args:
+        scenarios: Scenario frames from run_three_scenario_analysis
+        analyzer: PortfolioRiskAnalyzer whose penalty cube holds the scenarios
+            (year totals are read from the frames without it)
+    """
     print("\n" + "=" * 80)
     print("📅 TIME SERIES PENALTY ANALYSIS (2025-2042)")
     print("=" * 80)
@@ -198,17 +212,15 @@ def generate_time_series_analysis(scenarios):
     
     for scenario_name, df in scenarios.items():
         if scenario_name in ['all_standard', 'all_aco', 'hybrid']:
+            penalties = (analyzer.penalty_matrix(df) if analyzer is not None
+                         else PenaltyMatrix.from_frame(df))
             for year in years:
-                col_name = f'penalty_{year}'
-                if col_name in df.columns:
-                    total_penalty = df[col_name].sum()
-                    buildings_at_risk = (df[col_name] > 0).sum()
-                    
+                if penalties.has_year(year):
                     time_series_data.append({
                         'scenario': scenario_name,
                         'year': year,
-                        'total_penalty': total_penalty,
-                        'buildings_at_risk': buildings_at_risk
+                        'total_penalty': penalties.total(year),
+                        'buildings_at_risk': penalties.at_risk(year)
                     })
     
     time_series_df = pd.DataFrame(time_series_data)
@@ -246,8 +258,14 @@ def generate_time_series_analysis(scenarios):
             print(f"{scenario.replace('_', ' ').title():<20}: {int(peak_row['year'])} "
                   f"(${peak_row['total_penalty']:,.0f})")
 
-def generate_property_type_analysis(scenarios):
-    """Analyze risk and opportunity by property type"""
+def generate_property_type_analysis(scenarios, analyzer=None):
+    """Analyze risk and opportunity by property type
+    
+    Args:
+        scenarios: Scenario frames from run_three_scenario_analysis
+        analyzer: PortfolioRiskAnalyzer whose rollup holds the scenarios
+            (the hybrid frame is aggregated on the fly without it)
+    """
     print("\n" + "=" * 80)
     print("🏢 PROPERTY TYPE RISK ANALYSIS")
     print("=" * 80)
@@ -257,20 +275,16 @@ def generate_property_type_analysis(scenarios):
         return
     
     hybrid_df = scenarios['hybrid']
+    hybrid = (analyzer.scenario_rollup(hybrid_df) if analyzer is not None
+              else PenaltyRollup.build({'hybrid': hybrid_df}))
     
     # Property type breakdown with opt-in analysis
-    if 'should_opt_in' in hybrid_df.columns:
-        prop_analysis = hybrid_df.groupby('property_type').agg({
-            'building_id': 'count',
-            'should_opt_in': ['sum', 'mean'],
-            'penalty_2030': ['sum', 'mean'],
-            'sqft': 'sum',
-            'npv_advantage': 'mean'
-        }).round(2)
-        
-        # Flatten column names
-        prop_analysis.columns = ['total_buildings', 'opt_in_count', 'opt_in_rate',
-                                'total_penalty_2030', 'avg_penalty_2030', 'total_sqft', 'avg_npv_advantage']
+    if hybrid.has_opt_in:
+        by_type = hybrid.summary(by='property_type', years=(2030,))
+        by_type['avg_penalty_2030'] = by_type['total_penalty_2030'] / by_type['total_buildings']
+        prop_analysis = by_type[['total_buildings', 'opt_in_count', 'opt_in_rate',
+                                 'total_penalty_2030', 'avg_penalty_2030', 'total_sqft',
+                                 'avg_npv_advantage']].round(2)
         
         # Filter to significant property types (5+ buildings)
         prop_analysis = prop_analysis[prop_analysis['total_buildings'] >= 5]
@@ -309,39 +323,8 @@ def generate_top_buildings_analysis(analyzer):
     print("=" * 80)
     
     try:
-        # Load building data and calculate individual risks
-        buildings_analysis = []
-        
-        for idx, building in analyzer.portfolio.iterrows():
-            building_data = analyzer.prepare_building_for_analysis(building)
-            
-            # Calculate standard path penalties
-            standard_penalties = analyzer.calculate_building_penalties(building_data, 'standard')
-            aco_penalties = analyzer.calculate_building_penalties(building_data, 'aco')
-            
-            # Calculate NPVs
-            standard_npv = sum(penalty / (1.07 ** (int(year) - 2025)) 
-                             for year, penalty in standard_penalties.items() 
-                             if int(year) >= 2025)
-            
-            aco_npv = sum(penalty / (1.07 ** (int(year) - 2025)) 
-                         for year, penalty in aco_penalties.items() 
-                         if int(year) >= 2025)
-            
-            buildings_analysis.append({
-                'building_id': building_data['building_id'],
-                'property_type': building_data['property_type'],
-                'sqft': building_data['sqft'],
-                'current_eui': building_data['current_eui'],
-                'final_target': building_data['final_target'],
-                'eui_gap': building_data['current_eui'] - building_data['final_target'],
-                'standard_npv': standard_npv,
-                'aco_npv': aco_npv,
-                'npv_advantage': standard_npv - aco_npv,
-                'penalty_2030': standard_penalties.get('2030', 0)
-            })
-        
-        risk_df = pd.DataFrame(buildings_analysis)
+        # Standard / ACO NPVs per building from the penalty cube (no re-pricing)
+        risk_df = analyzer.building_risk()
         
         # Top 20 by total NPV exposure
         top_risk = risk_df.nlargest(20, 'standard_npv')
@@ -436,16 +419,20 @@ def main():
     if not analyzer:
         return False
     
-    # 2. Three-Scenario Analysis
-    scenarios, scenario_summary = run_three_scenario_analysis(analyzer)
+    # 2. Three-Scenario Analysis (incremental against the results store)
+    store = ResultsStore(RESULTS_STORE_PATH, model_version=analyzer.model_version())
+    try:
+        scenarios, scenario_summary = run_three_scenario_analysis(analyzer, store, WORKERS)
+    finally:
+        store.close()
     if not scenarios:
         return False
     
     # 3. Time Series Analysis
-    generate_time_series_analysis(scenarios)
+    generate_time_series_analysis(scenarios, analyzer)
     
     # 4. Property Type Analysis
-    generate_property_type_analysis(scenarios)
+    generate_property_type_analysis(scenarios, analyzer)
     
     # 5. Top Buildings Analysis
     top_buildings = generate_top_buildings_analysis(analyzer)
@@ -0,0 +1,116 @@
+"""
+Suggested File Name: benchmark_cli_startup.py
+File Location: /Users/robertpadgett/Projects/01_My_Notebooks/500_ED_Risk_Retro_BP/scripts/
+Use: Measure run_analysis_cli.py startup so import regressions are caught early
+
+This script:
+1. Times the light subcommands (--show-config, --list-scenarios, --help) as
+   fresh processes, best of N
+2. Profiles their imports with `python -X importtime` and lists the most
+   expensive modules, flagging any heavy module that should stay lazy
+3. Times a forwarded run against the warm daemon when one is listening
+
+Run:
+    python scripts/benchmark_cli_startup.py --repeat 5
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLI = os.path.join(PROJECT_ROOT, 'run_analysis_cli.py')
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'src'))
+
+from utils import cli_daemon
+
+# Modules the light subcommands must never import
+HEAVY_MODULES = ('pandas', 'numpy', 'matplotlib', 'seaborn', 'scipy')
+
+LIGHT_COMMANDS = {
+    'show-config': ['--show-config', '--no-daemon'],
+    'list-scenarios': ['--list-scenarios'],
+    'help': ['--help'],
+}
+
+
+def wall_time(args, repeat=5):
+    """Best-of-N wall time (s) of a fresh CLI process"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, CLI, *args], cwd=PROJECT_ROOT,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def import_profile(args):
+    """
+    Imports of one CLI invocation from `python -X importtime`
+
+    Returns:
+        Dict of module name -> (self µs, cumulative µs)
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', CLI, *args], cwd=PROJECT_ROOT,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    profile = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        profile[name.strip()] = (int(own), int(cumulative))
+    return profile
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CLI startup")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', 'pass'], check=True)
+    interpreter = time.perf_counter() - start
+
+    print("=" * 70)
+    print("CLI STARTUP BENCHMARK")
+    print("=" * 70)
+    print(f"Bare interpreter: {interpreter * 1000:.0f} ms\n")
+
+    regressions = []
+    for label, cli_args in LIGHT_COMMANDS.items():
+        seconds = wall_time(cli_args, args.repeat)
+        profile = import_profile(cli_args)
+        heavy = sorted(m for m in profile if m.split('.')[0] in HEAVY_MODULES)
+        print(f"{label:<16} {seconds * 1000:7.0f} ms  ({len(profile)} modules imported)")
+        if heavy:
+            regressions.append(label)
+            print(f"   ⚠️  imports heavy modules: {', '.join(heavy[:5])}")
+
+    print(f"\nMost expensive imports for --show-config:")
+    profile = import_profile(LIGHT_COMMANDS['show-config'])
+    for name, (own, _) in sorted(profile.items(), key=lambda item: -item[1][0])[:args.top]:
+        print(f"   {own / 1000:7.1f} ms  {name}")
+
+    status = cli_daemon.ping()
+    if status is not None:
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            cli_daemon.run_remote(['--show-config'])
+            timings.append(time.perf_counter() - start)
+        print(f"\nWarm daemon (pid {status['pid']}) round trip: {min(timings) * 1000:.1f} ms")
+    else:
+        print(f"\nNo daemon on {cli_daemon.DEFAULT_SOCKET_PATH} (start one with --serve-daemon)")
+
+    if regressions:
+        print(f"\n❌ Startup regression in: {', '.join(regressions)}")
+        sys.exit(1)
+    print("\n✅ Light subcommands import no heavy modules")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,7 @@ setup(
         "google-cloud-bigquery>=3.11.0",
         "pandas>=2.0.0",
         "numpy>=1.26.0",
+        "scipy>=1.11.0",
         "pyarrow>=14.0.0",
     ],
 )
@@ -34,6 +34,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 # Import the correct unified modules
 from utils.penalty_calculator import EnergizeDenverPenaltyCalculator
 from utils.eui_target_loader import load_building_targets
+from utils import data_catalog
 
 class EnhancedBuildingComplianceAnalyzer:
     def __init__(self, building_id, data_dir='/Users/robertpadgett/Projects/01_My_Notebooks/500_ED_Risk_Retro_BP/data'):
@@ -54,14 +55,14 @@ class EnhancedBuildingComplianceAnalyzer:
         print(f"📊 Loading data for Building {self.building_id}...")
         
         # Load comprehensive current data
-        self.df_current = pd.read_csv(os.path.join(self.processed_dir, 'energize_denver_comprehensive_latest.csv'))
+        self.df_current = data_catalog.read_csv(os.path.join(self.processed_dir, 'energize_denver_comprehensive_latest.csv'))
         self.df_current['Building ID'] = self.df_current['Building ID'].astype(str)
         
         # Load all years data for historical analysis
         all_years_files = [f for f in os.listdir(self.processed_dir) if f.startswith('energize_denver_all_years_')]
         if all_years_files:
             latest_all_years = sorted(all_years_files)[-1]
-            self.df_all_years = pd.read_csv(os.path.join(self.processed_dir, latest_all_years))
+            self.df_all_years = data_catalog.read_csv(os.path.join(self.processed_dir, latest_all_years))
             self.df_all_years['Building ID'] = self.df_all_years['Building ID'].astype(str)
         
         # Get building-specific data
@@ -78,7 +79,7 @@ class EnhancedBuildingComplianceAnalyzer:
             
         # Load target years from the CSV directly to get baseline year
         try:
-            targets_csv = pd.read_csv(os.path.join(self.raw_dir, 'Building_EUI_Targets.csv'))
+            targets_csv = data_catalog.read_csv(os.path.join(self.raw_dir, 'Building_EUI_Targets.csv'))
             targets_csv['Building ID'] = targets_csv['Building ID'].astype(str)
             self.building_target_years = targets_csv[targets_csv['Building ID'] == self.building_id].iloc[0]
         except Exception as e:
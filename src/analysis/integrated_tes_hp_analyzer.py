@@ -60,6 +60,8 @@ class IntegratedTESHPAnalyzer:
         """
         # Initialize penalty calculator
         self.penalty_calc = EnergizeDenverPenaltyCalculator()
+        # (heating, cooling, other) fractions from a degree-day fit, if set
+        self.measured_split = None
         # Use unified config if available
         if USE_UNIFIED_CONFIG and building_data is None:
             config = get_config()
@@ -145,8 +147,25 @@ class IntegratedTESHPAnalyzer:
                 },
             ]
         
+    def use_degree_day_fit(self, fits) -> bool:
+        """
+        Use the heating/cooling/other split measured by a degree-day change-point fit
+        
+        Args:
+            fits: ChangePointFits (utils.degree_days) covering this building
+            
+        Returns:
+            True if the building was fitted (otherwise the heuristic split stays)
+        """
+        self.measured_split = fits.energy_split(self.building_data.get('building_id'))
+        return self.measured_split is not None
+    
     def calculate_energy_split(self) -> Tuple[float, float, float]:
         """Calculate heating, cooling, and other energy splits"""
+        # Measured split from use_degree_day_fit()
+        if self.measured_split is not None:
+            return self.measured_split
+        
         # For multifamily in Denver
         gas_energy = self.building_data['gas_kbtu']
         elec_energy = self.building_data['electricity_kwh'] * 3.412
@@ -10,6 +10,8 @@ This analyzer provides:
 4. Property type trends analysis
 5. Time series penalty evolution
 6. Comprehensive risk metrics for the entire portfolio
+7. Optional parallel execution: shared building inputs computed once, then
+   the scenario rows and the downstream analyses spread over a process pool
 """
 
 import pandas as pd
@@ -17,19 +19,55 @@ import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 from datetime import datetime
+import contextlib
+import io
 import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from typing import Dict, List, Tuple, Optional
 from collections import defaultdict
+from dataclasses import asdict
 
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # Import our custom modules
 from utils.penalty_calculator import EnergizeDenverPenaltyCalculator
+from utils.penalty_plan import default_plan
 from utils.eui_target_loader import load_building_targets
 from utils.year_normalization import YearNormalizer
-from utils.opt_in_predictor import OptInPredictor
+from utils.opt_in_predictor import OptInPredictor, OptInDecision
+from utils.results_store import input_hash
+from utils.portfolio_schema import (load_portfolio_frame, compact, base_frame, scenario_frame,
+                                    fork, frame_memory, number)
+from utils.penalty_cube import PenaltyCube, PenaltyMatrix
+from utils.penalty_rollup import PenaltyRollup, rollup_dimensions
+from utils.penalty_monte_carlo import MonteCarloInputs, MonteCarloParams, run_monte_carlo, print_report
+from utils.retrofit_optimizer import (OptimizerParams, RetrofitCandidates, default_options,
+                                      optimize_retrofits, print_plan)
+from utils.compliance_path_optimizer import PathParams, optimize_compliance, print_policy
+from utils.measure_library import MeasureLibrary, print_frontier_summary
+from utils.incremental_aggregates import IncrementalAggregates
+
+SCENARIOS = ('all_standard', 'all_aco', 'hybrid')
+
+# Worker-process state (set once per worker by _init_worker)
+_SHARED = None
+
+
+def _init_worker(analyzer, scenarios=None):
+    global _SHARED
+    _SHARED = (analyzer, scenarios)
+
+
+def _analyze_chunk(bounds):
+    analyzer, _ = _SHARED
+    return analyzer.analyze_rows(*bounds)
+
+
+def _run_analysis(task):
+    analyzer, scenarios = _SHARED
+    return analyzer.run_analysis(task, scenarios)
 
 
 class PortfolioRiskAnalyzer:
@@ -48,9 +86,31 @@ class PortfolioRiskAnalyzer:
         
         # Initialize components
         self.penalty_calc = EnergizeDenverPenaltyCalculator()
+        self.penalty_plan = default_plan()
         self.year_normalizer = YearNormalizer()
         self.opt_in_predictor = OptInPredictor()
         
+        # Building x year x path penalties, built by analyze_all_scenarios
+        self.penalty_cube = None
+        
+        # (scenario, property type, EPB, MAI, ZIP) sums shared by the summary tables
+        self.rollup = None
+        
+        # Building ID -> {target year: forecast EUI}, set by use_eui_forecast
+        self.eui_forecast = None
+        
+        # (cache key, RetrofitCandidates) reused across optimize_retrofits budgets
+        self.retrofit_candidates = None
+        
+        # CompliancePolicy driving the hybrid scenario, set by use_compliance_policy
+        self.compliance_policy = None
+        
+        # Scenario summaries updated per building edit, set by start_incremental
+        self.incremental = None
+        
+        # Prepared building data in portfolio order, kept by shared_inputs
+        self.building_inputs = None
+        
         # Load portfolio data
         self.load_portfolio_data()
         
@@ -58,34 +118,12 @@ class PortfolioRiskAnalyzer:
         """Load all necessary data for portfolio analysis"""
         print("📊 Loading portfolio data...")
         
-        # Load current comprehensive data
-        self.df_current = pd.read_csv(
-            os.path.join(self.processed_dir, 'energize_denver_comprehensive_latest.csv')
-        )
-        self.df_current['Building ID'] = self.df_current['Building ID'].astype(str)
-        
-        # Load target data
-        self.df_targets = pd.read_csv(
+        # Load only the analyzed columns, typed (categoricals, float32)
+        self.snapshot_name = 'energize_denver_comprehensive_latest.csv'
+        self.portfolio = load_portfolio_frame(
+            os.path.join(self.processed_dir, self.snapshot_name),
             os.path.join(self.raw_dir, 'Building_EUI_Targets.csv')
         )
-        self.df_targets['Building ID'] = self.df_targets['Building ID'].astype(str)
-        
-        # Merge data
-        self.portfolio = pd.merge(
-            self.df_current,
-            self.df_targets,
-            on='Building ID',
-            how='inner',
-            suffixes=('', '_targets')
-        )
-        
-        # Clean up - convert to numeric first
-        self.portfolio['Weather Normalized Site EUI'] = pd.to_numeric(
-            self.portfolio['Weather Normalized Site EUI'], errors='coerce'
-        )
-        self.portfolio['Master Sq Ft'] = pd.to_numeric(
-            self.portfolio['Master Sq Ft'], errors='coerce'
-        )
         
         # Filter out invalid data
         self.portfolio = self.portfolio[
@@ -93,82 +131,199 @@ class PortfolioRiskAnalyzer:
             (self.portfolio['Weather Normalized Site EUI'].notna())
         ]
         self.portfolio = self.portfolio[
-            (self.portfolio['Master Sq Ft'] >= 25000) & 
+            (self.portfolio['Master Sq Ft'] >= self.penalty_plan.rules.min_sqft) & 
             (self.portfolio['Master Sq Ft'].notna())
         ]
+        self.portfolio = compact(self.portfolio)
+        
+        # Building columns shared by every scenario table
+        self.base_frame = base_frame(self.portfolio)
+        self.rollup_dimensions = rollup_dimensions(self.portfolio)
         
-        print(f"✓ Loaded {len(self.portfolio)} buildings for analysis")
+        print(f"✓ Loaded {len(self.portfolio)} buildings for analysis "
+              f"({frame_memory(self.portfolio) / 1e6:.1f} MB)")
         
     def prepare_building_for_analysis(self, building_row) -> Dict:
-        """Prepare a building row for analysis"""
+        """Prepare a building row for analysis (typed cells become Python floats/ints)"""
+        final_target = building_row.get('Adjusted Final Target EUI',
+                                         building_row['Original Final Target EUI'])
         return {
             'building_id': building_row['Building ID'],
             'property_type': building_row['Master Property Type'],
-            'sqft': building_row['Master Sq Ft'],
-            'current_eui': building_row['Weather Normalized Site EUI'],
-            'baseline_eui': building_row['Baseline EUI'],
-            'first_interim_target': building_row['First Interim Target EUI'],
-            'second_interim_target': building_row['Second Interim Target EUI'],
-            'final_target': building_row.get('Adjusted Final Target EUI', 
-                                           building_row['Original Final Target EUI']),
-            'year_built': building_row.get('Year Built', 1990),
+            'sqft': number(building_row['Master Sq Ft']),
+            'current_eui': number(building_row['Weather Normalized Site EUI']),
+            'baseline_eui': number(building_row['Baseline EUI']),
+            'first_interim_target': number(building_row['First Interim Target EUI']),
+            'second_interim_target': number(building_row['Second Interim Target EUI']),
+            'final_target': number(final_target),
+            'year_built': number(building_row.get('Year Built', 1990)),
             'is_epb': building_row.get('Is EPB', False),
             'baseline_year': int(building_row.get('Baseline Year', 2019)),
             'first_interim_year': int(building_row.get('First Interim Target Year', 2025)),
-            'second_interim_year': int(building_row.get('Second Interim Target Year', 2027))
+            'second_interim_year': int(building_row.get('Second Interim Target Year', 2027)),
+            **self._forecast_inputs(building_row['Building ID']),
+            **self._policy_inputs(building_row['Building ID'])
         }
     
+    def use_eui_forecast(self, forecast):
+        """
+        Assess each target year against forecast EUI instead of current EUI
+        
+        Args:
+            forecast: EUIForecast (utils.eui_forecast), or None to go back to
+                current EUI; buildings without a forecast keep current EUI
+        """
+        self.eui_forecast = None if forecast is None else forecast.eui_by_year()
+        
+    def _forecast_inputs(self, building_id) -> Dict:
+        """'actual_euis' entry for a building when a forecast is in use"""
+        if self.eui_forecast is None:
+            return {}
+        return {'actual_euis': self.eui_forecast.get(str(building_id), {})}
+    
+    def use_compliance_policy(self, policy):
+        """
+        Take hybrid-scenario path decisions from an optimized policy
+        
+        Args:
+            policy: CompliancePolicy (optimize_compliance_paths), or None to go
+                back to the OptInPredictor rules; buildings missing from the
+                policy keep the rules
+        """
+        self.compliance_policy = policy
+        
+    def _policy_inputs(self, building_id) -> Dict:
+        """'compliance_plan' entry for a building when a policy is in use"""
+        if self.compliance_policy is None:
+            return {}
+        decision = self.compliance_policy.decision(building_id)
+        if decision is None:
+            return {}
+        return {'compliance_plan': decision}
+    
     def calculate_building_penalties(self, building_data: Dict, path: str = 'standard') -> Dict:
-        """Calculate penalties for a single building"""
-        sqft = building_data['sqft']
-        current_eui = building_data['current_eui']
+        """Calculate penalties for a single building (target years per config/penalty_rules.json)"""
+        # Forecast EUI per target year in building_data['actual_euis'] when available (use_eui_forecast)
+        return self.penalty_plan.building_penalties(path, building_data,
+                                                    rate=self.penalty_calc.get_penalty_rate(path))
+    
+    def _standard_row(self, building_data: Dict) -> Dict:
+        """Scenario row for a building on the standard path"""
+        penalties = self.calculate_building_penalties(building_data, 'standard')
         
-        if path == 'standard':
-            # Standard path penalties
-            penalties = {}
-            
-            # 2025 penalty
-            gap_2025 = max(0, current_eui - building_data['first_interim_target'])
-            penalties['2025'] = gap_2025 * sqft * self.penalty_calc.get_penalty_rate('standard')
-            
-            # 2027 penalty  
-            gap_2027 = max(0, current_eui - building_data['second_interim_target'])
-            penalties['2027'] = gap_2027 * sqft * self.penalty_calc.get_penalty_rate('standard')
-            
-            # 2030 penalty
-            gap_2030 = max(0, current_eui - building_data['final_target'])
-            penalties['2030'] = gap_2030 * sqft * self.penalty_calc.get_penalty_rate('standard')
-            
-            # Annual penalties 2031-2042
-            for year in range(2031, 2043):
-                penalties[str(year)] = penalties['2030']  # Same as 2030
-                
-        else:  # ACO path
-            penalties = {}
-            
-            # No penalties until 2028
-            penalties['2025'] = 0
-            penalties['2026'] = 0
-            penalties['2027'] = 0
-            
-            # 2028 penalty (using first interim target)
-            gap_2028 = max(0, current_eui - building_data['first_interim_target'])
-            penalties['2028'] = gap_2028 * sqft * self.penalty_calc.get_penalty_rate('aco')
-            
-            # 2029-2031 no penalties
-            penalties['2029'] = 0
-            penalties['2030'] = 0
-            penalties['2031'] = 0
-            
-            # 2032 penalty (using final target)
-            gap_2032 = max(0, current_eui - building_data['final_target'])
-            penalties['2032'] = gap_2032 * sqft * self.penalty_calc.get_penalty_rate('aco')
-            
-            # Annual penalties 2033-2042
-            for year in range(2033, 2043):
-                penalties[str(year)] = penalties['2032']
-                
-        return penalties
+        # Add normalized years
+        normalized_first = self.year_normalizer.normalize_standard_path_year(
+            building_data['first_interim_year'], 'first_interim'
+        )
+        normalized_second = self.year_normalizer.normalize_standard_path_year(
+            building_data['second_interim_year'], 'second_interim'
+        )
+        
+        return {
+            'building_id': building_data['building_id'],
+            'property_type': building_data['property_type'],
+            'sqft': building_data['sqft'],
+            'path': 'standard',
+            'normalized_first_year': normalized_first,
+            'normalized_second_year': normalized_second,
+            'normalized_final_year': self.year_normalizer.NORMALIZED_YEARS['standard']['final'],
+            **{f'penalty_{year}': penalty for year, penalty in penalties.items()}
+        }
+    
+    def _aco_row(self, building_data: Dict) -> Dict:
+        """Scenario row for a building on the ACO path"""
+        penalties = self.calculate_building_penalties(building_data, 'aco')
+        
+        return {
+            'building_id': building_data['building_id'],
+            'property_type': building_data['property_type'],
+            'sqft': building_data['sqft'],
+            'path': 'aco',
+            'normalized_first_year': self.year_normalizer.NORMALIZED_YEARS['aco']['first_interim'],
+            'normalized_final_year': self.year_normalizer.NORMALIZED_YEARS['aco']['final'],
+            **{f'penalty_{year}': penalty for year, penalty in penalties.items()}
+        }
+    
+    def _extension_row(self, building_data: Dict) -> Dict:
+        """Scenario row for a building on a timeline extension"""
+        penalties = self.calculate_building_penalties(building_data, 'extension')
+        
+        return {
+            'building_id': building_data['building_id'],
+            'property_type': building_data['property_type'],
+            'sqft': building_data['sqft'],
+            'path': 'extension',
+            'normalized_first_year': None,
+            'normalized_second_year': None,
+            'normalized_final_year': self.year_normalizer.NORMALIZED_YEARS['extension']['final'],
+            **{f'penalty_{year}': penalty for year, penalty in penalties.items()}
+        }
+    
+    def _policy_decision(self, plan: Dict) -> OptInDecision:
+        """OptInDecision view of an optimized compliance plan"""
+        path_npv = plan['path_npv']
+        if plan['option']:
+            stages = ', then '.join(f"{option} {year}" for year, option in plan['stages'])
+            rationale = f"Optimized: {stages} retrofit"
+        else:
+            rationale = "Optimized: no retrofit"
+        return OptInDecision(
+            should_opt_in=plan['path'] == 'aco',
+            confidence=min(100.0, 50 + 50 * plan['margin'] / max(plan['npv'], plan['margin'], 1.0)),
+            primary_rationale=rationale,
+            npv_advantage=path_npv.get('standard', 0.0) - path_npv.get('aco', 0.0),
+            decision_factors=plan,
+        )
+    
+    def _hybrid_row(self, building_data: Dict, rows: Optional[Dict] = None) -> Dict:
+        """
+        Scenario row for a building on its predicted (or optimized) path
+
+        With an optimized plan the penalty columns are the plan's yearly
+        penalties, i.e. with its retrofits installed.
+
+        Args:
+            rows: Optional 'standard' / 'aco' rows already computed for the
+                building, reused instead of pricing the path again
+        """
+        rows = rows or {}
+        plan = building_data.get('compliance_plan')
+        if plan is not None:
+            decision = self._policy_decision(plan)
+            path = plan['path']
+        else:
+            # Predict opt-in decision
+            decision = self.opt_in_predictor.predict_opt_in(building_data)
+            path = 'aco' if decision.should_opt_in else 'standard'
+        
+        if path == 'aco':
+            row = dict(rows['aco']) if 'aco' in rows else self._aco_row(building_data)
+            row['normalized_second_year'] = None
+        elif path == 'extension':
+            row = self._extension_row(building_data)
+        else:
+            row = rows['standard'] if 'standard' in rows else self._standard_row(building_data)
+        
+        penalties = {k: v for k, v in row.items() if k.startswith('penalty_')}
+        planned = {}
+        if plan is not None:
+            penalties = {k: plan['penalties'][int(k.replace('penalty_', ''))] for k in penalties}
+            planned = {'retrofit_option': plan['option']}
+        return {
+            'building_id': row['building_id'],
+            'property_type': row['property_type'],
+            'sqft': row['sqft'],
+            'path': row['path'],
+            'should_opt_in': decision.should_opt_in,
+            'opt_in_confidence': decision.confidence,
+            'opt_in_rationale': decision.primary_rationale,
+            'npv_advantage': decision.npv_advantage,
+            'normalized_first_year': row['normalized_first_year'],
+            'normalized_second_year': row['normalized_second_year'],
+            'normalized_final_year': row['normalized_final_year'],
+            **planned,
+            **penalties
+        }
     
     def scenario_all_standard(self) -> pd.DataFrame:
         """Calculate portfolio risk if all buildings stay on standard path"""
@@ -177,29 +332,9 @@ class PortfolioRiskAnalyzer:
         results = []
         for idx, building in self.portfolio.iterrows():
             building_data = self.prepare_building_for_analysis(building)
-            penalties = self.calculate_building_penalties(building_data, 'standard')
-            
-            # Add normalized years
-            normalized_first = self.year_normalizer.normalize_standard_path_year(
-                building_data['first_interim_year'], 'first_interim'
-            )
-            normalized_second = self.year_normalizer.normalize_standard_path_year(
-                building_data['second_interim_year'], 'second_interim'
-            )
+            results.append(self._standard_row(building_data))
             
-            result = {
-                'building_id': building_data['building_id'],
-                'property_type': building_data['property_type'],
-                'sqft': building_data['sqft'],
-                'path': 'standard',
-                'normalized_first_year': normalized_first,
-                'normalized_second_year': normalized_second,
-                'normalized_final_year': 2030,
-                **{f'penalty_{year}': penalty for year, penalty in penalties.items()}
-            }
-            results.append(result)
-            
-        return pd.DataFrame(results)
+        return scenario_frame(self.base_frame, results)
     
     def scenario_all_aco(self) -> pd.DataFrame:
         """Calculate portfolio risk if all buildings opt into ACO path"""
@@ -208,88 +343,201 @@ class PortfolioRiskAnalyzer:
         results = []
         for idx, building in self.portfolio.iterrows():
             building_data = self.prepare_building_for_analysis(building)
-            penalties = self.calculate_building_penalties(building_data, 'aco')
-            
-            result = {
-                'building_id': building_data['building_id'],
-                'property_type': building_data['property_type'],
-                'sqft': building_data['sqft'],
-                'path': 'aco',
-                'normalized_first_year': 2028,
-                'normalized_final_year': 2032,
-                **{f'penalty_{year}': penalty for year, penalty in penalties.items()}
-            }
-            results.append(result)
+            results.append(self._aco_row(building_data))
             
-        return pd.DataFrame(results)
+        return scenario_frame(self.base_frame, results)
     
     def scenario_hybrid(self) -> pd.DataFrame:
         """Calculate portfolio risk using opt-in prediction logic"""
         print("\n📈 Scenario 3: HYBRID - Using opt-in decision logic")
         
         results = []
-        opt_in_count = 0
-        
         for idx, building in self.portfolio.iterrows():
             building_data = self.prepare_building_for_analysis(building)
-            
-            # Predict opt-in decision
-            decision = self.opt_in_predictor.predict_opt_in(building_data)
-            
-            if decision.should_opt_in:
-                opt_in_count += 1
-                path = 'aco'
-                penalties = self.calculate_building_penalties(building_data, 'aco')
-                normalized_first = 2028
-                normalized_second = None
-                normalized_final = 2032
-            else:
-                path = 'standard'
-                penalties = self.calculate_building_penalties(building_data, 'standard')
-                normalized_first = self.year_normalizer.normalize_standard_path_year(
-                    building_data['first_interim_year'], 'first_interim'
-                )
-                normalized_second = self.year_normalizer.normalize_standard_path_year(
-                    building_data['second_interim_year'], 'second_interim'
-                )
-                normalized_final = 2030
-            
-            result = {
-                'building_id': building_data['building_id'],
-                'property_type': building_data['property_type'],
-                'sqft': building_data['sqft'],
-                'path': path,
-                'should_opt_in': decision.should_opt_in,
-                'opt_in_confidence': decision.confidence,
-                'opt_in_rationale': decision.primary_rationale,
-                'npv_advantage': decision.npv_advantage,
-                'normalized_first_year': normalized_first,
-                'normalized_second_year': normalized_second,
-                'normalized_final_year': normalized_final,
-                **{f'penalty_{year}': penalty for year, penalty in penalties.items()}
-            }
-            results.append(result)
+            results.append(self._hybrid_row(building_data))
         
+        opt_in_count = sum(row['should_opt_in'] for row in results)
         print(f"  → {opt_in_count} buildings ({opt_in_count/len(self.portfolio)*100:.1f}%) predicted to opt-in")
         
-        return pd.DataFrame(results)
+        return scenario_frame(self.base_frame, results)
+    
+    def model_version(self) -> str:
+        """Hash of the penalty rules and opt-in parameters behind every stored result"""
+        return input_hash({
+            'penalty_config': asdict(self.penalty_calc.config),
+            'penalty_rules': asdict(self.penalty_plan.rules),
+            'opt_in_parameters': vars(self.opt_in_predictor),
+            'scenario_years': [self.penalty_plan.rules.first_year, self.penalty_plan.rules.last_year],
+        })
     
-    def analyze_all_scenarios(self) -> Dict[str, pd.DataFrame]:
-        """Run all three scenarios and return results"""
+    def analyze_building(self, building_data: Dict) -> Dict:
+        """All three scenario rows for one building (the unit stored in a ResultsStore)"""
+        # Each path is priced once; the hybrid row reuses the chosen path's schedule
+        standard = self._standard_row(building_data)
+        aco = self._aco_row(building_data)
+        return {
+            'all_standard': standard,
+            'all_aco': aco,
+            'hybrid': self._hybrid_row(building_data, {'standard': standard, 'aco': aco}),
+        }
+
+    def analyze_rows(self, start: int, stop: int) -> List[Tuple[Dict, Dict]]:
+        """(prepared building data, analyze_building rows) for portfolio rows start:stop"""
+        results = []
+        for idx, building in self.portfolio.iloc[start:stop].iterrows():
+            building_data = self.prepare_building_for_analysis(building)
+            results.append((building_data, self.analyze_building(building_data)))
+        return results
+
+    def shared_inputs(self, workers: Optional[int] = None) -> List[Tuple[Dict, Dict]]:
+        """
+        Prepared data and all three scenario rows for every building, computed once
+
+        Each building is prepared and priced on the standard and ACO paths a
+        single time, and its hybrid row reuses those schedules with the
+        building's opt-in decision. Contiguous chunks of the portfolio run
+        across processes and are concatenated in portfolio order, so the
+        results do not depend on the number of workers.
+
+        Args:
+            workers: Processes (None = all CPUs, 1 = run in this process)
+
+        Returns:
+            (building_data, analyze_building rows) per building, in portfolio order
+        """
+        n = len(self.portfolio)
+        workers = os.cpu_count() if workers is None else workers
+        workers = max(1, min(workers, n))
+        size = max(1, -(-n // (workers * 4)))
+        chunks = [(start, min(start + size, n)) for start in range(0, n, size)]
+        if workers == 1:
+            parts = [self.analyze_rows(*chunk) for chunk in chunks]
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(self,)) as pool:
+                parts = list(pool.map(_analyze_chunk, chunks))
+
+        results = [result for part in parts for result in part]
+        self.building_inputs = [building_data for building_data, _ in results]
+        return results
+    
+    @staticmethod
+    def building_contributions(building_id: str, outputs: Dict):
+        """
+        What one building adds to the portfolio aggregates
+        
+        Yields:
+            (aggregate, group_key, metric, value) rows: yearly penalty totals and
+            buildings at risk per scenario, and hybrid totals per property type
+        """
+        for scenario, row in outputs.items():
+            for column, penalty in row.items():
+                if column.startswith('penalty_'):
+                    year = column.replace('penalty_', '')
+                    yield 'scenario_year', f"{scenario}|{year}", 'total_penalty', penalty
+                    yield 'scenario_year', f"{scenario}|{year}", 'buildings_at_risk', float(penalty > 0)
+        
+        hybrid = outputs['hybrid']
+        property_type = str(hybrid['property_type'])
+        yield 'property_type', property_type, 'total_buildings', 1.0
+        yield 'property_type', property_type, 'opt_in_count', float(hybrid['should_opt_in'])
+        yield 'property_type', property_type, 'total_penalty_2030', hybrid.get('penalty_2030', 0)
+        yield 'property_type', property_type, 'total_sqft', hybrid['sqft']
+        yield 'property_type', property_type, 'npv_advantage', hybrid['npv_advantage']
+    
+    def refresh_results_store(self, store, snapshot: str = None):
+        """
+        Bring a ResultsStore up to date with the loaded portfolio
+        
+        Only buildings whose inputs changed since the last run (or that are
+        new) are recomputed; aggregates are adjusted by their deltas.
+        
+        Returns:
+            StoreDiff describing what was recomputed
+        """
+        inputs = {}
+        for idx, building in self.portfolio.iterrows():
+            building_data = self.prepare_building_for_analysis(building)
+            inputs[str(building_data['building_id'])] = building_data
+        
+        diff = store.refresh(inputs, self.analyze_building, self.building_contributions,
+                             snapshot=snapshot)
+        print(f"  → Results store: {diff.summary()}")
+        return diff
+    
+    def analyze_all_scenarios(self, store=None, workers: Optional[int] = 1) -> Dict[str, pd.DataFrame]:
+        """
+        Run all three scenarios and return results
+        
+        Args:
+            store: Optional ResultsStore - only changed buildings are recomputed
+                and the scenario tables are assembled from stored results
+            workers: 1 runs the scenarios one after another; any other value
+                builds them together from shared_inputs over that many
+                processes (None = all CPUs). The tables are identical.
+        """
         print("\n🔍 RUNNING PORTFOLIO RISK ANALYSIS")
         print("=" * 60)
         
-        scenarios = {
-            'all_standard': self.scenario_all_standard(),
-            'all_aco': self.scenario_all_aco(),
-            'hybrid': self.scenario_hybrid()
-        }
+        if store is None and workers == 1:
+            scenarios = {
+                'all_standard': self.scenario_all_standard(),
+                'all_aco': self.scenario_all_aco(),
+                'hybrid': self.scenario_hybrid()
+            }
+        elif store is None:
+            print("\n📈 Scenarios 1-3: STANDARD, ACO and HYBRID paths from shared building inputs")
+            outputs = self.shared_inputs(workers)
+            scenarios = {
+                name: scenario_frame(self.base_frame, [rows[name] for _, rows in outputs])
+                for name in SCENARIOS
+            }
+            opt_in_count = int(scenarios['hybrid']['should_opt_in'].sum())
+            print(f"  → {opt_in_count} buildings ({opt_in_count/len(self.portfolio)*100:.1f}%) predicted to opt-in")
+        else:
+            self.refresh_results_store(store, snapshot=self.snapshot_name)
+            outputs = store.outputs(self.portfolio['Building ID'].astype(str))
+            scenarios = {
+                name: scenario_frame(self.base_frame, [building[name] for building in outputs.values()])
+                for name in SCENARIOS
+            }
+        
+        # Every scenario (and sensitivity variant) is a path choice over this cube
+        self.penalty_cube = PenaltyCube.from_scenarios(scenarios['all_standard'], scenarios['all_aco'])
+        self.portfolio_rollup(scenarios)
         
         # Print summary comparison
         self.print_scenario_comparison(scenarios)
         
         return scenarios
     
+    def penalty_matrix(self, scenario_df: pd.DataFrame) -> PenaltyMatrix:
+        """
+        Yearly penalties of a scenario as an array with cached totals
+        
+        Scenarios over the analyzed portfolio are gathered from the penalty
+        cube by their 'path' column; other frames, and hybrids with planned
+        retrofits, are read from their penalty_YYYY columns.
+        """
+        retrofits = 'retrofit_option' in scenario_df.columns and (scenario_df['retrofit_option'] != '').any()
+        if self.penalty_cube is not None and self.penalty_cube.covers(scenario_df) and not retrofits:
+            return self.penalty_cube.scenario(scenario_df['path'].to_numpy())
+        return PenaltyMatrix.from_frame(scenario_df)
+    
+    def portfolio_rollup(self, scenarios: Dict[str, pd.DataFrame]) -> PenaltyRollup:
+        """Rollup over the given scenario frames (rebuilt when their content or the model changes)"""
+        version = self.model_version()
+        if self.rollup is None or not self.rollup.covers(scenarios, version):
+            self.rollup = PenaltyRollup.build(scenarios, self.rollup_dimensions, version=version)
+        return self.rollup
+    
+    def scenario_rollup(self, scenario_df: pd.DataFrame) -> PenaltyRollup:
+        """Rollup slice for one scenario frame (aggregated on the fly if not in self.rollup)"""
+        name = self.rollup.scenario_name(scenario_df) if self.rollup is not None else None
+        if name is None:
+            return PenaltyRollup.build({'scenario': scenario_df}, self.rollup_dimensions)
+        return self.rollup.slice(scenario=name)
+    
     def print_scenario_comparison(self, scenarios: Dict[str, pd.DataFrame]):
         """Print comparison of all scenarios"""
         print("\n📊 SCENARIO COMPARISON")
@@ -299,43 +547,22 @@ class PortfolioRiskAnalyzer:
         comparison = []
         
         for scenario_name, df in scenarios.items():
-            # Total penalties by year
-            penalty_cols = [col for col in df.columns if col.startswith('penalty_')]
-            yearly_totals = {}
-            
-            for col in penalty_cols:
-                year = col.replace('penalty_', '')
-                yearly_totals[year] = df[col].sum()
-            
-            # Calculate NPV (7% discount rate from 2025)
-            npv_total = 0
-            for year_str, penalty in yearly_totals.items():
-                year = int(year_str)
-                years_from_2025 = year - 2025
-                if years_from_2025 >= 0:
-                    npv_total += penalty / ((1.07) ** years_from_2025)
+            penalties = self.penalty_matrix(df)
             
-            # Key years
-            penalty_2025 = yearly_totals.get('2025', 0)
-            penalty_2027 = yearly_totals.get('2027', 0)
-            penalty_2028 = yearly_totals.get('2028', 0)
-            penalty_2030 = yearly_totals.get('2030', 0)
-            penalty_2032 = yearly_totals.get('2032', 0)
-            
-            # Peak year
-            peak_year = max(yearly_totals.items(), key=lambda x: x[1])
+            # NPV (7% discount rate from 2025) and peak year
+            npv_total = penalties.npv()
+            peak_year = penalties.peak_year()
             
             comparison.append({
                 'Scenario': scenario_name.replace('_', ' ').title(),
                 'Total NPV': npv_total,
                 'Peak Year': f"{peak_year[0]}: ${peak_year[1]:,.0f}",
-                '2025 Penalty': penalty_2025,
-                '2027 Penalty': penalty_2027,
-                '2028 Penalty': penalty_2028,
-                '2030 Penalty': penalty_2030,
-                '2032 Penalty': penalty_2032,
-                'Buildings at Risk 2025': (df[df['penalty_2025'] > 0]['penalty_2025'].count() 
-                                         if 'penalty_2025' in df.columns else 0)
+                '2025 Penalty': penalties.total(2025),
+                '2027 Penalty': penalties.total(2027),
+                '2028 Penalty': penalties.total(2028),
+                '2030 Penalty': penalties.total(2030),
+                '2032 Penalty': penalties.total(2032),
+                'Buildings at Risk 2025': penalties.at_risk(2025)
             })
         
         comparison_df = pd.DataFrame(comparison)
@@ -357,17 +584,212 @@ class PortfolioRiskAnalyzer:
                 print("\n\nHybrid Scenario - Opt-In Decision Breakdown:")
                 print("-" * 60)
                 rationale_counts = hybrid_df[hybrid_df['should_opt_in'] == True]['opt_in_rationale'].value_counts()
+                rationale_counts = rationale_counts[rationale_counts > 0]
                 for rationale, count in rationale_counts.items():
                     print(f"  {rationale}: {count} buildings")
     
+    def penalty_monte_carlo(self, scenario_df: pd.DataFrame = None, n_paths: int = 20_000,
+                            params: MonteCarloParams = None, workers: int = None,
+                            seed: int = 42, alpha: float = 0.95):
+        """
+        Penalty ranges under uncertain EUI trajectories and retrofit adoption
+        
+        Each building keeps the compliance path it has in scenario_df (the
+        hybrid scenario when omitted) while its EUI follows its historical
+        trend with property-type-correlated shocks.
+        
+        Args:
+            scenario_df: Scenario over the loaded portfolio (supplies 'path')
+            n_paths: Simulated portfolio paths
+            params: MonteCarloParams (volatility, correlations, retrofit hazard)
+            workers: Processes for the simulation chunks (None = all CPUs)
+            seed: Root random seed
+            alpha: VaR / CVaR level
+            
+        Returns:
+            MonteCarloResult
+        """
+        if scenario_df is None:
+            scenario_df = self.scenario_hybrid()
+        if not self.base_frame['building_id'].equals(scenario_df['building_id'].astype(str).reset_index(drop=True)):
+            raise ValueError("Scenario does not cover the loaded portfolio in order")
+        
+        inputs = MonteCarloInputs.from_frame(self.portfolio, scenario_df['path'].astype(str).to_numpy())
+        print(f"\n🎲 Simulating {n_paths:,} portfolio paths for {len(inputs):,} buildings...")
+        result = run_monte_carlo(inputs, n_paths=n_paths, params=params, seed=seed,
+                                 alpha=alpha, workers=workers)
+        print_report(result)
+        return result
+
+    def optimize_retrofits(self, budget: float, scenario_df: pd.DataFrame = None,
+                           objective: str = 'avoided_penalties', min_epb_share: float = 0.0,
+                           yearly_limits: Optional[Dict[int, int]] = None,
+                           options=None, params: OptimizerParams = None):
+        """
+        Allocate a retrofit fund across the portfolio
+
+        Candidates (building x retrofit option x deployment year) are built
+        once per scenario and cached, so repeated calls with different fund
+        sizes only re-run the selection.
+
+        Args:
+            budget: Fund size in dollars
+            scenario_df: Scenario supplying each building's path (hybrid when omitted)
+            objective: 'avoided_penalties' or 'developer_profit'
+            min_epb_share: Minimum share of spending on EPB buildings
+            yearly_limits: Deployment year -> max projects started that year
+            options: RetrofitOption packages (default_options() when omitted)
+            params: OptimizerParams
+
+        Returns:
+            RetrofitPlan
+        """
+        if scenario_df is None:
+            scenario_df = self.scenario_hybrid()
+        if not self.base_frame['building_id'].equals(scenario_df['building_id'].astype(str).reset_index(drop=True)):
+            raise ValueError("Scenario does not cover the loaded portfolio in order")
+
+        paths = scenario_df['path'].astype(str).to_numpy()
+        key = (tuple(paths), tuple(options or ()), params)
+        if self.retrofit_candidates is None or self.retrofit_candidates[0] != key:
+            inputs = MonteCarloInputs.from_frame(self.portfolio, paths)
+            is_epb = self.rollup_dimensions['is_epb'].reindex(inputs.building_ids).fillna(False).to_numpy(dtype=bool)
+            if options is None:
+                options = default_options(self.opt_in_predictor.retrofit_cost_per_reduction)
+            self.retrofit_candidates = (key, RetrofitCandidates(inputs, is_epb, options, params))
+
+        plan = optimize_retrofits(self.retrofit_candidates[1], budget, objective=objective,
+                                  min_epb_share=min_epb_share, yearly_limits=yearly_limits)
+        print_plan(plan)
+        return plan
+
+    def optimize_compliance_paths(self, options=None, params: PathParams = None, allowed=None):
+        """
+        Cheapest compliance path and retrofit timing for every building
+        
+        Solves the path / retrofit-year / retrofit-depth decision for the
+        whole portfolio at once; pass the result to use_compliance_policy to
+        drive the hybrid scenario with it.
+        
+        Args:
+            options: RetrofitOption depths (default_options() when omitted)
+            params: PathParams (paths considered, retrofit years, discounting)
+            allowed: Optional bool (paths, buildings) mask of the paths each
+                building may take (e.g. extension only where approved)
+            
+        Returns:
+            CompliancePolicy
+        """
+        if options is None:
+            options = default_options(self.opt_in_predictor.retrofit_cost_per_reduction)
+        inputs = MonteCarloInputs.from_frame(self.portfolio, 'standard')
+        policy = optimize_compliance(inputs, options, params, self.penalty_plan, allowed)
+        print_policy(policy)
+        return policy
+
+    def measure_frontiers(self, library: MeasureLibrary = None):
+        """
+        Cost-vs-EUI frontier of retrofit measure packages for every building
+        
+        Args:
+            library: MeasureLibrary (the default measures when omitted)
+            
+        Returns:
+            MeasureFrontier (cheapest_reaching(final targets) gives each
+            building's least-cost package to comply)
+        """
+        library = library or MeasureLibrary()
+        inputs = MonteCarloInputs.from_frame(self.portfolio, 'standard')
+        frontier = library.evaluate(inputs.current_eui, inputs.sqft, inputs.property_types,
+                                    inputs.building_ids)
+        print_frontier_summary(frontier, inputs.final_target)
+        return frontier
+
+    def start_incremental(self, scenarios: Dict[str, pd.DataFrame], top_n: int = 10) -> IncrementalAggregates:
+        """
+        Keep scenario totals, at-risk counts, property-type rollups and the
+        top-N penalty ranking current under update_building edits
+        
+        Args:
+            scenarios: analyze_all_scenarios() results
+            top_n: Ranking size reported in change reports
+        """
+        self.incremental = IncrementalAggregates(scenarios, self.rollup_dimensions, top_n=top_n)
+        self._portfolio_rows = {str(b): label for label, b in self.portfolio['Building ID'].items()}
+        return self.incremental
+    
+    def update_building(self, building_id, is_mai: bool = None, **inputs):
+        """
+        Correct one building's inputs and update the incremental summaries
+        
+        Only this building's scenario rows are recomputed; the scenario
+        frames and penalty cube from analyze_all_scenarios are not touched
+        (rerun it for full tables). The rollup is dropped, so the next report
+        rebuilds it with the edited MAI designation.
+        
+        Args:
+            building_id: Building to correct
+            is_mai: New MAI designation; the final target is re-derived from
+                the original target with the rule-table caps / floors
+            inputs: New values for current_eui, baseline_eui, sqft,
+                first_interim_target, second_interim_target, final_target
+        
+        Returns:
+            ChangeReport
+        """
+        if self.incremental is None:
+            raise RuntimeError("Call start_incremental(scenarios) before update_building")
+        label = self._portfolio_rows.get(str(building_id))
+        if label is None:
+            raise KeyError(f"Building {building_id} is not in the portfolio")
+        final_column = ('Adjusted Final Target EUI' if 'Adjusted Final Target EUI' in self.portfolio.columns
+                        else 'Original Final Target EUI')
+        columns = {
+            'current_eui': 'Weather Normalized Site EUI',
+            'baseline_eui': 'Baseline EUI',
+            'sqft': 'Master Sq Ft',
+            'first_interim_target': 'First Interim Target EUI',
+            'second_interim_target': 'Second Interim Target EUI',
+            'final_target': final_column,
+        }
+        unknown = set(inputs) - set(columns)
+        if unknown:
+            raise ValueError(f"Cannot update {sorted(unknown)}; editable inputs are {sorted(columns)}")
+        def write(column, value):
+            # Keep the compact column dtypes (float32)
+            self.portfolio.at[label, column] = self.portfolio[column].dtype.type(value)
+        
+        for name, value in inputs.items():
+            write(columns[name], value)
+        
+        if is_mai is not None:
+            row = self.portfolio.loc[label]
+            write(final_column, self.penalty_plan.final_targets(
+                [row['Original Final Target EUI']], [row['Baseline EUI']], [is_mai])[0])
+            if 'is_mai' not in self.rollup_dimensions.columns:
+                self.rollup_dimensions['is_mai'] = False
+            self.rollup_dimensions.loc[str(building_id), 'is_mai'] = bool(is_mai)
+        self.rollup = None
+        
+        building_data = self.prepare_building_for_analysis(self.portfolio.loc[label])
+        if self.building_inputs is not None:
+            # Keep the shared inputs (building_risk) in step with the edit
+            self.building_inputs[self.portfolio.index.get_loc(label)] = building_data
+        report = self.incremental.apply(building_id, self.analyze_building(building_data), is_mai=is_mai)
+        print(report.summary())
+        return report
+
     def sensitivity_analysis(self, base_scenario: pd.DataFrame, 
-                           adjustment_pct: float = 0.20) -> Dict[str, pd.DataFrame]:
+                           adjustment_pct: float = 0.20,
+                           random_state: np.random.RandomState = None) -> Dict[str, pd.DataFrame]:
         """
         Perform sensitivity analysis on opt-in rates.
         
         Args:
             base_scenario: The hybrid scenario DataFrame
             adjustment_pct: Percentage to adjust opt-in rates (default ±20%)
+            random_state: Generator for picking the flipped buildings
+                (numpy's global generator when None)
             
         Returns:
             Dictionary with high and low sensitivity scenarios
@@ -383,11 +805,13 @@ class PortfolioRiskAnalyzer:
         current_opt_in_rate = base_scenario['should_opt_in'].mean()
         print(f"  Current opt-in rate: {current_opt_in_rate*100:.1f}%")
         
-        # Create scenarios
+        # Create scenarios (variants copy only the columns they change)
         scenarios = {}
+        changed_columns = ['should_opt_in', 'path'] + [
+            col for col in base_scenario.columns if col.startswith('penalty_')]
         
         # High opt-in scenario
-        high_scenario = base_scenario.copy()
+        high_scenario = fork(base_scenario, changed_columns)
         borderline_buildings = high_scenario[
             (high_scenario['opt_in_confidence'] >= 50) & 
             (high_scenario['opt_in_confidence'] <= 80) &
@@ -397,7 +821,7 @@ class PortfolioRiskAnalyzer:
         # Flip some borderline buildings to opt-in
         num_to_flip = int(len(borderline_buildings) * adjustment_pct)
         if num_to_flip > 0:
-            buildings_to_flip = borderline_buildings.sample(n=num_to_flip).index
+            buildings_to_flip = borderline_buildings.sample(n=num_to_flip, random_state=random_state).index
             
             for idx in buildings_to_flip:
                 building_data = self.prepare_building_for_analysis(self.portfolio.loc[idx])
@@ -417,7 +841,7 @@ class PortfolioRiskAnalyzer:
         scenarios['high_opt_in'] = high_scenario
         
         # Low opt-in scenario (similar logic but opposite)
-        low_scenario = base_scenario.copy()
+        low_scenario = fork(base_scenario, changed_columns)
         borderline_opt_ins = low_scenario[
             (low_scenario['opt_in_confidence'] >= 50) & 
             (low_scenario['opt_in_confidence'] <= 80) &
@@ -426,7 +850,7 @@ class PortfolioRiskAnalyzer:
         
         num_to_flip = int(len(borderline_opt_ins) * adjustment_pct)
         if num_to_flip > 0:
-            buildings_to_flip = borderline_opt_ins.sample(n=num_to_flip).index
+            buildings_to_flip = borderline_opt_ins.sample(n=num_to_flip, random_state=random_state).index
             
             for idx in buildings_to_flip:
                 building_data = self.prepare_building_for_analysis(self.portfolio.loc[idx])
@@ -451,22 +875,14 @@ class PortfolioRiskAnalyzer:
         """Analyze opt-in trends by property type"""
         print("\n🏢 PROPERTY TYPE ANALYSIS")
         
+        rollup = self.scenario_rollup(scenario_df)
+        by_type = rollup.summary(by='property_type', years=(2025, 2030))
+        
         # Only meaningful for scenarios with opt-in decisions
-        if 'should_opt_in' in scenario_df.columns:
-            analysis = scenario_df.groupby('property_type').agg({
-                'building_id': 'count',
-                'should_opt_in': ['sum', 'mean'],
-                'npv_advantage': 'mean',
-                'penalty_2025': 'sum',
-                'penalty_2030': 'sum',
-                'sqft': 'sum'
-            }).round(2)
-            
-            # Flatten column names
-            analysis.columns = ['_'.join(col).strip() for col in analysis.columns.values]
-            analysis.columns = ['total_buildings', 'opt_in_count', 'opt_in_rate', 
-                               'avg_npv_advantage', 'total_penalty_2025', 
-                               'total_penalty_2030', 'total_sqft']
+        if rollup.has_opt_in:
+            analysis = by_type[['total_buildings', 'opt_in_count', 'opt_in_rate', 
+                                'avg_npv_advantage', 'total_penalty_2025', 
+                                'total_penalty_2030', 'total_sqft']].round(2)
             
             # Sort by opt-in rate
             analysis = analysis.sort_values('opt_in_rate', ascending=False)
@@ -482,14 +898,8 @@ class PortfolioRiskAnalyzer:
                       f"NPV Adv: ${row['avg_npv_advantage']:>10,.0f}")
         else:
             # For non-hybrid scenarios, just show penalty distribution
-            analysis = scenario_df.groupby('property_type').agg({
-                'building_id': 'count',
-                'penalty_2025': 'sum',
-                'penalty_2030': 'sum',
-                'sqft': 'sum'
-            })
-            analysis.columns = ['total_buildings', 'total_penalty_2025', 
-                               'total_penalty_2030', 'total_sqft']
+            analysis = by_type[['total_buildings', 'total_penalty_2025', 
+                                'total_penalty_2030', 'total_sqft']]
             
         return analysis
     
@@ -502,17 +912,14 @@ class PortfolioRiskAnalyzer:
         time_series_data = []
         
         for scenario_name, df in scenarios.items():
+            penalties = self.penalty_matrix(df)
             for year in years:
-                col_name = f'penalty_{year}'
-                if col_name in df.columns:
-                    total_penalty = df[col_name].sum()
-                    buildings_at_risk = (df[col_name] > 0).sum()
-                    
+                if penalties.has_year(year):
                     time_series_data.append({
                         'scenario': scenario_name,
                         'year': year,
-                        'total_penalty': total_penalty,
-                        'buildings_at_risk': buildings_at_risk
+                        'total_penalty': penalties.total(year),
+                        'buildings_at_risk': penalties.at_risk(year)
                     })
         
         time_series_df = pd.DataFrame(time_series_data)
@@ -540,9 +947,142 @@ class PortfolioRiskAnalyzer:
         
         return time_series_df
     
+    def mai_analysis(self, scenario_df: pd.DataFrame) -> pd.DataFrame:
+        """MAI building penalties of a scenario by property type (from the rollup)"""
+        print("\n🏭 MAI BUILDING PENALTY ANALYSIS")
+        
+        mai = self.scenario_rollup(scenario_df).slice(is_mai=True)
+        if mai.buildings() == 0:
+            print("  No MAI buildings found in scenario")
+            return pd.DataFrame()
+        
+        print(f"  Total MAI buildings: {mai.buildings()}")
+        for year in (2028, 2030, 2032):
+            if mai.has_year(year):
+                print(f"  {year}: ${mai.penalty(year):,.0f} ({mai.at_risk(year)} buildings)")
+        
+        return mai.summary(by='property_type', years=(2028, 2030, 2032))
+    
+    def run_analysis(self, task: Tuple, scenarios: Dict[str, pd.DataFrame]):
+        """
+        One run_analyses task: (kind, scenario name, argument)
+        
+        Returns:
+            (result, the task's printed report)
+        """
+        kind, name, argument = task
+        report = io.StringIO()
+        with contextlib.redirect_stdout(report):
+            if kind == 'sensitivity':
+                adjustment_pct, state = argument
+                random_state = np.random.RandomState()
+                random_state.set_state(state)
+                result = (self.sensitivity_analysis(scenarios[name], adjustment_pct, random_state),
+                          random_state.get_state())
+            elif kind == 'property_type':
+                result = self.property_type_analysis(scenarios[name])
+            elif kind == 'mai':
+                result = self.mai_analysis(scenarios[name])
+            elif kind == 'time_series':
+                result = self.time_series_analysis(scenarios)
+            else:
+                raise ValueError(f"Unknown analysis: {kind}")
+        return result, report.getvalue()
+    
+    def run_analyses(self, scenarios: Dict[str, pd.DataFrame], workers: Optional[int] = None,
+                     adjustment_pct: float = 0.20) -> Dict:
+        """
+        Sensitivity, property type, MAI and time series analyses side by side
+        
+        The analyses only read the scenario frames (through the penalty cube
+        and rollup), so each runs as an independent task across processes.
+        Reports are printed in task order and the sensitivity variants are
+        drawn from a copy of numpy's global generator, which is then advanced
+        as if they had been drawn here - results match running the analyses
+        one after another.
+        
+        Args:
+            scenarios: Frames from analyze_all_scenarios
+            workers: Processes (None = all CPUs, 1 = run in this process)
+            adjustment_pct: Sensitivity opt-in adjustment
+            
+        Returns:
+            Dict with 'sensitivity' (variant frames), 'property_types' and
+            'mai' (per scenario) and 'time_series' (over the three scenarios)
+        """
+        base = {name: df for name, df in scenarios.items() if name in SCENARIOS}
+        tasks = []
+        if 'hybrid' in base:
+            tasks.append(('sensitivity', 'hybrid', (adjustment_pct, np.random.get_state())))
+        tasks += [('property_type', name, None) for name in base]
+        tasks += [('mai', name, None) for name in base]
+        tasks.append(('time_series', None, None))
+        
+        workers = os.cpu_count() if workers is None else workers
+        workers = max(1, min(workers, len(tasks)))
+        if workers == 1:
+            outputs = [self.run_analysis(task, base) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(self, base)) as pool:
+                outputs = list(pool.map(_run_analysis, tasks))
+        
+        analyses = {'sensitivity': {}, 'property_types': {}, 'mai': {}}
+        for (kind, name, _), (result, report) in zip(tasks, outputs):
+            print(report, end='')
+            if kind == 'sensitivity':
+                analyses['sensitivity'], state = result
+                np.random.set_state(state)
+            elif kind == 'property_type':
+                analyses['property_types'][name] = result
+            elif kind == 'mai':
+                analyses['mai'][name] = result
+            else:
+                analyses['time_series'] = result
+        return analyses
+    
+    def building_risk(self) -> pd.DataFrame:
+        """
+        Standard / ACO penalty NPV and EUI gap per building, in portfolio order
+        
+        NPVs are read from the penalty cube and EUIs from the shared building
+        inputs when available, so no building is priced again.
+        """
+        if self.penalty_cube is None:
+            raise ValueError("Run analyze_all_scenarios first (no penalty cube)")
+        inputs = self.building_inputs
+        if inputs is None:
+            inputs = [self.prepare_building_for_analysis(building)
+                      for idx, building in self.portfolio.iterrows()]
+        
+        standard_npv = self.penalty_cube.building_npv('standard')
+        aco_npv = self.penalty_cube.building_npv('aco')
+        current_eui = np.array([b['current_eui'] for b in inputs])
+        final_target = np.array([b['final_target'] for b in inputs])
+        return pd.DataFrame({
+            'building_id': [b['building_id'] for b in inputs],
+            'property_type': [b['property_type'] for b in inputs],
+            'sqft': [b['sqft'] for b in inputs],
+            'current_eui': current_eui,
+            'final_target': final_target,
+            'eui_gap': current_eui - final_target,
+            'standard_npv': standard_npv,
+            'aco_npv': aco_npv,
+            'npv_advantage': standard_npv - aco_npv,
+            'penalty_2030': self.penalty_cube.path_penalties('standard', 2030),
+        })
+    
     def create_visualizations(self, scenarios: Dict[str, pd.DataFrame], 
-                            output_dir: str = None):
-        """Create comprehensive visualizations"""
+                            output_dir: str = None, time_series_df: pd.DataFrame = None):
+        """
+        Create comprehensive visualizations
+        
+        Args:
+            scenarios: Scenario frames to plot
+            output_dir: Figure directory
+            time_series_df: time_series_analysis results already computed
+                (e.g. by run_analyses); scenarios missing from it are analyzed here
+        """
         if output_dir is None:
             output_dir = os.path.join(self.data_dir, '..', 'outputs', 'portfolio_analysis')
         os.makedirs(output_dir, exist_ok=True)
@@ -558,16 +1098,7 @@ class PortfolioRiskAnalyzer:
         for name, df in scenarios.items():
             scenario_names.append(name.replace('_', ' ').title())
             
-            # Calculate NPV
-            npv_total = 0
-            for year in range(2025, 2043):
-                col_name = f'penalty_{year}'
-                if col_name in df.columns:
-                    penalty = df[col_name].sum()
-                    years_from_2025 = year - 2025
-                    npv_total += penalty / ((1.07) ** years_from_2025)
-            
-            npv_values.append(npv_total)
+            npv_values.append(self.penalty_matrix(df).npv())
         
         bars = ax1.bar(scenario_names, [v/1e6 for v in npv_values], 
                        color=['#1f77b4', '#ff7f0e', '#2ca02c'])
@@ -582,7 +1113,11 @@ class PortfolioRiskAnalyzer:
         
         # 2. Time Series - Penalty Evolution
         ax2 = plt.subplot(2, 3, 2)
-        time_series_df = self.time_series_analysis(scenarios)
+        analyzed = set() if time_series_df is None else set(time_series_df['scenario'])
+        missing = {name: df for name, df in scenarios.items() if name not in analyzed}
+        if missing:
+            time_series_df = pd.concat([time_series_df, self.time_series_analysis(missing)],
+                                       ignore_index=True)
         
         for scenario in scenarios.keys():
             scenario_data = time_series_df[time_series_df['scenario'] == scenario]
@@ -666,9 +1201,9 @@ class PortfolioRiskAnalyzer:
         # Create summary table
         summary_data = []
         for name, df in scenarios.items():
-            total_sqft = df['sqft'].sum()
-            buildings_at_risk_2025 = (df['penalty_2025'] > 0).sum() if 'penalty_2025' in df.columns else 0
-            avg_penalty_per_sqft = df['penalty_2030'].sum() / total_sqft if 'penalty_2030' in df.columns else 0
+            penalties = self.penalty_matrix(df)
+            buildings_at_risk_2025 = penalties.at_risk(2025)
+            avg_penalty_per_sqft = penalties.penalty_per_sqft(2030)
             
             summary_data.append([
                 name.replace('_', ' ').title(),
@@ -697,27 +1232,27 @@ class PortfolioRiskAnalyzer:
         
         return fig
     
-    def generate_report(self, output_path: str = None):
-        """Generate comprehensive portfolio risk report"""
+    def generate_report(self, output_path: str = None, store=None, workers: Optional[int] = 1):
+        """Generate comprehensive portfolio risk report
+        
+        Args:
+            output_path: JSON output path (Excel detail is written alongside)
+            store: Optional ResultsStore for incremental reruns
+            workers: 1 runs every step in turn in this process; otherwise the
+                scenarios come from shared_inputs and the analyses from
+                run_analyses over that many processes (None = all CPUs)
+        """
         print("\n📋 GENERATING COMPREHENSIVE PORTFOLIO RISK REPORT")
         print("=" * 60)
         
-        # Run all analyses
-        scenarios = self.analyze_all_scenarios()
-        
-        # Sensitivity analysis on hybrid scenario
-        if 'hybrid' in scenarios:
-            sensitivity_scenarios = self.sensitivity_analysis(scenarios['hybrid'])
-            scenarios.update(sensitivity_scenarios)
-        
-        # Property type analysis
-        property_analysis = {}
-        for name, df in scenarios.items():
-            if name in ['all_standard', 'all_aco', 'hybrid']:
-                property_analysis[name] = self.property_type_analysis(df)
+        # Run all analyses (sensitivity, property type, MAI, time series)
+        scenarios = self.analyze_all_scenarios(store=store, workers=workers)
+        analyses = self.run_analyses(scenarios, workers=workers)
+        scenarios.update(analyses['sensitivity'])
+        property_analysis = analyses['property_types']
         
         # Create visualizations
-        fig = self.create_visualizations(scenarios)
+        fig = self.create_visualizations(scenarios, time_series_df=analyses['time_series'])
         
         # Save detailed results
         if output_path:
@@ -732,8 +1267,19 @@ class PortfolioRiskAnalyzer:
                 # Add property type analysis
                 for name, analysis in property_analysis.items():
                     analysis.to_excel(writer, sheet_name=f'{name}_by_type')
+                
+                # MAI buildings by property type, and penalties by year
+                for name, analysis in analyses['mai'].items():
+                    if not analysis.empty:
+                        analysis.to_excel(writer, sheet_name=f'{name}_mai')
+                analyses['time_series'].to_excel(writer, sheet_name='time_series', index=False)
             
             print(f"\n✓ Detailed results saved to: {excel_path}")
+            
+            # Penalty cube (memory-mapped .npy + Arrow metadata) for later reports
+            cube_dir = output_path.replace('.json', '_penalty_cube')
+            self.penalty_cube.save(cube_dir)
+            print(f"✓ Penalty cube saved to: {cube_dir}")
         
         print("\n🎯 ANALYSIS COMPLETE!")
         
@@ -27,6 +27,7 @@ from utils.penalty_calculator import EnergizeDenverPenaltyCalculator
 from utils.eui_target_loader import load_building_targets
 from utils.year_normalization import YearNormalizer
 from utils.opt_in_predictor import OptInPredictor
+from utils.penalty_rollup import PenaltyRollup, rollup_dimensions
 
 
 class PortfolioRiskAnalyzer:
@@ -48,6 +49,9 @@ class PortfolioRiskAnalyzer:
         self.year_normalizer = YearNormalizer()
         self.opt_in_predictor = OptInPredictor()
         
+        # (scenario, property type, EPB, MAI, ZIP) sums shared by the summary tables
+        self.rollup = None
+        
         # Load portfolio data
         self.load_portfolio_data()
         
@@ -94,6 +98,8 @@ class PortfolioRiskAnalyzer:
             (self.portfolio['Master Sq Ft'].notna())
         ]
         
+        self.rollup_dimensions = rollup_dimensions(self.portfolio)
+        
         print(f"✓ Loaded {len(self.portfolio)} buildings for analysis")
         
     def prepare_building_for_analysis(self, building_row) -> Dict:
@@ -271,6 +277,19 @@ class PortfolioRiskAnalyzer:
         
         return pd.DataFrame(results)
     
+    def portfolio_rollup(self, scenarios: Dict[str, pd.DataFrame]) -> PenaltyRollup:
+        """Rollup over the given scenario frames (rebuilt only when the frames change)"""
+        if self.rollup is None or not self.rollup.covers(scenarios):
+            self.rollup = PenaltyRollup.build(scenarios, self.rollup_dimensions)
+        return self.rollup
+    
+    def scenario_rollup(self, scenario_df: pd.DataFrame) -> PenaltyRollup:
+        """Rollup slice for one scenario frame (aggregated on the fly if not in self.rollup)"""
+        name = self.rollup.scenario_name(scenario_df) if self.rollup is not None else None
+        if name is None:
+            return PenaltyRollup.build({'scenario': scenario_df}, self.rollup_dimensions)
+        return self.rollup.slice(scenario=name)
+    
     def analyze_all_scenarios(self) -> Dict[str, pd.DataFrame]:
         """Run all three scenarios and return results"""
         print("\n🔍 RUNNING PORTFOLIO RISK ANALYSIS")
@@ -281,6 +300,7 @@ class PortfolioRiskAnalyzer:
             'all_aco': self.scenario_all_aco(),
             'hybrid': self.scenario_hybrid()
         }
+        self.portfolio_rollup(scenarios)
         
         # Print summary comparison
         self.print_scenario_comparison(scenarios)
@@ -448,22 +468,14 @@ class PortfolioRiskAnalyzer:
         """Analyze opt-in trends by property type"""
         print("\n🏢 PROPERTY TYPE ANALYSIS")
         
+        rollup = self.scenario_rollup(scenario_df)
+        by_type = rollup.summary(by='property_type', years=(2025, 2030))
+        
         # Only meaningful for scenarios with opt-in decisions
-        if 'should_opt_in' in scenario_df.columns:
-            analysis = scenario_df.groupby('property_type').agg({
-                'building_id': 'count',
-                'should_opt_in': ['sum', 'mean'],
-                'npv_advantage': 'mean',
-                'penalty_2025': 'sum',
-                'penalty_2030': 'sum',
-                'sqft': 'sum'
-            }).round(2)
-            
-            # Flatten column names
-            analysis.columns = ['_'.join(col).strip() for col in analysis.columns.values]
-            analysis.columns = ['total_buildings', 'opt_in_count', 'opt_in_rate', 
-                               'avg_npv_advantage', 'total_penalty_2025', 
-                               'total_penalty_2030', 'total_sqft']
+        if rollup.has_opt_in:
+            analysis = by_type[['total_buildings', 'opt_in_count', 'opt_in_rate', 
+                                'avg_npv_advantage', 'total_penalty_2025', 
+                                'total_penalty_2030', 'total_sqft']].round(2)
             
             # Sort by opt-in rate
             analysis = analysis.sort_values('opt_in_rate', ascending=False)
@@ -479,14 +491,8 @@ class PortfolioRiskAnalyzer:
                       f"NPV Adv: ${row['avg_npv_advantage']:>10,.0f}")
         else:
             # For non-hybrid scenarios, just show penalty distribution
-            analysis = scenario_df.groupby('property_type').agg({
-                'building_id': 'count',
-                'penalty_2025': 'sum',
-                'penalty_2030': 'sum',
-                'sqft': 'sum'
-            })
-            analysis.columns = ['total_buildings', 'total_penalty_2025', 
-                               'total_penalty_2030', 'total_sqft']
+            analysis = by_type[['total_buildings', 'total_penalty_2025', 
+                                'total_penalty_2030', 'total_sqft']]
             
         return analysis
     
@@ -734,6 +740,9 @@ class PortfolioRiskAnalyzer:
             sensitivity_scenarios = self.sensitivity_analysis(scenarios['hybrid'])
             scenarios.update(sensitivity_scenarios)
         
+        # One rollup pass over every scenario feeds the summary tables
+        self.portfolio_rollup(scenarios)
+        
         # Property type analysis
         property_analysis = {}
         for name, df in scenarios.items():
@@ -770,40 +779,23 @@ class PortfolioRiskAnalyzer:
     
     def create_executive_summary(self, scenarios: Dict[str, pd.DataFrame]) -> pd.DataFrame:
         """Create executive summary sheet for Excel"""
+        rollup = self.portfolio_rollup(scenarios)
         summary_rows = []
         
-        for name, df in scenarios.items():
-            total_sqft = df['sqft'].sum()
-            
-            # Calculate NPV
-            npv_total = 0
-            for year in range(2025, 2043):
-                col_name = f'penalty_{year}'
-                if col_name in df.columns:
-                    penalty = df[col_name].sum()
-                    years_from_2025 = year - 2025
-                    npv_total += penalty / ((1.07) ** years_from_2025)
-            
-            # Buildings at risk
-            at_risk_2025 = (df['penalty_2025'] > 0).sum() if 'penalty_2025' in df.columns else 0
-            at_risk_2030 = (df['penalty_2030'] > 0).sum() if 'penalty_2030' in df.columns else 0
-            at_risk_2032 = (df['penalty_2032'] > 0).sum() if 'penalty_2032' in df.columns else 0
-            
-            # Average penalties
-            avg_2030 = df['penalty_2030'].sum() / total_sqft if 'penalty_2030' in df.columns else 0
-            avg_2032 = df['penalty_2032'].sum() / total_sqft if 'penalty_2032' in df.columns else 0
+        for name in scenarios:
+            scenario = rollup.slice(scenario=name)
             
             summary_rows.append({
                 'Scenario': name.replace('_', ' ').title(),
-                'Total Buildings': len(df),
-                'Total Sq Ft': f"{total_sqft:,.0f}",
-                'NPV of Penalties': f"${npv_total:,.0f}",
-                'Buildings at Risk 2025': at_risk_2025,
-                'Buildings at Risk 2030': at_risk_2030,
-                'Buildings at Risk 2032': at_risk_2032,
-                'Avg $/sqft 2030': f"${avg_2030:.3f}",
-                'Avg $/sqft 2032': f"${avg_2032:.3f}",
-                'Opt-In Rate': f"{df['should_opt_in'].mean()*100:.1f}%" if 'should_opt_in' in df.columns else "N/A"
+                'Total Buildings': scenario.buildings(),
+                'Total Sq Ft': f"{scenario.total('sqft'):,.0f}",
+                'NPV of Penalties': f"${scenario.npv():,.0f}",
+                'Buildings at Risk 2025': scenario.at_risk(2025),
+                'Buildings at Risk 2030': scenario.at_risk(2030),
+                'Buildings at Risk 2032': scenario.at_risk(2032),
+                'Avg $/sqft 2030': f"${scenario.penalty_per_sqft(2030):.3f}",
+                'Avg $/sqft 2032': f"${scenario.penalty_per_sqft(2032):.3f}",
+                'Opt-In Rate': f"{scenario.opt_in_rate()*100:.1f}%" if scenario.has_opt_in else "N/A"
             })
         
         return pd.DataFrame(summary_rows)
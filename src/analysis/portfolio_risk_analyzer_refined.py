@@ -40,6 +40,7 @@ from utils.penalty_calculator import EnergizeDenverPenaltyCalculator
 from utils.eui_target_loader import load_building_targets
 from utils.year_normalization import YearNormalizer
 from utils.opt_in_predictor import OptInPredictor
+from utils.penalty_rollup import PenaltyRollup, rollup_dimensions
 from data_processing.mai_handler import MAIHandler
 
 
@@ -70,6 +71,9 @@ class PortfolioRiskAnalyzer:
         self.year_normalizer = YearNormalizer()
         self.opt_in_predictor = OptInPredictor()
         
+        # (scenario, property type, EPB, MAI, ZIP) sums shared by the summary tables
+        self.rollup = None
+        
         # Load portfolio data
         self.load_portfolio_data()
         
@@ -134,6 +138,8 @@ class PortfolioRiskAnalyzer:
             (self.portfolio['Master Sq Ft'].notna())
         ]
         
+        self.rollup_dimensions = rollup_dimensions(self.portfolio)
+        
         print(f"✓ Loaded {len(self.portfolio)} buildings for analysis")
         print(f"  - Standard buildings: {len(self.portfolio[~self.portfolio['is_mai']])}")
         print(f"  - MAI buildings: {len(self.portfolio[self.portfolio['is_mai']])}")
@@ -391,30 +397,41 @@ class PortfolioRiskAnalyzer:
         
         return pd.DataFrame(results)
     
+    def portfolio_rollup(self, scenarios: Dict[str, pd.DataFrame]) -> PenaltyRollup:
+        """Rollup over the given scenario frames (rebuilt only when the frames change)"""
+        if self.rollup is None or not self.rollup.covers(scenarios):
+            self.rollup = PenaltyRollup.build(scenarios, self.rollup_dimensions)
+        return self.rollup
+    
+    def scenario_rollup(self, scenario_df: pd.DataFrame) -> PenaltyRollup:
+        """Rollup slice for one scenario frame (aggregated on the fly if not in self.rollup)"""
+        name = self.rollup.scenario_name(scenario_df) if self.rollup is not None else None
+        if name is None:
+            return PenaltyRollup.build({'scenario': scenario_df}, self.rollup_dimensions)
+        return self.rollup.slice(scenario=name)
+    
     def analyze_mai_penalties(self, scenario_df: pd.DataFrame) -> pd.DataFrame:
         """Analyze MAI building penalties specifically"""
         print("\n🏭 MAI BUILDING PENALTY ANALYSIS")
         
-        mai_df = scenario_df[scenario_df['is_mai'] == True].copy()
+        mai = self.scenario_rollup(scenario_df).slice(is_mai=True)
         
-        if len(mai_df) == 0:
+        if mai.buildings() == 0:
             print("  No MAI buildings found in scenario")
             return pd.DataFrame()
         
-        # Calculate key metrics for MAI buildings
-        mai_with_penalties_2028 = mai_df[mai_df['penalty_2028'] > 0]
-        mai_with_penalties_2032 = mai_df[mai_df['penalty_2032'] > 0]
-        
-        print(f"  Total MAI buildings: {len(mai_df)}")
-        print(f"  MAI buildings with 2028 penalties: {len(mai_with_penalties_2028)}")
-        print(f"  MAI buildings with 2032 penalties: {len(mai_with_penalties_2032)}")
-        print(f"  Total 2028 MAI penalties: ${mai_df['penalty_2028'].sum():,.0f}")
-        print(f"  Total 2032 MAI penalties: ${mai_df['penalty_2032'].sum():,.0f}")
+        # Key metrics for MAI buildings come from the rollup
+        print(f"  Total MAI buildings: {mai.buildings()}")
+        print(f"  MAI buildings with 2028 penalties: {mai.at_risk(2028)}")
+        print(f"  MAI buildings with 2032 penalties: {mai.at_risk(2032)}")
+        print(f"  Total 2028 MAI penalties: ${mai.penalty(2028):,.0f}")
+        print(f"  Total 2032 MAI penalties: ${mai.penalty(2032):,.0f}")
         
-        # Show top MAI buildings by penalty
-        if len(mai_with_penalties_2028) > 0:
+        # Building-level detail (top MAI buildings) still needs the frame
+        mai_df = scenario_df[scenario_df['is_mai'] == True].copy()
+        if mai.at_risk(2028) > 0:
             print("\n  Top MAI buildings by 2028 penalty:")
-            top_mai = mai_with_penalties_2028.nlargest(5, 'penalty_2028')[
+            top_mai = mai_df[mai_df['penalty_2028'] > 0].nlargest(5, 'penalty_2028')[
                 ['building_id', 'property_type', 'penalty_2028']
             ]
             for idx, row in top_mai.iterrows():
@@ -432,6 +449,7 @@ class PortfolioRiskAnalyzer:
             'all_aco': self.scenario_all_aco(),
             'hybrid': self.scenario_hybrid()
         }
+        self.portfolio_rollup(scenarios)
         
         # Analyze MAI penalties in each scenario
         for scenario_name, df in scenarios.items():
@@ -639,23 +657,14 @@ class PortfolioRiskAnalyzer:
         """Analyze opt-in trends by property type"""
         print("\n🏢 PROPERTY TYPE ANALYSIS")
         
+        rollup = self.scenario_rollup(scenario_df)
+        by_type = rollup.summary(by='property_type', years=(2025, 2030))
+        
         # Only meaningful for scenarios with opt-in decisions
-        if 'should_opt_in' in scenario_df.columns:
-            analysis = scenario_df.groupby('property_type').agg({
-                'building_id': 'count',
-                'should_opt_in': ['sum', 'mean'],
-                'is_mai': 'sum',
-                'npv_advantage': 'mean',
-                'penalty_2025': 'sum',
-                'penalty_2030': 'sum',
-                'sqft': 'sum'
-            }).round(2)
-            
-            # Flatten column names
-            analysis.columns = ['_'.join(col).strip() for col in analysis.columns.values]
-            analysis.columns = ['total_buildings', 'opt_in_count', 'opt_in_rate', 
-                               'mai_count', 'avg_npv_advantage', 'total_penalty_2025', 
-                               'total_penalty_2030', 'total_sqft']
+        if rollup.has_opt_in:
+            analysis = by_type[['total_buildings', 'opt_in_count', 'opt_in_rate', 
+                                'mai_count', 'avg_npv_advantage', 'total_penalty_2025', 
+                                'total_penalty_2030', 'total_sqft']].round(2)
             
             # Sort by opt-in rate
             analysis = analysis.sort_values('opt_in_rate', ascending=False)
@@ -672,15 +681,8 @@ class PortfolioRiskAnalyzer:
                       f"NPV Adv: ${row['avg_npv_advantage']:>10,.0f}")
         else:
             # For non-hybrid scenarios, just show penalty distribution
-            analysis = scenario_df.groupby('property_type').agg({
-                'building_id': 'count',
-                'is_mai': 'sum',
-                'penalty_2025': 'sum',
-                'penalty_2030': 'sum',
-                'sqft': 'sum'
-            })
-            analysis.columns = ['total_buildings', 'mai_count', 'total_penalty_2025', 
-                               'total_penalty_2030', 'total_sqft']
+            analysis = by_type[['total_buildings', 'mai_count', 'total_penalty_2025', 
+                                'total_penalty_2030', 'total_sqft']]
             
         return analysis
     
@@ -1082,6 +1084,9 @@ class PortfolioRiskAnalyzer:
             sensitivity_scenarios = self.sensitivity_analysis(scenarios['hybrid'])
             scenarios.update(sensitivity_scenarios)
         
+        # One rollup pass over every scenario feeds the summary tables
+        self.portfolio_rollup(scenarios)
+        
         # Property type analysis
         property_analysis = {}
         for name, df in scenarios.items():
@@ -1122,94 +1127,58 @@ class PortfolioRiskAnalyzer:
     
     def create_executive_summary(self, scenarios: Dict[str, pd.DataFrame]) -> pd.DataFrame:
         """Create executive summary sheet for Excel"""
+        rollup = self.portfolio_rollup(scenarios)
         summary_rows = []
         
-        for name, df in scenarios.items():
-            total_sqft = df['sqft'].sum()
-            mai_count = len(df[df['is_mai'] == True])
+        for name in scenarios:
+            scenario = rollup.slice(scenario=name)
+            mai = scenario.slice(is_mai=True)
             
-            # Calculate NPV only through 2032
-            npv_total = 0
-            mai_npv = 0
-            for year in range(2025, 2033):
-                col_name = f'penalty_{year}'
-                if col_name in df.columns:
-                    penalty = df[col_name].sum()
-                    mai_penalty = df[df['is_mai'] == True][col_name].sum()
-                    years_from_2025 = year - 2025
-                    npv_total += penalty / ((1.07) ** years_from_2025)
-                    mai_npv += mai_penalty / ((1.07) ** years_from_2025)
-            
-            # Buildings at risk by year
-            at_risk_2025 = (df['penalty_2025'] > 0).sum() if 'penalty_2025' in df.columns else 0
-            at_risk_2027 = (df['penalty_2027'] > 0).sum() if 'penalty_2027' in df.columns else 0
-            at_risk_2028 = (df['penalty_2028'] > 0).sum() if 'penalty_2028' in df.columns else 0
-            at_risk_2030 = (df['penalty_2030'] > 0).sum() if 'penalty_2030' in df.columns else 0
-            at_risk_2032 = (df['penalty_2032'] > 0).sum() if 'penalty_2032' in df.columns else 0
-            
-            # MAI at risk
-            mai_at_risk_2028 = ((df['is_mai'] == True) & (df['penalty_2028'] > 0)).sum() if 'penalty_2028' in df.columns else 0
-            mai_at_risk_2032 = ((df['is_mai'] == True) & (df['penalty_2032'] > 0)).sum() if 'penalty_2032' in df.columns else 0
+            # NPV only through 2032
+            npv_total = scenario.npv(through=2032)
+            mai_npv = mai.npv(through=2032)
             
             # Average penalties (only for at-risk buildings)
-            if 'penalty_2028' in df.columns:
-                at_risk_2028_df = df[df['penalty_2028'] > 0]
-                avg_2028 = at_risk_2028_df['penalty_2028'].sum() / at_risk_2028_df['sqft'].sum() if len(at_risk_2028_df) > 0 else 0
-            else:
-                avg_2028 = 0
-                
-            if 'penalty_2030' in df.columns:
-                at_risk_2030_df = df[df['penalty_2030'] > 0]
-                avg_2030 = at_risk_2030_df['penalty_2030'].sum() / at_risk_2030_df['sqft'].sum() if len(at_risk_2030_df) > 0 else 0
-            else:
-                avg_2030 = 0
-                
-            if 'penalty_2032' in df.columns:
-                at_risk_2032_df = df[df['penalty_2032'] > 0]
-                avg_2032 = at_risk_2032_df['penalty_2032'].sum() / at_risk_2032_df['sqft'].sum() if len(at_risk_2032_df) > 0 else 0
-            else:
-                avg_2032 = 0
+            avg_2028 = scenario.penalty_per_sqft(2028, at_risk_only=True)
+            avg_2030 = scenario.penalty_per_sqft(2030, at_risk_only=True)
+            avg_2032 = scenario.penalty_per_sqft(2032, at_risk_only=True)
             
             # Add row to summary
             summary_rows.append({
                 'Scenario': name.replace('_', ' ').title(),
-                'Total Buildings': len(df),
-                'MAI Buildings': mai_count,
-                'Total Sq Ft': f"{total_sqft:,.0f}",
+                'Total Buildings': scenario.buildings(),
+                'MAI Buildings': mai.buildings(),
+                'Total Sq Ft': f"{scenario.total('sqft'):,.0f}",
                 'NPV of Penalties (2025-2032)': f"${npv_total:,.0f}",
                 'MAI NPV': f"${mai_npv:,.0f}",
-                'Buildings at Risk 2025': at_risk_2025,
-                'Buildings at Risk 2027': at_risk_2027,
-                'Buildings at Risk 2028': f"{at_risk_2028} ({mai_at_risk_2028} MAI)",
-                'Buildings at Risk 2030': at_risk_2030,
-                'Buildings at Risk 2032': f"{at_risk_2032} ({mai_at_risk_2032} MAI)",
+                'Buildings at Risk 2025': scenario.at_risk(2025),
+                'Buildings at Risk 2027': scenario.at_risk(2027),
+                'Buildings at Risk 2028': f"{scenario.at_risk(2028)} ({mai.at_risk(2028)} MAI)",
+                'Buildings at Risk 2030': scenario.at_risk(2030),
+                'Buildings at Risk 2032': f"{scenario.at_risk(2032)} ({mai.at_risk(2032)} MAI)",
                 'Avg $/sqft 2028 (at-risk only)': f"${avg_2028:.3f}",
                 'Avg $/sqft 2030 (at-risk only)': f"${avg_2030:.3f}",
                 'Avg $/sqft 2032 (at-risk only)': f"${avg_2032:.3f}",
-                'Opt-In Rate': f"{df['should_opt_in'].mean()*100:.1f}%" if 'should_opt_in' in df.columns else "N/A"
+                'Opt-In Rate': f"{scenario.opt_in_rate()*100:.1f}%" if scenario.has_opt_in else "N/A"
             })
         
         return pd.DataFrame(summary_rows)
     
     def create_mai_summary(self, scenarios: Dict[str, pd.DataFrame]) -> pd.DataFrame:
         """Create MAI-specific summary sheet for Excel"""
+        rollup = self.portfolio_rollup(scenarios)
         mai_rows = []
         
         for name, df in scenarios.items():
             if name in ['all_standard', 'all_aco', 'hybrid']:
-                mai_df = df[df['is_mai'] == True]
+                mai = rollup.slice(scenario=name, is_mai=True)
                 
-                if len(mai_df) > 0:
-                    # MAI buildings with penalties
-                    mai_2028_at_risk = (mai_df['penalty_2028'] > 0).sum() if 'penalty_2028' in mai_df.columns else 0
-                    mai_2032_at_risk = (mai_df['penalty_2032'] > 0).sum() if 'penalty_2032' in mai_df.columns else 0
-                    
-                    # MAI penalties
-                    mai_2028_penalty = mai_df['penalty_2028'].sum() if 'penalty_2028' in mai_df.columns else 0
-                    mai_2032_penalty = mai_df['penalty_2032'].sum() if 'penalty_2032' in mai_df.columns else 0
+                if mai.buildings() > 0:
+                    mai_2028_at_risk = mai.at_risk(2028)
                     
-                    # Top 5 MAI buildings by 2028 penalty
+                    # Top 5 MAI buildings by 2028 penalty (building-level detail from the frame)
                     if mai_2028_at_risk > 0:
+                        mai_df = df[df['is_mai'] == True]
                         top_mai = mai_df.nlargest(5, 'penalty_2028')[['building_id', 'property_type', 'penalty_2028']]
                         top_mai_list = [f"{row['building_id']} ({row['property_type']}): ${row['penalty_2028']:,.0f}" 
                                        for _, row in top_mai.iterrows()]
@@ -1218,11 +1187,11 @@ class PortfolioRiskAnalyzer:
                     
                     mai_rows.append({
                         'Scenario': name.replace('_', ' ').title(),
-                        'Total MAI Buildings': len(mai_df),
+                        'Total MAI Buildings': mai.buildings(),
                         'MAI Buildings at Risk 2028': mai_2028_at_risk,
-                        'MAI Buildings at Risk 2032': mai_2032_at_risk,
-                        'Total MAI Penalty 2028': f"${mai_2028_penalty:,.0f}",
-                        'Total MAI Penalty 2032': f"${mai_2032_penalty:,.0f}",
+                        'MAI Buildings at Risk 2032': mai.at_risk(2032),
+                        'Total MAI Penalty 2028': f"${mai.penalty(2028):,.0f}",
+                        'Total MAI Penalty 2032': f"${mai.penalty(2032):,.0f}",
                         'Top MAI Buildings by 2028 Penalty': '; '.join(top_mai_list[:3])
                     })
         
@@ -5,22 +5,107 @@ Use: Identify clusters of buildings that could share thermal infrastructure (amb
      heat recovery, thermal storage) using BigQuery's geospatial functions
 
 This script:
-1. Uses BigQuery's ST_DISTANCE to find nearby buildings
+1. Uses BigQuery's ST_DISTANCE to find nearby buildings, joining only neighboring
+   grid cells and materializing the pairs once
 2. Identifies high-value clusters based on penalty exposure and building types
 3. Finds opportunities for waste heat recovery (e.g., data centers + offices)
 4. Prioritizes Equity Priority Buildings (EPBs) in cluster formation
 5. Exports results as GeoJSON for visualization
 """
 
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 from google.cloud import bigquery
 import pandas as pd
-import json
+import numpy as np
 from datetime import datetime
 
+from analytics.geo_export import line_features, write_geojson
+from analytics.spatial_index import bucketed_neighbor_pairs, grid_cell_size
+
 # Configuration
 PROJECT_ID = "energize-denver-eaas"
 DATASET_ID = "energize_denver"
 
+# Denver area bounds for building points
+DENVER_BOUNDS = {'lat_min': 39.0, 'lat_max': 40.5, 'lon_min': -106.0, 'lon_max': -104.0}
+
+# Line colors by opportunity type (anything else: economies of scale)
+OPPORTUNITY_COLORS = {
+    'Heat Recovery': '#ff0000',
+    'Shared System': '#ff8800'
+}
+
+def local_building_clusters(buildings_df, distance_meters=500):
+    """
+    Local equivalent of the building_clusters view for a penalty_analysis extract
+
+    Uses the same grid buckets, pair rule and scoring as the bucketed SQL, so
+    results can be checked (or produced) without BigQuery.
+
+    Args:
+        buildings_df: penalty_analysis rows (building_id, latitude, longitude,
+            property_type, gross_floor_area, annual_penalty_2024, is_epb, ...)
+        distance_meters: Pair distance threshold
+
+    Returns:
+        DataFrame of scored pairs sorted by opportunity_score (descending)
+    """
+    df = buildings_df[
+        buildings_df['latitude'].between(DENVER_BOUNDS['lat_min'], DENVER_BOUNDS['lat_max']) &
+        buildings_df['longitude'].between(DENVER_BOUNDS['lon_min'], DENVER_BOUNDS['lon_max'])
+    ].reset_index(drop=True)
+
+    names = df['building_name'] if 'building_name' in df.columns else pd.Series(None, index=df.index)
+    if 'consumption_building_name' in df.columns:
+        names = names.fillna(df['consumption_building_name'])
+    df['building_name'] = names.fillna('Building ' + df['building_id'].astype(str))
+
+    # Cells sized for the bounds as in the SQL; orient pairs so building_a < building_b
+    i, j, distance = bucketed_neighbor_pairs(df['latitude'].to_numpy(), df['longitude'].to_numpy(),
+                                             distance_meters, max_abs_lat=DENVER_BOUNDS['lat_max'])
+    ids = df['building_id'].to_numpy()
+    swap = ids[i] > ids[j]
+    i, j = np.where(swap, j, i), np.where(swap, i, j)
+
+    side_columns = {'building_id': 'building', 'building_name': 'name', 'property_type': 'type',
+                    'gross_floor_area': 'sqft', 'annual_penalty_2024': 'penalty', 'is_epb': 'epb',
+                    'longitude': 'lon', 'latitude': 'lat'}
+    pairs = {}
+    for column, prefix in side_columns.items():
+        pairs[f"{prefix}_a"] = df[column].to_numpy()[i]
+        pairs[f"{prefix}_b"] = df[column].to_numpy()[j]
+    pairs = pd.DataFrame(pairs)
+    pairs['distance_meters'] = distance
+
+    type_a = pairs['type_a'].astype(object)
+    type_b = pairs['type_b'].astype(object)
+    sinks = ['Office', 'Multifamily Housing']
+    heat_recovery = (((type_a == 'Data Center') & type_b.isin(sinks)) |
+                     ((type_b == 'Data Center') & type_a.isin(sinks)))
+    medical = ((type_a.str.contains('Hospital', na=False) & type_b.str.contains('Multifamily', na=False)) |
+               (type_b.str.contains('Hospital', na=False) & type_a.str.contains('Multifamily', na=False)))
+    mixed = type_a.notna() & type_b.notna() & (type_a != type_b)
+    pairs['synergy_multiplier'] = np.select([heat_recovery, medical, mixed], [3.0, 2.5, 1.5], 1.0)
+
+    epb_a = pairs['epb_a'].fillna(0).astype(int) == 1
+    epb_b = pairs['epb_b'].fillna(0).astype(int) == 1
+    pairs['epb_multiplier'] = np.select([epb_a & epb_b, epb_a | epb_b], [2.0, 1.5], 1.0)
+
+    pairs['combined_penalty'] = pairs['penalty_a'].fillna(0) + pairs['penalty_b'].fillna(0)
+    pairs['opportunity_score'] = (pairs['combined_penalty'] * pairs['synergy_multiplier'] *
+                                  pairs['epb_multiplier'] / np.maximum(pairs['distance_meters'], 100))
+    pairs['total_sqft'] = pairs['sqft_a'] + pairs['sqft_b']
+    pairs['opportunity_type'] = np.select(
+        [pairs['synergy_multiplier'] >= 2.5, pairs['synergy_multiplier'] >= 1.5],
+        ['Heat Recovery', 'Shared System'], 'Economies of Scale')
+
+    pairs = pairs[pairs['combined_penalty'] > 0]
+    return pairs.sort_values('opportunity_score', ascending=False, kind='stable').reset_index(drop=True)
+
+
 class DERClusterAnalysis:
     """Analyze building clusters for distributed energy resource opportunities"""
     
@@ -28,13 +113,41 @@ class DERClusterAnalysis:
         self.bq_client = bigquery.Client(project=PROJECT_ID)
         self.dataset_ref = f"{PROJECT_ID}.{DATASET_ID}"
         
-    def create_clustering_view(self, distance_meters=500):
-        """Create a view that identifies building clusters within specified distance"""
-        
-        view_id = f"{self.dataset_ref}.building_clusters"
-        
-        query = f"""
-        CREATE OR REPLACE VIEW `{view_id}` AS
+    def _clustering_query(self, distance_meters=500, bucketed=True):
+        """
+        SELECT behind building_clusters: scored building pairs within distance_meters
+
+        The bucketed plan gives every building an integer grid cell at least
+        distance_meters wide and equality-joins each cell to itself and its
+        eight neighbors, so only nearby candidates reach ST_DWITHIN. Work and
+        bytes scale with the neighbor pairs instead of n². bucketed=False keeps
+        the original CROSS JOIN for side-by-side checks.
+
+        Args:
+            distance_meters: Pair distance threshold
+            bucketed: Use the grid-cell join (True) or the CROSS JOIN (False)
+
+        Returns:
+            SQL string (no trailing ORDER BY)
+        """
+        lat_step, lon_step = grid_cell_size(distance_meters, DENVER_BOUNDS['lat_max'])
+
+        if bucketed:
+            pair_join = f"""FROM building_points a
+            CROSS JOIN UNNEST([-1, 0, 1]) as dx
+            CROSS JOIN UNNEST([-1, 0, 1]) as dy
+            JOIN building_points b
+                ON b.cell_x = a.cell_x + dx
+                AND b.cell_y = a.cell_y + dy
+            WHERE a.building_id < b.building_id  -- Avoid duplicates
+                AND ST_DWITHIN(a.location, b.location, {distance_meters})"""
+        else:
+            pair_join = f"""FROM building_points a
+            CROSS JOIN building_points b
+            WHERE a.building_id < b.building_id  -- Avoid duplicates
+                AND ST_DISTANCE(a.location, b.location) <= {distance_meters}"""
+
+        return f"""
         WITH building_points AS (
             -- Convert lat/lon to geography points
             SELECT 
@@ -49,12 +162,15 @@ class DERClusterAnalysis:
                 is_epb,
                 latitude,
                 longitude,
-                ST_GEOGPOINT(longitude, latitude) as location
+                ST_GEOGPOINT(longitude, latitude) as location,
+                -- Grid cell at least distance_meters on a side
+                CAST(FLOOR(longitude / {lon_step}) AS INT64) as cell_x,
+                CAST(FLOOR(latitude / {lat_step}) AS INT64) as cell_y
             FROM `{self.dataset_ref}.penalty_analysis`
             WHERE latitude IS NOT NULL 
                 AND longitude IS NOT NULL
-                AND latitude BETWEEN 39.0 AND 40.5  -- Denver area bounds
-                AND longitude BETWEEN -106.0 AND -104.0
+                AND latitude BETWEEN {DENVER_BOUNDS['lat_min']} AND {DENVER_BOUNDS['lat_max']}  -- Denver area bounds
+                AND longitude BETWEEN {DENVER_BOUNDS['lon_min']} AND {DENVER_BOUNDS['lon_max']}
         ),
         
         -- Find all building pairs within distance threshold
@@ -75,10 +191,7 @@ class DERClusterAnalysis:
                 a.location as location_a,
                 b.location as location_b,
                 ST_DISTANCE(a.location, b.location) as distance_meters
-            FROM building_points a
-            CROSS JOIN building_points b
-            WHERE a.building_id < b.building_id  -- Avoid duplicates
-                AND ST_DISTANCE(a.location, b.location) <= {distance_meters}
+            {pair_join}
         ),
         
         -- Identify synergistic pairs (e.g., data center + office)
@@ -136,13 +249,58 @@ class DERClusterAnalysis:
             
         FROM synergy_scores
         WHERE combined_penalty > 0  -- Focus on buildings with penalty exposure
-        ORDER BY opportunity_score DESC
         """
+
+    def create_clustering_view(self, distance_meters=500, bucketed=True, materialize=True):
+        """
+        Create the building_clusters view of nearby building pairs
+
+        With materialize=True the pairs are written once to the
+        building_clusters_bucketed table (clustered by opportunity type) and
+        the view just reads that table, so downstream queries no longer
+        re-run the spatial join.
+
+        Args:
+            distance_meters: Pair distance threshold
+            bucketed: Use the grid-cell join instead of a CROSS JOIN
+            materialize: Store the pairs in a table behind the view
+
+        Returns:
+            View ID, or None on error
+        """
+        
+        view_id = f"{self.dataset_ref}.building_clusters"
+        table_id = f"{self.dataset_ref}.building_clusters_bucketed"
+        pairs_query = self._clustering_query(distance_meters, bucketed=bucketed)
+        
+        if materialize:
+            queries = [
+                f"""
+                CREATE OR REPLACE TABLE `{table_id}`
+                CLUSTER BY opportunity_type, building_a AS
+                {pairs_query}
+                """,
+                f"""
+                CREATE OR REPLACE VIEW `{view_id}` AS
+                SELECT * FROM `{table_id}`
+                ORDER BY opportunity_score DESC
+                """
+            ]
+        else:
+            queries = [f"""
+            CREATE OR REPLACE VIEW `{view_id}` AS
+            {pairs_query}
+            ORDER BY opportunity_score DESC
+            """]
         
-        print(f"Creating clustering view with {distance_meters}m radius...")
+        plan = 'grid-bucketed' if bucketed else 'cross join'
+        print(f"Creating clustering view with {distance_meters}m radius ({plan})...")
         
         try:
-            self.bq_client.query(query).result()
+            for query in queries:
+                self.bq_client.query(query).result()
+            if materialize:
+                print(f"✓ Materialized cluster pairs: {table_id}")
             print(f"✓ Created clustering view: {view_id}")
             return view_id
         except Exception as e:
@@ -208,8 +366,8 @@ class DERClusterAnalysis:
                   f"{row['opportunity_type']:<15} | "
                   f"Score: {row['score']:>6.2f} {row['has_epb']}")
     
-    def export_cluster_geojson(self, limit=100):
-        """Export top clusters as GeoJSON for visualization"""
+    def export_cluster_geojson(self, limit=100, ndjson=False):
+        """Export top clusters as GeoJSON for visualization (streamed page by page)"""
         
         print("\n=== EXPORTING CLUSTER GEOJSON ===")
         
@@ -254,50 +412,29 @@ class DERClusterAnalysis:
         FROM top_clusters
         """
         
-        df = self.bq_client.query(query).to_dataframe()
-        
-        # Create GeoJSON structure
-        geojson = {
-            "type": "FeatureCollection",
-            "features": []
-        }
-        
-        for _, row in df.iterrows():
-            # Create line feature connecting the two buildings
-            feature = {
-                "type": "Feature",
-                "geometry": {
-                    "type": "LineString",
-                    "coordinates": [
-                        [row['lon_a'], row['lat_a']],
-                        [row['lon_b'], row['lat_b']]
-                    ]
-                },
-                "properties": {
-                    "building_a": row['building_a'],
-                    "building_b": row['building_b'],
-                    "name_a": row['name_a'],
-                    "name_b": row['name_b'],
-                    "type_a": row['type_a'],
-                    "type_b": row['type_b'],
-                    "distance_m": round(row['distance_meters'], 0),
-                    "opportunity_type": row['opportunity_type'],
-                    "penalty_exposure": round(row['combined_penalty'], 0),
-                    "score": round(row['opportunity_score'], 2),
-                    "has_epb": bool(row['epb_a'] or row['epb_b']),
-                    "color": "#ff0000" if row['opportunity_type'] == 'Heat Recovery' else
-                            "#ff8800" if row['opportunity_type'] == 'Shared System' else
-                            "#0088ff"
-                }
-            }
-            geojson['features'].append(feature)
-        
-        # Save to file
-        output_path = "outputs/data/cluster_opportunities.geojson"
-        with open(output_path, 'w') as f:
-            json.dump(geojson, f, indent=2)
-        
-        print(f"✓ Exported {len(df)} cluster opportunities to {output_path}")
+        # Stream result pages straight into the writer - never hold every feature in memory
+        pages = self.bq_client.query(query).result(page_size=10000).to_dataframe_iterable()
+        
+        def features():
+            for page in pages:
+                page['distance_m'] = page['distance_meters'].round(0)
+                page['penalty_exposure'] = page['combined_penalty'].round(0)
+                page['score'] = page['opportunity_score'].round(2)
+                page['has_epb'] = page['epb_a'].fillna(False).astype(bool) | page['epb_b'].fillna(False).astype(bool)
+                page['color'] = page['opportunity_type'].map(OPPORTUNITY_COLORS).fillna('#0088ff')
+                yield from line_features(
+                    page, ['lon_a', 'lat_a', 'lon_b', 'lat_b'],
+                    properties=['building_a', 'building_b', 'name_a', 'name_b', 'type_a', 'type_b',
+                                'distance_m', 'opportunity_type', 'penalty_exposure', 'score',
+                                'has_epb', 'color']
+                )
+        
+        # Save to file (ndjson=True writes one feature per line)
+        output_path = "outputs/data/cluster_opportunities.geojsonl" if ndjson else \
+                      "outputs/data/cluster_opportunities.geojson"
+        count = write_geojson(features(), output_path, ndjson=ndjson)
+        
+        print(f"✓ Exported {count} cluster opportunities to {output_path}")
         print("\nVisualization tips:")
         print("- Red lines: Heat recovery opportunities")
         print("- Orange lines: Shared system opportunities")
@@ -0,0 +1,210 @@
+"""
+Suggested File Name: cluster_arrays.py
+File Location: /Users/robertpadgett/Projects/01_My_Notebooks/500_ED_Risk_Retro_BP/src/analytics/
+Use: Columnar building table and sparse cluster membership for DER clustering
+
+This module:
+1. Holds building attributes as NumPy columns (struct-of-arrays) instead of
+   one BuildingProfile dataclass per building
+2. Stores cluster membership as CSR arrays (anchor + members per cluster row)
+3. Turns per-building vectors into per-cluster totals with one sparse product
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+
+@dataclass
+class BuildingArrays:
+    """Struct-of-arrays building table - one entry per building position"""
+    building_id: np.ndarray
+    lat: np.ndarray
+    lon: np.ndarray
+    property_type: np.ndarray
+    gross_floor_area: np.ndarray
+    site_eui: np.ndarray
+    electric_eui: np.ndarray
+    gas_eui: np.ndarray
+    opt_in_status: np.ndarray
+    is_epb: np.ndarray
+    penalty_exposure: np.ndarray
+    # Analyzer-specific columns (names, addresses, raw opt-in flags)
+    extras: Dict[str, np.ndarray] = field(default_factory=dict)
+
+    PROFILE_FIELDS = ['building_id', 'lat', 'lon', 'property_type', 'gross_floor_area',
+                      'site_eui', 'electric_eui', 'gas_eui', 'opt_in_status',
+                      'is_epb', 'penalty_exposure']
+
+    def __len__(self) -> int:
+        return len(self.building_id)
+
+    @property
+    def thermal_load_mmbtu(self) -> np.ndarray:
+        """Annual thermal load in MMBtu (same rule as BuildingProfile)"""
+        return self.gross_floor_area * self.gas_eui / 1000
+
+    @property
+    def cooling_load_tons(self) -> np.ndarray:
+        """Peak cooling load in tons (same rule as BuildingProfile)"""
+        return self.gross_floor_area / 400
+
+    @classmethod
+    def from_profiles(cls, profiles: List) -> 'BuildingArrays':
+        """
+        Build the columnar table from BuildingProfile objects
+
+        Args:
+            profiles: List of BuildingProfile objects
+
+        Returns:
+            BuildingArrays with one position per profile
+        """
+        columns = {}
+        for name in cls.PROFILE_FIELDS:
+            values = [getattr(p, name) for p in profiles]
+            columns[name] = np.array(values, dtype=object) if name in (
+                'building_id', 'property_type', 'opt_in_status') else np.array(values)
+        return cls(**columns)
+
+    @classmethod
+    def from_columns(cls, df: pd.DataFrame, columns: Dict[str, object],
+                     defaults: Optional[Dict[str, object]] = None) -> 'BuildingArrays':
+        """
+        Build the columnar table straight from DataFrame columns
+
+        Args:
+            df: Building rows (already filtered to rows with coordinates)
+            columns: Profile field -> DataFrame column name (or a ready array)
+            defaults: Profile field -> value used when the column is missing
+
+        Returns:
+            BuildingArrays with one position per row
+        """
+        defaults = defaults or {}
+        n = len(df)
+        arrays = {}
+        for name in cls.PROFILE_FIELDS:
+            source = columns.get(name)
+            if isinstance(source, np.ndarray):
+                arrays[name] = source
+            elif source is not None and source in df.columns:
+                arrays[name] = df[source].to_numpy()
+            else:
+                default = defaults.get(name)
+                dtype = object if default is None or isinstance(default, str) else None
+                arrays[name] = np.full(n, default, dtype=dtype)
+        return cls(**arrays)
+
+    def to_profiles(self) -> List:
+        """Convert back to BuildingProfile objects (for per-building APIs)"""
+        from analytics.der_clustering_analysis import BuildingProfile
+
+        columns = [getattr(self, name).tolist() for name in self.PROFILE_FIELDS]
+        return [BuildingProfile(*values) for values in zip(*columns)]
+
+
+@dataclass
+class ClusterMembership:
+    """CSR-style cluster membership: one anchor plus a member slice per cluster"""
+    anchor_idx: np.ndarray
+    member_indptr: np.ndarray
+    member_idx: np.ndarray
+    member_distance: np.ndarray
+    n_buildings: int
+
+    @property
+    def n_clusters(self) -> int:
+        return len(self.anchor_idx)
+
+    @property
+    def member_counts(self) -> np.ndarray:
+        return np.diff(self.member_indptr)
+
+    @classmethod
+    def from_lists(cls, anchors: List[int], members: List[np.ndarray],
+                   distances: List[np.ndarray], n_buildings: int) -> 'ClusterMembership':
+        """
+        Pack per-cluster member index/distance arrays into CSR form
+
+        Args:
+            anchors: Anchor building position per cluster
+            members: Member building positions per cluster (nearest first)
+            distances: Member distances (meters) to the anchor per cluster
+            n_buildings: Size of the building table
+
+        Returns:
+            ClusterMembership
+        """
+        counts = np.array([len(m) for m in members], dtype=np.int64)
+        indptr = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        return cls(
+            anchor_idx=np.asarray(anchors, dtype=np.int64),
+            member_indptr=indptr,
+            member_idx=(np.concatenate(members).astype(np.int64) if len(members)
+                        else np.empty(0, dtype=np.int64)),
+            member_distance=(np.concatenate(distances).astype(float) if len(distances)
+                             else np.empty(0, dtype=float)),
+            n_buildings=n_buildings
+        )
+
+    def matrix(self) -> sparse.csr_matrix:
+        """(n_clusters, n_buildings) 0/1 matrix - anchor first, then members"""
+        counts = self.member_counts + 1
+        indptr = np.concatenate([[0], np.cumsum(counts)])
+
+        indices = np.empty(indptr[-1], dtype=np.int64)
+        indices[indptr[:-1]] = self.anchor_idx
+        member_slots = np.ones(indptr[-1], dtype=bool)
+        member_slots[indptr[:-1]] = False
+        indices[member_slots] = self.member_idx
+
+        return sparse.csr_matrix((np.ones(len(indices)), indices, indptr),
+                                 shape=(self.n_clusters, self.n_buildings))
+
+    def distance_matrix(self) -> sparse.csr_matrix:
+        """(n_clusters, n_buildings) member -> anchor distances (anchors excluded)"""
+        # copy=True - scipy may sort indices in place, which would reorder members
+        return sparse.csr_matrix((self.member_distance, self.member_idx, self.member_indptr),
+                                 shape=(self.n_clusters, self.n_buildings), copy=True)
+
+    def cluster_sums(self, columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """
+        Per-cluster totals of several building vectors in one sparse product
+
+        Integer/boolean inputs come back as int64 totals, floats as float64.
+
+        Args:
+            columns: Name -> per-building vector
+
+        Returns:
+            Name -> per-cluster total
+        """
+        if not columns:
+            return {}
+
+        names = list(columns)
+        stacked = np.column_stack([np.asarray(columns[name], dtype=float) for name in names])
+        totals = self.matrix() @ stacked
+
+        sums = {}
+        for k, name in enumerate(names):
+            kind = np.asarray(columns[name]).dtype.kind
+            sums[name] = totals[:, k].astype(np.int64) if kind in 'biu' else totals[:, k]
+        return sums
+
+    def distinct_counts(self, values: np.ndarray) -> np.ndarray:
+        """Number of distinct values (e.g. property types) inside each cluster"""
+        codes, uniques = pd.factorize(pd.Series(values, dtype=object), use_na_sentinel=False)
+        onehot = sparse.csr_matrix((np.ones(len(codes)), (np.arange(len(codes)), codes)),
+                                   shape=(len(codes), len(uniques)))
+        present = self.matrix() @ onehot
+        return present.getnnz(axis=1).astype(np.int64)
+
+    def member_slices(self):
+        """Yield (cluster position, member positions, member distances)"""
+        for k in range(self.n_clusters):
+            start, stop = self.member_indptr[k], self.member_indptr[k + 1]
+            yield k, self.member_idx[start:stop], self.member_distance[start:stop]
@@ -11,14 +11,20 @@ This module:
 5. Prioritizes Equity Priority Buildings (EPBs)
 """
 
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 import pandas as pd
 import numpy as np
 from typing import List, Dict, Tuple, Optional
-import json
 from dataclasses import dataclass
 from collections import defaultdict
 import math
 
+from analytics.cluster_arrays import BuildingArrays, ClusterMembership
+from analytics.spatial_index import neighbor_graph
+
 @dataclass
 class BuildingProfile:
     """Data class for building thermal profile"""
@@ -46,6 +52,28 @@ class BuildingProfile:
         return self.gross_floor_area / 400
 
 
+def cluster_membership(clusters_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Long (cluster_id, building_id) table from cluster results
+    
+    Args:
+        clusters_df: Output of DERClusterAnalyzer.analyze_clusters
+        
+    Returns:
+        DataFrame with one row per cluster building, anchor first within each cluster
+    """
+    if clusters_df.empty:
+        return pd.DataFrame(columns=['cluster_id', 'building_id'])
+    
+    building_ids = [[anchor] + [m['building_id'] for m in members]
+                    for anchor, members in zip(clusters_df['anchor_building_id'], clusters_df['members'])]
+    membership = pd.DataFrame({
+        'cluster_id': clusters_df['cluster_id'].to_numpy(),
+        'building_id': building_ids
+    })
+    return membership.explode('building_id', ignore_index=True)
+
+
 class DERClusterAnalyzer:
     """Analyzer for identifying DER clustering opportunities"""
     
@@ -67,6 +95,16 @@ class DERClusterAnalyzer:
         'College/University'
     ]
     
+    # Column order of analyze_clusters results
+    CLUSTER_COLUMNS = [
+        'cluster_id', 'anchor_building_id', 'anchor_property_type', 'member_count',
+        'total_buildings', 'total_sqft', 'total_thermal_load_mmbtu', 'total_cooling_load_tons',
+        'avg_distance_m', 'max_distance_m', 'epb_count', 'epb_percentage',
+        'total_penalty_exposure', 'opt_in_count', 'high_thermal_demand_count',
+        'property_type_diversity', 'members', 'thermal_diversity_score',
+        'economic_potential_score'
+    ]
+    
     def __init__(self, max_distance_meters: float = 500):
         """
         Initialize the DER cluster analyzer
@@ -109,18 +147,21 @@ class DERClusterAnalyzer:
         Returns:
             List of anchor buildings
         """
-        anchors = []
+        if not buildings:
+            return []
         
-        for building in buildings:
-            # Check if it's an anchor property type
-            if building.property_type in self.ANCHOR_PROPERTY_TYPES:
-                anchors.append(building)
-            # Also include large buildings with high thermal loads
-            elif (building.gross_floor_area > 100000 and 
-                  building.thermal_load_mmbtu > 5000):
-                anchors.append(building)
-                
-        return anchors
+        anchor_mask = self._anchor_mask(BuildingArrays.from_profiles(buildings))
+        return [b for b, is_anchor in zip(buildings, anchor_mask) if is_anchor]
+    
+    def _anchor_mask(self, arrays: BuildingArrays) -> np.ndarray:
+        """Boolean mask of anchor buildings in the building table"""
+        # Anchor property types
+        is_anchor_type = pd.Series(arrays.property_type, dtype=object).isin(
+            self.ANCHOR_PROPERTY_TYPES).to_numpy()
+        # Also include large buildings with high thermal loads
+        is_large_thermal = ((arrays.gross_floor_area > 100000) &
+                            (arrays.thermal_load_mmbtu > 5000))
+        return is_anchor_type | np.asarray(is_large_thermal, dtype=bool)
     
     def find_nearby_buildings(self, anchor: BuildingProfile, 
                             buildings: List[BuildingProfile]) -> List[Tuple[BuildingProfile, float]]:
@@ -162,45 +203,118 @@ class DERClusterAnalyzer:
         Returns:
             Dictionary of cluster metrics
         """
-        all_buildings = [anchor] + [b[0] for b in members]
+        arrays = BuildingArrays.from_profiles([anchor] + [b for b, _ in members])
+        membership = ClusterMembership.from_lists(
+            [0], [np.arange(1, len(members) + 1)], [np.array([d for _, d in members], dtype=float)],
+            len(arrays)
+        )
+        return self.aggregate_cluster_metrics(arrays, membership).iloc[0].to_dict()
+    
+    def _building_loads(self, arrays: BuildingArrays) -> Tuple[np.ndarray, np.ndarray]:
+        """Per-building thermal load (MMBtu) and cooling load (tons)"""
+        return arrays.thermal_load_mmbtu, arrays.cooling_load_tons
+    
+    def _opt_in_flags(self, arrays: BuildingArrays) -> np.ndarray:
+        """Per-building opt-in indicator counted into opt_in_count"""
+        return arrays.opt_in_status == 'Opt-In'
+    
+    def _thermal_diversity_scores(self, arrays: BuildingArrays,
+                                  membership: ClusterMembership) -> np.ndarray:
+        """Thermal diversity score (mixing heating/cooling dominated buildings)"""
+        electric_heavy = membership.cluster_sums({
+            'electric_heavy': np.asarray(arrays.electric_eui > arrays.gas_eui, dtype=bool)
+        })['electric_heavy']
+        total = membership.member_counts + 1
+        gas_heavy = total - electric_heavy
+        return np.minimum(electric_heavy, gas_heavy) / total
+    
+    def _anchor_columns(self, arrays: BuildingArrays,
+                        membership: ClusterMembership) -> Dict[str, np.ndarray]:
+        """Extra per-anchor columns (none in the base analyzer)"""
+        return {}
+    
+    def _member_records(self, arrays: BuildingArrays,
+                        membership: ClusterMembership) -> List[List[Dict]]:
+        """Members list for each cluster (output formatting only)"""
+        records = []
+        for _, idx, distance in membership.member_slices():
+            records.append([{'building_id': b,
+                             'distance_m': d,
+                             'property_type': t,
+                             'is_epb': e}
+                            for b, d, t, e in zip(arrays.building_id[idx], distance.tolist(),
+                                                  arrays.property_type[idx], arrays.is_epb[idx])])
+        return records
+    
+    def aggregate_cluster_metrics(self, arrays: BuildingArrays,
+                                  membership: ClusterMembership) -> pd.DataFrame:
+        """
+        Calculate metrics for every cluster at once
+        
+        All totals come from a single (clusters x buildings) sparse product
+        against the stacked per-building vectors.
+        
+        Args:
+            arrays: Building table
+            membership: Cluster anchors and members
+            
+        Returns:
+            DataFrame with one row per cluster (CLUSTER_COLUMNS)
+        """
+        member_count = membership.member_counts
+        total_buildings = member_count + 1
+        anchor_idx = membership.anchor_idx
+        
+        thermal_load, cooling_load = self._building_loads(arrays)
+        sums = membership.cluster_sums({
+            'total_sqft': arrays.gross_floor_area,
+            'total_thermal_load_mmbtu': thermal_load,
+            'total_cooling_load_tons': cooling_load,
+            'epb_count': np.asarray(arrays.is_epb, dtype=bool),
+            'total_penalty_exposure': arrays.penalty_exposure,
+            'opt_in_count': self._opt_in_flags(arrays),
+            'high_thermal_demand_count': pd.Series(arrays.property_type, dtype=object).isin(
+                self.HIGH_THERMAL_DEMAND_TYPES).to_numpy(),
+        })
+        
+        distance = membership.distance_matrix()
+        distance_sum = np.asarray(distance.sum(axis=1)).ravel()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            avg_distance = np.where(member_count > 0, distance_sum / member_count, 0)
+        max_distance = distance.max(axis=1).toarray().ravel()
         
         metrics = {
-            'cluster_id': f"cluster_{anchor.building_id}",
-            'anchor_building_id': anchor.building_id,
-            'anchor_property_type': anchor.property_type,
-            'member_count': len(members),
-            'total_buildings': len(all_buildings),
-            'total_sqft': sum(b.gross_floor_area for b in all_buildings),
-            'total_thermal_load_mmbtu': sum(b.thermal_load_mmbtu for b in all_buildings),
-            'total_cooling_load_tons': sum(b.cooling_load_tons for b in all_buildings),
-            'avg_distance_m': np.mean([d for _, d in members]) if members else 0,
-            'max_distance_m': max([d for _, d in members]) if members else 0,
-            'epb_count': sum(1 for b in all_buildings if b.is_epb),
-            'epb_percentage': sum(1 for b in all_buildings if b.is_epb) / len(all_buildings) * 100,
-            'total_penalty_exposure': sum(b.penalty_exposure for b in all_buildings),
-            'opt_in_count': sum(1 for b in all_buildings if b.opt_in_status == 'Opt-In'),
-            'high_thermal_demand_count': sum(1 for b in all_buildings 
-                                           if b.property_type in self.HIGH_THERMAL_DEMAND_TYPES),
-            'property_type_diversity': len(set(b.property_type for b in all_buildings)),
-            'members': [{'building_id': b.building_id, 
-                        'distance_m': d,
-                        'property_type': b.property_type,
-                        'is_epb': b.is_epb} for b, d in members]
+            'cluster_id': [f"cluster_{b}" for b in arrays.building_id[anchor_idx]],
+            'anchor_building_id': arrays.building_id[anchor_idx],
+            'anchor_property_type': arrays.property_type[anchor_idx],
+            'member_count': member_count,
+            'total_buildings': total_buildings,
+            'avg_distance_m': avg_distance,
+            'max_distance_m': max_distance,
+            'epb_percentage': sums['epb_count'] / total_buildings * 100,
+            'property_type_diversity': membership.distinct_counts(arrays.property_type),
+            'members': self._member_records(arrays, membership),
+            'thermal_diversity_score': self._thermal_diversity_scores(arrays, membership),
         }
+        metrics.update(sums)
+        metrics.update(self._anchor_columns(arrays, membership))
         
-        # Calculate thermal diversity score (mixing heating/cooling dominated buildings)
-        electric_heavy = sum(1 for b in all_buildings if b.electric_eui > b.gas_eui)
-        gas_heavy = len(all_buildings) - electric_heavy
-        metrics['thermal_diversity_score'] = min(electric_heavy, gas_heavy) / len(all_buildings)
+        clusters_df = pd.DataFrame(metrics)
+        clusters_df['economic_potential_score'] = self._calculate_economic_scores(clusters_df)
         
-        # Calculate economic potential score
-        metrics['economic_potential_score'] = self._calculate_economic_score(metrics)
-        
-        return metrics
+        return clusters_df[[c for c in self.CLUSTER_COLUMNS if c in clusters_df.columns]]
     
     def _calculate_economic_score(self, metrics: Dict) -> float:
         """
-        Calculate economic potential score for a cluster (0-100)
+        Calculate economic potential score for a single cluster (0-100)
+        
+        See _calculate_economic_scores for the factors.
+        """
+        return float(self._calculate_economic_scores(pd.DataFrame([dict(metrics)]))[0])
+    
+    def _calculate_economic_scores(self, clusters_df: pd.DataFrame) -> np.ndarray:
+        """
+        Calculate economic potential score for every cluster (0-100)
         
         Factors:
         - Size of cluster (sqft and load)
@@ -208,45 +322,157 @@ class DERClusterAnalyzer:
         - Penalty exposure
         - Thermal diversity
         - Property type diversity
+        - Network cost per MMBtu served (deduction, when estimated)
         """
-        score = 0
+        def column(name):
+            return clusters_df[name].to_numpy(dtype=float)
+        
+        total_sqft = column('total_sqft')
+        thermal_load = column('total_thermal_load_mmbtu')
+        penalty = column('total_penalty_exposure')
+        
+        score = np.zeros(len(clusters_df))
         
         # Size factors (up to 30 points)
-        if metrics['total_sqft'] > 1000000:
-            score += 15
-        elif metrics['total_sqft'] > 500000:
-            score += 10
-        elif metrics['total_sqft'] > 250000:
-            score += 5
-            
-        if metrics['total_thermal_load_mmbtu'] > 10000:
-            score += 15
-        elif metrics['total_thermal_load_mmbtu'] > 5000:
-            score += 10
-        elif metrics['total_thermal_load_mmbtu'] > 2500:
-            score += 5
+        score = score + np.select(
+            [total_sqft > 1000000, total_sqft > 500000, total_sqft > 250000], [15, 10, 5], 0)
+        score = score + np.select(
+            [thermal_load > 10000, thermal_load > 5000, thermal_load > 2500], [15, 10, 5], 0)
         
         # EPB factor (up to 20 points)
-        score += min(20, metrics['epb_percentage'] * 0.4)
+        score = score + np.minimum(20, column('epb_percentage') * 0.4)
         
         # Penalty exposure (up to 20 points)
-        if metrics['total_penalty_exposure'] > 1000000:
-            score += 20
-        elif metrics['total_penalty_exposure'] > 500000:
-            score += 15
-        elif metrics['total_penalty_exposure'] > 250000:
-            score += 10
-        elif metrics['total_penalty_exposure'] > 100000:
-            score += 5
+        score = score + np.select(
+            [penalty > 1000000, penalty > 500000, penalty > 250000, penalty > 100000],
+            [20, 15, 10, 5], 0)
         
         # Diversity factors (up to 20 points)
-        score += metrics['thermal_diversity_score'] * 10
-        score += min(10, metrics['property_type_diversity'] * 2)
+        score = score + column('thermal_diversity_score') * 10
+        score = score + np.minimum(10, column('property_type_diversity') * 2)
         
         # Building count (up to 10 points)
-        score += min(10, metrics['member_count'])
+        score = score + np.minimum(10, column('member_count'))
+        
+        # Network cost (up to -15 points) - only once apply_network_costs has run;
+        # NaN (no heat served, so not costed) takes no deduction
+        if 'network_cost_per_mmbtu' in clusters_df.columns:
+            network_cost = column('network_cost_per_mmbtu')
+            score = score - np.select(
+                [network_cost > 20, network_cost > 10, network_cost > 5], [15, 10, 5], 0)
+        
+        return np.clip(score, 0, 100)
+    
+    def build_building_arrays(self, buildings_df: pd.DataFrame) -> BuildingArrays:
+        """
+        Columnar building table for rows with coordinates
+        
+        Args:
+            buildings_df: DataFrame with building data including lat/lon
+            
+        Returns:
+            BuildingArrays (one position per located building)
+        """
+        located = self._located_buildings(buildings_df)
+        return BuildingArrays.from_columns(located, {
+            'building_id': 'building_id',
+            'lat': 'latitude',
+            'lon': 'longitude',
+            'property_type': 'property_type',
+            'gross_floor_area': 'gross_floor_area',
+            'site_eui': 'most_recent_site_eui',
+            'electric_eui': 'electric_eui',
+            'gas_eui': 'gas_eui',
+            'opt_in_status': 'opt_in_recommendation',
+            'is_epb': 'is_epb',
+            'penalty_exposure': 'total_penalties_default'
+        }, defaults=self._profile_defaults())
+    
+    @staticmethod
+    def _located_buildings(buildings_df: pd.DataFrame) -> pd.DataFrame:
+        """Rows with both latitude and longitude"""
+        if 'latitude' not in buildings_df.columns or 'longitude' not in buildings_df.columns:
+            return buildings_df.iloc[0:0]
+        return buildings_df[buildings_df['latitude'].notna() & buildings_df['longitude'].notna()]
+    
+    @staticmethod
+    def _profile_defaults() -> Dict:
+        """Fallback values when a building column is missing"""
+        return {
+            'property_type': 'Unknown',
+            'gross_floor_area': 0,
+            'site_eui': 0,
+            'electric_eui': 0,
+            'gas_eui': 0,
+            'opt_in_status': 'Unknown',
+            'is_epb': False,
+            'penalty_exposure': 0
+        }
+    
+    def build_building_profiles(self, buildings_df: pd.DataFrame) -> List[BuildingProfile]:
+        """
+        Convert building rows with coordinates into BuildingProfile objects
         
-        return min(100, score)
+        Args:
+            buildings_df: DataFrame with building data including lat/lon
+            
+        Returns:
+            List of building profiles
+        """
+        return self.build_building_arrays(buildings_df).to_profiles()
+    
+    def find_clusters(self, arrays: BuildingArrays,
+                      anchor_mask: Optional[np.ndarray] = None) -> ClusterMembership:
+        """
+        Greedy clustering around anchors over the sparse neighbor graph
+        
+        Anchors are visited in building order; each takes every unclaimed
+        neighbor within max_distance_meters (nearest first) and forms a cluster
+        when at least 3 remain.
+        
+        Args:
+            arrays: Building table
+            anchor_mask: Optional precomputed anchor mask
+            
+        Returns:
+            ClusterMembership for the accepted clusters
+        """
+        n = len(arrays)
+        if anchor_mask is None:
+            anchor_mask = self._anchor_mask(arrays)
+        
+        graph = neighbor_graph(arrays.lat, arrays.lon, self.max_distance_meters)
+        
+        # Buildings are claimed by ID, so duplicate rows of one building are claimed together
+        id_codes, unique_ids = pd.factorize(pd.Series(arrays.building_id, dtype=object),
+                                            use_na_sentinel=False)
+        processed = np.zeros(len(unique_ids), dtype=bool)
+        
+        anchors, members, distances = [], [], []
+        for anchor in np.flatnonzero(anchor_mask):
+            if processed[id_codes[anchor]]:
+                continue
+            
+            start, stop = graph.indptr[anchor], graph.indptr[anchor + 1]
+            nearby = graph.indices[start:stop]
+            distance = graph.data[start:stop]
+            
+            # Nearest first, ties in building order; skip the anchor's own ID
+            order = np.lexsort((nearby, distance))
+            nearby, distance = nearby[order], distance[order]
+            available = (id_codes[nearby] != id_codes[anchor]) & ~processed[id_codes[nearby]]
+            
+            # Only create cluster if there are enough unclaimed nearby buildings
+            if available.sum() >= 3:
+                anchors.append(anchor)
+                members.append(nearby[available])
+                distances.append(distance[available])
+                
+                # Mark buildings as processed
+                processed[id_codes[anchor]] = True
+                processed[id_codes[nearby[available]]] = True
+        
+        return ClusterMembership.from_lists(anchors, members, distances, n)
     
     def analyze_clusters(self, buildings_df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -258,109 +484,135 @@ class DERClusterAnalyzer:
         Returns:
             DataFrame with cluster analysis results
         """
-        # Convert to BuildingProfile objects
-        buildings = []
-        for _, row in buildings_df.iterrows():
-            if pd.notna(row.get('latitude')) and pd.notna(row.get('longitude')):
-                buildings.append(BuildingProfile(
-                    building_id=row['building_id'],
-                    lat=row['latitude'],
-                    lon=row['longitude'],
-                    property_type=row.get('property_type', 'Unknown'),
-                    gross_floor_area=row.get('gross_floor_area', 0),
-                    site_eui=row.get('most_recent_site_eui', 0),
-                    electric_eui=row.get('electric_eui', 0),
-                    gas_eui=row.get('gas_eui', 0),
-                    opt_in_status=row.get('opt_in_recommendation', 'Unknown'),
-                    is_epb=row.get('is_epb', False),
-                    penalty_exposure=row.get('total_penalties_default', 0)
-                ))
+        # Columnar building table
+        buildings = self.build_building_arrays(buildings_df)
         
         # Identify anchor buildings
-        anchors = self.identify_anchor_buildings(buildings)
-        print(f"📍 Found {len(anchors)} potential anchor buildings")
+        anchor_mask = self._anchor_mask(buildings)
+        print(f"📍 Found {int(anchor_mask.sum())} potential anchor buildings")
         
         # Build clusters around each anchor
-        clusters = []
-        processed_buildings = set()
+        membership = self.find_clusters(buildings, anchor_mask)
         
-        for anchor in anchors:
-            if anchor.building_id in processed_buildings:
-                continue
-                
-            nearby = self.find_nearby_buildings(anchor, buildings)
-            
-            # Only create cluster if there are enough nearby buildings
-            if len(nearby) >= 3:
-                # Filter out buildings already in other clusters
-                nearby_filtered = [(b, d) for b, d in nearby 
-                                 if b.building_id not in processed_buildings]
-                
-                if len(nearby_filtered) >= 3:
-                    cluster_metrics = self.calculate_cluster_metrics(anchor, nearby_filtered)
-                    clusters.append(cluster_metrics)
-                    
-                    # Mark buildings as processed
-                    processed_buildings.add(anchor.building_id)
-                    for b, _ in nearby_filtered:
-                        processed_buildings.add(b.building_id)
-        
-        # Convert to DataFrame and sort by economic potential
-        clusters_df = pd.DataFrame(clusters)
-        if not clusters_df.empty:
+        # Aggregate, add network costs and sort by economic potential
+        clusters_df = pd.DataFrame()
+        if membership.n_clusters > 0:
+            clusters_df = self.aggregate_cluster_metrics(buildings, membership)
+            clusters_df = self.apply_network_costs(clusters_df, buildings)
             clusters_df = clusters_df.sort_values('economic_potential_score', ascending=False)
         
         print(f"🏢 Identified {len(clusters_df)} viable DER clusters")
         
         return clusters_df
     
+    def apply_network_costs(self, clusters_df: pd.DataFrame,
+                            buildings: BuildingArrays) -> pd.DataFrame:
+        """
+        Add thermal network length/capex columns and re-score clusters
+        
+        Args:
+            clusters_df: DataFrame with cluster results
+            buildings: Building table (or profiles) used to build the clusters
+            
+        Returns:
+            clusters_df with network_* columns and updated economic_potential_score
+        """
+        from analytics.thermal_network import ThermalNetworkEstimator
+        
+        clusters_df = ThermalNetworkEstimator().estimate_clusters(clusters_df, buildings)
+        if not clusters_df.empty:
+            clusters_df['economic_potential_score'] = self._calculate_economic_scores(clusters_df)
+        return clusters_df
+    
+    def match_heat_sources(self, clusters_df: pd.DataFrame,
+                           buildings_df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+        """
+        Match rejectable heat to nearby heat demand and add it to the clusters
+        
+        Adds matched_thermal_mmbtu and heat_match_count columns to clusters_df
+        (in place) using HeatMatchingEngine over the same distance limit.
+        
+        Args:
+            clusters_df: DataFrame with cluster results
+            buildings_df: Original buildings DataFrame
+            
+        Returns:
+            Dictionary of heat matching results (profiles, matches, buildings, clusters)
+        """
+        from analytics.heat_matching import HeatMatchingEngine
+        
+        engine = HeatMatchingEngine(max_distance_meters=self.max_distance_meters)
+        results = engine.run(self.build_building_arrays(buildings_df),
+                             clusters_df if not clusters_df.empty else None)
+        
+        if not clusters_df.empty:
+            cluster_heat = results['clusters'].set_index('cluster_id')
+            clusters_df['matched_thermal_mmbtu'] = clusters_df['cluster_id'].map(
+                cluster_heat['matched_thermal_mmbtu']).fillna(0.0)
+            clusters_df['heat_match_count'] = clusters_df['cluster_id'].map(
+                cluster_heat['heat_match_count']).fillna(0).astype(int)
+        
+        return results
+    
+    def _cluster_locations(self, clusters_df: pd.DataFrame,
+                           buildings_df: pd.DataFrame) -> pd.DataFrame:
+        """Cluster rows joined to their anchor's coordinates (one merge, no per-row lookups)"""
+        anchors = (buildings_df[['building_id', 'latitude', 'longitude']]
+                   .drop_duplicates('building_id')
+                   .rename(columns={'building_id': 'anchor_building_id'}))
+        located = clusters_df.merge(anchors, on='anchor_building_id', how='inner')
+        return pd.DataFrame({
+            'longitude': located['longitude'],
+            'latitude': located['latitude'],
+            'cluster_id': located['cluster_id'],
+            'anchor_building': located['anchor_building_id'],
+            'member_count': located['member_count'],
+            'total_sqft': located['total_sqft'],
+            'economic_score': located['economic_potential_score'],
+            'epb_percentage': located['epb_percentage'],
+            'total_penalty': located['total_penalty_exposure']
+        })
+    
     def export_cluster_geojson(self, clusters_df: pd.DataFrame, 
                              buildings_df: pd.DataFrame,
-                             output_path: str):
+                             output_path: str,
+                             ndjson: bool = False):
         """
         Export clusters as GeoJSON for mapping
         
+        Features are streamed to disk, so memory stays flat for large exports.
+        
         Args:
             clusters_df: DataFrame with cluster results
             buildings_df: Original buildings DataFrame
             output_path: Path to save GeoJSON file
+            ndjson: Write newline-delimited GeoJSON (one feature per line)
         """
-        features = []
+        from analytics.geo_export import point_features, write_geojson
         
-        for _, cluster in clusters_df.iterrows():
-            # Get anchor building location
-            anchor_building = buildings_df[
-                buildings_df['building_id'] == cluster['anchor_building_id']
-            ].iloc[0]
-            
-            # Create feature for cluster center
-            feature = {
-                'type': 'Feature',
-                'geometry': {
-                    'type': 'Point',
-                    'coordinates': [anchor_building['longitude'], anchor_building['latitude']]
-                },
-                'properties': {
-                    'cluster_id': cluster['cluster_id'],
-                    'anchor_building': cluster['anchor_building_id'],
-                    'member_count': cluster['member_count'],
-                    'total_sqft': cluster['total_sqft'],
-                    'economic_score': cluster['economic_potential_score'],
-                    'epb_percentage': cluster['epb_percentage'],
-                    'total_penalty': cluster['total_penalty_exposure']
-                }
-            }
-            features.append(feature)
-        
-        geojson = {
-            'type': 'FeatureCollection',
-            'features': features
-        }
+        locations = self._cluster_locations(clusters_df, buildings_df)
+        count = write_geojson(point_features(locations, 'longitude', 'latitude'),
+                              output_path, ndjson=ndjson)
+        
+        print(f"📍 Exported {count} clusters to GeoJSON: {output_path}")
+    
+    def export_cluster_geoparquet(self, clusters_df: pd.DataFrame,
+                                  buildings_df: pd.DataFrame,
+                                  output_path: str):
+        """
+        Export clusters as GeoParquet (anchor points, WKB geometry)
+        
+        Args:
+            clusters_df: DataFrame with cluster results
+            buildings_df: Original buildings DataFrame
+            output_path: Path to save the .parquet file
+        """
+        from analytics.geo_export import write_geoparquet
         
-        with open(output_path, 'w') as f:
-            json.dump(geojson, f, indent=2)
+        locations = self._cluster_locations(clusters_df, buildings_df)
+        count = write_geoparquet(locations, output_path, lon_col='longitude', lat_col='latitude')
         
-        print(f"📍 Exported cluster GeoJSON to: {output_path}")
+        print(f"📍 Exported {count} clusters to GeoParquet: {output_path}")
 
 
 def main():
@@ -16,6 +16,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils.local_gcp_bridge import LocalGCPBridge
 from analytics.der_clustering_analysis import DERClusterAnalyzer, BuildingProfile
+from analytics.cluster_arrays import BuildingArrays, ClusterMembership
 import pandas as pd
 import numpy as np
 import json
@@ -25,124 +26,168 @@ import math
 class FixedDERClusterAnalyzer(DERClusterAnalyzer):
     """Fixed DER Cluster Analyzer with correct column mappings"""
     
+    CLUSTER_COLUMNS = [
+        'cluster_id', 'anchor_building_id', 'anchor_building_name', 'anchor_building_address',
+        'anchor_property_type', 'member_count', 'total_buildings', 'total_sqft',
+        'avg_distance_m', 'max_distance_m', 'epb_count', 'epb_percentage',
+        'total_penalty_exposure', 'property_type_diversity', 'total_thermal_load_mmbtu',
+        'total_cooling_load_tons', 'opt_in_count', 'thermal_diversity_score', 'members',
+        'economic_potential_score'
+    ]
+    
     def calculate_cluster_metrics(self, anchor: BuildingProfile, 
                                 members: List[Tuple[BuildingProfile, float]],
-                                buildings_df: pd.DataFrame) -> Dict:
+                                buildings: BuildingArrays) -> Dict:
         """
         Fixed calculate_cluster_metrics with proper column names
+        
+        Args:
+            anchor: The anchor building
+            members: List of (building, distance) tuples
+            buildings: Building table from build_building_arrays (build it once
+                per portfolio and reuse it across clusters)
         """
-        all_buildings = [anchor] + [b[0] for b in members]
+        positions = pd.Index(buildings.building_id).get_indexer(
+            [anchor.building_id] + [b.building_id for b, _ in members])
         
-        # Get building details from dataframe with correct column names
-        anchor_details = buildings_df[buildings_df['building_id'] == anchor.building_id].iloc[0]
+        membership = ClusterMembership.from_lists(
+            [positions[0]], [positions[1:]], [np.array([d for _, d in members], dtype=float)],
+            len(buildings)
+        )
+        return self.aggregate_cluster_metrics(buildings, membership).iloc[0].to_dict()
+    
+    def build_building_arrays(self, buildings_df: pd.DataFrame) -> BuildingArrays:
+        """
+        Fixed building table using current_eui, should_opt_in, names and addresses
+        """
+        located = self._located_buildings(buildings_df)
+        building_ids = located['building_id'].astype(str).to_numpy(dtype=object)
+        
+        if 'should_opt_in' in located.columns:
+            should_opt_in = located['should_opt_in'].to_numpy()
+            opt_in_status = np.where(should_opt_in.astype(bool), 'Opt-In', 'Default').astype(object)
+            # NaN counts as "not opted in" in opt_in_count (pandas sum skips it)
+            opt_in_flags = located['should_opt_in'].fillna(False).astype(bool).to_numpy()
+        else:
+            opt_in_status = np.full(len(located), 'Default', dtype=object)
+            opt_in_flags = np.zeros(len(located), dtype=np.int64)
+        
+        arrays = BuildingArrays.from_columns(located, {
+            'building_id': building_ids,
+            'lat': 'latitude',
+            'lon': 'longitude',
+            'property_type': 'property_type',
+            'gross_floor_area': 'gross_floor_area',
+            'site_eui': 'current_eui',
+            'electric_eui': 'electric_eui',
+            'gas_eui': 'gas_eui',
+            'opt_in_status': opt_in_status,
+            'is_epb': 'is_epb',
+            'penalty_exposure': 'total_penalties_default'
+        }, defaults=self._profile_defaults())
         
         # Handle building name and address
-        anchor_name = anchor_details.get('building_name', f"Building {anchor.building_id}")
+        if 'building_name' in located.columns:
+            names = located['building_name'].to_numpy(dtype=object)
+        else:
+            names = np.array([f"Building {b}" for b in building_ids], dtype=object)
+        
         # If no address column, create one from building_id and zip
-        anchor_address = anchor_details.get('address', 
-                                           anchor_details.get('property_address',
-                                           f"Building {anchor.building_id}, ZIP: {anchor_details.get('zip_code', 'Unknown')}"))
+        if 'address' in located.columns:
+            addresses = located['address'].to_numpy(dtype=object)
+        elif 'property_address' in located.columns:
+            addresses = located['property_address'].to_numpy(dtype=object)
+        else:
+            zips = located['zip_code'] if 'zip_code' in located.columns else pd.Series('Unknown', index=located.index)
+            addresses = np.array([f"Building {b}, ZIP: {z}" for b, z in zip(building_ids, zips)],
+                                 dtype=object)
         
-        metrics = {
-            'cluster_id': f"cluster_{anchor.building_id}",
-            'anchor_building_id': anchor.building_id,
-            'anchor_building_name': anchor_name,
-            'anchor_building_address': anchor_address,
-            'anchor_property_type': anchor.property_type,
-            'member_count': len(members),
-            'total_buildings': len(all_buildings),
-            'total_sqft': sum(b.gross_floor_area for b in all_buildings),
-            'avg_distance_m': np.mean([d for _, d in members]) if members else 0,
-            'max_distance_m': max([d for _, d in members]) if members else 0,
-            'epb_count': sum(1 for b in all_buildings if b.is_epb),
-            'epb_percentage': sum(1 for b in all_buildings if b.is_epb) / len(all_buildings) * 100,
-            'total_penalty_exposure': sum(b.penalty_exposure for b in all_buildings),
-            'property_type_diversity': len(set(b.property_type for b in all_buildings)),
+        arrays.extras = {
+            'building_name': names,
+            'building_address': addresses,
+            'opt_in_flags': opt_in_flags
         }
+        return arrays
+    
+    def _building_loads(self, arrays: BuildingArrays) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Fix thermal load calculations using actual EUI data
+        """
+        sqft = arrays.gross_floor_area
+        gas_eui = arrays.gas_eui
+        electric_eui = arrays.electric_eui
         
-        # Fix thermal load calculations using actual EUI data
-        total_thermal_load = 0
-        total_cooling_load = 0
-        
-        for b in all_buildings:
-            # Thermal load (heating) from gas EUI
-            # Convert from kBtu/sqft to MMBtu total
-            thermal_load_mmbtu = (b.gross_floor_area * b.gas_eui) / 1000 if b.gas_eui > 0 else 0
-            total_thermal_load += thermal_load_mmbtu
-            
-            # Cooling load estimation from electric EUI
-            # Assume 30% of electric use is for cooling in commercial buildings
-            # Convert to tons (1 ton = 12,000 BTU/hr, assume 2000 cooling hours/year)
-            if b.electric_eui > 0:
-                cooling_energy_kbtu = b.gross_floor_area * b.electric_eui * 0.3
-                cooling_tons = cooling_energy_kbtu * 1000 / (12 * 2000)  # Convert to tons
-                total_cooling_load += cooling_tons
-            else:
-                # Fallback to rule of thumb if no electric data
-                total_cooling_load += b.gross_floor_area / 400
-        
-        metrics['total_thermal_load_mmbtu'] = total_thermal_load
-        metrics['total_cooling_load_tons'] = total_cooling_load
+        # Thermal load (heating) from gas EUI
+        # Convert from kBtu/sqft to MMBtu total
+        thermal_load_mmbtu = np.where(gas_eui > 0, sqft * gas_eui / 1000, 0)
         
-        # Fix opt_in_count calculation using 'should_opt_in' column
-        building_ids = [b.building_id for b in all_buildings]
-        opt_in_buildings = buildings_df[buildings_df['building_id'].isin(building_ids)]
+        # Cooling load estimation from electric EUI
+        # Assume 30% of electric use is for cooling in commercial buildings
+        # Convert to tons (1 ton = 12,000 BTU/hr, assume 2000 cooling hours/year)
+        # Fallback to rule of thumb if no electric data
+        cooling_tons = np.where(electric_eui > 0,
+                                sqft * electric_eui * 0.3 * 1000 / (12 * 2000),
+                                sqft / 400)
         
-        if 'should_opt_in' in opt_in_buildings.columns:
-            metrics['opt_in_count'] = opt_in_buildings['should_opt_in'].sum()
-        else:
-            metrics['opt_in_count'] = 0
+        return thermal_load_mmbtu, cooling_tons
+    
+    def _opt_in_flags(self, arrays: BuildingArrays) -> np.ndarray:
+        """Fix opt_in_count calculation using 'should_opt_in' column"""
+        return arrays.extras['opt_in_flags']
+    
+    def _thermal_diversity_scores(self, arrays: BuildingArrays,
+                                  membership: ClusterMembership) -> np.ndarray:
+        """
+        Fix thermal diversity score calculation
+        """
+        electric_eui = arrays.electric_eui
+        gas_eui = arrays.gas_eui
         
-        # Fix thermal diversity score calculation
-        electric_heavy = 0
-        gas_heavy = 0
-        balanced = 0
+        has_both = (electric_eui > 0) & (gas_eui > 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = np.where(has_both, electric_eui / np.where(has_both, gas_eui, 1), 1.0)
         
-        for b in all_buildings:
-            if b.electric_eui > 0 and b.gas_eui > 0:
-                ratio = b.electric_eui / b.gas_eui
-                if ratio > 2:  # Heavily electric
-                    electric_heavy += 1
-                elif ratio < 0.5:  # Heavily gas
-                    gas_heavy += 1
-                else:  # Balanced
-                    balanced += 1
+        counts = membership.cluster_sums({
+            'electric_heavy': has_both & (ratio > 2),    # Heavily electric
+            'gas_heavy': has_both & (ratio < 0.5),       # Heavily gas
+            'balanced': has_both & (ratio >= 0.5) & (ratio <= 2),
+        })
+        total = membership.member_counts + 1
         
         # Thermal diversity is good when you have a mix of heating and cooling loads
-        if len(all_buildings) > 0:
-            # Best diversity is 50/50 split
-            diversity_ratio = min(electric_heavy, gas_heavy) / len(all_buildings)
-            # Also give credit for balanced buildings
-            metrics['thermal_diversity_score'] = diversity_ratio + (balanced / len(all_buildings) * 0.5)
-        else:
-            metrics['thermal_diversity_score'] = 0
-        
-        # Enhanced members list with building details
-        members_with_details = []
-        for building, distance in members:
-            building_info = buildings_df[buildings_df['building_id'] == building.building_id].iloc[0]
-            
-            member_name = building_info.get('building_name', f"Building {building.building_id}")
-            member_address = building_info.get('address',
-                                             building_info.get('property_address',
-                                             f"Building {building.building_id}, ZIP: {building_info.get('zip_code', 'Unknown')}"))
-            
-            members_with_details.append({
-                'building_id': building.building_id,
-                'building_name': member_name,
-                'building_address': member_address,
-                'distance_m': distance,
-                'property_type': building.property_type,
-                'is_epb': building.is_epb,
-                'sqft': building.gross_floor_area,
-                'gas_eui': building.gas_eui,
-                'electric_eui': building.electric_eui
-            })
-        
-        metrics['members'] = members_with_details
-        metrics['economic_potential_score'] = self._calculate_economic_score(metrics)
+        # Best diversity is 50/50 split
+        diversity_ratio = np.minimum(counts['electric_heavy'], counts['gas_heavy']) / total
+        # Also give credit for balanced buildings
+        return diversity_ratio + (counts['balanced'] / total * 0.5)
+    
+    def _anchor_columns(self, arrays: BuildingArrays,
+                        membership: ClusterMembership) -> Dict[str, np.ndarray]:
+        """Anchor building name and address"""
+        return {
+            'anchor_building_name': arrays.extras['building_name'][membership.anchor_idx],
+            'anchor_building_address': arrays.extras['building_address'][membership.anchor_idx],
+        }
+    
+    def _member_records(self, arrays: BuildingArrays,
+                        membership: ClusterMembership) -> List[List[Dict]]:
+        """Enhanced members list with building details"""
+        names = arrays.extras['building_name']
+        addresses = arrays.extras['building_address']
         
-        return metrics
+        records = []
+        for _, idx, distance in membership.member_slices():
+            records.append([{
+                'building_id': arrays.building_id[i],
+                'building_name': names[i],
+                'building_address': addresses[i],
+                'distance_m': d,
+                'property_type': arrays.property_type[i],
+                'is_epb': arrays.is_epb[i],
+                'sqft': arrays.gross_floor_area[i],
+                'gas_eui': arrays.gas_eui[i],
+                'electric_eui': arrays.electric_eui[i]
+            } for i, d in zip(idx.tolist(), distance.tolist())])
+        return records
 
     def analyze_clusters(self, buildings_df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -155,60 +200,8 @@ class FixedDERClusterAnalyzer(DERClusterAnalyzer):
         print(f"   Average gas EUI: {buildings_df['gas_eui'].mean():.1f}")
         print(f"   Average electric EUI: {buildings_df['electric_eui'].mean():.1f}")
         
-        # Convert to BuildingProfile objects with fixed calculations
-        buildings = []
-        for _, row in buildings_df.iterrows():
-            if pd.notna(row.get('latitude')) and pd.notna(row.get('longitude')):
-                # Use the actual EUI values from the data
-                electric_eui = row.get('electric_eui', 0)
-                gas_eui = row.get('gas_eui', 0)
-                
-                buildings.append(BuildingProfile(
-                    building_id=str(row['building_id']),
-                    lat=row['latitude'],
-                    lon=row['longitude'],
-                    property_type=row.get('property_type', 'Unknown'),
-                    gross_floor_area=row.get('gross_floor_area', 0),
-                    site_eui=row.get('current_eui', 0),
-                    electric_eui=electric_eui,
-                    gas_eui=gas_eui,
-                    opt_in_status='Opt-In' if row.get('should_opt_in', False) else 'Default',
-                    is_epb=row.get('is_epb', False),
-                    penalty_exposure=row.get('total_penalties_default', 0)
-                ))
-        
-        # Rest of the analysis continues as before
-        anchors = self.identify_anchor_buildings(buildings)
-        print(f"\n📍 Found {len(anchors)} potential anchor buildings")
-        
-        clusters = []
-        processed_buildings = set()
-        
-        for anchor in anchors:
-            if anchor.building_id in processed_buildings:
-                continue
-                
-            nearby = self.find_nearby_buildings(anchor, buildings)
-            
-            if len(nearby) >= 3:
-                nearby_filtered = [(b, d) for b, d in nearby 
-                                 if b.building_id not in processed_buildings]
-                
-                if len(nearby_filtered) >= 3:
-                    cluster_metrics = self.calculate_cluster_metrics(anchor, nearby_filtered, buildings_df)
-                    clusters.append(cluster_metrics)
-                    
-                    processed_buildings.add(anchor.building_id)
-                    for b, _ in nearby_filtered:
-                        processed_buildings.add(b.building_id)
-        
-        clusters_df = pd.DataFrame(clusters)
-        if not clusters_df.empty:
-            clusters_df = clusters_df.sort_values('economic_potential_score', ascending=False)
-        
-        print(f"\n🏢 Identified {len(clusters_df)} viable DER clusters")
-        
-        return clusters_df
+        # Rest of the analysis is shared with the base analyzer
+        return super().analyze_clusters(buildings_df)
 
 
 def organize_outputs(base_output_dir):
@@ -333,32 +326,37 @@ def main():
         os.path.join(output_paths['reports'], 'epb_clusters_fixed.csv')
     )
     
-    # 3. Detailed members report
-    members_data = []
-    for _, cluster in clusters_df.iterrows():
-        for member in cluster['members']:
-            members_data.append({
-                'cluster_id': cluster['cluster_id'],
-                'anchor_building_id': cluster['anchor_building_id'],
-                'anchor_building_name': cluster['anchor_building_name'],
-                'anchor_building_address': cluster['anchor_building_address'],
-                'building_id': member['building_id'],
-                'building_name': member['building_name'],
-                'building_address': member['building_address'],
-                'distance_m': member['distance_m'],
-                'property_type': member['property_type'],
-                'is_epb': member['is_epb'],
-                'sqft': member['sqft'],
-                'gas_eui': member['gas_eui'],
-                'electric_eui': member['electric_eui']
-            })
-    
-    members_df = pd.DataFrame(members_data)
+    # 3. Detailed members report (one exploded frame instead of a row-by-row loop)
+    anchor_columns = ['cluster_id', 'anchor_building_id', 'anchor_building_name', 'anchor_building_address']
+    exploded = clusters_df[anchor_columns + ['members']].explode('members', ignore_index=True)
+    exploded = exploded.dropna(subset=['members'])
+    members_df = pd.concat([
+        exploded[anchor_columns].reset_index(drop=True),
+        pd.DataFrame(exploded['members'].tolist())
+    ], axis=1)
+    members_df = members_df[anchor_columns + ['building_id', 'building_name', 'building_address',
+                                              'distance_m', 'property_type', 'is_epb', 'sqft',
+                                              'gas_eui', 'electric_eui']]
     export_to_excel_friendly_csv(
         members_df,
         os.path.join(output_paths['reports'], 'cluster_members_detail_fixed.csv')
     )
     
+    # Map layers: streamed GeoJSON and GeoParquet of anchors and members
+    from analytics.geo_export import point_features, write_geojson, write_geoparquet
+    member_points = members_df.merge(
+        buildings_df[['building_id', 'latitude', 'longitude']].drop_duplicates('building_id'),
+        on='building_id', how='left'
+    )
+    write_geojson(point_features(member_points, 'longitude', 'latitude'),
+                  os.path.join(output_paths['json'], 'cluster_members_fixed.geojsonl'), ndjson=True)
+    write_geoparquet(member_points, os.path.join(output_paths['json'], 'cluster_members_fixed.parquet'),
+                     lon_col='longitude', lat_col='latitude')
+    analyzer.export_cluster_geojson(clusters_df, buildings_df,
+                                    os.path.join(output_paths['json'], 'der_clusters_fixed.geojson'))
+    analyzer.export_cluster_geoparquet(clusters_df, buildings_df,
+                                       os.path.join(output_paths['json'], 'der_clusters_fixed.parquet'))
+    
     # 4. Save summary with thermal stats
     summary = {
         'total_clusters': int(len(clusters_df)),
@@ -387,6 +385,9 @@ def main():
     print(f"   - der_clusters_fixed.csv")
     print(f"   - epb_clusters_fixed.csv")
     print(f"   - cluster_members_detail_fixed.csv")
+    print(f"   Map layers: {output_paths['json']}")
+    print(f"   - der_clusters_fixed.geojson / .parquet")
+    print(f"   - cluster_members_fixed.geojsonl / .parquet")
     
     return clusters_df
 
@@ -0,0 +1,390 @@
+"""
+Suggested File Name: geo_export.py
+File Location: /Users/robertpadgett/Projects/01_My_Notebooks/500_ED_Risk_Retro_BP/src/analytics/
+Use: Streaming GeoJSON / GeoJSONSeq / GeoParquet export and zoom tiles for cluster maps
+
+This module:
+1. Writes GeoJSON features one at a time (memory stays flat for large exports)
+2. Writes newline-delimited GeoJSON (GeoJSONSeq) for line-by-line loaders
+3. Writes GeoParquet (WKB geometry + 'geo' metadata) in row-group chunks
+4. Pre-aggregates points into per-zoom slippy-map tiles so map loads stay fast
+"""
+
+import json
+import math
+import os
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+DEFAULT_CHUNK_SIZE = 50000
+
+
+def _json_default(value):
+    """Make NumPy / pandas scalars JSON serializable"""
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return None if np.isnan(value) else float(value)
+    if isinstance(value, np.bool_):
+        return bool(value)
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return str(value)
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return str(value)
+
+
+def _clean_properties(record: Dict) -> Dict:
+    """Replace float NaN with None so the output stays valid JSON"""
+    return {k: (None if isinstance(v, float) and math.isnan(v) else v) for k, v in record.items()}
+
+
+def _iter_chunks(df: pd.DataFrame, chunk_size: int) -> Iterator[pd.DataFrame]:
+    for start in range(0, len(df), chunk_size):
+        yield df.iloc[start:start + chunk_size]
+
+
+class GeoJSONStreamWriter:
+    """
+    Incremental GeoJSON writer
+
+    Use as a context manager and call write_feature / write_features; the
+    FeatureCollection header and footer are written around the stream.
+    With ndjson=True each feature is written on its own line (GeoJSONSeq).
+    """
+
+    def __init__(self, output_path: str, ndjson: bool = False):
+        self.output_path = output_path
+        self.ndjson = ndjson
+        self.count = 0
+        self._file = None
+
+    def __enter__(self):
+        directory = os.path.dirname(self.output_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.output_path, 'w')
+        if not self.ndjson:
+            self._file.write('{"type": "FeatureCollection", "features": [\n')
+        return self
+
+    def write_feature(self, feature: Dict):
+        text = json.dumps(feature, default=_json_default, allow_nan=False)
+        if self.ndjson:
+            self._file.write(text + '\n')
+        else:
+            self._file.write((',\n' if self.count else '') + text)
+        self.count += 1
+
+    def write_features(self, features: Iterable[Dict]):
+        for feature in features:
+            self.write_feature(feature)
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self.ndjson:
+            self._file.write('\n]}\n')
+        self._file.close()
+        return False
+
+
+def point_features(df: pd.DataFrame, lon_col: str, lat_col: str,
+                   properties: Optional[Sequence[str]] = None,
+                   chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Dict]:
+    """
+    Yield Point features chunk by chunk (rows without coordinates are skipped)
+
+    Args:
+        df: Source rows
+        lon_col, lat_col: Coordinate columns
+        properties: Columns to carry as feature properties (default: all others)
+        chunk_size: Rows converted per chunk
+
+    Yields:
+        GeoJSON Feature dictionaries
+    """
+    if properties is None:
+        properties = [c for c in df.columns if c not in (lon_col, lat_col)]
+    properties = list(properties)
+
+    for chunk in _iter_chunks(df, chunk_size):
+        chunk = chunk[chunk[lon_col].notna() & chunk[lat_col].notna()]
+        coords = chunk[[lon_col, lat_col]].to_numpy(dtype=float).tolist()
+        records = chunk[properties].to_dict('records')
+        for (lon, lat), record in zip(coords, records):
+            yield {
+                'type': 'Feature',
+                'geometry': {'type': 'Point', 'coordinates': [lon, lat]},
+                'properties': _clean_properties(record)
+            }
+
+
+def line_features(df: pd.DataFrame, coord_cols: Sequence[str],
+                  properties: Optional[Sequence[str]] = None,
+                  chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Dict]:
+    """
+    Yield two-point LineString features chunk by chunk
+
+    Args:
+        df: Source rows
+        coord_cols: (lon_a, lat_a, lon_b, lat_b) column names
+        properties: Columns to carry as feature properties (default: all others)
+        chunk_size: Rows converted per chunk
+
+    Yields:
+        GeoJSON Feature dictionaries
+    """
+    coord_cols = list(coord_cols)
+    if properties is None:
+        properties = [c for c in df.columns if c not in coord_cols]
+    properties = list(properties)
+
+    for chunk in _iter_chunks(df, chunk_size):
+        coords = chunk[coord_cols].to_numpy(dtype=float).tolist()
+        records = chunk[properties].to_dict('records')
+        for (lon_a, lat_a, lon_b, lat_b), record in zip(coords, records):
+            yield {
+                'type': 'Feature',
+                'geometry': {'type': 'LineString',
+                             'coordinates': [[lon_a, lat_a], [lon_b, lat_b]]},
+                'properties': _clean_properties(record)
+            }
+
+
+def write_geojson(features: Iterable[Dict], output_path: str, ndjson: bool = False) -> int:
+    """
+    Stream features to a GeoJSON (or GeoJSONSeq) file
+
+    Args:
+        features: Iterable of GeoJSON features (a generator keeps memory flat)
+        output_path: Destination path
+        ndjson: Write newline-delimited features instead of a FeatureCollection
+
+    Returns:
+        Number of features written
+    """
+    with GeoJSONStreamWriter(output_path, ndjson=ndjson) as writer:
+        writer.write_features(features)
+    return writer.count
+
+
+def wkb_points(lon: np.ndarray, lat: np.ndarray) -> List[bytes]:
+    """Little-endian WKB Points built in one vectorized pass"""
+    records = np.empty(len(lon), dtype=[('order', 'u1'), ('type', '<u4'), ('x', '<f8'), ('y', '<f8')])
+    records['order'] = 1
+    records['type'] = 1
+    records['x'] = lon
+    records['y'] = lat
+    raw = records.tobytes()
+    size = records.dtype.itemsize
+    return [raw[i:i + size] for i in range(0, len(raw), size)]
+
+
+def wkb_lines(lon_a: np.ndarray, lat_a: np.ndarray,
+              lon_b: np.ndarray, lat_b: np.ndarray) -> List[bytes]:
+    """Little-endian WKB two-point LineStrings built in one vectorized pass"""
+    records = np.empty(len(lon_a), dtype=[('order', 'u1'), ('type', '<u4'), ('n', '<u4'),
+                                          ('x1', '<f8'), ('y1', '<f8'), ('x2', '<f8'), ('y2', '<f8')])
+    records['order'] = 1
+    records['type'] = 2
+    records['n'] = 2
+    records['x1'], records['y1'] = lon_a, lat_a
+    records['x2'], records['y2'] = lon_b, lat_b
+    raw = records.tobytes()
+    size = records.dtype.itemsize
+    return [raw[i:i + size] for i in range(0, len(raw), size)]
+
+
+def write_geoparquet(df: pd.DataFrame, output_path: str,
+                     lon_col: Optional[str] = None, lat_col: Optional[str] = None,
+                     line_cols: Optional[Sequence[str]] = None,
+                     properties: Optional[Sequence[str]] = None,
+                     row_group_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """
+    Write points (lon_col/lat_col) or two-point lines (line_cols) as GeoParquet
+
+    Rows are converted and written one row group at a time.
+
+    Args:
+        df: Source rows
+        lon_col, lat_col: Point coordinate columns
+        line_cols: (lon_a, lat_a, lon_b, lat_b) columns for LineStrings
+        properties: Attribute columns (default: all non-coordinate columns)
+        row_group_size: Rows per Parquet row group
+
+    Returns:
+        Number of rows written
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if line_cols is not None:
+        coord_cols = list(line_cols)
+        geometry_type = 'LineString'
+    else:
+        coord_cols = [lon_col, lat_col]
+        geometry_type = 'Point'
+
+    df = df[df[coord_cols].notna().all(axis=1)]
+    if properties is None:
+        properties = [c for c in df.columns if c not in coord_cols]
+    properties = list(properties)
+
+    coords = df[coord_cols].to_numpy(dtype=float)
+    xs = coords[:, 0::2]
+    ys = coords[:, 1::2]
+    bbox = ([float(xs.min()), float(ys.min()), float(xs.max()), float(ys.max())]
+            if len(df) else [])
+
+    geometry_metadata = {'encoding': 'WKB', 'geometry_types': [geometry_type]}
+    if bbox:
+        geometry_metadata['bbox'] = bbox
+    geo_metadata = {
+        'version': '1.0.0',
+        'primary_column': 'geometry',
+        'columns': {'geometry': geometry_metadata}
+    }
+    # One schema for every row group - per-chunk inference can disagree on all-null chunks
+    properties_schema = pa.Schema.from_pandas(df[properties], preserve_index=False)
+
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    writer = None
+    written = 0
+    try:
+        for chunk in _iter_chunks(df, row_group_size) if len(df) else [df]:
+            values = chunk[coord_cols].to_numpy(dtype=float)
+            if geometry_type == 'Point':
+                geometry = wkb_points(values[:, 0], values[:, 1])
+            else:
+                geometry = wkb_lines(values[:, 0], values[:, 1], values[:, 2], values[:, 3])
+
+            table = pa.Table.from_pandas(chunk[properties], schema=properties_schema,
+                                         preserve_index=False)
+            table = table.append_column('geometry', pa.array(geometry, type=pa.binary()))
+
+            if writer is None:
+                metadata = dict(table.schema.metadata or {})
+                metadata[b'geo'] = json.dumps(geo_metadata).encode('utf-8')
+                writer = pq.ParquetWriter(output_path, table.schema.with_metadata(metadata),
+                                          compression='zstd')
+            writer.write_table(table.replace_schema_metadata(writer.schema.metadata))
+            written += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return written
+
+
+def read_geoparquet_points(path: str) -> pd.DataFrame:
+    """
+    Read a Point GeoParquet written by write_geoparquet back into lon/lat columns
+
+    Args:
+        path: GeoParquet file
+
+    Returns:
+        DataFrame of attribute columns plus longitude / latitude
+    """
+    df = pd.read_parquet(path)
+    geometry = df.pop('geometry')
+    point_dtype = np.dtype([('order', 'u1'), ('type', '<u4'), ('x', '<f8'), ('y', '<f8')])
+    points = np.frombuffer(b''.join(geometry.tolist()), dtype=point_dtype)
+    df['longitude'] = points['x']
+    df['latitude'] = points['y']
+    return df
+
+
+def tile_coordinates(lon: np.ndarray, lat: np.ndarray, zoom: int) -> np.ndarray:
+    """
+    Fractional slippy-map (Web Mercator) tile coordinates
+
+    Returns:
+        (n, 2) array of fractional tile x / y at the given zoom
+    """
+    n = 2 ** zoom
+    lat_rad = np.radians(np.clip(lat, -85.0511, 85.0511))
+    x = (np.asarray(lon, dtype=float) + 180.0) / 360.0 * n
+    y = (1.0 - np.arcsinh(np.tan(lat_rad)) / np.pi) / 2.0 * n
+    return np.column_stack([x, y])
+
+
+def build_zoom_tiles(df: pd.DataFrame, lon_col: str, lat_col: str, output_dir: str,
+                     zooms: Iterable[int] = range(10, 17),
+                     sum_columns: Optional[Sequence[str]] = None,
+                     cells_per_tile: int = 64,
+                     detail_zoom: Optional[int] = None) -> Dict:
+    """
+    Pre-aggregate points into simplified per-zoom GeoJSON tiles
+
+    Each tile is split into a cells_per_tile x cells_per_tile grid; points in
+    the same cell collapse to one feature (mean location, count, summed
+    columns). At detail_zoom and above the original points are written.
+    Tiles land in output_dir/{z}/{x}/{y}.geojson.
+
+    Args:
+        df: Points to tile
+        lon_col, lat_col: Coordinate columns
+        output_dir: Tile root directory
+        zooms: Zoom levels to build
+        sum_columns: Numeric columns summed per cell (e.g. total_sqft)
+        cells_per_tile: Aggregation grid resolution inside each tile
+        detail_zoom: First zoom that writes raw points (default: max zoom)
+
+    Returns:
+        Tile index dictionary (also saved as output_dir/tiles.json)
+    """
+    zooms = sorted(zooms)
+    sum_columns = list(sum_columns or [])
+    if detail_zoom is None:
+        detail_zoom = zooms[-1] if zooms else 0
+
+    points = df[df[lon_col].notna() & df[lat_col].notna()]
+    lon = points[lon_col].to_numpy(dtype=float)
+    lat = points[lat_col].to_numpy(dtype=float)
+
+    index = {'zooms': {}, 'detail_zoom': detail_zoom,
+             'bounds': ([float(lon.min()), float(lat.min()), float(lon.max()), float(lat.max())]
+                        if len(points) else [])}
+
+    for zoom in zooms:
+        tile_xy = tile_coordinates(lon, lat, zoom)
+        tiles = pd.DataFrame({
+            'tile_x': np.floor(tile_xy[:, 0]).astype(np.int64),
+            'tile_y': np.floor(tile_xy[:, 1]).astype(np.int64),
+        })
+
+        if zoom >= detail_zoom:
+            layer = points.reset_index(drop=True).assign(tile_x=tiles['tile_x'], tile_y=tiles['tile_y'])
+            layer = layer.rename(columns={lon_col: 'lon', lat_col: 'lat'})
+        else:
+            cell = np.floor(tile_xy * cells_per_tile).astype(np.int64)
+            grouped = pd.DataFrame({
+                'tile_x': tiles['tile_x'], 'tile_y': tiles['tile_y'],
+                'cell_x': cell[:, 0], 'cell_y': cell[:, 1],
+                'lon': lon, 'lat': lat, 'count': 1,
+                **{c: points[c].to_numpy() for c in sum_columns}
+            })
+            aggregations = {'lon': 'mean', 'lat': 'mean', 'count': 'sum'}
+            aggregations.update({c: 'sum' for c in sum_columns})
+            layer = (grouped.groupby(['tile_x', 'tile_y', 'cell_x', 'cell_y'], sort=False)
+                     .agg(aggregations).reset_index()
+                     .drop(columns=['cell_x', 'cell_y']))
+
+        tile_count = 0
+        for (tile_x, tile_y), tile_df in layer.groupby(['tile_x', 'tile_y'], sort=False):
+            tile_path = os.path.join(output_dir, str(zoom), str(tile_x), f"{tile_y}.geojson")
+            write_geojson(point_features(tile_df.drop(columns=['tile_x', 'tile_y']), 'lon', 'lat'),
+                          tile_path)
+            tile_count += 1
+
+        index['zooms'][str(zoom)] = {'tiles': tile_count, 'features': int(len(layer))}
+
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, 'tiles.json'), 'w') as f:
+        json.dump(index, f, indent=2)
+
+    return index
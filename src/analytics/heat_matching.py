@@ -0,0 +1,289 @@
+"""
+Suggested File Name: heat_matching.py
+File Location: /Users/robertpadgett/Projects/01_My_Notebooks/500_ED_Risk_Retro_BP/src/analytics/
+Use: Match heat sources (data centers, supermarkets, plants) to nearby heat sinks for DER clusters
+
+This module:
+1. Estimates each building's rejectable heat and heat demand (MMBtu/yr) and
+   nets them, so each building is either a net source or a net sink
+2. Builds the sparse source -> sink neighbor graph within a pipe distance limit
+3. Solves the distance-weighted transportation (min-cost flow) problem with HiGHS
+4. Reports matched thermal MMBtu per building pair and per DER cluster
+
+Replaces the pair-type CASE scoring in cluster_analysis_bigquery.py and the
+electric-vs-gas head count in thermal_diversity_score with actual matched energy.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.optimize import linprog
+from typing import Dict, Optional, Tuple
+
+from analytics.cluster_arrays import BuildingArrays
+from analytics.der_clustering_analysis import cluster_membership
+from analytics.spatial_index import neighbor_pairs
+
+
+class HeatMatchingEngine:
+    """Distance-constrained heat source -> heat sink assignment"""
+
+    # Share of annual electric use that ends up as recoverable low-grade heat
+    REJECTABLE_HEAT_FRACTION = {
+        'Data Center': 0.85,
+        'Supermarket': 0.35,
+        'Grocery Store': 0.35,
+        'Manufacturing/Industrial Plant': 0.30,
+        'Hospital': 0.20,
+        'Laboratory': 0.20,
+        'College/University': 0.10,
+        'Office': 0.10,
+    }
+    DEFAULT_REJECTABLE_HEAT_FRACTION = 0.05
+
+    # Boiler efficiency - converts gas input to delivered heat demand
+    HEATING_EFFICIENCY = 0.80
+
+    def __init__(self, max_distance_meters: float = 500,
+                 distance_weight: float = 0.5,
+                 min_match_mmbtu: float = 1.0,
+                 max_sinks_per_source: Optional[int] = 10):
+        """
+        Initialize the heat matching engine
+
+        Args:
+            max_distance_meters: Longest source -> sink connection allowed
+            distance_weight: Share of a matched MMBtu's value lost at max distance (0-1)
+            min_match_mmbtu: Matches smaller than this are dropped from results
+            max_sinks_per_source: Keep only the nearest N candidate sinks per source
+                (None keeps every neighbor - exact but slower on dense downtown blocks)
+        """
+        self.max_distance_meters = max_distance_meters
+        self.distance_weight = distance_weight
+        self.min_match_mmbtu = min_match_mmbtu
+        self.max_sinks_per_source = max_sinks_per_source
+
+    def estimate_heat_profiles(self, buildings) -> pd.DataFrame:
+        """
+        Estimate rejectable heat and heat demand for each building
+
+        Args:
+            buildings: BuildingArrays table or list of BuildingProfile objects
+
+        Returns:
+            DataFrame with building_id, lat, lon, property_type,
+            rejectable_heat_mmbtu and heat_demand_mmbtu
+        """
+        if not isinstance(buildings, BuildingArrays):
+            buildings = BuildingArrays.from_profiles(buildings)
+
+        profiles = pd.DataFrame({
+            'building_id': buildings.building_id,
+            'lat': buildings.lat,
+            'lon': buildings.lon,
+            'property_type': buildings.property_type,
+            'gross_floor_area': buildings.gross_floor_area,
+            'electric_eui': buildings.electric_eui,
+            'gas_eui': buildings.gas_eui,
+        })
+        return self._add_heat_columns(profiles)
+
+    def _add_heat_columns(self, profiles: pd.DataFrame) -> pd.DataFrame:
+        """Add rejectable_heat_mmbtu / heat_demand_mmbtu from EUI and floor area"""
+        sqft = profiles['gross_floor_area'].fillna(0).clip(lower=0).to_numpy(dtype=float)
+        electric_eui = profiles['electric_eui'].fillna(0).clip(lower=0).to_numpy(dtype=float)
+        gas_eui = profiles['gas_eui'].fillna(0).clip(lower=0).to_numpy(dtype=float)
+
+        fraction = (profiles['property_type']
+                    .map(self.REJECTABLE_HEAT_FRACTION)
+                    .fillna(self.DEFAULT_REJECTABLE_HEAT_FRACTION)
+                    .to_numpy(dtype=float))
+
+        profiles['rejectable_heat_mmbtu'] = sqft * electric_eui * fraction / 1000
+        profiles['heat_demand_mmbtu'] = sqft * gas_eui * self.HEATING_EFFICIENCY / 1000
+        return profiles
+
+    def match(self, profiles: pd.DataFrame) -> pd.DataFrame:
+        """
+        Solve the source -> sink assignment over the sparse neighbor graph
+
+        Rejectable heat is first netted against the building's own heat demand
+        (heat it could reuse on site is not exported), so every building is a
+        net source, a net sink or neither, and a neighbor pair carries flow in
+        one direction at most. The LP maximizes matched MMBtu, discounted
+        linearly by distance, subject to each source's surplus and each sink's
+        remaining demand.
+
+        Args:
+            profiles: Output of estimate_heat_profiles
+
+        Returns:
+            DataFrame of matches: source/sink building IDs, distance_m, matched_mmbtu
+        """
+        columns = ['source_building_id', 'sink_building_id', 'source_property_type',
+                   'sink_property_type', 'distance_m', 'matched_mmbtu']
+
+        lat = profiles['lat'].to_numpy(dtype=float)
+        lon = profiles['lon'].to_numpy(dtype=float)
+        rejectable = profiles['rejectable_heat_mmbtu'].to_numpy(dtype=float)
+        heat_demand = profiles['heat_demand_mmbtu'].to_numpy(dtype=float)
+        supply = np.maximum(rejectable - heat_demand, 0)
+        demand = np.maximum(heat_demand - rejectable, 0)
+
+        i, j, distance = neighbor_pairs(lat, lon, self.max_distance_meters)
+
+        # Directed edges in both directions, keeping only net source -> net sink
+        src = np.concatenate([i, j])
+        dst = np.concatenate([j, i])
+        dist = np.concatenate([distance, distance])
+        useful = (supply[src] > 0) & (demand[dst] > 0)
+        src, dst, dist = src[useful], dst[useful], dist[useful]
+        src, dst, dist = self._nearest_sinks(src, dst, dist)
+
+        if len(src) == 0:
+            return pd.DataFrame(columns=columns)
+
+        flows = self._solve_transport(src, dst, dist, supply, demand)
+
+        keep = flows >= self.min_match_mmbtu
+        building_ids = profiles['building_id'].to_numpy()
+        property_types = profiles['property_type'].to_numpy()
+
+        matches = pd.DataFrame({
+            'source_building_id': building_ids[src[keep]],
+            'sink_building_id': building_ids[dst[keep]],
+            'source_property_type': property_types[src[keep]],
+            'sink_property_type': property_types[dst[keep]],
+            'distance_m': dist[keep],
+            'matched_mmbtu': flows[keep],
+        })
+        return matches.sort_values('matched_mmbtu', ascending=False).reset_index(drop=True)
+
+    def _nearest_sinks(self, src: np.ndarray, dst: np.ndarray,
+                       dist: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Prune each source's candidate edges to its nearest max_sinks_per_source sinks"""
+        if self.max_sinks_per_source is None or len(src) == 0:
+            return src, dst, dist
+
+        order = np.lexsort((dist, src))
+        src, dst, dist = src[order], dst[order], dist[order]
+
+        # Rank of each edge within its source's group (0 = nearest)
+        group_start = np.flatnonzero(np.r_[True, src[1:] != src[:-1]])
+        group_sizes = np.diff(np.r_[group_start, len(src)])
+        rank = np.arange(len(src)) - np.repeat(group_start, group_sizes)
+
+        keep = rank < self.max_sinks_per_source
+        return src[keep], dst[keep], dist[keep]
+
+    def _solve_transport(self, src: np.ndarray, dst: np.ndarray, dist: np.ndarray,
+                         supply: np.ndarray, demand: np.ndarray) -> np.ndarray:
+        """Solve the capacitated transportation LP and return per-edge flows"""
+        n_edges = len(src)
+        n_buildings = len(supply)
+
+        # Value of one matched MMBtu falls linearly with distance
+        value = 1.0 - self.distance_weight * dist / max(self.max_distance_meters, 1e-9)
+        cost = -value
+
+        # Rows 0..n-1: source capacity, rows n..2n-1: sink capacity
+        edge_idx = np.arange(n_edges)
+        rows = np.concatenate([src, n_buildings + dst])
+        cols = np.concatenate([edge_idx, edge_idx])
+        a_ub = sparse.csr_matrix((np.ones(2 * n_edges), (rows, cols)),
+                                 shape=(2 * n_buildings, n_edges))
+        b_ub = np.concatenate([supply, demand])
+
+        # Drop capacity rows that no edge touches - keeps the LP small
+        active = np.diff(a_ub.indptr) > 0
+        result = linprog(cost, A_ub=a_ub[active], b_ub=b_ub[active],
+                         bounds=(0, None), method='highs')
+
+        if not result.success:
+            raise RuntimeError(f"Heat matching LP failed: {result.message}")
+
+        return np.clip(result.x, 0, None)
+
+    def summarize_buildings(self, profiles: pd.DataFrame, matches: pd.DataFrame) -> pd.DataFrame:
+        """
+        Per-building matched heat (as source and as sink)
+
+        Args:
+            profiles: Output of estimate_heat_profiles
+            matches: Output of match
+
+        Returns:
+            Profiles with heat_exported_mmbtu / heat_imported_mmbtu columns added
+        """
+        summary = profiles.copy()
+        exported = matches.groupby('source_building_id')['matched_mmbtu'].sum()
+        imported = matches.groupby('sink_building_id')['matched_mmbtu'].sum()
+        summary['heat_exported_mmbtu'] = summary['building_id'].map(exported).fillna(0.0)
+        summary['heat_imported_mmbtu'] = summary['building_id'].map(imported).fillna(0.0)
+        return summary
+
+    def summarize_clusters(self, clusters_df: pd.DataFrame, matches: pd.DataFrame) -> pd.DataFrame:
+        """
+        Matched thermal MMBtu inside each DER cluster
+
+        Only matches where both source and sink belong to the same cluster
+        (anchor or member) count toward that cluster.
+
+        Args:
+            clusters_df: Output of DERClusterAnalyzer.analyze_clusters
+            matches: Output of match
+
+        Returns:
+            DataFrame with cluster_id, matched_thermal_mmbtu, heat_match_count
+        """
+        membership = cluster_membership(clusters_df)
+        columns = ['cluster_id', 'matched_thermal_mmbtu', 'heat_match_count']
+        if membership.empty or matches.empty:
+            return pd.DataFrame({'cluster_id': clusters_df.get('cluster_id', pd.Series(dtype=object)),
+                                 'matched_thermal_mmbtu': 0.0,
+                                 'heat_match_count': 0})[columns]
+
+        cluster_of = membership.drop_duplicates('building_id').set_index('building_id')['cluster_id']
+        source_cluster = matches['source_building_id'].map(cluster_of)
+        sink_cluster = matches['sink_building_id'].map(cluster_of)
+        internal = matches[source_cluster.notna() & (source_cluster == sink_cluster)]
+
+        per_cluster = (internal.assign(cluster_id=source_cluster[internal.index])
+                       .groupby('cluster_id')
+                       .agg(matched_thermal_mmbtu=('matched_mmbtu', 'sum'),
+                            heat_match_count=('matched_mmbtu', 'size')))
+
+        summary = pd.DataFrame({'cluster_id': clusters_df['cluster_id'].to_numpy()})
+        summary = summary.merge(per_cluster, on='cluster_id', how='left')
+        summary['matched_thermal_mmbtu'] = summary['matched_thermal_mmbtu'].fillna(0.0)
+        summary['heat_match_count'] = summary['heat_match_count'].fillna(0).astype(int)
+        return summary[columns]
+
+    def run(self, buildings, clusters_df: Optional[pd.DataFrame] = None) -> Dict[str, pd.DataFrame]:
+        """
+        Full pipeline: profiles -> matches -> building and cluster summaries
+
+        Args:
+            buildings: BuildingArrays table or list of BuildingProfile objects
+            clusters_df: Optional cluster results to summarize against
+
+        Returns:
+            Dictionary with 'profiles', 'matches', 'buildings' and (optionally) 'clusters'
+        """
+        profiles = self.estimate_heat_profiles(buildings)
+        matches = self.match(profiles)
+
+        results = {
+            'profiles': profiles,
+            'matches': matches,
+            'buildings': self.summarize_buildings(profiles, matches),
+        }
+        if clusters_df is not None:
+            results['clusters'] = self.summarize_clusters(clusters_df, matches)
+
+        total_supply = profiles['rejectable_heat_mmbtu'].sum()
+        print(f"🔥 Heat matching: {len(matches):,} source→sink matches, "
+              f"{matches['matched_mmbtu'].sum() if not matches.empty else 0:,.0f} of "
+              f"{total_supply:,.0f} MMBtu rejectable heat reused")
+
+        return results
@@ -217,6 +217,10 @@ def main():
         analyzer = DERClusterAnalyzer(max_distance_meters=500)
         geojson_path = os.path.join(output_dir, 'der_clusters_epb_highlighted.geojson')
         analyzer.export_cluster_geojson(clusters_df, buildings_with_epb, geojson_path)
+        analyzer.export_cluster_geoparquet(
+            clusters_df, buildings_with_epb,
+            os.path.join(output_dir, 'der_clusters_epb_highlighted.parquet')
+        )
         
         print("\n🎯 Key Findings:")
         print(f"1. {(clusters_df['epb_count'] > 0).sum()} clusters contain EPBs")
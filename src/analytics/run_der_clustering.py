@@ -55,6 +55,10 @@ def main():
         print("❌ No viable clusters found")
         return
     
+    # Match rejectable heat (data centers, supermarkets) to nearby heat demand
+    print("\n🔥 Matching heat sources to heat sinks...")
+    heat_results = analyzer.match_heat_sources(clusters_df, df)
+    
     # Display results
     print(f"\n✅ Found {len(clusters_df)} viable DER clusters!")
     
@@ -68,9 +72,13 @@ def main():
         print(f"   Buildings: {cluster['total_buildings']} ({cluster['member_count']} nearby)")
         print(f"   Total sqft: {cluster['total_sqft']:,.0f}")
         print(f"   Thermal load: {cluster['total_thermal_load_mmbtu']:,.0f} MMBtu")
+        print(f"   Matched heat: {cluster['matched_thermal_mmbtu']:,.0f} MMBtu")
         print(f"   Penalty exposure: ${cluster['total_penalty_exposure']:,.0f}")
         print(f"   EPB percentage: {cluster['epb_percentage']:.1f}%")
         print(f"   Max distance: {cluster['max_distance_m']:.0f}m")
+        print(f"   Network: {cluster['network_pipe_length_m']:,.0f}m pipe, "
+              f"${cluster['network_capex']:,.0f} capex, "
+              f"${cluster['network_cost_per_mmbtu']:.2f}/MMBtu")
     
     # Save results
     output_dir = '/Users/robertpadgett/Projects/01_My_Notebooks/500_ED_Risk_Retro_BP/outputs'
@@ -81,6 +89,11 @@ def main():
     clusters_df.to_csv(output_path, index=False)
     print(f"\n💾 Saved cluster analysis to: {output_path}")
     
+    # Save heat source -> sink matches
+    matches_path = os.path.join(output_dir, 'der_heat_matches.csv')
+    heat_results['matches'].to_csv(matches_path, index=False)
+    print(f"💾 Saved heat matches to: {matches_path}")
+    
     # Export GeoJSON for mapping
     geojson_path = os.path.join(output_dir, 'der_clusters.geojson')
     analyzer.export_cluster_geojson(clusters_df, df, geojson_path)
@@ -92,6 +105,9 @@ def main():
         'total_sqft_in_clusters': float(clusters_df['total_sqft'].sum()),
         'total_penalty_exposure': float(clusters_df['total_penalty_exposure'].sum()),
         'avg_economic_score': float(clusters_df['economic_potential_score'].mean()),
+        'total_matched_thermal_mmbtu': float(clusters_df['matched_thermal_mmbtu'].sum()),
+        'total_network_pipe_length_m': float(clusters_df['network_pipe_length_m'].sum()),
+        'total_network_capex': float(clusters_df['network_capex'].sum()),
         'high_potential_clusters': int(len(clusters_df[clusters_df['economic_potential_score'] > 70])),
         'clusters_with_epbs': int(len(clusters_df[clusters_df['epb_count'] > 0])),
         'property_type_breakdown': {k: int(v) for k, v in clusters_df['anchor_property_type'].value_counts().to_dict().items()}
@@ -0,0 +1,206 @@
+"""
+Suggested File Name: spatial_index.py
+File Location: /Users/robertpadgett/Projects/01_My_Notebooks/500_ED_Risk_Retro_BP/src/analytics/
+Use: Shared spatial helpers for DER clustering - vectorized distances and sparse neighbor graphs
+
+This module:
+1. Computes Haversine distances for whole arrays of building coordinates
+2. Projects lat/lon to local meters for KD-tree neighbor searches
+3. Returns the sparse set of building pairs within a distance threshold
+   (cost proportional to the number of neighbor pairs, not n²)
+4. Buckets points into fixed lat/lon grid cells and joins only neighboring
+   cells - the same plan the BigQuery clustering SQL uses
+"""
+
+import numpy as np
+from scipy.spatial import cKDTree
+from scipy import sparse
+import pandas as pd
+from typing import Optional, Tuple
+
+EARTH_RADIUS_M = 6371000  # Same radius as DERClusterAnalyzer.haversine_distance
+
+
+def haversine_meters(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """
+    Vectorized Haversine distance between coordinate arrays
+
+    Args:
+        lat1, lon1: Arrays (or scalars) of the first points in degrees
+        lat2, lon2: Arrays (or scalars) of the second points in degrees
+
+    Returns:
+        Array of distances in meters
+    """
+    lat1 = np.radians(np.asarray(lat1, dtype=float))
+    lat2 = np.radians(np.asarray(lat2, dtype=float))
+    delta_lat = lat2 - lat1
+    delta_lon = np.radians(np.asarray(lon2, dtype=float) - np.asarray(lon1, dtype=float))
+
+    a = (np.sin(delta_lat / 2) ** 2 +
+         np.cos(lat1) * np.cos(lat2) * np.sin(delta_lon / 2) ** 2)
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+    return EARTH_RADIUS_M * c
+
+
+def project_to_meters(lat, lon, ref_lat: Optional[float] = None) -> np.ndarray:
+    """
+    Equirectangular projection of lat/lon to local x/y meters
+
+    Accurate to well under 1% over a metro area, which is all the KD-tree
+    needs - exact distances are re-checked with Haversine afterwards.
+
+    Args:
+        lat, lon: Coordinate arrays in degrees
+        ref_lat: Reference latitude (defaults to the mean latitude)
+
+    Returns:
+        (n, 2) array of x/y coordinates in meters
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    if ref_lat is None:
+        ref_lat = float(np.mean(lat)) if len(lat) else 0.0
+
+    x = np.radians(lon) * EARTH_RADIUS_M * np.cos(np.radians(ref_lat))
+    y = np.radians(lat) * EARTH_RADIUS_M
+    return np.column_stack([x, y])
+
+
+def neighbor_pairs(lat, lon, max_distance_meters: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Find all building pairs within max_distance_meters of each other
+
+    Args:
+        lat, lon: Coordinate arrays in degrees
+        max_distance_meters: Distance threshold
+
+    Returns:
+        Tuple of (i, j, distance_m) arrays with i < j
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    if len(lat) < 2:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0, dtype=float)
+
+    points = project_to_meters(lat, lon)
+    tree = cKDTree(points)
+    # Small inflation so projection error never drops a true neighbor
+    pairs = tree.query_pairs(r=max_distance_meters * 1.01, output_type='ndarray')
+    if len(pairs) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0, dtype=float)
+
+    i = pairs[:, 0].astype(np.int64)
+    j = pairs[:, 1].astype(np.int64)
+    distance = haversine_meters(lat[i], lon[i], lat[j], lon[j])
+
+    keep = distance <= max_distance_meters
+    i, j, distance = i[keep], j[keep], distance[keep]
+    order = np.lexsort((j, i))
+    return i[order], j[order], distance[order]
+
+
+def neighbor_graph(lat, lon, max_distance_meters: float) -> sparse.csr_matrix:
+    """
+    Symmetric sparse distance graph of buildings within max_distance_meters
+
+    Args:
+        lat, lon: Coordinate arrays in degrees
+        max_distance_meters: Distance threshold
+
+    Returns:
+        (n, n) CSR matrix where entry (i, j) is the distance in meters
+    """
+    n = len(lat)
+    i, j, distance = neighbor_pairs(lat, lon, max_distance_meters)
+    rows = np.concatenate([i, j])
+    cols = np.concatenate([j, i])
+    data = np.concatenate([distance, distance])
+    return sparse.csr_matrix((data, (rows, cols)), shape=(n, n))
+
+
+def grid_cell_size(max_distance_meters: float, max_abs_lat: float) -> Tuple[float, float]:
+    """
+    Lat/lon grid cell size (degrees) at least max_distance_meters on a side
+
+    With cells this large every pair within the threshold sits in the same or
+    an adjacent cell, so a 3x3 cell neighborhood is a complete candidate set.
+
+    Args:
+        max_distance_meters: Distance threshold
+        max_abs_lat: Largest |latitude| in the data (longitude cells narrow
+            toward the poles, so size them for the worst case)
+
+    Returns:
+        Tuple of (lat_step, lon_step) in degrees
+    """
+    # Small inflation covers the spherical radius differences between engines
+    lat_step = float(np.degrees(max_distance_meters * 1.01 / EARTH_RADIUS_M))
+    lon_step = lat_step / float(np.cos(np.radians(min(abs(max_abs_lat), 89.0))))
+    return lat_step, lon_step
+
+
+def grid_cells(lat, lon, lat_step: float, lon_step: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Integer grid cell of each point - FLOOR(coordinate / step) as in the SQL
+
+    Returns:
+        Tuple of (cell_x, cell_y) int64 arrays
+    """
+    cell_x = np.floor(np.asarray(lon, dtype=float) / lon_step).astype(np.int64)
+    cell_y = np.floor(np.asarray(lat, dtype=float) / lat_step).astype(np.int64)
+    return cell_x, cell_y
+
+
+def bucketed_neighbor_pairs(lat, lon, max_distance_meters: float,
+                            max_abs_lat: Optional[float] = None
+                            ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Grid-bucketed equivalent of neighbor_pairs
+
+    Each point probes its own cell and the eight around it with an equality
+    join on the cell key; only candidates from those cells get a Haversine
+    check. This mirrors DERClusterAnalysis' bucketed clustering SQL so the
+    two engines can be compared pair for pair.
+
+    Args:
+        lat, lon: Coordinate arrays in degrees
+        max_distance_meters: Distance threshold
+        max_abs_lat: Latitude used to size longitude cells (defaults to the data's max)
+
+    Returns:
+        Tuple of (i, j, distance_m) arrays with i < j
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    if len(lat) < 2:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0, dtype=float)
+
+    if max_abs_lat is None:
+        max_abs_lat = float(np.max(np.abs(lat)))
+    lat_step, lon_step = grid_cell_size(max_distance_meters, max_abs_lat)
+    cell_x, cell_y = grid_cells(lat, lon, lat_step, lon_step)
+
+    points = pd.DataFrame({'j': np.arange(len(lat)), 'cell_x': cell_x, 'cell_y': cell_y})
+    offsets = np.array([(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)])
+    probes = pd.DataFrame({
+        'i': np.repeat(np.arange(len(lat)), len(offsets)),
+        'cell_x': np.repeat(cell_x, len(offsets)) + np.tile(offsets[:, 0], len(lat)),
+        'cell_y': np.repeat(cell_y, len(offsets)) + np.tile(offsets[:, 1], len(lat)),
+    })
+    candidates = probes.merge(points, on=['cell_x', 'cell_y'])
+
+    i = candidates['i'].to_numpy(np.int64)
+    j = candidates['j'].to_numpy(np.int64)
+    keep = i < j
+    i, j = i[keep], j[keep]
+    distance = haversine_meters(lat[i], lon[i], lat[j], lon[j])
+
+    keep = distance <= max_distance_meters
+    i, j, distance = i[keep], j[keep], distance[keep]
+    order = np.lexsort((j, i))
+    return i[order], j[order], distance[order]
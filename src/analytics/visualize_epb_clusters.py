@@ -14,6 +14,8 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 import json
 import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 def load_cluster_data(output_dir):
     """Load the cluster analysis results"""
@@ -165,6 +167,26 @@ def create_implementation_roadmap(epb_clusters_df, output_dir):
         json.dump(roadmap, f, indent=2)
     print(f"\n💾 Saved implementation roadmap to: {roadmap_path}")
 
+def create_map_tiles(output_dir):
+    """Pre-build per-zoom cluster tiles so the map only loads what is on screen"""
+    from analytics.geo_export import build_zoom_tiles, read_geoparquet_points
+    
+    parquet_path = os.path.join(output_dir, 'der_clusters_epb_highlighted.parquet')
+    if not os.path.exists(parquet_path):
+        print(f"⚠️ {parquet_path} not found - run integrate_epb_data.py first")
+        return None
+    
+    clusters_points = read_geoparquet_points(parquet_path)
+    tiles_dir = os.path.join(output_dir, 'tiles', 'der_clusters')
+    index = build_zoom_tiles(clusters_points, 'longitude', 'latitude', tiles_dir,
+                             zooms=range(10, 17),
+                             sum_columns=['member_count', 'total_sqft', 'total_penalty'])
+    
+    total_tiles = sum(z['tiles'] for z in index['zooms'].values())
+    zooms = [int(z) for z in index['zooms']]  # JSON keys are strings
+    print(f"\n🗺️ Saved {total_tiles} map tiles (zoom {min(zooms)}-{max(zooms)}) to: {tiles_dir}")
+    return index
+
 def main():
     """Main function to visualize and analyze EPB clusters"""
     
@@ -191,6 +213,9 @@ def main():
     # Create implementation roadmap
     create_implementation_roadmap(epb_clusters_df, output_dir)
     
+    # Pre-build zoom tiles for the cluster map
+    create_map_tiles(output_dir)
+    
     print("\n✅ Analysis complete! Check the outputs folder for:")
     print("   - epb_cluster_visualizations.png")
     print("   - epb_implementation_roadmap.json")
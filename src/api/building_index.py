@@ -0,0 +1,360 @@
+"""
+Suggested File Name: building_index.py
+File Location: /Users/robertpadgett/Projects/01_My_Notebooks/500_ED_Risk_Retro_BP/src/api/
+Use: In-memory, building-ID indexed portfolio for the compliance API
+
+This module:
+1. Loads the comprehensive portfolio, EUI targets and MAI designations once
+2. Keeps one calculator-ready record per building in a dict keyed by building ID
+3. Assigns geocoded buildings to proximity clusters with the DER cluster
+   analyzer's anchor-based assignment (every member within the cluster
+   distance of its anchor, so clusters never chain across a district)
+4. Memoizes penalty schedules, path comparisons, opt-in decisions and
+   cluster membership as JSON-ready dicts, and can precompute them all
+
+Answers come from the shared EnergizeDenverPenaltyCalculator and
+OptInPredictor, so the API never disagrees with the batch scripts.
+"""
+
+import math
+import os
+import sys
+import threading
+from dataclasses import asdict
+from typing import Dict, Iterable, List, Optional, Set
+
+import numpy as np
+import pandas as pd
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics.cluster_arrays import BuildingArrays
+from analytics.der_clustering_analysis import DERClusterAnalyzer
+from analytics.spatial_index import bucketed_neighbor_pairs
+from utils.opt_in_predictor import OptInPredictor
+from utils.penalty_calculator import EnergizeDenverPenaltyCalculator
+from utils.penalty_rules import load_rules
+from utils.portfolio_schema import PORTFOLIO_SCHEMA, compact, load_portfolio_frame, number
+
+DEFAULT_DATA_DIR = '/Users/robertpadgett/Projects/01_My_Notebooks/500_ED_Risk_Retro_BP/data'
+CLUSTER_DISTANCE_METERS = 500
+MAX_CLUSTER_MEMBERS = 50  # Members listed per cluster answer (nearest first)
+
+# Portfolio columns plus the coordinates used for cluster membership
+INDEX_SCHEMA = {**PORTFOLIO_SCHEMA, 'latitude': 'float64', 'longitude': 'float64'}
+
+# Answer kinds served by lookup()
+KINDS = ('summary', 'penalties', 'paths', 'opt-in', 'cluster')
+PATHS = ('standard', 'aco')
+
+
+class BuildingNotFound(KeyError):
+    """Unknown building ID"""
+
+
+class InvalidRequest(ValueError):
+    """Unknown answer kind or compliance path in a request"""
+
+
+def _json_ready(value):
+    """Convert numpy scalars / NaN to plain JSON types (recursively)"""
+    if isinstance(value, dict):
+        return {str(k): _json_ready(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_ready(v) for v in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def _number(row, column, default=None):
+    value = pd.to_numeric(row.get(column, default), errors='coerce')
+    return default if pd.isna(value) else number(value)
+
+
+def building_record(row, mai_ids: Set[str]) -> Dict:
+    """
+    Calculator/predictor input for one merged portfolio row
+
+    Same fields as PortfolioRiskAnalyzer.prepare_building_for_analysis plus
+    raw_targets for EnergizeDenverPenaltyCalculator: the rules' standard
+    target events shifted with the building's first interim year, then the
+    ACO events at their rule years.
+    """
+    rules = load_rules()
+    standard, aco = rules.path('standard'), rules.path('aco')
+    building_id = str(row['Building ID'])
+    current_eui = _number(row, 'Weather Normalized Site EUI')
+    baseline_eui = _number(row, 'Baseline EUI', current_eui)
+    first_interim = _number(row, 'First Interim Target EUI', baseline_eui)
+    second_interim = _number(row, 'Second Interim Target EUI', first_interim)
+    final_target = _number(row, 'Adjusted Final Target EUI',
+                           _number(row, 'Original Final Target EUI', second_interim))
+    first_interim_year = int(_number(row, 'First Interim Target Year', standard.targets[0].year))
+    offset = first_interim_year - standard.targets[0].year
+    targets = {'first_interim': first_interim, 'second_interim': second_interim, 'final': final_target}
+    raw_targets = {event.year + offset: targets[event.target] for event in standard.targets}
+    raw_targets.update({event.year: targets[event.target] for event in aco.targets})
+
+    return {
+        'building_id': building_id,
+        'building_name': row.get('Building Name') if pd.notna(row.get('Building Name')) else None,
+        'property_type': row.get('Master Property Type', ''),
+        'sqft': _number(row, 'Master Sq Ft'),
+        'current_eui': current_eui,
+        'baseline_eui': baseline_eui,
+        'first_interim_target': first_interim,
+        'second_interim_target': second_interim,
+        'final_target': final_target,
+        'year_built': int(_number(row, 'Year Built', 1990)),
+        'is_epb': bool(row.get('Is EPB', False)) if pd.notna(row.get('Is EPB', False)) else False,
+        'is_mai': building_id in mai_ids,
+        'baseline_year': int(_number(row, 'Baseline Year', 2019)),
+        'first_interim_year': first_interim_year,
+        'raw_targets': raw_targets,
+    }
+
+
+class BuildingIndex:
+    """Warm, building-ID keyed answers for the compliance API"""
+
+    def __init__(self, portfolio: pd.DataFrame, mai_ids: Optional[Iterable[str]] = None,
+                 cluster_distance: float = CLUSTER_DISTANCE_METERS):
+        """
+        Args:
+            portfolio: Merged portfolio + targets rows (PortfolioRiskAnalyzer columns,
+                optionally latitude/longitude)
+            mai_ids: MAI designated building IDs
+            cluster_distance: Neighbor distance (meters) for cluster membership
+        """
+        self.mai_ids = {str(b) for b in (mai_ids or [])}
+        self.calculator = EnergizeDenverPenaltyCalculator(
+            mai_lookup={b: True for b in self.mai_ids})
+        self.predictor = OptInPredictor()
+        self.cluster_distance = cluster_distance
+
+        portfolio = portfolio.drop_duplicates('Building ID', keep='last').reset_index(drop=True)
+        self.buildings: Dict[str, Dict] = {}
+        for row in portfolio.to_dict('records'):
+            record = building_record(row, self.mai_ids)
+            self.buildings[record['building_id']] = record
+
+        self._build_clusters(portfolio)
+        self._cache: Dict[tuple, Dict] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_files(cls, data_dir: str = DEFAULT_DATA_DIR, **kwargs) -> 'BuildingIndex':
+        """
+        Load the portfolio the same way PortfolioRiskAnalyzer does
+
+        Reads processed/energize_denver_comprehensive_latest.csv,
+        raw/Building_EUI_Targets.csv and the MAI target summary.
+        """
+        from utils.mai_data_loader import MAIDataLoader
+
+        portfolio = load_portfolio_frame(
+            os.path.join(data_dir, 'processed', 'energize_denver_comprehensive_latest.csv'),
+            os.path.join(data_dir, 'raw', 'Building_EUI_Targets.csv'),
+            schema=INDEX_SCHEMA)
+        portfolio = compact(portfolio[(portfolio['Weather Normalized Site EUI'] > 0) &
+                                      (portfolio['Master Sq Ft'] >= load_rules().min_sqft)])
+
+        mai_ids = MAIDataLoader(os.path.join(data_dir, 'raw')).get_mai_building_ids()
+        index = cls(portfolio, mai_ids=mai_ids, **kwargs)
+        print(f"✓ Indexed {len(index):,} buildings ({len(index.mai_ids):,} MAI)")
+        return index
+
+    def __len__(self) -> int:
+        return len(self.buildings)
+
+    def __contains__(self, building_id) -> bool:
+        return str(building_id) in self.buildings
+
+    def _build_clusters(self, portfolio: pd.DataFrame):
+        """
+        Proximity clusters of geocoded buildings
+
+        Every geocoded building may anchor a cluster (in portfolio order) and
+        claims its unclaimed neighbors within cluster_distance, as in
+        DERClusterAnalyzer.find_clusters; buildings left with fewer than 3
+        unclaimed neighbors stay unclustered.
+        """
+        self.cluster_of: Dict[str, int] = {}
+        self.cluster_members: Dict[int, List[str]] = {}
+        self._neighbors: Dict[str, List[tuple]] = {}
+        self._geocoded: Set[str] = set()
+        if not {'latitude', 'longitude'} <= set(portfolio.columns):
+            return
+
+        coords = pd.DataFrame({
+            'building_id': portfolio['Building ID'].astype(str),
+            'latitude': pd.to_numeric(portfolio['latitude'], errors='coerce'),
+            'longitude': pd.to_numeric(portfolio['longitude'], errors='coerce'),
+        }).dropna()
+        if coords.empty:
+            return
+
+        ids = coords['building_id'].to_numpy(dtype=object)
+        self._geocoded = set(ids)
+        arrays = BuildingArrays.from_columns(coords, {
+            'building_id': ids,
+            'lat': 'latitude',
+            'lon': 'longitude',
+        }, defaults={'gross_floor_area': 0.0, 'gas_eui': 0.0})
+        membership = DERClusterAnalyzer(self.cluster_distance).find_clusters(
+            arrays, anchor_mask=np.ones(len(ids), dtype=bool))
+
+        for cluster_id, anchor in enumerate(membership.anchor_idx):
+            start, stop = membership.member_indptr[cluster_id], membership.member_indptr[cluster_id + 1]
+            members = [ids[anchor]] + ids[membership.member_idx[start:stop]].tolist()
+            self.cluster_members[cluster_id] = members
+            for building_id in members:
+                self.cluster_of[building_id] = cluster_id
+
+        i, j, distance = bucketed_neighbor_pairs(coords['latitude'].to_numpy(),
+                                                 coords['longitude'].to_numpy(), self.cluster_distance)
+        for a, b, d in zip(ids[i], ids[j], distance):
+            self._neighbors.setdefault(a, []).append((b, float(d)))
+            self._neighbors.setdefault(b, []).append((a, float(d)))
+
+    def record(self, building_id) -> Dict:
+        """
+        Calculator input for a building
+
+        Raises:
+            BuildingNotFound: Unknown building ID
+        """
+        try:
+            return self.buildings[str(building_id)]
+        except KeyError:
+            raise BuildingNotFound(f"Building {building_id} not found") from None
+
+    def _key(self, kind: str, building_id, path: Optional[str]) -> tuple:
+        return (kind, str(building_id), path if kind == 'penalties' else None)
+
+    def cached(self, kind: str, building_id, path: Optional[str] = 'standard') -> bool:
+        """True when the answer is already memoized (no computation needed)"""
+        return self._key(kind, building_id, path) in self._cache
+
+    def lookup(self, kind: str, building_id, path: Optional[str] = 'standard') -> Dict:
+        """
+        Memoized answer for one building
+
+        Args:
+            kind: One of KINDS
+            building_id: Building ID
+            path: Compliance path for 'penalties' ('standard' or 'aco')
+
+        Raises:
+            BuildingNotFound: Unknown building ID
+            InvalidRequest: Unknown kind or path
+        """
+        if kind not in KINDS:
+            raise InvalidRequest(f"Unknown answer kind: {kind}")
+        if kind == 'penalties' and path not in PATHS:
+            raise InvalidRequest(f"Unknown compliance path: {path}")
+
+        key = self._key(kind, building_id, path)
+        answer = self._cache.get(key)
+        if answer is None:
+            record = self.record(building_id)
+            if kind == 'summary':
+                answer = self._summary(record)
+            elif kind == 'penalties':
+                answer = self._penalties(record, path)
+            elif kind == 'paths':
+                answer = self._paths(record)
+            elif kind == 'opt-in':
+                answer = self._opt_in(record)
+            else:
+                answer = self._cluster(record)
+            with self._lock:
+                self._cache[key] = answer
+        return answer
+
+    def warm(self, kinds: Iterable[str] = KINDS) -> int:
+        """
+        Precompute answers for every building
+
+        Returns:
+            Number of answers computed
+        """
+        computed = 0
+        for kind in kinds:
+            for path in (PATHS if kind == 'penalties' else (None,)):
+                for building_id in list(self.buildings):
+                    if not self.cached(kind, building_id, path):
+                        self.lookup(kind, building_id, path)
+                        computed += 1
+        return computed
+
+    @property
+    def cache_size(self) -> int:
+        return len(self._cache)
+
+    def _summary(self, record: Dict) -> Dict:
+        summary = {k: v for k, v in record.items() if k != 'raw_targets'}
+        summary['cluster_id'] = self.cluster_of.get(record['building_id'])
+        return _json_ready(summary)
+
+    def _penalties(self, record: Dict, path: str) -> Dict:
+        """Penalty schedule with NPV for one compliance path"""
+        comparison = self._comparison(record)
+        penalties = self.calculator.calculate_npv_penalties(comparison[f"{path}_penalties"])
+        columns = ['target_year', 'payment_year', 'actual_eui', 'final_target_eui',
+                   'gap_eui', 'penalty_rate', 'penalty_amount', 'penalty_npv']
+        return _json_ready({
+            'building_id': record['building_id'],
+            'compliance_path': path,
+            'total_nominal': penalties['penalty_amount'].sum(),
+            'total_npv': penalties['penalty_npv'].sum(),
+            'schedule': penalties[columns].to_dict('records'),
+        })
+
+    def _comparison(self, record: Dict) -> Dict:
+        """compare_compliance_paths result, shared by the penalties and paths answers"""
+        key = ('_comparison', record['building_id'], None)
+        comparison = self._cache.get(key)
+        if comparison is None:
+            comparison = self.calculator.compare_compliance_paths(record)
+            with self._lock:
+                self._cache[key] = comparison
+        return comparison
+
+    def _paths(self, record: Dict) -> Dict:
+        comparison = self._comparison(record)
+        return _json_ready({k: v for k, v in comparison.items()
+                            if k not in ('standard_penalties', 'aco_penalties')})
+
+    def _opt_in(self, record: Dict) -> Dict:
+        decision = self.predictor.predict_opt_in(record)
+        return _json_ready({'building_id': record['building_id'], **asdict(decision)})
+
+    def _cluster(self, record: Dict) -> Dict:
+        building_id = record['building_id']
+        if building_id not in self._geocoded:
+            return {'building_id': building_id, 'cluster_id': None, 'geocoded': False}
+        neighbors = sorted(self._neighbors.get(building_id, []), key=lambda n: n[1])
+        neighbors = [{'building_id': b, 'distance_meters': round(d, 1)}
+                     for b, d in neighbors[:MAX_CLUSTER_MEMBERS]]
+        cluster_id = self.cluster_of.get(building_id)
+        if cluster_id is None:
+            return _json_ready({'building_id': building_id, 'cluster_id': None, 'geocoded': True,
+                                'neighbors': neighbors, 'distance_meters': self.cluster_distance})
+
+        members = self.cluster_members[cluster_id]
+        return _json_ready({
+            'building_id': building_id,
+            'cluster_id': cluster_id,
+            'geocoded': True,
+            'cluster_size': len(members),
+            'cluster_sqft': sum(self.buildings[m]['sqft'] or 0 for m in members),
+            'anchor': members[0],
+            'members': members[:MAX_CLUSTER_MEMBERS],
+            'neighbors': neighbors,
+            'distance_meters': self.cluster_distance,
+        })
@@ -0,0 +1,204 @@
+"""
+Suggested File Name: load_test.py
+File Location: /Users/robertpadgett/Projects/01_My_Notebooks/500_ED_Risk_Retro_BP/src/api/
+Use: Load-test harness for the compliance API
+
+This module:
+1. Opens N keep-alive connections and replays per-building (or batch)
+   requests for random building IDs as fast as the service answers
+2. Records the latency of every request and reports p50/p95/p99/max and
+   throughput
+3. Can start an in-process service from the data directory, or target one
+   already running
+
+Run:
+    python src/api/load_test.py --port 8080 --requests 5000 --concurrency 32
+    python src/api/load_test.py --data-dir data --endpoint batch --batch-size 100
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.building_index import DEFAULT_DATA_DIR, KINDS
+
+ENDPOINTS = tuple(k for k in KINDS if k != 'summary') + ('summary', 'batch')
+
+
+class HTTPClient:
+    """Minimal keep-alive JSON client for the compliance service"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 8080):
+        self.host = host
+        self.port = port
+        self._reader = None
+        self._writer = None
+
+    async def connect(self):
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            await self._writer.wait_closed()
+            self._writer = None
+
+    async def request(self, method: str, target: str, payload: Optional[Dict] = None) -> Tuple[int, Dict]:
+        """
+        Send one request on the open connection
+
+        Returns:
+            Tuple of (status code, decoded JSON body)
+        """
+        if self._writer is None:
+            await self.connect()
+        body = json.dumps(payload).encode() if payload is not None else b''
+        head = (f"{method} {target} HTTP/1.1\r\nHost: {self.host}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n")
+        self._writer.write(head.encode('latin-1') + body)
+        await self._writer.drain()
+
+        response = await self._reader.readuntil(b'\r\n\r\n')
+        lines = response.decode('latin-1').split('\r\n')
+        status = int(lines[0].split(' ', 2)[1])
+        length = 0
+        for line in lines[1:]:
+            if line.lower().startswith('content-length:'):
+                length = int(line.split(':', 1)[1])
+        return status, json.loads(await self._reader.readexactly(length))
+
+
+@dataclass
+class LoadTestResult:
+    """Latencies (ms) and errors from one load test"""
+    endpoint: str
+    latencies_ms: List[float] = field(default_factory=list)
+    errors: int = 0
+    wall_time: float = 0.0
+
+    def percentile(self, q: float) -> float:
+        return float(np.percentile(self.latencies_ms, q)) if self.latencies_ms else 0.0
+
+    @property
+    def throughput(self) -> float:
+        return len(self.latencies_ms) / self.wall_time if self.wall_time else 0.0
+
+    def format(self) -> str:
+        return (f"{self.endpoint}: {len(self.latencies_ms):,} requests, {self.errors} errors, "
+                f"{self.throughput:,.0f} req/s | p50 {self.percentile(50):.2f}ms  "
+                f"p95 {self.percentile(95):.2f}ms  p99 {self.percentile(99):.2f}ms  "
+                f"max {max(self.latencies_ms, default=0):.2f}ms")
+
+
+async def run_load_test(host: str, port: int, building_ids: List[str], endpoint: str = 'paths',
+                        total_requests: int = 2000, concurrency: int = 32, batch_size: int = 100,
+                        seed: int = 42) -> LoadTestResult:
+    """
+    Replay random requests against a running service
+
+    Args:
+        host, port: Service address
+        building_ids: IDs to sample from
+        endpoint: One of ENDPOINTS ('batch' posts batch_size IDs to /batch/paths)
+        total_requests: Requests across all connections
+        concurrency: Keep-alive connections sending in parallel
+        batch_size: IDs per batch request
+
+    Returns:
+        LoadTestResult
+    """
+    if endpoint not in ENDPOINTS:
+        raise ValueError(f"Unknown endpoint {endpoint}; choose from {ENDPOINTS}")
+    rng = random.Random(seed)
+    result = LoadTestResult(endpoint)
+    remaining = [total_requests]
+
+    def next_request():
+        if endpoint == 'batch':
+            return 'POST', '/batch/paths', {'building_ids': rng.sample(building_ids,
+                                                                      min(batch_size, len(building_ids)))}
+        building_id = rng.choice(building_ids)
+        suffix = '' if endpoint == 'summary' else f"/{endpoint}"
+        return 'GET', f"/buildings/{building_id}{suffix}", None
+
+    async def worker():
+        client = HTTPClient(host, port)
+        try:
+            while remaining[0] > 0:
+                remaining[0] -= 1
+                method, target, payload = next_request()
+                start = time.perf_counter()
+                try:
+                    status, _ = await client.request(method, target, payload)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    result.errors += 1
+                    await client.close()
+                    continue
+                result.latencies_ms.append((time.perf_counter() - start) * 1000)
+                if status != 200:
+                    result.errors += 1
+        finally:
+            await client.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result.wall_time = time.perf_counter() - start
+    return result
+
+
+async def _main(args):
+    service = None
+    host, port = args.host, args.port
+    if port is None:
+        from api.building_index import BuildingIndex
+        from api.service import ComplianceService
+
+        print("📊 Starting in-process service...")
+        service = ComplianceService(BuildingIndex.from_files(args.data_dir))
+        await service.start(host, 0)
+        await service._warm_task
+        port = service.port
+
+    client = HTTPClient(host, port)
+    _, listing = await client.request('GET', '/buildings')
+    await client.close()
+    building_ids = listing['building_ids']
+    print(f"🎯 {len(building_ids):,} buildings, {args.requests:,} requests, "
+          f"{args.concurrency} connections\n")
+
+    endpoints = ENDPOINTS if args.endpoint == 'all' else [args.endpoint]
+    for endpoint in endpoints:
+        result = await run_load_test(host, port, building_ids, endpoint, args.requests,
+                                     args.concurrency, args.batch_size)
+        print(result.format())
+
+    if service is not None:
+        await service.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the compliance API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=None,
+                        help="Running service port (omit to start one in-process)")
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR)
+    parser.add_argument('--endpoint', default='all', choices=ENDPOINTS + ('all',))
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--batch-size', type=int, default=100)
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
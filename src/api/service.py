@@ -0,0 +1,269 @@
+"""
+Suggested File Name: service.py
+File Location: /Users/robertpadgett/Projects/01_My_Notebooks/500_ED_Risk_Retro_BP/src/api/
+Use: Async HTTP service answering per-building compliance questions from a warm BuildingIndex
+
+This module:
+1. Serves JSON over HTTP/1.1 (keep-alive) with asyncio streams - no web
+   framework dependency
+2. Answers from the memoized BuildingIndex; only cache misses are computed,
+   and those run in a worker thread so the event loop never blocks
+3. Precomputes every answer in the background after startup
+4. Offers batch endpoints that answer many building IDs in one request
+
+Endpoints:
+    GET  /health
+    GET  /buildings                          building IDs
+    GET  /buildings/{id}                     building summary
+    GET  /buildings/{id}/penalties?path=aco  penalty schedule (standard|aco)
+    GET  /buildings/{id}/paths               compare_compliance_paths summary
+    GET  /buildings/{id}/opt-in              opt-in decision
+    GET  /buildings/{id}/cluster             cluster membership
+    POST /batch/{kind}                       {"building_ids": [...], "path": "standard"}
+
+Run:
+    python src/api/service.py --data-dir data --port 8080
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.building_index import DEFAULT_DATA_DIR, KINDS, BuildingIndex, BuildingNotFound, InvalidRequest
+
+MAX_BATCH_SIZE = 5000
+MAX_BODY_BYTES = 1 << 20
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+class EncodedJSON(bytes):
+    """Pre-serialized JSON body (sent as-is)"""
+
+
+class HTTPError(Exception):
+    """Error with an HTTP status, returned to the client as {"error": message}"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _dumps(payload) -> bytes:
+    return json.dumps(payload, separators=(',', ':')).encode()
+
+
+class ComplianceService:
+    """Routes HTTP requests to BuildingIndex answers"""
+
+    def __init__(self, index: BuildingIndex, warm: bool = True):
+        """
+        Args:
+            index: Loaded building index
+            warm: Precompute every answer in the background once serving starts
+        """
+        self.index = index
+        self.warm = warm
+        self.warmed = False
+        self.requests_served = 0
+        self._encoded: Dict[tuple, EncodedJSON] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._warm_task: Optional[asyncio.Task] = None
+
+    async def _answer(self, kind: str, building_id: str, path: str = 'standard') -> EncodedJSON:
+        """Serialized answer - memoized bytes, computed off the event loop on a miss"""
+        key = (kind, building_id, path if kind == 'penalties' else None)
+        encoded = self._encoded.get(key)
+        if encoded is not None:
+            return encoded
+
+        if self.index.cached(kind, building_id, path):
+            answer = self.index.lookup(kind, building_id, path)
+        elif building_id not in self.index:
+            raise BuildingNotFound(f"Building {building_id} not found")
+        else:
+            answer = await asyncio.to_thread(self.index.lookup, kind, building_id, path)
+        encoded = self._encoded[key] = EncodedJSON(_dumps(answer))
+        return encoded
+
+    async def handle(self, method: str, target: str, body: bytes = b'') -> Tuple[int, Dict]:
+        """
+        Dispatch one request
+
+        Returns:
+            Tuple of (status code, JSON-ready payload or EncodedJSON)
+        """
+        url = urlsplit(target)
+        parts = [unquote(p) for p in url.path.strip('/').split('/') if p]
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+        try:
+            if parts == ['health']:
+                return 200, {'status': 'ok', 'buildings': len(self.index),
+                             'warmed': self.warmed, 'cached_answers': self.index.cache_size}
+            if parts == ['buildings']:
+                return 200, {'building_ids': list(self.index.buildings)}
+
+            if parts and parts[0] == 'buildings' and len(parts) in (2, 3):
+                if method != 'GET':
+                    raise HTTPError(405, f"{method} not allowed")
+                kind = parts[2] if len(parts) == 3 else 'summary'
+                if kind not in KINDS:
+                    raise HTTPError(404, f"Unknown resource: {kind}")
+                return 200, await self._answer(kind, parts[1], query.get('path', 'standard'))
+
+            if len(parts) == 2 and parts[0] == 'batch':
+                if method != 'POST':
+                    raise HTTPError(405, f"{method} not allowed")
+                return 200, await self._batch(parts[1], body)
+
+            raise HTTPError(404, f"No route for {url.path}")
+        except HTTPError as e:
+            return e.status, {'error': str(e)}
+        except BuildingNotFound as e:
+            return 404, {'error': e.args[0] if e.args else 'not found'}
+        except InvalidRequest as e:
+            return 400, {'error': str(e)}
+
+    async def _batch(self, kind: str, body: bytes) -> EncodedJSON:
+        """Answers for many buildings; unknown IDs are listed rather than failing the batch"""
+        if kind not in KINDS:
+            raise HTTPError(404, f"Unknown resource: {kind}")
+        try:
+            request = json.loads(body or b'{}')
+        except json.JSONDecodeError as e:
+            raise HTTPError(400, f"Invalid JSON body: {e}")
+        if not isinstance(request, dict) or not isinstance(request.get('building_ids', []), list):
+            raise HTTPError(400, 'Expected {"building_ids": [...]} body')
+        building_ids = [str(b) for b in request.get('building_ids', [])]
+        if len(building_ids) > MAX_BATCH_SIZE:
+            raise HTTPError(413, f"At most {MAX_BATCH_SIZE} building IDs per batch")
+        path = request.get('path', 'standard')
+
+        found = [b for b in building_ids if b in self.index]
+        missing = [b for b in building_ids if b not in self.index]
+        pending = [b for b in found if not self.index.cached(kind, b, path)]
+        if pending:
+            # One worker-thread hop for all misses instead of one per building
+            await asyncio.to_thread(lambda: [self.index.lookup(kind, b, path) for b in pending])
+
+        # Splice the per-building bytes instead of re-serializing every answer
+        results = b','.join([_dumps(b) + b':' + await self._answer(kind, b, path) for b in found])
+        return EncodedJSON(b'{"results":{' + results + b'},"not_found":' + _dumps(missing) + b'}')
+
+    async def _connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve requests on one keep-alive connection"""
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    return
+
+                lines = head.decode('latin-1').split('\r\n')
+                try:
+                    method, target, version = lines[0].split(' ', 2)
+                except ValueError:
+                    await self._respond(writer, 400, {'error': 'Malformed request line'}, False)
+                    return
+                headers = {}
+                for line in lines[1:]:
+                    if ':' in line:
+                        name, value = line.split(':', 1)
+                        headers[name.strip().lower()] = value.strip()
+
+                try:
+                    length = int(headers.get('content-length', 0) or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._respond(writer, 400, {'error': 'Invalid Content-Length'}, False)
+                    return
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, 413, {'error': 'Request body too large'}, False)
+                    return
+                body = await reader.readexactly(length) if length else b''
+
+                keep_alive = (headers.get('connection', '').lower() != 'close'
+                              and version.upper() != 'HTTP/1.0')
+                try:
+                    status, payload = await self.handle(method.upper(), target, body)
+                except Exception as e:
+                    status, payload = 500, {'error': str(e)}
+                self.requests_served += 1
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    return
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: int, payload, keep_alive: bool):
+        body = payload if isinstance(payload, EncodedJSON) else _dumps(payload)
+        head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+    async def _warm(self):
+        start = time.perf_counter()
+        computed = await asyncio.to_thread(self.index.warm)
+        self.warmed = True
+        print(f"✓ Precomputed {computed:,} answers in {time.perf_counter() - start:.1f}s")
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8080) -> asyncio.AbstractServer:
+        """Start listening (port 0 picks a free port); returns the asyncio server"""
+        self._server = await asyncio.start_server(self._connection, host, port)
+        if self.warm:
+            self._warm_task = asyncio.create_task(self._warm())
+        return self._server
+
+    @property
+    def port(self) -> Optional[int]:
+        if self._server is None or not self._server.sockets:
+            return None
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._warm_task is not None:
+            await self._warm_task
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def serve_forever(self, host: str = '127.0.0.1', port: int = 8080):
+        server = await self.start(host, port)
+        print(f"🚀 Serving {len(self.index):,} buildings on http://{host}:{self.port}")
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Energize Denver compliance API")
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--no-warm', action='store_true', help="Compute answers on first request only")
+    args = parser.parse_args()
+
+    print("📊 Loading portfolio index...")
+    index = BuildingIndex.from_files(args.data_dir)
+    service = ComplianceService(index, warm=not args.no_warm)
+    try:
+        asyncio.run(service.serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\nStopped")
+
+
+if __name__ == "__main__":
+    main()
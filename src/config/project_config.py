@@ -6,11 +6,19 @@ Use: Centralized configuration for all TES+HP analysis modules to ensure consist
 This module provides a single source of truth for project parameters
 """
 
+import copy
 import json
-import pandas as pd
+import os
+import sys
 from typing import Dict, Any
 from datetime import datetime
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.penalty_rules import load_rules
+
+_RULES = load_rules()
+
 class ProjectConfig:
     """Unified configuration for TES+HP project analysis"""
     
@@ -106,36 +114,36 @@ class ProjectConfig:
         },
         
         'penalties': {
-            # Corrected rates per April 2025 Technical Guidance
+            # Rates and target years from config/penalty_rules.json
             'standard_path': {
-                'rate': 0.15,  # $/kBtu for standard path (3 target years)
-                'years': [2025, 2027, 2030],
-                'description': 'Standard compliance path'
+                'rate': _RULES.rate('standard'),  # $/kBtu for standard path (3 target years)
+                'years': list(_RULES.target_years('standard')),
+                'description': _RULES.path('standard').description
             },
             'alternate_path': {
-                'rate': 0.23,  # $/kBtu for alternate/opt-in path (2 target years)
-                'years': [2028, 2032], 
-                'description': 'Alternate compliance (opt-in) path'
+                'rate': _RULES.rate('aco'),  # $/kBtu for alternate/opt-in path (2 target years)
+                'years': list(_RULES.target_years('aco')),
+                'description': _RULES.path('aco').description
             },
             'extension_path': {
-                'rate': 0.35,  # $/kBtu for timeline extension (1 target year)
-                'years': [2030],  # or [2032] depending on path
-                'description': 'Timeline extension path'
+                'rate': _RULES.rate('extension'),  # $/kBtu for timeline extension (1 target year)
+                'years': list(_RULES.target_years('extension')),
+                'description': _RULES.path('extension').description
             },
-            'late_extension_additional': 0.10,  # Additional $/kBtu for late extensions
-            'never_benchmarking': 10.0,  # $/sqft one-time penalty
+            'late_extension_additional': _RULES.late_extension_addon,  # Additional $/kBtu for late extensions
+            'never_benchmarking': _RULES.never_benchmarked_per_sqft,  # $/sqft one-time penalty
             
             # Legacy fields for backward compatibility (DEPRECATED)
-            '2025_rate': 0.15,  # DEPRECATED - use standard_path['rate']
-            '2027_rate': 0.15,  # DEPRECATED - use standard_path['rate']
-            '2030_rate': 0.15,  # DEPRECATED - use standard_path['rate']
+            '2025_rate': _RULES.rate('standard'),  # DEPRECATED - use standard_path['rate']
+            '2027_rate': _RULES.rate('standard'),  # DEPRECATED - use standard_path['rate']
+            '2030_rate': _RULES.rate('standard'),  # DEPRECATED - use standard_path['rate']
             'penalty_years': 15,  # Analysis period
         }
     }
     
     def __init__(self, config_override: Dict = None):
         """Initialize with optional config override"""
-        self.config = self.DEFAULT_CONFIG.copy()
+        self.config = copy.deepcopy(self.DEFAULT_CONFIG)
         if config_override:
             self._deep_update(self.config, config_override)
         
@@ -393,5 +401,5 @@ def update_config(updates: Dict):
 
 def reset_config():
     """Reset to default configuration"""
-    PROJECT_CONFIG.config = ProjectConfig.DEFAULT_CONFIG.copy()
+    PROJECT_CONFIG.config = copy.deepcopy(ProjectConfig.DEFAULT_CONFIG)
     PROJECT_CONFIG._calculate_derived_values()
@@ -10,15 +10,23 @@ This script:
 4. Tracks when each building last reported
 5. Maximizes building coverage while using best available data
 6. Calculates trends from baseline years using Building_EUI_Targets.csv
-7. Formats numeric columns as float for Excel compatibility
+7. Forecasts each building's EUI for the 2025-2032 target years from its
+   full reporting history
+8. Formats numeric columns as float for Excel compatibility
 """
 
 import pandas as pd
 import numpy as np
 import os
+import sys
 import json
 from datetime import datetime
 
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.eui_forecast import EUIForecaster
+
 def get_timestamp():
     """Generate timestamp for file naming"""
     return datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -310,6 +318,39 @@ def calculate_baseline_trends(df_comprehensive, df_all, key_columns):
     
     return df_comprehensive
 
+def calculate_eui_forecasts(df_comprehensive, df_all, key_columns):
+    """Forecast EUI for the target years from every building's full reporting history"""
+    
+    print("\n🔮 Forecasting EUI for target years...")
+    
+    # Find Weather Normalized Site EUI column
+    eui_col = None
+    for col in key_columns['energy_columns']:
+        if 'weather normalized site eui' in col.lower():
+            eui_col = col
+            break
+    
+    if not eui_col:
+        print("   ⚠️  No Weather Normalized Site EUI column found, skipping forecasts")
+        return df_comprehensive
+    
+    # One batched fit over all buildings (trend shrunk toward property type)
+    forecast = EUIForecaster().fit_history(
+        df_all, id_col='Building ID', year_col=key_columns['year'], eui_col=eui_col,
+        type_col=key_columns['type']
+    )
+    
+    forecast_df = forecast.frame()
+    df_comprehensive = df_comprehensive.drop(
+        columns=[col for col in forecast_df.columns if col != 'Building ID' and col in df_comprehensive.columns]
+    ).merge(forecast_df, on='Building ID', how='left')
+    
+    forecasted = df_comprehensive['Forecast_EUI_2030'].notna().sum()
+    print(f"   ✓ Forecast EUI for {forecasted} buildings "
+          f"({forecast.interval * 100:.0f}% intervals, years {', '.join(map(str, forecast.years))})")
+    
+    return df_comprehensive
+
 def merge_with_other_sources(df_comprehensive, data_dir):
     """Merge with geocoding, EPB, and other data sources"""
     
@@ -466,7 +507,8 @@ def merge_with_other_sources(df_comprehensive, data_dir):
 def format_eui_columns(df):
     """Format EUI columns to 2 decimal places"""
     eui_columns = ['Average_EUI_Recent', 'EUI_Trend_Pct', 'EUI_Change_From_Baseline_Pct', 
-                   'Current_EUI', 'Baseline_EUI']
+                   'Current_EUI', 'Baseline_EUI', 'Forecast_Trend_Pct']
+    eui_columns += [col for col in df.columns if col.startswith('Forecast_EUI_')]
     
     for col in eui_columns:
         if col in df.columns:
@@ -566,7 +608,10 @@ def main():
     # Step 5: Calculate baseline trends if targets were merged
     df_comprehensive = calculate_baseline_trends(df_comprehensive, df_all_processed, key_columns)
     
-    # Step 6: Save results with timestamp
+    # Step 6: Forecast EUI for the target years
+    df_comprehensive = calculate_eui_forecasts(df_comprehensive, df_all_processed, key_columns)
+    
+    # Step 7: Save results with timestamp
     current_path, all_path, summary_path = save_comprehensive_data(
         df_comprehensive, 
         df_all_processed,
@@ -0,0 +1,344 @@
+"""
+Suggested File Name: arrow_transfer.py
+File Location: /Users/robertpadgett/Projects/01_My_Notebooks/500_ED_Risk_Retro_BP/src/gcp/
+Use: Arrow/Parquet bulk transfer between local files, DataFrames and BigQuery
+
+This module:
+1. Converts DataFrames and CSVs to Arrow with clean column names and
+   consistent types (mixed object columns become nullable strings)
+2. Derives an explicit BigQuery schema from the Arrow schema (no autodetect),
+   and Arrow column types from a BigQuery schema
+3. Streams CSVs and query/table results through Parquet in record batches,
+   so memory is bounded by the batch size rather than the table size
+4. Loads compressed Parquet into BigQuery from local files or gs:// URIs
+"""
+
+import os
+import re
+import tempfile
+from typing import Iterable, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+PARQUET_COMPRESSION = 'zstd'    # Supported by BigQuery Parquet loads
+ROW_GROUP_SIZE = 100_000        # Rows per Parquet row group
+CSV_BLOCK_SIZE = 16 << 20       # Bytes per CSV read block
+EXPORT_PAGE_SIZE = 50_000       # Rows per page when pulling results without the Storage API
+
+
+def clean_column_name(name) -> str:
+    """BigQuery-safe column name: lowercase, non-alphanumerics -> underscores"""
+    clean = re.sub(r'[^0-9a-zA-Z_]+', '_', str(name).strip()).strip('_').lower()
+    if not clean or clean[0].isdigit():
+        clean = f"_{clean}"
+    return clean
+
+
+def normalize_object_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Make object columns Arrow-friendly without losing nulls
+
+    Columns mixing strings and numbers (common in the Excel/CSV exports) are
+    turned into strings value by value; missing values stay null instead of
+    becoming the text 'nan' / 'None'.
+    """
+    converted = {}
+    for col in df.columns[df.dtypes == object]:
+        kind = pd.api.types.infer_dtype(df[col], skipna=True)
+        if kind not in ('string', 'empty', 'boolean', 'date', 'datetime', 'decimal', 'bytes'):
+            converted[col] = df[col].astype(str).where(df[col].notna(), None)
+    return df.assign(**converted) if converted else df
+
+
+def dataframe_to_arrow(df: pd.DataFrame, schema: Optional[pa.Schema] = None) -> pa.Table:
+    """DataFrame -> Arrow table (index dropped, object columns normalized)"""
+    return pa.Table.from_pandas(normalize_object_columns(df), schema=schema, preserve_index=False)
+
+
+def _bigquery_type(arrow_type: pa.DataType) -> str:
+    if pa.types.is_boolean(arrow_type):
+        return 'BOOL'
+    if pa.types.is_integer(arrow_type):
+        return 'INT64'
+    if pa.types.is_floating(arrow_type):
+        return 'FLOAT64'
+    if pa.types.is_decimal(arrow_type):
+        return 'BIGNUMERIC' if arrow_type.precision > 38 else 'NUMERIC'
+    if pa.types.is_timestamp(arrow_type):
+        return 'TIMESTAMP' if arrow_type.tz else 'DATETIME'
+    if pa.types.is_date(arrow_type):
+        return 'DATE'
+    if pa.types.is_time(arrow_type):
+        return 'TIME'
+    if pa.types.is_binary(arrow_type) or pa.types.is_large_binary(arrow_type):
+        return 'BYTES'
+    return 'STRING'
+
+
+_ARROW_TYPES = {
+    'BOOL': pa.bool_(), 'BOOLEAN': pa.bool_(),
+    'INT64': pa.int64(), 'INTEGER': pa.int64(),
+    'FLOAT64': pa.float64(), 'FLOAT': pa.float64(),
+    'NUMERIC': pa.decimal128(38, 9), 'BIGNUMERIC': pa.decimal256(76, 38),
+    'TIMESTAMP': pa.timestamp('us', tz='UTC'), 'DATETIME': pa.timestamp('us'),
+    'DATE': pa.date32(), 'TIME': pa.time64('us'),
+    'BYTES': pa.binary(), 'STRING': pa.string(),
+}
+
+
+def arrow_column_types(schema: List) -> dict:
+    """Column name -> Arrow type for a list of bigquery.SchemaField (csv_to_parquet column_types)"""
+    return {field.name: _ARROW_TYPES.get(field.field_type.upper(), pa.string()) for field in schema}
+
+
+def bigquery_schema(arrow_schema: pa.Schema) -> List:
+    """
+    Explicit BigQuery schema for an Arrow schema
+
+    Returns:
+        List of bigquery.SchemaField (all NULLABLE)
+    """
+    from google.cloud import bigquery
+
+    return [bigquery.SchemaField(f.name, _bigquery_type(f.type), mode='NULLABLE')
+            for f in arrow_schema]
+
+
+def _batches(data) -> Iterable[pa.RecordBatch]:
+    """Record batches from a DataFrame, Arrow table, or an iterable of either/batches"""
+    if isinstance(data, pd.DataFrame):
+        yield from dataframe_to_arrow(data).to_batches(max_chunksize=ROW_GROUP_SIZE)
+    elif isinstance(data, pa.Table):
+        yield from data.to_batches(max_chunksize=ROW_GROUP_SIZE)
+    elif isinstance(data, pa.RecordBatch):
+        yield data
+    else:
+        for chunk in data:
+            yield from _batches(chunk)
+
+
+def write_parquet(data, path, compression: str = PARQUET_COMPRESSION,
+                  row_group_size: int = ROW_GROUP_SIZE) -> int:
+    """
+    Stream data into one Parquet file
+
+    Args:
+        data: DataFrame, Arrow table, or an iterable of DataFrames / record batches
+            (an iterable is consumed one chunk at a time)
+        path: Output path or writable binary file object
+        compression: Parquet codec
+        row_group_size: Maximum rows per row group
+
+    Returns:
+        Number of rows written
+    """
+    writer = None
+    rows = 0
+    try:
+        for batch in _batches(data):
+            if writer is None:
+                writer = pq.ParquetWriter(path, batch.schema, compression=compression)
+            elif batch.schema != writer.schema:
+                batch = pa.Table.from_batches([batch]).cast(writer.schema)
+            writer.write(batch, row_group_size=row_group_size)
+            rows += batch.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def _widen(arrow_type: pa.DataType, values: pa.Array) -> pa.DataType:
+    """Narrowest of arrow_type, float64, string that holds every (text) value"""
+    for candidate in (arrow_type, pa.float64(), pa.string()):
+        if candidate == pa.float64() and not (pa.types.is_integer(arrow_type)
+                                              or pa.types.is_floating(arrow_type)):
+            continue
+        try:
+            pc.cast(values, candidate)
+            return candidate
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            continue
+    return pa.string()
+
+
+def infer_csv_types(csv_path: str, names: List[str], block_size: int = CSV_BLOCK_SIZE,
+                    column_types: Optional[dict] = None) -> dict:
+    """
+    Column types that hold every row of a CSV, not just the first block
+
+    Starts from Arrow's inference on the first block, then streams the whole
+    file as text and widens a column whenever a later block does not fit
+    (integers -> float64 -> string; other types -> string).
+
+    Returns:
+        Cleaned column name -> Arrow type (column_types entries kept as given)
+    """
+    column_types = column_types or {}
+    read_options = pa_csv.ReadOptions(block_size=block_size, column_names=names, skip_rows=1)
+    first = pa_csv.open_csv(csv_path, read_options=read_options,
+                            convert_options=pa_csv.ConvertOptions(column_types=column_types))
+    types = {field.name: field.type for field in first.schema}
+    first.close()
+
+    text = pa_csv.open_csv(csv_path, read_options=read_options,
+                           convert_options=pa_csv.ConvertOptions(
+                               column_types={name: pa.string() for name in names},
+                               strings_can_be_null=True))
+    for batch in text:
+        for name, values in zip(batch.schema.names, batch.columns):
+            if name not in column_types and types[name] != pa.string():
+                types[name] = _widen(types[name], values)
+    return {**types, **column_types}
+
+
+def csv_to_parquet(csv_path: str, parquet_path, column_types: Optional[dict] = None,
+                   block_size: int = CSV_BLOCK_SIZE, compression: str = PARQUET_COMPRESSION) -> pa.Schema:
+    """
+    Convert a CSV to Parquet block by block with cleaned column names
+
+    Types are inferred over the whole file (infer_csv_types - one extra
+    streaming pass), so a column whose values change type after the first
+    block is widened instead of failing the conversion. column_types
+    (cleaned name -> Arrow type) fixes a column's type and skips its inference.
+
+    Returns:
+        Arrow schema of the written file
+    """
+    header = pa_csv.open_csv(csv_path, read_options=pa_csv.ReadOptions(block_size=block_size))
+    names = [clean_column_name(name) for name in header.schema.names]
+    header.close()
+
+    reader = pa_csv.open_csv(
+        csv_path,
+        read_options=pa_csv.ReadOptions(block_size=block_size, column_names=names, skip_rows=1),
+        convert_options=pa_csv.ConvertOptions(
+            column_types=infer_csv_types(csv_path, names, block_size, column_types))
+    )
+    write_parquet(reader, parquet_path, compression=compression)
+    return reader.schema
+
+
+def load_parquet(client, source, table_id: str, schema: Optional[List] = None,
+                 write_disposition: str = 'WRITE_TRUNCATE'):
+    """
+    Load a Parquet file into BigQuery
+
+    Args:
+        client: bigquery.Client
+        source: Local path, gs:// URI, or binary file object
+        table_id: Destination project.dataset.table
+        schema: Explicit BigQuery schema (defaults to the Parquet file's own types)
+        write_disposition: WRITE_TRUNCATE / WRITE_APPEND / WRITE_EMPTY
+
+    Returns:
+        Finished load job
+    """
+    from google.cloud import bigquery
+
+    job_config = bigquery.LoadJobConfig(
+        source_format=bigquery.SourceFormat.PARQUET,
+        write_disposition=write_disposition,
+        create_disposition=bigquery.CreateDisposition.CREATE_IF_NEEDED
+    )
+    if schema:
+        job_config.schema = schema
+
+    if isinstance(source, str) and source.startswith('gs://'):
+        job = client.load_table_from_uri(source, table_id, job_config=job_config)
+        job.result()
+    elif isinstance(source, str):
+        with open(source, 'rb') as f:
+            job = client.load_table_from_file(f, table_id, job_config=job_config)
+            job.result()
+    else:
+        source.seek(0)
+        job = client.load_table_from_file(source, table_id, job_config=job_config)
+        job.result()
+    return job
+
+
+def load_dataframe(client, df: pd.DataFrame, table_id: str,
+                   write_disposition: str = 'WRITE_TRUNCATE', clean_columns: bool = False) -> int:
+    """
+    Upload a DataFrame as compressed Parquet with an explicit schema
+
+    Args:
+        client: bigquery.Client
+        df: Data to upload
+        table_id: Destination project.dataset.table
+        write_disposition: WRITE_TRUNCATE / WRITE_APPEND / WRITE_EMPTY
+        clean_columns: Rename columns with clean_column_name first
+
+    Returns:
+        Number of rows uploaded
+    """
+    if clean_columns:
+        df = df.rename(columns=clean_column_name)
+    table = dataframe_to_arrow(df)
+
+    with tempfile.TemporaryFile() as f:
+        write_parquet(table, f)
+        load_parquet(client, f, table_id, schema=bigquery_schema(table.schema),
+                     write_disposition=write_disposition)
+    return table.num_rows
+
+
+def load_csv(client, csv_path: str, table_id: str, column_types: Optional[dict] = None,
+             write_disposition: str = 'WRITE_TRUNCATE', staging_dir: Optional[str] = None) -> pa.Schema:
+    """
+    Load a local CSV into BigQuery through a streamed, typed Parquet file
+
+    Returns:
+        Arrow schema that was loaded
+    """
+    with tempfile.NamedTemporaryFile(suffix='.parquet', dir=staging_dir, delete=False) as f:
+        parquet_path = f.name
+    try:
+        schema = csv_to_parquet(csv_path, parquet_path, column_types=column_types)
+        load_parquet(client, parquet_path, table_id, schema=bigquery_schema(schema),
+                     write_disposition=write_disposition)
+    finally:
+        os.remove(parquet_path)
+    return schema
+
+
+def source_format(path: str) -> str:
+    """BigQuery source format for a file path / URI based on its extension"""
+    from google.cloud import bigquery
+
+    if path.lower().endswith(('.parquet', '.pq')):
+        return bigquery.SourceFormat.PARQUET
+    return bigquery.SourceFormat.CSV
+
+
+def export_query_to_parquet(client, sql: str, path, page_size: int = EXPORT_PAGE_SIZE,
+                            bqstorage_client=None) -> int:
+    """
+    Stream query results straight into a Parquet file
+
+    Rows arrive as Arrow record batches (through the Storage API when a
+    bqstorage_client is given, otherwise page by page) and are written as
+    they arrive - no full DataFrame is built.
+
+    Returns:
+        Number of rows written
+    """
+    rows = client.query(sql).result(page_size=page_size)
+    return write_parquet(rows.to_arrow_iterable(bqstorage_client=bqstorage_client), path)
+
+
+def export_table_to_parquet(client, table_id: str, path, page_size: int = EXPORT_PAGE_SIZE,
+                            bqstorage_client=None) -> int:
+    """
+    Stream a whole table into a Parquet file (no query cost - reads table storage)
+
+    Returns:
+        Number of rows written
+    """
+    rows = client.list_rows(table_id, page_size=page_size)
+    return write_parquet(rows.to_arrow_iterable(bqstorage_client=bqstorage_client), path)
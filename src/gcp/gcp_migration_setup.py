@@ -11,12 +11,21 @@ Requirements:
 """
 
 import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 import pandas as pd
 from google.cloud import storage
 from google.cloud import bigquery
 from datetime import datetime
 import json
 
+from gcp.arrow_transfer import (arrow_column_types, bigquery_schema, csv_to_parquet, load_parquet,
+                                source_format)
+from gcp.materialization import (MATERIALIZED_TABLES, TABLE_SUFFIX, BigQueryEngine,
+                                 refresh_materialized_tables)
+
 class EnergizeDenverGCPMigration:
     """
     Manages the migration and operation of Energize Denver data on Google Cloud
@@ -84,33 +93,49 @@ class EnergizeDenverGCPMigration:
         
         return f"gs://{self.bucket_name}/{cloud_path}"
     
-    def load_csv_to_bigquery(self, csv_path, table_name, schema=None):
+    def load_csv_to_bigquery(self, csv_path, table_name, schema=None, column_types=None):
         """
         Load CSV file to BigQuery table
         
+        Local CSVs are streamed into a typed, zstd-compressed Parquet file
+        first, so Cloud Storage and BigQuery receive a columnar file with an
+        explicit schema instead of raw CSV text.
+        
         Args:
-            csv_path: Path to CSV file (local or gs://)
+            csv_path: Path to CSV file (local or gs://; gs:// .parquet also accepted)
             table_name: Name for BigQuery table
             schema: Optional schema definition
+            column_types: Optional {column: Arrow type} for the local CSV
+                conversion (derived from schema when omitted)
         """
         table_id = f"{self.project_id}.{self.dataset_name}.{table_name}"
         
-        job_config = bigquery.LoadJobConfig(
-            source_format=bigquery.SourceFormat.CSV,
-            skip_leading_rows=1,
-            autodetect=True if schema is None else False,
-            schema=schema
-        )
-        
-        # If local file, upload to Cloud Storage first
         if not csv_path.startswith('gs://'):
-            csv_path = self.upload_file_to_storage(csv_path, f"data/{os.path.basename(csv_path)}")
-        
-        load_job = self.bq_client.load_table_from_uri(
-            csv_path, table_id, job_config=job_config
-        )
-        
-        load_job.result()  # Wait for job to complete
+            # Convert locally, then upload the Parquet file to Cloud Storage
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                parquet_name = f"{os.path.splitext(os.path.basename(csv_path))[0]}.parquet"
+                parquet_path = os.path.join(tmp_dir, parquet_name)
+                if column_types is None and schema:
+                    column_types = arrow_column_types(schema)
+                arrow_schema = csv_to_parquet(csv_path, parquet_path, column_types=column_types)
+                gcs_path = self.upload_file_to_storage(parquet_path, f"data/{parquet_name}")
+            load_parquet(self.bq_client, gcs_path, table_id,
+                         schema=schema or bigquery_schema(arrow_schema))
+        elif source_format(csv_path) == bigquery.SourceFormat.PARQUET:
+            load_parquet(self.bq_client, csv_path, table_id, schema=schema)
+        else:
+            job_config = bigquery.LoadJobConfig(
+                source_format=bigquery.SourceFormat.CSV,
+                skip_leading_rows=1,
+                autodetect=True if schema is None else False,
+                schema=schema
+            )
+            
+            load_job = self.bq_client.load_table_from_uri(
+                csv_path, table_id, job_config=job_config
+            )
+            
+            load_job.result()  # Wait for job to complete
         
         table = self.bq_client.get_table(table_id)
         print(f"✓ Loaded {table.num_rows} rows to {table_id}")
@@ -332,9 +357,25 @@ def process_new_building_data(cloud_event):
         print("✓ Generated Cloud Function code for automatic updates")
         print("  Deploy with: gcloud functions deploy process_new_building_data --trigger-bucket=your-bucket-name")
     
-    def generate_dashboard_query(self):
+    def materialize_penalty_calculations(self):
+        """
+        Refresh penalty_calculations_materialized (clustered by property type
+        and building) from the penalty_calculations view; only rewrites it when
+        the view's content changed
+        """
+        engine = BigQueryEngine(self.bq_client, self.project_id, self.dataset_name)
+        specs = [spec for spec in MATERIALIZED_TABLES if spec.source == 'penalty_calculations']
+        return refresh_materialized_tables(engine, specs)
+    
+    def generate_dashboard_query(self, penalty_table='penalty_calculations' + TABLE_SUFFIX):
         """
         Generate SQL for a Looker Studio dashboard
+
+        Args:
+            penalty_table: Penalty table to read - the materialized table by
+                default (refreshed by materialize_penalty_calculations), so
+                dashboard hits don't recompute the view; pass
+                'penalty_calculations' to read the view itself
         """
         dashboard_query = """
         -- Energize Denver Risk Dashboard Query
@@ -373,11 +414,12 @@ def process_new_building_data(cloud_event):
             -- Date for time series
             CURRENT_DATE() as report_date
             
-        FROM `{project_id}.{dataset_name}.penalty_calculations` p
+        FROM `{project_id}.{dataset_name}.{penalty_table}` p
         LEFT JOIN `{project_id}.{dataset_name}.cluster_analysis` c
             USING(building_id)
         WHERE actual_eui IS NOT NULL
-        """.format(project_id=self.project_id, dataset_name=self.dataset_name)
+        """.format(project_id=self.project_id, dataset_name=self.dataset_name,
+                   penalty_table=penalty_table)
         
         return dashboard_query
 
@@ -407,8 +449,9 @@ if __name__ == "__main__":
             table_name = os.path.basename(file_path).replace('.csv', '').lower()
             migration.load_csv_to_bigquery(file_path, table_name)
     
-    # Create penalty calculation view
+    # Create penalty calculation view and its materialized table (read by the dashboard)
     migration.create_penalty_calculation_view()
+    migration.materialize_penalty_calculations()
     
     # Run cluster analysis
     cluster_results = migration.run_cluster_analysis()
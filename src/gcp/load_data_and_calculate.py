@@ -8,12 +8,17 @@ Usage:
 """
 
 import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 from google.cloud import bigquery
 from google.cloud import storage
 import pandas as pd
 import numpy as np
 from datetime import datetime
 
+from gcp.arrow_transfer import load_parquet, source_format
+
 # Configuration
 PROJECT_ID = "energize-denver-eaas"
 DATASET_ID = "energize_denver"
@@ -28,10 +33,18 @@ class EnergizeDenverDataLoader:
         self.dataset_ref = f"{PROJECT_ID}.{DATASET_ID}"
         
     def load_csv_to_bigquery(self, gcs_path, table_name, schema=None):
-        """Load a CSV file from Cloud Storage to BigQuery"""
+        """Load a CSV (or Parquet) file from Cloud Storage to BigQuery"""
         
         table_id = f"{self.dataset_ref}.{table_name}"
         
+        if source_format(gcs_path) == bigquery.SourceFormat.PARQUET:
+            # Typed columnar file - no CSV parsing or schema autodetect
+            print(f"Loading {gcs_path} to {table_id}...")
+            load_parquet(self.bq_client, gcs_path, table_id, schema=schema)
+            table = self.bq_client.get_table(table_id)
+            print(f"✓ Loaded {table.num_rows} rows to {table_id}")
+            return table_id
+        
         # Configure load job
         job_config = bigquery.LoadJobConfig(
             source_format=bigquery.SourceFormat.CSV,
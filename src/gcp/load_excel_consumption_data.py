@@ -12,13 +12,18 @@ This script:
 5. Creates an enhanced analysis view with actual vs target EUI
 """
 
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 import pandas as pd
 import numpy as np
 from google.cloud import bigquery
 from google.cloud import storage
-import os
 from datetime import datetime
 
+from gcp.arrow_transfer import load_dataframe
+
 # Configuration
 PROJECT_ID = "energize-denver-eaas"
 DATASET_ID = "energize_denver"
@@ -189,23 +194,10 @@ class ExcelDataLoader:
         # Create a copy to avoid modifying the original
         upload_df = df.copy()
         
-        # Ensure all object columns are strings
-        for col in upload_df.select_dtypes(include=['object']).columns:
-            upload_df[col] = upload_df[col].astype(str)
-        
-        # Configure job with explicit schema
-        job_config = bigquery.LoadJobConfig(
-            write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE,
-            autodetect=True,
-            create_disposition=bigquery.CreateDisposition.CREATE_IF_NEEDED
-        )
-        
-        # Upload
+        # Upload as compressed Parquet with an explicit schema; mixed object
+        # columns become nullable strings (nulls stay NULL, not 'nan')
         try:
-            job = self.bq_client.load_table_from_dataframe(
-                upload_df, table_id, job_config=job_config
-            )
-            job.result()  # Wait for completion
+            load_dataframe(self.bq_client, upload_df, table_id)
         except Exception as e:
             print(f"\nError during upload: {str(e)}")
             print("\nTrying alternative upload method...")
@@ -9,9 +9,14 @@ This script:
 3. Creates a comprehensive view with all geographic info
 """
 
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 import pandas as pd
 from google.cloud import bigquery
-import os
+
+from gcp.arrow_transfer import load_dataframe
 
 def load_geographic_data_to_bigquery(project_id='energize-denver-eaas', 
                                    dataset_id='energize_denver'):
@@ -32,11 +37,11 @@ def load_geographic_data_to_bigquery(project_id='energize-denver-eaas',
     print("📍 Loading geographic data files...")
     
     # Load geocoded data
-    geocoded_df = pd.read_csv(geocoded_path)
+    geocoded_df = pd.read_csv(geocoded_path, engine='pyarrow')
     print(f"✅ Loaded {len(geocoded_df)} geocoded buildings")
     
     # Load zipcode data
-    zipcode_df = pd.read_csv(zipcode_path)
+    zipcode_df = pd.read_csv(zipcode_path, engine='pyarrow')
     print(f"✅ Loaded {len(zipcode_df)} zipcode records")
     
     # Clean column names for BigQuery
@@ -54,23 +59,12 @@ def load_geographic_data_to_bigquery(project_id='energize-denver-eaas',
     geocoded_table = f"{project_id}.{dataset_id}.geocoded_buildings"
     zipcode_table = f"{project_id}.{dataset_id}.building_zipcodes"
     
-    # Upload geocoded data
-    job_config = bigquery.LoadJobConfig(
-        write_disposition="WRITE_TRUNCATE",
-        autodetect=True
-    )
-    
-    job = client.load_table_from_dataframe(
-        geocoded_df, geocoded_table, job_config=job_config
-    )
-    job.result()
+    # Upload geocoded data (Parquet with an explicit schema, replaces the table)
+    load_dataframe(client, geocoded_df, geocoded_table)
     print(f"✅ Uploaded geocoded data to {geocoded_table}")
     
     # Upload zipcode data
-    job = client.load_table_from_dataframe(
-        zipcode_df, zipcode_table, job_config=job_config
-    )
-    job.result()
+    load_dataframe(client, zipcode_df, zipcode_table)
     print(f"✅ Uploaded zipcode data to {zipcode_table}")
     
     # Create a view that joins all geographic data with analysis
@@ -0,0 +1,409 @@
+"""
+Suggested File Name: materialization.py
+File Location: /Users/robertpadgett/Projects/01_My_Notebooks/500_ED_Risk_Retro_BP/src/gcp/
+Use: Materialize the penalty / opt-in / building analysis views as partitioned, clustered tables
+
+This module:
+1. Generates DDL for year-partitioned tables clustered by property type and
+   building ID (RANGE_BUCKET partitions in BigQuery, an index locally)
+2. Fingerprints every partition of the source view (row count + XOR of row
+   hashes) and keeps the last refreshed fingerprints in a state table
+3. Plans an incremental refresh that deletes and re-inserts only the
+   partitions whose fingerprint changed (full rebuild if the schema changed)
+4. Runs the same plan against BigQuery or a local SQLite database, so the
+   refresh logic can be tested without GCP
+
+Dashboards should read the *_materialized tables instead of the views; each
+hit then scans only the partitions/clusters it filters on.
+"""
+
+import hashlib
+import json
+import sqlite3
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+# Configuration
+PROJECT_ID = "energize-denver-eaas"
+DATASET_ID = "energize_denver"
+
+STATE_TABLE = "_materialization_state"
+TABLE_SUFFIX = "_materialized"
+
+
+@dataclass
+class MaterializedTable:
+    """A view to materialize and how to lay out its table"""
+    source: str
+    # Integer year column to partition on (None = single unpartitioned table)
+    partition_column: Optional[str] = 'reporting_year'
+    cluster_columns: List[str] = field(default_factory=lambda: ['property_type', 'building_id'])
+    # RANGE_BUCKET partition years [start, end)
+    partition_start: int = 2015
+    partition_end: int = 2041
+
+    @property
+    def name(self) -> str:
+        return f"{self.source}{TABLE_SUFFIX}"
+
+
+# penalty_analysis and building_analysis_v2 carry no reporting year (one row per
+# building), so they partition on the building's baseline year instead.
+# opt_in_decision_analysis is already reduced to each building's latest year,
+# and penalty_calculations (the dashboard's view) has no year column at all.
+MATERIALIZED_TABLES = [
+    MaterializedTable('building_analysis_v2', partition_column='baseline_year'),
+    MaterializedTable('penalty_analysis', partition_column='baseline_year'),
+    MaterializedTable('penalty_analysis_corrected', partition_column='reporting_year'),
+    MaterializedTable('opt_in_decision_analysis', partition_column=None),
+    MaterializedTable('penalty_calculations', partition_column=None),
+]
+
+
+# Partition key -> (row_count, fingerprint)
+Fingerprints = Dict[Optional[int], Tuple[int, int]]
+
+
+@dataclass
+class RefreshPlan:
+    """Statements needed to bring one materialized table up to date"""
+    table: MaterializedTable
+    rebuild: bool = False
+    changed: List[Optional[int]] = field(default_factory=list)
+    removed: List[Optional[int]] = field(default_factory=list)
+    # Run one by one (DDL can't join a BigQuery transaction)
+    ddl: List[str] = field(default_factory=list)
+    # Run together as one transaction
+    dml: List[str] = field(default_factory=list)
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.ddl or self.dml)
+
+
+def _partition_key(value) -> Optional[int]:
+    return None if value is None or pd.isna(value) else int(value)
+
+
+def _fingerprints(df: pd.DataFrame) -> Fingerprints:
+    """Fingerprint query/state rows -> {partition: (row_count, fingerprint)}"""
+    result = {}
+    for row in df.itertuples(index=False):
+        if not row.row_count:
+            continue
+        fingerprint = 0 if pd.isna(row.fingerprint) else int(row.fingerprint)
+        result[_partition_key(row.partition_value)] = (int(row.row_count), fingerprint)
+    return result
+
+
+class _Engine(ABC):
+    """SQL generation shared by both engines; subclasses handle quoting and execution"""
+
+    true_literal = 'TRUE'
+    now = 'CURRENT_TIMESTAMP()'
+    integer_type = 'INT64'
+
+    @abstractmethod
+    def table(self, name: str) -> str:
+        """Quoted, fully qualified table name"""
+
+    @abstractmethod
+    def columns(self, name: str) -> List[str]:
+        """Column names of a table/view ([] if it does not exist)"""
+
+    @abstractmethod
+    def fetch(self, sql: str) -> pd.DataFrame:
+        """Query result as a DataFrame"""
+
+    @abstractmethod
+    def execute(self, statements: List[str], transaction: bool = False):
+        """Run statements (as one transaction when asked)"""
+
+    @abstractmethod
+    def create_table_sql(self, spec: MaterializedTable) -> List[str]:
+        """DDL creating the empty materialized table"""
+
+    @abstractmethod
+    def row_fingerprint(self, alias: str, columns: List[str]) -> str:
+        """Aggregate expression hashing every row of alias"""
+
+    def select_list(self, spec: MaterializedTable, columns: List[str]) -> str:
+        """
+        Source columns as materialized: the partition column is cast to an
+        integer (RANGE_BUCKET needs INT64, and loaders such as
+        create_penalty_analysis_corrected write years as FLOAT64)
+        """
+        return ', '.join(f"CAST({c} AS {self.integer_type}) AS {c}" if c == spec.partition_column else c
+                         for c in columns)
+
+    def drop_table_sql(self, spec: MaterializedTable) -> str:
+        return f"DROP TABLE IF EXISTS {self.table(spec.name)}"
+
+    def state_table_sql(self) -> str:
+        return f"""
+        CREATE TABLE IF NOT EXISTS {self.table(STATE_TABLE)} (
+            table_name STRING,
+            partition_value INT64,
+            row_count INT64,
+            fingerprint INT64,
+            refreshed_at TIMESTAMP
+        )"""
+
+    def fingerprint_sql(self, spec: MaterializedTable, columns: List[str]) -> str:
+        """Per-partition row count and order-independent content hash of the source"""
+        partition = spec.partition_column or 'NULL'
+        group_by = "GROUP BY partition_value" if spec.partition_column else ""
+        return f"""
+        SELECT
+            {partition} AS partition_value,
+            COUNT(*) AS row_count,
+            {self.row_fingerprint('src', columns)} AS fingerprint
+        FROM {self.table(spec.source)} src
+        {group_by}"""
+
+    def state_sql(self, spec: MaterializedTable) -> str:
+        return f"""
+        SELECT partition_value, row_count, fingerprint
+        FROM {self.table(STATE_TABLE)}
+        WHERE table_name = '{spec.name}'"""
+
+    def partition_predicate(self, spec: MaterializedTable, partitions: List[Optional[int]],
+                            column: Optional[str] = None) -> str:
+        """WHERE clause matching whole partitions (lets BigQuery drop them without a scan)"""
+        column = column or spec.partition_column
+        if spec.partition_column is None:
+            return self.true_literal
+        values = sorted(p for p in partitions if p is not None)
+        clauses = []
+        if values:
+            clauses.append(f"{column} IN ({', '.join(str(v) for v in values)})")
+        if None in partitions:
+            clauses.append(f"{column} IS NULL")
+        return ' OR '.join(clauses)
+
+    def refresh_dml(self, spec: MaterializedTable, columns: List[str], changed: List,
+                    removed: List, current: Fingerprints, rebuild: bool) -> List[str]:
+        """Delete/insert the given partitions and record their new fingerprints"""
+        target, source, state = self.table(spec.name), self.table(spec.source), self.table(STATE_TABLE)
+        column_list = ', '.join(columns)
+        touched = changed + removed
+        statements = []
+
+        if not rebuild:
+            statements.append(f"DELETE FROM {target} WHERE {self.partition_predicate(spec, touched)}")
+        if changed:
+            statements.append(f"INSERT INTO {target} ({column_list}) "
+                              f"SELECT {self.select_list(spec, columns)} FROM {source} "
+                              f"WHERE {self.partition_predicate(spec, changed)}")
+
+        if rebuild:
+            statements.append(f"DELETE FROM {state} WHERE table_name = '{spec.name}'")
+        else:
+            key_predicate = self.partition_predicate(spec, touched, column='partition_value')
+            statements.append(f"DELETE FROM {state} WHERE table_name = '{spec.name}' "
+                              f"AND ({key_predicate})")
+        if changed:
+            rows = []
+            for partition in changed:
+                count, fingerprint = current[partition]
+                value = 'NULL' if partition is None else str(partition)
+                rows.append(f"('{spec.name}', {value}, {count}, {fingerprint}, {self.now})")
+            statements.append(f"INSERT INTO {state} "
+                              f"(table_name, partition_value, row_count, fingerprint, refreshed_at) "
+                              f"VALUES {', '.join(rows)}")
+        return statements
+
+
+class BigQueryEngine(_Engine):
+    """Runs materialization plans against a BigQuery dataset"""
+
+    def __init__(self, client, project_id: str = PROJECT_ID, dataset_id: str = DATASET_ID):
+        self.client = client
+        self.dataset_ref = f"{project_id}.{dataset_id}"
+
+    def table(self, name: str) -> str:
+        return f"`{self.dataset_ref}.{name}`"
+
+    def columns(self, name: str) -> List[str]:
+        try:
+            return [f.name for f in self.client.get_table(f"{self.dataset_ref}.{name}").schema]
+        except Exception:
+            return []
+
+    def fetch(self, sql: str) -> pd.DataFrame:
+        return self.client.query(sql).to_dataframe()
+
+    def execute(self, statements: List[str], transaction: bool = False):
+        if transaction and len(statements) > 1:
+            script = ';\n'.join(['BEGIN TRANSACTION'] + statements + ['COMMIT TRANSACTION'])
+            self.client.query(script + ';').result()
+            return
+        for sql in statements:
+            self.client.query(sql).result()
+
+    def create_table_sql(self, spec: MaterializedTable) -> List[str]:
+        partition = ""
+        if spec.partition_column:
+            partition = (f"PARTITION BY RANGE_BUCKET({spec.partition_column}, "
+                         f"GENERATE_ARRAY({spec.partition_start}, {spec.partition_end}, 1))")
+        cluster = f"CLUSTER BY {', '.join(spec.cluster_columns)}" if spec.cluster_columns else ""
+        # Partition column typed INT64 whatever the view produces (see select_list)
+        replace = (f" REPLACE (CAST({spec.partition_column} AS INT64) AS {spec.partition_column})"
+                   if spec.partition_column else "")
+        return [f"""
+        CREATE TABLE IF NOT EXISTS {self.table(spec.name)}
+        {partition}
+        {cluster}
+        AS SELECT *{replace} FROM {self.table(spec.source)} WHERE FALSE"""]
+
+    def row_fingerprint(self, alias: str, columns: List[str]) -> str:
+        return f"BIT_XOR(FARM_FINGERPRINT(TO_JSON_STRING({alias})))"
+
+
+class _RowFingerprint:
+    """SQLite aggregate: XOR of signed 64-bit row hashes (stand-in for FARM_FINGERPRINT)"""
+
+    def __init__(self):
+        self.value = 0
+
+    def step(self, *values):
+        digest = hashlib.blake2b(json.dumps(values, default=str).encode(), digest_size=8).digest()
+        self.value ^= int.from_bytes(digest, 'big', signed=True)
+
+    def finalize(self):
+        return self.value
+
+
+class SQLiteEngine(_Engine):
+    """Runs materialization plans against a local SQLite database"""
+
+    now = 'CURRENT_TIMESTAMP'
+    integer_type = 'INTEGER'
+
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+        connection.create_aggregate('row_fingerprint', -1, _RowFingerprint)
+
+    def table(self, name: str) -> str:
+        return f'"{name}"'
+
+    def columns(self, name: str) -> List[str]:
+        return [row[1] for row in self.connection.execute(f"PRAGMA table_info({self.table(name)})")]
+
+    def fetch(self, sql: str) -> pd.DataFrame:
+        return pd.read_sql_query(sql, self.connection)
+
+    def execute(self, statements: List[str], transaction: bool = False):
+        with self.connection:
+            for sql in statements:
+                self.connection.execute(sql)
+
+    def create_table_sql(self, spec: MaterializedTable) -> List[str]:
+        select = self.select_list(spec, self.columns(spec.source)) or '*'
+        statements = [f"CREATE TABLE IF NOT EXISTS {self.table(spec.name)} "
+                      f"AS SELECT {select} FROM {self.table(spec.source)} WHERE 0"]
+        index_columns = ([spec.partition_column] if spec.partition_column else []) + spec.cluster_columns
+        if index_columns:
+            statements.append(f"CREATE INDEX IF NOT EXISTS {self.table(spec.name + '_cluster')} "
+                              f"ON {self.table(spec.name)} ({', '.join(index_columns)})")
+        return statements
+
+    def row_fingerprint(self, alias: str, columns: List[str]) -> str:
+        return f"row_fingerprint({', '.join(f'{alias}.{c}' for c in columns)})"
+
+
+def materialization_ddl(engine: _Engine, tables: List[MaterializedTable] = None) -> List[str]:
+    """DDL for the state table and every materialized table (for review or manual runs)"""
+    statements = [engine.state_table_sql()]
+    for spec in tables or MATERIALIZED_TABLES:
+        statements += engine.create_table_sql(spec)
+    return statements
+
+
+def plan_refresh(engine: _Engine, spec: MaterializedTable) -> RefreshPlan:
+    """
+    Compare source partitions with the recorded state and plan the refresh
+
+    Raises:
+        ValueError: If the source view does not exist
+    """
+    source_columns = engine.columns(spec.source)
+    if not source_columns:
+        raise ValueError(f"Source view not found: {spec.source}")
+
+    plan = RefreshPlan(spec)
+    plan.rebuild = engine.columns(spec.name) != source_columns
+    if plan.rebuild:
+        plan.ddl = [engine.drop_table_sql(spec)] + engine.create_table_sql(spec)
+
+    current = _fingerprints(engine.fetch(engine.fingerprint_sql(spec, source_columns)))
+    stored = {} if plan.rebuild else _fingerprints(engine.fetch(engine.state_sql(spec)))
+
+    plan.changed = sorted((p for p in current if stored.get(p) != current[p]),
+                          key=lambda p: (p is None, p))
+    plan.removed = sorted((p for p in stored if p not in current), key=lambda p: (p is None, p))
+
+    if plan.rebuild or plan.changed or plan.removed:
+        plan.dml = engine.refresh_dml(spec, source_columns, plan.changed, plan.removed,
+                                      current, plan.rebuild)
+    return plan
+
+
+def apply_plan(engine: _Engine, plan: RefreshPlan):
+    """Run a refresh plan (DDL first, then all DML as one transaction)"""
+    engine.execute(plan.ddl)
+    if plan.dml:
+        engine.execute(plan.dml, transaction=True)
+
+
+def refresh_materialized_tables(engine: _Engine, tables: List[MaterializedTable] = None,
+                                dry_run: bool = False) -> Dict[str, RefreshPlan]:
+    """
+    Incrementally refresh materialized tables
+
+    Args:
+        engine: BigQueryEngine or SQLiteEngine
+        tables: Tables to refresh (defaults to MATERIALIZED_TABLES)
+        dry_run: Only plan; print the statements instead of running them
+
+    Returns:
+        Table name -> RefreshPlan
+    """
+    engine.execute([engine.state_table_sql()])
+    plans = {}
+    for spec in tables or MATERIALIZED_TABLES:
+        try:
+            plan = plan_refresh(engine, spec)
+        except ValueError as e:
+            print(f"⚠️  Skipping {spec.name}: {e}")
+            continue
+        plans[spec.name] = plan
+
+        if plan.is_empty:
+            print(f"✓ {spec.name}: up to date")
+            continue
+        action = "rebuild" if plan.rebuild else "refresh"
+        print(f"{'📝' if dry_run else '🔄'} {spec.name}: {action} "
+              f"{len(plan.changed)} changed / {len(plan.removed)} removed partition(s)")
+        if dry_run:
+            for sql in plan.ddl + plan.dml:
+                print(f"    {sql.strip()};")
+        else:
+            apply_plan(engine, plan)
+    return plans
+
+
+def main():
+    """Refresh the materialized analysis tables in BigQuery"""
+    from google.cloud import bigquery
+
+    engine = BigQueryEngine(bigquery.Client(project=PROJECT_ID))
+    print("=== REFRESHING MATERIALIZED ANALYSIS TABLES ===\n")
+    refresh_materialized_tables(engine)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,21 +8,35 @@ This script:
 2. Recreates them with correct penalty rates
 3. Validates the results
 4. Generates a summary report
+5. Runs independent view jobs concurrently in dependency order
 """
 
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 from google.cloud import bigquery
 import pandas as pd
 import numpy as np
 from datetime import datetime
-import os
+
+from gcp.view_scheduler import ViewJob, ViewScheduler
+from utils.penalty_plan import default_plan
 
 # Configuration
 PROJECT_ID = "energize-denver-eaas"
 DATASET_ID = "energize_denver"
 
-# Correct penalty rates
-PENALTY_RATE_STANDARD = 0.15  # $/kBtu for standard path
-PENALTY_RATE_ACO = 0.23       # $/kBtu for ACO/opt-in path
+# Penalty rules (config/penalty_rules.json)
+PENALTY_PLAN = default_plan()
+PENALTY_RATE_STANDARD = PENALTY_PLAN.rules.rate('standard')  # $/kBtu for standard path
+PENALTY_RATE_ACO = PENALTY_PLAN.rules.rate('aco')            # $/kBtu for ACO/opt-in path
+
+
+
+def _first_penalty_columns():
+    """Penalty columns of the first standard and first ACO target events"""
+    return PENALTY_PLAN.penalty_columns('standard')[0], PENALTY_PLAN.penalty_columns('aco')[0]
 
 
 class BigQueryViewRegenerator:
@@ -55,15 +69,23 @@ class BigQueryViewRegenerator:
                 self.log_update(f"Error dropping view {view_id}: {str(e)}", "ERROR")
             return False
     
-    def create_corrected_penalty_view(self):
-        """Create the main penalty calculation view with correct rates"""
+    def corrected_penalty_view_query(self):
+        """SQL for the corrected penalty view"""
         
         view_name = "building_penalties_corrected"
         view_id = f"{self.dataset_ref}.{view_name}"
         
-        self.log_update(f"Creating corrected penalty view: {view_name}")
+        # Standard interim penalties only apply to buildings whose targets fall in those years
+        first_year, second_year = PENALTY_PLAN.rules.target_years('standard')[:2]
+        penalty_columns = ",\n            ".join(PENALTY_PLAN.sql_penalty_columns(
+            {'first_interim': 'gap_first', 'second_interim': 'gap_second', 'final': 'gap_final'},
+            'gross_floor_area',
+            paths=('standard', 'aco'),
+            conditions={('standard', first_year): f"first_interim_year = {first_year}",
+                        ('standard', second_year): f"second_interim_year = {second_year}"},
+        ))
         
-        query = f"""
+        return f"""
         CREATE OR REPLACE VIEW `{view_id}` AS
         WITH building_metrics AS (
             -- Get latest consumption and targets for each building
@@ -91,7 +113,7 @@ class BigQueryViewRegenerator:
             JOIN `{self.dataset_ref}.building_analysis_v2` t
                 ON c.building_id = t.building_id
             WHERE c.weather_normalized_eui > 0
-                AND c.gross_floor_area >= 25000
+                AND {PENALTY_PLAN.sql_covered('c.gross_floor_area')}
                 AND c.reporting_year = (
                     SELECT MAX(reporting_year) 
                     FROM `{self.dataset_ref}.building_consumption_corrected` c2 
@@ -102,79 +124,23 @@ class BigQueryViewRegenerator:
         SELECT 
             *,
             
-            -- STANDARD PATH PENALTIES (using {PENALTY_RATE_STANDARD})
-            -- 2025 penalty (first interim)
-            CASE 
-                WHEN first_interim_year = 2025 AND gap_first > 0 
-                THEN gap_first * gross_floor_area * {PENALTY_RATE_STANDARD}
-                ELSE 0 
-            END as penalty_2025_standard,
-            
-            -- 2027 penalty (second interim)
-            CASE 
-                WHEN second_interim_year = 2027 AND gap_second > 0 
-                THEN gap_second * gross_floor_area * {PENALTY_RATE_STANDARD}
-                ELSE 0 
-            END as penalty_2027_standard,
-            
-            -- 2030 penalty (final)
-            CASE 
-                WHEN gap_final > 0 
-                THEN gap_final * gross_floor_area * {PENALTY_RATE_STANDARD}
-                ELSE 0 
-            END as penalty_2030_standard,
-            
-            -- ACO PATH PENALTIES (using {PENALTY_RATE_ACO})
-            -- 2028 penalty (using first interim target)
-            CASE 
-                WHEN gap_first > 0 
-                THEN gap_first * gross_floor_area * {PENALTY_RATE_ACO}
-                ELSE 0 
-            END as penalty_2028_aco,
-            
-            -- 2032 penalty (using final target)
-            CASE 
-                WHEN gap_final > 0 
-                THEN gap_final * gross_floor_area * {PENALTY_RATE_ACO}
-                ELSE 0 
-            END as penalty_2032_aco,
-            
-            -- Total penalties by path
-            CASE 
-                WHEN first_interim_year = 2025 AND gap_first > 0 
-                THEN gap_first * gross_floor_area * {PENALTY_RATE_STANDARD}
-                ELSE 0 
-            END +
-            CASE 
-                WHEN second_interim_year = 2027 AND gap_second > 0 
-                THEN gap_second * gross_floor_area * {PENALTY_RATE_STANDARD}
-                ELSE 0 
-            END +
-            CASE 
-                WHEN gap_final > 0 
-                THEN gap_final * gross_floor_area * {PENALTY_RATE_STANDARD}
-                ELSE 0 
-            END as total_penalties_standard,
-            
-            CASE 
-                WHEN gap_first > 0 
-                THEN gap_first * gross_floor_area * {PENALTY_RATE_ACO}
-                ELSE 0 
-            END +
-            CASE 
-                WHEN gap_final > 0 
-                THEN gap_final * gross_floor_area * {PENALTY_RATE_ACO}
-                ELSE 0 
-            END as total_penalties_aco,
-            
-            -- Penalty rate verification columns
-            {PENALTY_RATE_STANDARD} as rate_standard_used,
-            {PENALTY_RATE_ACO} as rate_aco_used,
+            -- Penalty per path target year, totals by path and rate verification columns
+            {penalty_columns},
             
             CURRENT_TIMESTAMP() as calculation_timestamp
             
         FROM building_metrics
         """
+    
+    def create_corrected_penalty_view(self):
+        """Create the main penalty calculation view with correct rates"""
+        
+        view_name = "building_penalties_corrected"
+        view_id = f"{self.dataset_ref}.{view_name}"
+        
+        self.log_update(f"Creating corrected penalty view: {view_name}")
+        
+        query = self.corrected_penalty_view_query()
         
         try:
             self.client.query(query).result()
@@ -185,34 +151,35 @@ class BigQueryViewRegenerator:
             self.log_update(f"Error creating view {view_id}: {str(e)}", "ERROR")
             return False
     
-    def create_opt_in_decision_view(self):
-        """Create opt-in decision view with correct penalty calculations"""
+    def opt_in_decision_view_query(self):
+        """SQL for the opt-in decision view"""
         
         view_name = "opt_in_decision_analysis_v2"
         view_id = f"{self.dataset_ref}.{view_name}"
         
-        self.log_update(f"Creating opt-in decision view: {view_name}")
+        # Event columns, NPVs and the first standard penalty follow the rules file
+        npv_standard = PENALTY_PLAN.sql_npv('standard')
+        npv_aco = PENALTY_PLAN.sql_npv('aco')
+        standard_columns = PENALTY_PLAN.penalty_columns('standard')
+        aco_columns = PENALTY_PLAN.penalty_columns('aco')
+        first_penalty = standard_columns[0]
+        first_year = PENALTY_PLAN.rules.target_years('standard')[0]
+        discount_pct = PENALTY_PLAN.rules.discount_rate * 100
         
-        query = f"""
+        return f"""
         CREATE OR REPLACE VIEW `{view_id}` AS
         WITH penalty_analysis AS (
             SELECT 
                 *,
                 
-                -- NPV calculations (7% discount rate)
-                penalty_2025_standard / POWER(1.07, 1) +
-                penalty_2027_standard / POWER(1.07, 3) + 
-                penalty_2030_standard / POWER(1.07, 6) as npv_standard,
+                -- NPV calculations ({discount_pct:g}% discount rate)
+                {npv_standard} as npv_standard,
                 
-                penalty_2028_aco / POWER(1.07, 4) +
-                penalty_2032_aco / POWER(1.07, 8) as npv_aco,
+                {npv_aco} as npv_aco,
                 
                 -- NPV advantage of ACO (positive = ACO saves money)
-                (penalty_2025_standard / POWER(1.07, 1) +
-                 penalty_2027_standard / POWER(1.07, 3) + 
-                 penalty_2030_standard / POWER(1.07, 6)) -
-                (penalty_2028_aco / POWER(1.07, 4) +
-                 penalty_2032_aco / POWER(1.07, 8)) as npv_advantage_aco
+                ({npv_standard}) -
+                ({npv_aco}) as npv_advantage_aco
                 
             FROM `{self.dataset_ref}.building_penalties_corrected`
         ),
@@ -235,7 +202,7 @@ class BigQueryViewRegenerator:
                 -- Cash flow impact
                 CASE 
                     WHEN property_type IN ('Affordable Housing', 'Senior Care Community') THEN TRUE
-                    WHEN penalty_2025_standard > 100000 THEN TRUE
+                    WHEN {first_penalty} > 100000 THEN TRUE
                     ELSE FALSE
                 END as cash_constrained
                 
@@ -254,13 +221,10 @@ class BigQueryViewRegenerator:
             pct_reduction_needed,
             
             -- Penalties
-            penalty_2025_standard,
-            penalty_2027_standard,
-            penalty_2030_standard,
+            {', '.join(standard_columns)},
             total_penalties_standard,
             
-            penalty_2028_aco,
-            penalty_2032_aco,
+            {', '.join(aco_columns)},
             total_penalties_aco,
             
             -- NPV analysis
@@ -272,7 +236,7 @@ class BigQueryViewRegenerator:
             CASE 
                 -- Always opt-in cases
                 WHEN gap_first > 0 AND gap_second > 0 AND gap_final > 0 THEN TRUE
-                WHEN cash_constrained AND penalty_2025_standard > 50000 THEN TRUE
+                WHEN cash_constrained AND {first_penalty} > 50000 THEN TRUE
                 WHEN technical_difficulty >= 80 THEN TRUE
                 
                 -- Never opt-in cases
@@ -295,9 +259,9 @@ class BigQueryViewRegenerator:
             -- Rationale
             CASE 
                 WHEN gap_first > 0 AND gap_second > 0 AND gap_final > 0 THEN 'Cannot meet any targets'
-                WHEN cash_constrained AND penalty_2025_standard > 50000 THEN 'Cash flow constraints'
+                WHEN cash_constrained AND {first_penalty} > 50000 THEN 'Cash flow constraints'
                 WHEN technical_difficulty >= 80 THEN 'Technical infeasibility'
-                WHEN gap_first <= 0 THEN 'Already meets 2025 target'
+                WHEN gap_first <= 0 THEN 'Already meets {first_year} target'
                 WHEN npv_advantage_aco > 50000 THEN 'Significant financial advantage'
                 WHEN npv_advantage_aco > 0 THEN 'Modest financial advantage'
                 WHEN npv_advantage_aco < -50000 THEN 'ACO too expensive'
@@ -311,6 +275,16 @@ class BigQueryViewRegenerator:
             
         FROM decision_factors
         """
+    
+    def create_opt_in_decision_view(self):
+        """Create opt-in decision view with correct penalty calculations"""
+        
+        view_name = "opt_in_decision_analysis_v2"
+        view_id = f"{self.dataset_ref}.{view_name}"
+        
+        self.log_update(f"Creating opt-in decision view: {view_name}")
+        
+        query = self.opt_in_decision_view_query()
         
         try:
             self.client.query(query).result()
@@ -327,34 +301,43 @@ class BigQueryViewRegenerator:
         self.log_update("Validating penalty rates in new views")
         
         # Check penalty calculation view
-        query = f"""
+        query = self.penalty_rate_query()
+        
+        try:
+            result = self.client.query(query).to_dataframe()
+            return self.check_penalty_rates(result)
+                
+        except Exception as e:
+            self.log_update(f"Error validating rates: {str(e)}", "ERROR")
+            return False
+    
+    def penalty_rate_query(self):
+        """SQL returning the rates used by the penalty view"""
+        
+        return f"""
         SELECT DISTINCT
             rate_standard_used,
             rate_aco_used
         FROM `{self.dataset_ref}.building_penalties_corrected`
         LIMIT 1
         """
+    
+    def check_penalty_rates(self, result):
+        """Check the rates returned by penalty_rate_query"""
         
-        try:
-            result = self.client.query(query).to_dataframe()
+        if not result.empty:
+            std_rate = result['rate_standard_used'].iloc[0]
+            aco_rate = result['rate_aco_used'].iloc[0]
             
-            if not result.empty:
-                std_rate = result['rate_standard_used'].iloc[0]
-                aco_rate = result['rate_aco_used'].iloc[0]
-                
-                if abs(std_rate - PENALTY_RATE_STANDARD) < 0.001 and abs(aco_rate - PENALTY_RATE_ACO) < 0.001:
-                    self.log_update(f"✅ Penalty rates verified: Standard=${std_rate}, ACO=${aco_rate}", "SUCCESS")
-                    return True
-                else:
-                    self.log_update(f"❌ Incorrect rates: Standard=${std_rate} (expected ${PENALTY_RATE_STANDARD}), "
-                                  f"ACO=${aco_rate} (expected ${PENALTY_RATE_ACO})", "ERROR")
-                    return False
+            if abs(std_rate - PENALTY_RATE_STANDARD) < 0.001 and abs(aco_rate - PENALTY_RATE_ACO) < 0.001:
+                self.log_update(f"✅ Penalty rates verified: Standard=${std_rate}, ACO=${aco_rate}", "SUCCESS")
+                return True
             else:
-                self.log_update("No data returned from validation query", "ERROR")
+                self.log_update(f"❌ Incorrect rates: Standard=${std_rate} (expected ${PENALTY_RATE_STANDARD}), "
+                              f"ACO=${aco_rate} (expected ${PENALTY_RATE_ACO})", "ERROR")
                 return False
-                
-        except Exception as e:
-            self.log_update(f"Error validating rates: {str(e)}", "ERROR")
+        else:
+            self.log_update("No data returned from validation query", "ERROR")
             return False
     
     def compare_results(self):
@@ -362,7 +345,21 @@ class BigQueryViewRegenerator:
         
         self.log_update("Comparing opt-in decisions with corrected rates")
         
-        query = f"""
+        query = self.comparison_query()
+        
+        try:
+            result = self.client.query(query).to_dataframe()
+            if self.report_comparison(result):
+                # Test with Building 2952 if it exists
+                self.test_building_2952()
+                
+        except Exception as e:
+            self.log_update(f"Error comparing results: {str(e)}", "ERROR")
+    
+    def comparison_query(self):
+        """SQL summarizing opt-in decisions"""
+        
+        return f"""
         WITH comparison AS (
             SELECT 
                 COUNT(*) as total_buildings,
@@ -375,68 +372,78 @@ class BigQueryViewRegenerator:
         )
         SELECT * FROM comparison
         """
+    
+    def report_comparison(self, result):
+        """Log the opt-in decision summary"""
+        
+        if not result.empty:
+            self.log_update("\n📊 RESULTS WITH CORRECTED RATES:", "INFO")
+            self.log_update(f"Total buildings: {result['total_buildings'].iloc[0]:,}")
+            self.log_update(f"Opt-in recommended: {result['opt_in_count'].iloc[0]:,} ({result['opt_in_rate'].iloc[0]}%)")
+            self.log_update(f"Total standard penalties: ${result['total_standard_penalties'].iloc[0]:,.0f}")
+            self.log_update(f"Total ACO penalties: ${result['total_aco_penalties'].iloc[0]:,.0f}")
+            self.log_update(f"Average NPV advantage of ACO: ${result['avg_npv_advantage'].iloc[0]:,.0f}")
+            return True
+        return False
+    
+    def test_building_2952(self):
+        """Test calculations for Building 2952"""
+        
+        query = self.building_2952_query()
         
         try:
             result = self.client.query(query).to_dataframe()
-            
-            if not result.empty:
-                self.log_update("\n📊 RESULTS WITH CORRECTED RATES:", "INFO")
-                self.log_update(f"Total buildings: {result['total_buildings'].iloc[0]:,}")
-                self.log_update(f"Opt-in recommended: {result['opt_in_count'].iloc[0]:,} ({result['opt_in_rate'].iloc[0]}%)")
-                self.log_update(f"Total standard penalties: ${result['total_standard_penalties'].iloc[0]:,.0f}")
-                self.log_update(f"Total ACO penalties: ${result['total_aco_penalties'].iloc[0]:,.0f}")
-                self.log_update(f"Average NPV advantage of ACO: ${result['avg_npv_advantage'].iloc[0]:,.0f}")
-                
-                # Test with Building 2952 if it exists
-                self.test_building_2952()
+            self.report_building_2952(result)
                 
         except Exception as e:
-            self.log_update(f"Error comparing results: {str(e)}", "ERROR")
+            self.log_update(f"Building 2952 not found or error: {str(e)}", "INFO")
     
-    def test_building_2952(self):
-        """Test calculations for Building 2952"""
+    def building_2952_query(self):
+        """SQL for the Building 2952 test case"""
         
-        query = f"""
+        standard_column, aco_column = _first_penalty_columns()
+        
+        return f"""
         SELECT 
             building_id,
             current_eui,
             gap_first,
             gross_floor_area,
-            penalty_2025_standard,
-            penalty_2028_aco,
+            {standard_column},
+            {aco_column},
             should_opt_in,
             npv_advantage_aco,
             primary_rationale
         FROM `{self.dataset_ref}.opt_in_decision_analysis_v2`
         WHERE building_id = '2952'
         """
+    
+    def report_building_2952(self, result):
+        """Log the Building 2952 calculations against expected values"""
         
-        try:
-            result = self.client.query(query).to_dataframe()
+        if not result.empty:
+            self.log_update("\n🏢 Building 2952 Test Case:", "INFO")
+            row = result.iloc[0]
+            standard_column, aco_column = _first_penalty_columns()
+            standard_year = PENALTY_PLAN.rules.target_years('standard')[0]
+            aco_year = PENALTY_PLAN.rules.target_years('aco')[0]
             
-            if not result.empty:
-                self.log_update("\n🏢 Building 2952 Test Case:", "INFO")
-                row = result.iloc[0]
-                
-                # Manual calculation
-                gap = row['gap_first']
-                sqft = row['gross_floor_area']
-                expected_std = gap * sqft * PENALTY_RATE_STANDARD
-                expected_aco = gap * sqft * PENALTY_RATE_ACO
-                
-                self.log_update(f"Current EUI: {row['current_eui']}")
-                self.log_update(f"Gap (first interim): {gap}")
-                self.log_update(f"Square footage: {sqft:,.0f}")
-                self.log_update(f"2025 penalty (standard): ${row['penalty_2025_standard']:,.2f} "
-                              f"(expected: ${expected_std:,.2f})")
-                self.log_update(f"2028 penalty (ACO): ${row['penalty_2028_aco']:,.2f} "
-                              f"(expected: ${expected_aco:,.2f})")
-                self.log_update(f"Should opt-in: {row['should_opt_in']}")
-                self.log_update(f"NPV advantage: ${row['npv_advantage_aco']:,.2f}")
-                self.log_update(f"Rationale: {row['primary_rationale']}")
-                
-        except Exception as e:
-            self.log_update(f"Building 2952 not found or error: {str(e)}", "INFO")
+            # Manual calculation
+            gap = row['gap_first']
+            sqft = row['gross_floor_area']
+            expected_std = gap * sqft * PENALTY_RATE_STANDARD
+            expected_aco = gap * sqft * PENALTY_RATE_ACO
+            
+            self.log_update(f"Current EUI: {row['current_eui']}")
+            self.log_update(f"Gap (first interim): {gap}")
+            self.log_update(f"Square footage: {sqft:,.0f}")
+            self.log_update(f"{standard_year} penalty (standard): ${row[standard_column]:,.2f} "
+                          f"(expected: ${expected_std:,.2f})")
+            self.log_update(f"{aco_year} penalty (ACO): ${row[aco_column]:,.2f} "
+                          f"(expected: ${expected_aco:,.2f})")
+            self.log_update(f"Should opt-in: {row['should_opt_in']}")
+            self.log_update(f"NPV advantage: ${row['npv_advantage_aco']:,.2f}")
+            self.log_update(f"Rationale: {row['primary_rationale']}")
     
     def generate_summary_report(self):
         """Generate a summary report of the updates"""
@@ -466,7 +473,7 @@ Successfully regenerated BigQuery views with corrected penalty rates:
 
 ## Key Changes
 
-1. **ACO Penalty Rate**: Changed from $0.15 to $0.23 per kBtu (53% increase)
+1. **ACO Penalty Rate**: Changed from $0.15 to ${PENALTY_RATE_ACO:g} per kBtu ({PENALTY_RATE_ACO / 0.15 - 1:.0%} increase)
 2. **Impact**: Fewer buildings recommended to opt-in due to higher ACO penalties
 3. **NPV Calculations**: Now correctly reflect the cost difference between paths
 
@@ -495,13 +502,75 @@ Successfully regenerated BigQuery views with corrected penalty rates:
         
         return report_path
     
-    def run_full_regeneration(self):
-        """Run the complete regeneration process"""
+    def regeneration_jobs(self):
+        """
+        Regeneration steps as scheduler jobs
+        
+        Ordering between drops, views and checks is inferred from the tables
+        each statement creates and reads; the result checks additionally wait
+        for the rate validation, as in the sequential run.
+        """
+        
+        old_views = ['opt_in_decision_analysis', 'building_penalties_v1']
+        jobs = [ViewJob(f"drop_{view}", f"DROP VIEW IF EXISTS `{self.dataset_ref}.{view}`")
+                for view in old_views]
+        jobs += [
+            ViewJob('building_penalties_corrected', self.corrected_penalty_view_query()),
+            ViewJob('opt_in_decision_analysis_v2', self.opt_in_decision_view_query()),
+            ViewJob('validate_penalty_rates', self.penalty_rate_query(),
+                    on_result=self.check_penalty_rates, check=True),
+            ViewJob('compare_results', self.comparison_query(),
+                    depends_on={'validate_penalty_rates'}, on_result=self.report_comparison,
+                    check=True),
+            # Building 2952 is only tested once the comparison found results
+            ViewJob('test_building_2952', self.building_2952_query(),
+                    depends_on={'compare_results'}, on_result=self.report_building_2952)
+        ]
+        return jobs
+    
+    def run_full_regeneration(self, concurrent=True, max_concurrency=8):
+        """
+        Run the complete regeneration process
+        
+        Args:
+            concurrent: Submit independent jobs together (wall time follows the
+                longest dependency chain); False runs every step in sequence
+            max_concurrency: Maximum BigQuery jobs in flight
+        """
         
         self.log_update("="*80)
         self.log_update("BIGQUERY VIEW REGENERATION WITH CORRECTED PENALTY RATES")
         self.log_update("="*80)
         
+        if not concurrent:
+            return self._run_sequential_regeneration()
+        
+        scheduler = ViewScheduler(self.client, max_concurrency=max_concurrency, log=self.log_update)
+        timings = scheduler.run(self.regeneration_jobs())
+        self.log_update("\n⏱️  Job timeline:\n" + scheduler.format_timeline())
+        
+        views = ['building_penalties_corrected', 'opt_in_decision_analysis_v2']
+        self.views_to_update.extend(view for view in views if timings[view].status == 'DONE')
+        
+        if len(self.views_to_update) == len(views):
+            if timings['validate_penalty_rates'].status == 'DONE':
+                self.log_update("\nGenerating summary report", "INFO")
+                self.generate_summary_report()
+                
+                self.log_update("\n✅ REGENERATION COMPLETE!", "SUCCESS")
+                self.log_update(f"Views updated: {', '.join(self.views_to_update)}")
+                
+                return True
+            else:
+                self.log_update("\n❌ Validation failed!", "ERROR")
+                return False
+        else:
+            self.log_update("\n❌ Failed to create all views!", "ERROR")
+            return False
+    
+    def _run_sequential_regeneration(self):
+        """Original one-query-at-a-time regeneration (each step blocks on .result())"""
+        
         # Step 1: Drop old views
         self.log_update("\nStep 1: Dropping old views", "INFO")
         old_views = ['opt_in_decision_analysis', 'building_penalties_v1']
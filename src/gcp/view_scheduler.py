@@ -0,0 +1,273 @@
+"""
+Suggested File Name: view_scheduler.py
+File Location: /Users/robertpadgett/Projects/01_My_Notebooks/500_ED_Risk_Retro_BP/src/gcp/
+Use: Run BigQuery view regeneration jobs concurrently in dependency order
+
+This module:
+1. Builds a dependency DAG from the tables/views each SQL statement creates,
+   drops and reads (plus any explicit dependencies)
+2. Submits every job whose dependencies have finished, without blocking on
+   .result() - jobs are polled asynchronously
+3. Retries transient failures (rate limits, backend errors) with backoff
+4. Skips jobs whose dependencies failed and reports a per-job timeline
+
+Any client with query(sql) -> job, job.done() and job.result() works, so the
+scheduler can be tested against a local fake client.
+"""
+
+import asyncio
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Set
+
+# Statements that (re)define or remove a table/view
+TARGET_PATTERN = re.compile(
+    r"\b(?:CREATE(?:\s+OR\s+REPLACE)?(?:\s+MATERIALIZED)?\s+(?:VIEW|TABLE)(?:\s+IF\s+NOT\s+EXISTS)?"
+    r"|DROP\s+(?:MATERIALIZED\s+)?(?:VIEW|TABLE)(?:\s+IF\s+EXISTS)?"
+    r"|INSERT\s+INTO)\s+`([^`]+)`",
+    re.IGNORECASE
+)
+# Any backticked project.dataset.table / dataset.table reference
+REFERENCE_PATTERN = re.compile(r"`([\w-]+(?:\.[\w-]+){1,2})`")
+
+# HTTP status codes worth retrying (rate limits and backend errors)
+RETRYABLE_CODES = {429, 500, 502, 503, 504}
+RETRYABLE_REASONS = ('rateLimitExceeded', 'backendError', 'internalError', 'jobRateLimitExceeded')
+
+
+def _print_log(message, status="INFO"):
+    print(f"[{status}] {message}")
+
+
+def normalize_table_id(table_id: str) -> str:
+    """dataset.table key for a (project.)dataset.table identifier"""
+    return '.'.join(table_id.lower().split('.')[-2:])
+
+
+def is_retryable(error: Exception) -> bool:
+    """True for transient BigQuery errors (rate limits, 5xx backend errors)"""
+    if getattr(error, 'code', None) in RETRYABLE_CODES:
+        return True
+    return any(reason in str(error) for reason in RETRYABLE_REASONS)
+
+
+@dataclass
+class ViewJob:
+    """One SQL statement in a regeneration run"""
+    name: str
+    sql: str
+    # Extra job names to wait for (on top of those inferred from the SQL)
+    depends_on: Set[str] = field(default_factory=set)
+    # Called with the result DataFrame; its return value is kept as the job output
+    on_result: Optional[Callable[[Any], Any]] = None
+    # When True, a falsy on_result return value marks the job failed
+    check: bool = False
+
+    @property
+    def targets(self) -> Set[str]:
+        """Tables/views this statement creates, replaces, drops or inserts into"""
+        return {normalize_table_id(t) for t in TARGET_PATTERN.findall(self.sql)}
+
+    @property
+    def references(self) -> Set[str]:
+        """Tables/views this statement reads"""
+        return {normalize_table_id(t) for t in REFERENCE_PATTERN.findall(self.sql)} - self.targets
+
+
+@dataclass
+class JobTiming:
+    """Outcome and timing of one scheduled job (seconds from run start)"""
+    name: str
+    status: str = 'PENDING'
+    attempts: int = 0
+    submitted_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    job_id: Optional[str] = None
+    error: Optional[str] = None
+    output: Any = None
+
+    @property
+    def duration(self) -> float:
+        if self.submitted_at is None or self.finished_at is None:
+            return 0.0
+        return self.finished_at - self.submitted_at
+
+
+class ViewScheduler:
+    """Concurrent, dependency-ordered BigQuery job runner"""
+
+    def __init__(self, client, max_concurrency: int = 8, poll_interval: float = 0.5,
+                 max_retries: int = 2, retry_backoff: float = 2.0, log: Callable = _print_log):
+        """
+        Args:
+            client: bigquery.Client (or a fake with the same query/done/result calls)
+            max_concurrency: Maximum jobs running at once
+            poll_interval: Seconds between job.done() checks
+            max_retries: Resubmissions allowed per job for transient errors
+            retry_backoff: Base seconds for exponential retry backoff
+            log: Logger called as log(message, status)
+        """
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self.poll_interval = poll_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.log = log
+        self.timings: Dict[str, JobTiming] = {}
+        self.wall_time = 0.0
+
+    @staticmethod
+    def build_dag(jobs: List[ViewJob]) -> Dict[str, Set[str]]:
+        """
+        Job name -> names of jobs it must wait for
+
+        Jobs keep the order they are listed in wherever they touch the same
+        object: a job waits for earlier jobs that write what it reads or
+        writes, and for earlier jobs that read what it writes. Everything
+        else is free to run concurrently.
+
+        Raises:
+            ValueError: Duplicate job names or unknown explicit dependencies
+        """
+        names = [job.name for job in jobs]
+        if len(set(names)) != len(names):
+            raise ValueError("Job names must be unique")
+
+        dag = {}
+        for k, job in enumerate(jobs):
+            unknown = job.depends_on - set(names)
+            if unknown:
+                raise ValueError(f"{job.name} depends on unknown jobs: {sorted(unknown)}")
+
+            deps = set(job.depends_on)
+            for earlier in jobs[:k]:
+                if (earlier.targets & (job.references | job.targets) or
+                        earlier.references & job.targets):
+                    deps.add(earlier.name)
+            dag[job.name] = deps
+        return dag
+
+    @staticmethod
+    def topological_levels(dag: Dict[str, Set[str]]) -> List[List[str]]:
+        """
+        Group jobs into waves that can run together
+
+        Raises:
+            ValueError: If the dependencies contain a cycle
+        """
+        remaining = {name: set(deps) for name, deps in dag.items()}
+        levels = []
+        while remaining:
+            ready = sorted(name for name, deps in remaining.items() if not deps)
+            if not ready:
+                raise ValueError(f"Dependency cycle among: {sorted(remaining)}")
+            levels.append(ready)
+            for name in ready:
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+        return levels
+
+    def run(self, jobs: List[ViewJob]) -> Dict[str, JobTiming]:
+        """Run all jobs and return their timings (blocking wrapper around run_async)"""
+        return asyncio.run(self.run_async(jobs))
+
+    async def run_async(self, jobs: List[ViewJob]) -> Dict[str, JobTiming]:
+        """
+        Run all jobs, each as soon as its dependencies have succeeded
+
+        Returns:
+            Job name -> JobTiming (status DONE, FAILED or SKIPPED)
+        """
+        dag = self.build_dag(jobs)
+        self.topological_levels(dag)  # fail fast on cycles
+
+        self.timings = {job.name: JobTiming(job.name) for job in jobs}
+        finished = {job.name: asyncio.Event() for job in jobs}
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        start = time.perf_counter()
+
+        async def run_job(job):
+            timing = self.timings[job.name]
+            try:
+                for dep in dag[job.name]:
+                    await finished[dep].wait()
+                failed = sorted(d for d in dag[job.name] if self.timings[d].status != 'DONE')
+                if failed:
+                    timing.status = 'SKIPPED'
+                    timing.error = f"dependency failed: {', '.join(failed)}"
+                    self.log(f"Skipped {job.name} ({timing.error})", "WARNING")
+                    return
+                async with semaphore:
+                    await self._execute(job, timing, start)
+            finally:
+                finished[job.name].set()
+
+        await asyncio.gather(*(run_job(job) for job in jobs))
+        self.wall_time = time.perf_counter() - start
+        return self.timings
+
+    async def _execute(self, job: ViewJob, timing: JobTiming, start: float):
+        """Submit, poll and (if needed) retry one job"""
+        while True:
+            timing.attempts += 1
+            if timing.submitted_at is None:
+                timing.submitted_at = time.perf_counter() - start
+            try:
+                query_job = await asyncio.to_thread(self.client.query, job.sql)
+                timing.job_id = getattr(query_job, 'job_id', None)
+                while not await asyncio.to_thread(query_job.done):
+                    await asyncio.sleep(self.poll_interval)
+                result = await asyncio.to_thread(query_job.result)
+
+                if job.on_result is not None:
+                    frame = (await asyncio.to_thread(result.to_dataframe)
+                             if hasattr(result, 'to_dataframe') else result)
+                    timing.output = job.on_result(frame)
+                    if job.check and not timing.output:
+                        raise RuntimeError("result check failed")
+
+                timing.status = 'DONE'
+                timing.finished_at = time.perf_counter() - start
+                self.log(f"Finished {job.name} in {timing.duration:.1f}s", "SUCCESS")
+                return
+            except Exception as e:
+                if is_retryable(e) and timing.attempts <= self.max_retries:
+                    delay = self.retry_backoff * 2 ** (timing.attempts - 1)
+                    self.log(f"Retrying {job.name} in {delay:.1f}s: {str(e)}", "WARNING")
+                    await asyncio.sleep(delay)
+                    continue
+                timing.status = 'FAILED'
+                timing.error = str(e)
+                timing.finished_at = time.perf_counter() - start
+                self.log(f"Error in {job.name}: {str(e)}", "ERROR")
+                return
+
+    def format_timeline(self, width: int = 40) -> str:
+        """
+        Text timeline of the last run - one bar per job on a shared time axis
+
+        Returns:
+            Multi-line report including wall time vs. summed job time
+        """
+        if not self.timings:
+            return "No jobs run"
+
+        span = max(self.wall_time, 1e-9)
+        name_width = max(len(name) for name in self.timings)
+        lines = [f"{'job':<{name_width}}  {'start':>7} {'end':>7}  {'try':>3}  {'status':<7}  timeline"]
+        for name, t in sorted(self.timings.items(),
+                              key=lambda item: (item[1].submitted_at is None, item[1].submitted_at or 0)):
+            if t.submitted_at is None:
+                lines.append(f"{name:<{name_width}}  {'-':>7} {'-':>7}  {t.attempts:>3}  {t.status:<7}")
+                continue
+            left = int(round(t.submitted_at / span * width))
+            right = max(int(round(t.finished_at / span * width)), left + 1)
+            bar = ' ' * left + '█' * (right - left)
+            lines.append(f"{name:<{name_width}}  {t.submitted_at:>6.1f}s {t.finished_at:>6.1f}s  "
+                         f"{t.attempts:>3}  {t.status:<7}  |{bar:<{width}}|")
+
+        serial = sum(t.duration for t in self.timings.values())
+        lines.append(f"Wall time {self.wall_time:.1f}s vs {serial:.1f}s if run one after another")
+        return '\n'.join(lines)
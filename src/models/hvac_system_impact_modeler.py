@@ -60,6 +60,9 @@ class HVACSystemImpactModeler:
         # Initialize penalty calculator
         self.penalty_calc = EnergizeDenverPenaltyCalculator()
         
+        # (heating, cooling, other) fractions from a degree-day fit, if set
+        self.measured_split = None
+        
     def _load_building_data(self) -> Dict:
         """Load current building data"""
         building_row = self.df[self.df['Building ID'] == self.building_id]
@@ -89,13 +92,32 @@ class HVACSystemImpactModeler:
             'final_target': pd.to_numeric(data.get('Adjusted Final Target EUI', 0), errors='coerce'),
         }
     
+    def use_degree_day_fit(self, fits) -> bool:
+        """
+        Use the heating/cooling split measured by a degree-day change-point fit
+        
+        Args:
+            fits: ChangePointFits (utils.degree_days) covering this building
+            
+        Returns:
+            True if the building was fitted (otherwise the heuristic split stays)
+        """
+        self.measured_split = fits.energy_split(self.building_id)
+        return self.measured_split is not None
+    
     def calculate_heating_cooling_split(self) -> Tuple[float, float]:
         """
         Estimate heating vs cooling energy split based on building type and current usage
         
+        Uses the measured split from use_degree_day_fit() when available.
+        
         Returns:
             Tuple of (heating_fraction, cooling_fraction)
         """
+        if self.measured_split is not None:
+            heating_fraction, cooling_fraction, _ = self.measured_split
+            return heating_fraction, cooling_fraction
+        
         # For multifamily in Denver, typical split
         if 'multifamily' in self.building_data['property_type'].lower():
             # Most gas is for heating/hot water
@@ -0,0 +1,182 @@
+"""
+Suggested File Name: cli_daemon.py
+File Location: /Users/robertpadgett/Projects/01_My_Notebooks/500_ED_Risk_Retro_BP/src/utils/
+Use: Optional long-lived process that runs CLI invocations with warm imports and data
+
+This module:
+1. Serves CLI requests over a local Unix socket, one JSON line each way:
+   {"argv": [...], "cwd": "..."} -> {"exit_code": 0, "stdout": "...", "stderr": "..."}
+2. Runs requests one at a time in the daemon process, so pandas/matplotlib,
+   the analysis modules and the parsed data catalog (utils/data_catalog.py)
+   stay loaded between invocations
+3. Provides the client side (ping, run, shutdown) used by run_analysis_cli.py
+   to forward a run when a daemon is listening
+
+Only the standard library is imported here so the client costs nothing at
+CLI startup.
+
+Run:
+    python run_analysis_cli.py --serve-daemon     # foreground daemon
+    python run_analysis_cli.py --building-id 1234 # forwarded while it runs
+    python run_analysis_cli.py --stop-daemon
+"""
+
+import contextlib
+import io
+import json
+import os
+import socket
+import socketserver
+import tempfile
+import threading
+import traceback
+from typing import Callable, Dict, List, Optional
+
+DEFAULT_SOCKET_PATH = os.environ.get(
+    'ED_CLI_SOCKET',
+    os.path.join(tempfile.gettempdir(), f"ed_analysis_cli_{os.getuid()}.sock"))
+
+# Handler signature: argv -> exit code (None means 0)
+Handler = Callable[[List[str]], Optional[int]]
+
+
+def run_captured(handler: Handler, argv: List[str], cwd: Optional[str] = None) -> Dict:
+    """
+    Run handler(argv) with stdout/stderr captured and SystemExit turned into an exit code
+
+    Args:
+        handler: CLI entry point
+        argv: Arguments as typed by the user
+        cwd: Working directory of the calling shell (relative paths resolve there)
+    """
+    stdout, stderr = io.StringIO(), io.StringIO()
+    previous = os.getcwd()
+    exit_code = 0
+    try:
+        if cwd:
+            os.chdir(cwd)
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            try:
+                exit_code = handler(argv) or 0
+            except SystemExit as e:
+                exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+                if e.code is not None and not isinstance(e.code, int):
+                    print(e.code, file=stderr)
+            except Exception:
+                traceback.print_exc()
+                exit_code = 1
+    finally:
+        os.chdir(previous)
+    return {'exit_code': exit_code, 'stdout': stdout.getvalue(), 'stderr': stderr.getvalue()}
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as e:
+            response = {'exit_code': 2, 'stdout': '', 'stderr': f"Invalid request: {e}\n"}
+        else:
+            response = self.server.daemon.dispatch(request)
+        self.wfile.write(json.dumps(response).encode() + b'\n')
+
+
+class _UnixServer(socketserver.UnixStreamServer):
+    # Requests share module-level state (config, stdout), so they run serially
+    def __init__(self, path: str, daemon: 'CLIDaemon'):
+        self.daemon = daemon
+        super().__init__(path, _RequestHandler)
+
+
+class CLIDaemon:
+    """Serves CLI invocations from one warm process"""
+
+    def __init__(self, handler: Handler, socket_path: str = DEFAULT_SOCKET_PATH,
+                 warm: Optional[Callable[[], None]] = None):
+        """
+        Args:
+            handler: CLI entry point called with each request's argv
+            socket_path: Unix socket to listen on
+            warm: Called once before serving (preload modules and data)
+        """
+        self.handler = handler
+        self.socket_path = socket_path
+        self.warm = warm
+        self.requests_served = 0
+        self._server: Optional[_UnixServer] = None
+
+    def dispatch(self, request: Dict) -> Dict:
+        command = request.get('command', 'run')
+        if command == 'ping':
+            return {'exit_code': 0, 'stdout': '', 'stderr': '', 'pid': os.getpid(),
+                    'requests_served': self.requests_served}
+        if command == 'shutdown':
+            # shutdown() blocks until serve_forever returns, so hand it off
+            threading.Thread(target=self._server.shutdown, daemon=True).start()
+            return {'exit_code': 0, 'stdout': 'Daemon stopped\n', 'stderr': ''}
+        if command != 'run':
+            return {'exit_code': 2, 'stdout': '', 'stderr': f"Unknown command: {command}\n"}
+
+        self.requests_served += 1
+        return run_captured(self.handler, list(request.get('argv', [])), request.get('cwd'))
+
+    def bind(self):
+        """Create the socket (replacing a stale one left by a dead daemon)"""
+        if os.path.exists(self.socket_path):
+            if ping(self.socket_path) is not None:
+                raise RuntimeError(f"A daemon is already listening on {self.socket_path}")
+            os.unlink(self.socket_path)
+        self._server = _UnixServer(self.socket_path, self)
+        os.chmod(self.socket_path, 0o600)
+
+    def serve_forever(self):
+        if self._server is None:
+            self.bind()
+        try:
+            if self.warm is not None:
+                self.warm()
+            print(f"🚀 CLI daemon (pid {os.getpid()}) listening on {self.socket_path}")
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+
+def _send(socket_path: str, request: Dict, timeout: Optional[float] = None) -> Dict:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        sock.sendall(json.dumps(request).encode() + b'\n')
+        with sock.makefile('rb') as stream:
+            line = stream.readline()
+    if not line:
+        raise ConnectionError("Daemon closed the connection without answering")
+    return json.loads(line)
+
+
+def ping(socket_path: str = DEFAULT_SOCKET_PATH, timeout: float = 0.5) -> Optional[Dict]:
+    """Daemon status, or None when no daemon is listening"""
+    if not os.path.exists(socket_path):
+        return None
+    try:
+        return _send(socket_path, {'command': 'ping'}, timeout)
+    except (OSError, ValueError):
+        return None
+
+
+def run_remote(argv: List[str], socket_path: str = DEFAULT_SOCKET_PATH,
+               cwd: Optional[str] = None) -> Dict:
+    """Run one CLI invocation in the daemon; returns exit_code/stdout/stderr"""
+    return _send(socket_path, {'command': 'run', 'argv': list(argv), 'cwd': cwd or os.getcwd()})
+
+
+def shutdown(socket_path: str = DEFAULT_SOCKET_PATH) -> bool:
+    """Ask a running daemon to exit; False when none was listening"""
+    if ping(socket_path) is None:
+        return False
+    _send(socket_path, {'command': 'shutdown'}, timeout=5)
+    return True
@@ -0,0 +1,272 @@
+"""
+Suggested File Name: compliance_path_optimizer.py
+File Location: /Users/robertpadgett/Projects/01_My_Notebooks/500_ED_Risk_Retro_BP/src/utils/
+Use: Optimal compliance path and retrofit timing for every building at once
+
+This module:
+1. Solves, per building, the choice of compliance path (standard and ACO by
+   default; timeline extension only where a building is allowed it) together
+   with a staged retrofit plan, minimizing discounted penalties plus retrofit
+   capex through 2042
+2. Uses backward induction over the years with the installed retrofit depth
+   as the state: in any retrofit year a building may stay, or deepen to any
+   deeper package for the difference in capex, so a light retrofit now can
+   grow into a deep one later - a handful of (depth x buildings) array
+   operations per year, so the whole portfolio solves in milliseconds
+3. Compares each path at its optimal retrofit plan instead of the static
+   "no improvement" schedules of compare_compliance_paths
+4. Returns a CompliancePolicy the analyzer's hybrid scenario can use in
+   place of the OptInPredictor rule cascade
+"""
+
+from dataclasses import dataclass, replace
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .penalty_cube import DISCOUNT_RATE, YEARS
+from .penalty_monte_carlo import PATH_CODES, MonteCarloInputs, penalty_schedule
+from .penalty_plan import PenaltyPlan
+from .retrofit_optimizer import RetrofitOption, default_options
+
+PATHS = ('standard', 'aco', 'extension')
+
+
+@dataclass
+class PathParams:
+    """Economic settings of the path / retrofit decision"""
+    # Timeline extensions need the city's approval - offer them per building
+    # through optimize_compliance(allowed=...) with 'extension' added here
+    paths: tuple = ('standard', 'aco')
+    retrofit_years: tuple = tuple(range(2025, 2036))  # years a retrofit may be completed
+    discount_rate: float = DISCOUNT_RATE
+    base_year: int = 2025
+    itc_share: float = 0.40 * 0.95   # capex credit on ITC-eligible (electrification) options
+
+
+@dataclass
+class CompliancePolicy:
+    """Optimal path and retrofit plan per building"""
+    building_ids: np.ndarray
+    property_types: np.ndarray
+    paths: tuple
+    path: np.ndarray            # chosen path name per building
+    option: np.ndarray          # final retrofit option name ('' = no retrofit)
+    retrofit_year: np.ndarray   # completion year of the first stage (0 = no retrofit)
+    path_npv: np.ndarray        # (paths, buildings) penalties + capex NPV at each path's optimum
+    static_npv: np.ndarray      # (paths, buildings) penalty NPV with no retrofit
+    penalty_npv: np.ndarray
+    capex_npv: np.ndarray
+    penalties: np.ndarray       # (years, buildings) nominal penalties under the policy
+    states: np.ndarray          # (years, buildings) installed option index (-1 = none)
+    options: tuple              # option names indexed by states
+    years: tuple = YEARS
+
+    def __len__(self) -> int:
+        return len(self.building_ids)
+
+    @property
+    def npv(self) -> np.ndarray:
+        """Total cost (penalties + capex NPV) of the chosen plan"""
+        return self.penalty_npv + self.capex_npv
+
+    def savings_vs_static(self) -> np.ndarray:
+        """NPV saved against the cheapest path with no retrofit"""
+        return self.static_npv.min(axis=0) - self.npv
+
+    def decision(self, building_id) -> Optional[Dict]:
+        """Chosen path, retrofit and path NPVs for one building (None if unknown)"""
+        index = self._positions().get(str(building_id))
+        if index is None:
+            return None
+        npvs = self.path_npv[:, index]
+        ranked = np.sort(npvs[np.isfinite(npvs)])   # disallowed paths are inf
+        return {
+            'path': str(self.path[index]),
+            'option': str(self.option[index]),
+            'retrofit_year': int(self.retrofit_year[index]),
+            'npv': float(self.npv[index]),
+            'path_npv': dict(zip(self.paths, npvs.tolist())),
+            'margin': float(ranked[1] - ranked[0]) if len(ranked) > 1 else 0.0,
+            'stages': self.stages(index),
+            'penalties': dict(zip(self.years, self.penalties[:, index].tolist())),
+        }
+
+    def stages(self, index: int):
+        """[(completion year, option name)] of one building's retrofit plan"""
+        states = self.states[:, index]
+        previous = np.concatenate([[-1], states[:-1]])
+        return [(int(self.years[t]), self.options[states[t]])
+                for t in np.flatnonzero(states != previous)]
+
+    def _positions(self) -> Dict[str, int]:
+        if not hasattr(self, '_index'):
+            self._index = {b: i for i, b in enumerate(self.building_ids)}
+        return self._index
+
+    def frame(self) -> pd.DataFrame:
+        """One row per building with the plan and each path's optimal NPV"""
+        table = pd.DataFrame({
+            'building_id': self.building_ids,
+            'property_type': self.property_types,
+            'path': self.path,
+            'retrofit_option': self.option,
+            'retrofit_year': self.retrofit_year,
+            'retrofit_stages': (np.diff(self.states, axis=0, prepend=-1) != 0).sum(axis=0),
+            'penalty_npv': self.penalty_npv,
+            'capex_npv': self.capex_npv,
+            'total_npv': self.npv,
+            'savings_vs_static': self.savings_vs_static(),
+        })
+        for p, path in enumerate(self.paths):
+            table[f'{path}_npv'] = self.path_npv[p]
+        return table
+
+    def summary(self) -> Dict:
+        return {
+            'buildings': len(self),
+            'paths': pd.Series(self.path).value_counts().to_dict(),
+            'retrofits': pd.Series(self.option[self.option != '']).value_counts().to_dict(),
+            'total_npv': float(self.npv.sum()),
+            'penalty_npv': float(self.penalty_npv.sum()),
+            'capex_npv': float(self.capex_npv.sum()),
+            'static_best_npv': float(self.static_npv.min(axis=0).sum()),
+        }
+
+
+def optimize_compliance(inputs: MonteCarloInputs, options: Sequence[RetrofitOption] = None,
+                        params: Optional[PathParams] = None,
+                        plan: Optional[PenaltyPlan] = None,
+                        allowed: Optional[np.ndarray] = None) -> CompliancePolicy:
+    """
+    Cheapest path and staged retrofit plan for every building
+
+    Args:
+        inputs: Per-building arrays (MonteCarloInputs.from_frame; the
+            path column is ignored)
+        options: Retrofit depths to consider (default_options())
+        params: PathParams
+        plan: Compiled penalty rules (config/penalty_rules.json by default)
+        allowed: Optional (len(params.paths), buildings) bool mask of the
+            paths each building may take (e.g. approved timeline
+            extensions); every path in params.paths when omitted
+
+    Returns:
+        CompliancePolicy
+    """
+    params = params or PathParams()
+    options = tuple(options or default_options())
+    years = np.asarray(YEARS)
+    n = len(inputs)
+    columns = np.arange(n)
+    discount = (1 + params.discount_rate) ** -(years - params.base_year).clip(min=0)
+    sqft = np.nan_to_num(inputs.sqft)
+    eui = np.nan_to_num(inputs.current_eui)
+    if allowed is None:
+        allowed = np.ones((len(params.paths), n), dtype=bool)
+    allowed = np.asarray(allowed, dtype=bool)
+    if allowed.shape != (len(params.paths), n):
+        raise ValueError(f"allowed must be (paths, buildings) = ({len(params.paths)}, {n}), "
+                         f"got {allowed.shape}")
+    if n and not allowed.any(axis=0).all():
+        raise ValueError("Every building needs at least one allowed path")
+
+    # State 0 = no retrofit, state k = option k-1 installed
+    factors = np.concatenate([[1.0], [1 - o.eui_reduction for o in options]])
+    credit = np.array([params.itc_share if o.itc_eligible else 0.0 for o in options])
+    capex = (np.array([o.cost_per_sqft for o in options]) * (1 - credit))[:, None] * sqft[None, :]
+    capex = np.concatenate([np.zeros((1, n)), capex])                        # (states, buildings)
+    # Deepening from state k to a deeper state j costs the difference in capex
+    deeper = [np.flatnonzero(factors < factors[k]) for k in range(len(factors))]
+    retrofit_year = np.isin(years, params.retrofit_years)
+    state_eui = eui[None, :] * factors[:, None]                                # (states, buildings)
+
+    path_npv = np.empty((len(params.paths), n))
+    static_npv = np.empty((len(params.paths), n))
+    path_states = np.empty((len(params.paths), len(years), n), dtype=np.int64)
+    schedules = []
+    for p, path in enumerate(params.paths):
+        path_inputs = replace(inputs, path_codes=np.full(n, PATH_CODES[path], dtype=np.int8))
+        targets, rates = penalty_schedule(path_inputs, YEARS, plan)
+        schedules.append((targets, rates))
+        # Discounted penalty of each year in each state (years, states, buildings)
+        dollars = rates * sqft[None, :] * discount[:, None]
+        cost = np.maximum(state_eui[None, :, :] - targets[:, None, :], 0) * dollars[:, None, :]
+
+        # value[k] = cost from year t on when entering year t in state k
+        value = np.zeros((len(factors), n))
+        actions = np.broadcast_to(np.arange(len(factors))[None, :, None],
+                                  (len(years), len(factors), n)).copy()
+        for t in range(len(years) - 1, -1, -1):
+            value = cost[t] + value
+            if retrofit_year[t]:
+                # Retrofit (or deepen) completed in year t: pay the capex, take the depth from year t on
+                stay = value.copy()
+                for k, targets_k in enumerate(deeper):
+                    if not len(targets_k):
+                        continue
+                    switch = (np.maximum(capex[targets_k] - capex[k], 0) * discount[t]
+                              + stay[targets_k])
+                    best = switch.argmin(axis=0)
+                    better = switch[best, columns] < stay[k]
+                    value[k] = np.where(better, switch[best, columns], stay[k])
+                    actions[t, k] = np.where(better, targets_k[best], k)
+        path_npv[p] = np.where(allowed[p], value[0], np.inf)
+        static_npv[p] = np.where(allowed[p], cost[:, 0, :].sum(axis=0), np.inf)
+
+        # Forward pass: installed state in every year
+        state = np.zeros(n, dtype=np.int64)
+        for t in range(len(years)):
+            state = actions[t, state, columns]
+            path_states[p, t] = state
+
+    chosen = path_npv.argmin(axis=0)
+    states = path_states[chosen, :, columns].T                               # (years, buildings)
+    previous = np.vstack([np.zeros((1, n), dtype=np.int64), states[:-1]])
+    installed = states > 0
+    first = installed.argmax(axis=0)
+    retrofitted = installed.any(axis=0)
+
+    # Nominal yearly penalties and cost split of the chosen plans
+    targets = np.stack([s[0] for s in schedules])[chosen, :, columns].T       # (years, buildings)
+    rates = np.stack([s[1] for s in schedules])[chosen, :, columns].T
+    yearly_eui = state_eui[states, columns[None, :]]
+    penalties = np.maximum(yearly_eui - targets, 0) * rates * sqft[None, :]
+    upgrade = np.maximum(capex[states, columns[None, :]] - capex[previous, columns[None, :]], 0)
+    capex_npv = ((states != previous) * upgrade * discount[:, None]).sum(axis=0)
+
+    names = np.array([''] + [o.name for o in options], dtype=object)
+    return CompliancePolicy(
+        building_ids=inputs.building_ids,
+        property_types=inputs.property_types,
+        paths=tuple(params.paths),
+        path=np.array(params.paths, dtype=object)[chosen],
+        option=names[states[-1]] if len(years) else np.full(n, '', dtype=object),
+        retrofit_year=np.where(retrofitted, years[first], 0),
+        path_npv=path_npv,
+        static_npv=static_npv,
+        penalty_npv=(penalties * discount[:, None]).sum(axis=0),
+        capex_npv=capex_npv,
+        penalties=penalties,
+        states=states - 1,
+        options=tuple(o.name for o in options),
+    )
+
+
+def print_policy(policy: CompliancePolicy):
+    """Console summary of an optimized compliance policy"""
+    summary = policy.summary()
+    print("\n🧭 OPTIMAL COMPLIANCE PATHS")
+    print("=" * 60)
+    for path in policy.paths:
+        count = summary['paths'].get(path, 0)
+        print(f"  {path:<10} {count:>6,} buildings ({count / max(len(policy), 1) * 100:.1f}%)")
+    print("\n  Retrofits:")
+    for option, count in summary['retrofits'].items():
+        years = policy.retrofit_year[policy.option == option]
+        print(f"    {option:<15} {count:>6,} (median year {int(np.median(years))})")
+    print(f"\n  Penalty NPV: ${summary['penalty_npv']:,.0f}")
+    print(f"  Capex NPV:   ${summary['capex_npv']:,.0f}")
+    print(f"  Total NPV:   ${summary['total_npv']:,.0f} "
+          f"(vs ${summary['static_best_npv']:,.0f} on the best path with no retrofit)")
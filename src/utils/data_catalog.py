@@ -0,0 +1,58 @@
+"""
+Suggested File Name: data_catalog.py
+File Location: /Users/robertpadgett/Projects/01_My_Notebooks/500_ED_Risk_Retro_BP/src/utils/
+Use: Process-wide cache of parsed data files shared by the analysis modules
+
+This module:
+1. Memoizes pd.read_csv per (file, modification time, size, read options) so a
+   file is parsed once per process no matter how many analyzers load it
+2. Re-reads a file automatically when it changes on disk
+3. Hands every caller its own copy, so callers may add or convert columns
+   without affecting each other
+
+In a one-shot script this only saves the repeated reads within one run; in the
+warm CLI daemon (utils/cli_daemon.py) it keeps the catalog parsed between runs.
+"""
+
+import os
+from typing import Dict, List, Tuple
+
+import pandas as pd
+
+_FRAMES: Dict[str, Tuple[tuple, pd.DataFrame]] = {}
+
+
+def _signature(path: str, kwargs: Dict) -> tuple:
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size, repr(sorted(kwargs.items())))
+
+
+def read_csv(path, **kwargs) -> pd.DataFrame:
+    """
+    pd.read_csv with a process-wide cache
+
+    Args:
+        path: CSV file
+        **kwargs: Passed to pd.read_csv (part of the cache key)
+
+    Returns:
+        A copy of the parsed frame
+    """
+    path = os.path.abspath(os.fspath(path))
+    signature = _signature(path, kwargs)
+    key = path + '|' + signature[2]
+
+    cached = _FRAMES.get(key)
+    if cached is None or cached[0] != signature:
+        _FRAMES[key] = cached = (signature, pd.read_csv(path, **kwargs))
+    return cached[1].copy()
+
+
+def cached_files() -> List[str]:
+    """Paths currently held in the catalog"""
+    return sorted({key.split('|', 1)[0] for key in _FRAMES})
+
+
+def clear():
+    """Drop every cached frame"""
+    _FRAMES.clear()
@@ -0,0 +1,382 @@
+"""
+Suggested File Name: degree_days.py
+File Location: /Users/robertpadgett/Projects/01_My_Notebooks/500_ED_Risk_Retro_BP/src/utils/
+Use: Degree-day weather normalization of monthly building energy use
+
+This module:
+1. Reads the Portfolio Manager "Monthly Energy Use" workbooks (Monthly Usage
+   sheet, keyed to Denver Building IDs through the Information and Metrics
+   sheet) into one long building x month table
+2. Reads daily temperatures from a local weather CSV (NOAA daily format:
+   DATE plus TAVG, or TMAX / TMIN) and builds monthly heating and cooling
+   degree days for a grid of balance points
+3. Fits 2P (baseload only), 3PH / 3PC (heating or cooling change point) and
+   5P (both) models of daily-average energy against degree days for every
+   building at once: each candidate balance point is a closed-form least
+   squares solve over all buildings, and the best model per building is
+   chosen by BIC
+4. Reports normalized annual energy / EUI for a normal weather year, balance
+   points and heating / cooling slopes, and the measured heating / cooling
+   / other split used by the HVAC models
+"""
+
+import calendar
+from dataclasses import dataclass
+from typing import Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+MONTHLY_SHEET = 'Monthly Usage'
+INFO_SHEET = 'Information and Metrics'
+PM_ID = 'Portfolio Manager Property ID'
+DENVER_ID = 'Standard ID - City/Town ID'
+
+HEATING_BALANCE_POINTS = tuple(range(40, 72, 2))   # deg F
+COOLING_BALANCE_POINTS = tuple(range(50, 82, 2))
+MODELS = ('2P', '3PH', '3PC', '5P')
+# Free parameters per model (coefficients plus balance points) for BIC
+MODEL_PARAMETERS = {'2P': 1, '3PH': 3, '3PC': 3, '5P': 5}
+
+
+def _read_sheet(path: str, sheet: str, first_header: str) -> pd.DataFrame:
+    """Read a Portfolio Manager sheet whose header row follows a few title rows"""
+    raw = pd.read_excel(path, sheet_name=sheet, header=None)
+    header_row = raw.index[raw.iloc[:, 0].astype(str).str.strip() == first_header][0]
+    frame = raw.iloc[header_row + 1:].reset_index(drop=True)
+    frame.columns = [str(col).strip() for col in raw.iloc[header_row]]
+    return frame
+
+
+def _month_starts(values: pd.Series) -> pd.Series:
+    """Month labels ('Jan-23' text or Excel dates) -> month-start timestamps"""
+    months = pd.to_datetime(values, format='%b-%y', errors='coerce')
+    months = months.fillna(pd.to_datetime(values, errors='coerce'))
+    return months.dt.to_period('M').dt.to_timestamp()
+
+
+def load_monthly_energy(paths: Iterable[str]) -> pd.DataFrame:
+    """
+    Long monthly energy table from Monthly Energy Use workbooks
+
+    Returns:
+        DataFrame with building_id (Denver Building ID), month (month start)
+        and total_kbtu (sum of every fuel's monthly kBtu; 'Not Available' = 0,
+        months with no fuel reported are dropped)
+    """
+    frames = []
+    for path in paths:
+        usage = _read_sheet(path, MONTHLY_SHEET, PM_ID)
+        info = _read_sheet(path, INFO_SHEET, PM_ID)
+        ids = info.set_index(info[PM_ID].astype(str))[DENVER_ID].astype(str)
+
+        fuels = [col for col in usage.columns if col.endswith('Monthly (kBtu)')]
+        values = usage[fuels].apply(pd.to_numeric, errors='coerce')
+        frames.append(pd.DataFrame({
+            'building_id': usage[PM_ID].astype(str).map(ids),
+            'month': _month_starts(usage['Month']),
+            'total_kbtu': values.sum(axis=1, min_count=1),
+        }))
+
+    monthly = pd.concat(frames, ignore_index=True).dropna()
+    # Later workbooks restate earlier months: keep the last report of each
+    return monthly.drop_duplicates(['building_id', 'month'], keep='last').reset_index(drop=True)
+
+
+def load_weather(csv_path: str) -> pd.Series:
+    """Daily mean temperature (deg F) indexed by date from a local weather CSV"""
+    weather = pd.read_csv(csv_path)
+    columns = {col.upper(): col for col in weather.columns}
+    dates = pd.to_datetime(weather[columns['DATE']])
+    if 'TAVG' in columns and weather[columns['TAVG']].notna().any():
+        temps = pd.to_numeric(weather[columns['TAVG']], errors='coerce')
+        if 'TMAX' in columns and 'TMIN' in columns:
+            midpoint = (pd.to_numeric(weather[columns['TMAX']], errors='coerce')
+                        + pd.to_numeric(weather[columns['TMIN']], errors='coerce')) / 2
+            temps = temps.fillna(midpoint)
+    else:
+        temps = (pd.to_numeric(weather[columns['TMAX']], errors='coerce')
+                 + pd.to_numeric(weather[columns['TMIN']], errors='coerce')) / 2
+    return pd.Series(temps.to_numpy(), index=dates, name='temperature').sort_index().dropna()
+
+
+def monthly_degree_days(temps: pd.Series, balance_points: Sequence[float],
+                        kind: str = 'heating') -> pd.DataFrame:
+    """
+    Monthly degree-day totals for each balance point
+
+    Days missing from the weather record are filled with their month's mean.
+
+    Returns:
+        DataFrame indexed by month start, one column per balance point
+    """
+    t = temps.to_numpy()[:, None]
+    bp = np.asarray(balance_points, dtype=np.float64)[None, :]
+    daily = np.maximum(bp - t, 0) if kind == 'heating' else np.maximum(t - bp, 0)
+    months = temps.index.to_period('M').to_timestamp()
+    mean = pd.DataFrame(daily, index=months, columns=list(balance_points)).groupby(level=0).mean()
+    return mean.mul(mean.index.days_in_month, axis=0)
+
+
+def normal_degree_days(temps: pd.Series, balance_points: Sequence[float],
+                       kind: str = 'heating') -> np.ndarray:
+    """Average annual degree days per balance point over the complete years in temps"""
+    days = temps.groupby(temps.index.year).size()
+    complete = [year for year, n in days.items() if n >= (366 if calendar.isleap(year) else 365) - 5]
+    if not complete:
+        raise ValueError("Weather data has no complete year for degree-day normals")
+    monthly = monthly_degree_days(temps[temps.index.year.isin(complete)], balance_points, kind)
+    return monthly.to_numpy().sum(axis=0) / len(complete)
+
+
+def _solve3(a: np.ndarray, b: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Cramer's-rule solve of many 3x3 systems (a: (..., 3, 3), b: (..., 3))"""
+    def det(m):
+        return (m[..., 0, 0] * (m[..., 1, 1] * m[..., 2, 2] - m[..., 1, 2] * m[..., 2, 1])
+                - m[..., 0, 1] * (m[..., 1, 0] * m[..., 2, 2] - m[..., 1, 2] * m[..., 2, 0])
+                + m[..., 0, 2] * (m[..., 1, 0] * m[..., 2, 1] - m[..., 1, 1] * m[..., 2, 0]))
+
+    d = det(a)
+    safe = np.where(np.abs(d) > 1e-9, d, np.nan)
+    solution = np.empty(b.shape)
+    for k in range(3):
+        replaced = a.copy()
+        replaced[..., :, k] = b
+        solution[..., k] = det(replaced) / safe
+    return solution, np.isfinite(safe)
+
+
+@dataclass
+class ChangePointFits:
+    """Best change-point model per building"""
+    building_ids: np.ndarray
+    model: np.ndarray              # '2P' / '3PH' / '3PC' / '5P' ('' when not fitted)
+    baseload: np.ndarray           # kBtu per day
+    heating_slope: np.ndarray      # kBtu per heating degree day
+    cooling_slope: np.ndarray      # kBtu per cooling degree day
+    heating_balance: np.ndarray    # deg F (NaN without a heating term)
+    cooling_balance: np.ndarray
+    r2: np.ndarray
+    cv_rmse: np.ndarray
+    months: np.ndarray
+    normal_baseload: np.ndarray    # kBtu per normal year
+    normal_heating: np.ndarray
+    normal_cooling: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.building_ids)
+
+    @property
+    def normalized_annual_kbtu(self) -> np.ndarray:
+        return self.normal_baseload + self.normal_heating + self.normal_cooling
+
+    def normalized_eui(self, sqft) -> pd.Series:
+        """Weather-normalized site EUI (kBtu/sqft) given floor area by building ID"""
+        sqft = pd.Series(sqft).rename(index=str).reindex(self.building_ids).to_numpy(dtype=np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            eui = self.normalized_annual_kbtu / sqft
+        return pd.Series(eui, index=self.building_ids, name='normalized_eui')
+
+    def energy_split(self, building_id) -> Optional[Tuple[float, float, float]]:
+        """Measured (heating, cooling, other) fractions of normal-year energy, None if unfitted"""
+        rows = np.flatnonzero(self.building_ids == str(building_id))
+        if not len(rows) or not self.model[rows[0]]:
+            return None
+        i = rows[0]
+        total = self.normalized_annual_kbtu[i]
+        if not total > 0:
+            return None
+        heating = self.normal_heating[i] / total
+        cooling = self.normal_cooling[i] / total
+        return float(heating), float(cooling), float(1 - heating - cooling)
+
+    def frame(self) -> pd.DataFrame:
+        """One row per building with model, coefficients, fit quality and normal-year energy"""
+        return pd.DataFrame({
+            'building_id': self.building_ids,
+            'model': self.model,
+            'baseload_kbtu_per_day': self.baseload,
+            'heating_slope_kbtu_per_hdd': self.heating_slope,
+            'cooling_slope_kbtu_per_cdd': self.cooling_slope,
+            'heating_balance_f': self.heating_balance,
+            'cooling_balance_f': self.cooling_balance,
+            'r2': self.r2,
+            'cv_rmse': self.cv_rmse,
+            'months': self.months,
+            'normalized_annual_kbtu': self.normalized_annual_kbtu,
+            'heating_kbtu': self.normal_heating,
+            'cooling_kbtu': self.normal_cooling,
+        })
+
+
+class DegreeDayNormalizer:
+    """
+    Batched change-point regression of monthly energy on degree days
+
+    Each month's energy is modeled as days x baseload + heating slope x
+    HDD(heating balance) + cooling slope x CDD(cooling balance); slopes
+    must be positive and the cooling balance point at or above the heating
+    one. Normal-year energy applies the fitted model to the average annual
+    degree days of the weather record.
+    """
+
+    def __init__(self, temps: pd.Series,
+                 heating_balance_points: Sequence[float] = HEATING_BALANCE_POINTS,
+                 cooling_balance_points: Sequence[float] = COOLING_BALANCE_POINTS,
+                 min_months: int = 9):
+        """
+        Args:
+            temps: Daily mean temperature (deg F) indexed by date (load_weather)
+            heating_balance_points, cooling_balance_points: Candidate grids
+            min_months: Fewest reported months for a building to be fitted
+        """
+        self.temps = temps
+        self.heating_balance_points = np.asarray(heating_balance_points, dtype=np.float64)
+        self.cooling_balance_points = np.asarray(cooling_balance_points, dtype=np.float64)
+        self.min_months = min_months
+        self.hdd = monthly_degree_days(temps, heating_balance_points, 'heating')
+        self.cdd = monthly_degree_days(temps, cooling_balance_points, 'cooling')
+        self.normal_hdd = normal_degree_days(temps, heating_balance_points, 'heating')
+        self.normal_cdd = normal_degree_days(temps, cooling_balance_points, 'cooling')
+        self.normal_days = 365.25
+
+    @classmethod
+    def from_csv(cls, csv_path: str, **kwargs) -> 'DegreeDayNormalizer':
+        return cls(load_weather(csv_path), **kwargs)
+
+    def fit(self, monthly: pd.DataFrame, id_col: str = 'building_id',
+            month_col: str = 'month', energy_col: str = 'total_kbtu') -> ChangePointFits:
+        """
+        Fit every building in a long monthly table (load_monthly_energy)
+
+        Months outside the weather record are ignored.
+        """
+        months = pd.to_datetime(monthly[month_col]).dt.to_period('M').dt.to_timestamp()
+        covered = months.isin(self.hdd.index)
+        ids, rows = np.unique(monthly[id_col].astype(str).to_numpy()[covered], return_inverse=True)
+        labels, cols = np.unique(months[covered].to_numpy(), return_inverse=True)
+
+        energy = np.full((len(ids), len(labels)), np.nan)
+        energy[rows, cols] = pd.to_numeric(monthly[energy_col], errors='coerce').to_numpy()[covered]
+        return self.fit_matrix(energy, pd.DatetimeIndex(labels), ids)
+
+    def fit_matrix(self, energy: np.ndarray, months: pd.DatetimeIndex,
+                   building_ids: Sequence[str]) -> ChangePointFits:
+        """Fit a (buildings, months) energy matrix (NaN = not reported)"""
+        days = months.days_in_month.to_numpy(dtype=np.float64)
+        hdd = self.hdd.loc[months].to_numpy() / days[:, None]   # (months, heating bp)
+        cdd = self.cdd.loc[months].to_numpy() / days[:, None]
+        w = (np.isfinite(energy) & (energy >= 0)).astype(np.float64)
+        y = np.where(w > 0, energy, 0.0) / days                   # kBtu per day
+
+        n = w.sum(axis=1)
+        sy, syy = (w * y).sum(axis=1), (w * y * y).sum(axis=1)
+        sh, shh, shy = w @ hdd, w @ hdd ** 2, (w * y) @ hdd
+        sc, scc, scy = w @ cdd, w @ cdd ** 2, (w * y) @ cdd
+        total_ss = syy - sy ** 2 / np.where(n > 0, n, 1)
+
+        def best(sse, valid):
+            sse = np.where(valid, np.maximum(sse, 0), np.inf)
+            flat = sse.reshape(len(n), -1)
+            index = flat.argmin(axis=1)
+            return flat[np.arange(len(n)), index], np.unravel_index(index, sse.shape[1:])
+
+        # 2P: mean daily energy
+        sse = {'2P': total_ss}
+        coefs = {'2P': (sy / np.where(n > 0, n, 1),)}
+
+        # 3P: one slope per candidate balance point, all buildings and candidates at once
+        for name, s1, s11, s1y in (('3PH', sh, shh, shy), ('3PC', sc, scc, scy)):
+            det = n[:, None] * s11 - s1 ** 2
+            safe = np.where(np.abs(det) > 1e-9, det, np.nan)
+            slope = (n[:, None] * s1y - s1 * sy[:, None]) / safe
+            base = (sy[:, None] - slope * s1) / np.where(n > 0, n, 1)[:, None]
+            fit_sse = syy[:, None] - base * sy[:, None] - slope * s1y
+            valid = np.isfinite(slope) & (slope > 0) & (base >= 0)
+            sse[name], (k,) = best(fit_sse, valid)
+            row = np.arange(len(n))
+            coefs[name] = (base[row, k], slope[row, k], k)
+
+        # 5P: every (heating, cooling) balance pair
+        shc = np.einsum('bm,mi,mj->bij', w, hdd, cdd)
+        shape = shc.shape
+        a = np.empty(shape + (3, 3))
+        a[..., 0, 0] = n[:, None, None]
+        a[..., 0, 1] = a[..., 1, 0] = sh[:, :, None]
+        a[..., 0, 2] = a[..., 2, 0] = sc[:, None, :]
+        a[..., 1, 1] = shh[:, :, None]
+        a[..., 2, 2] = scc[:, None, :]
+        a[..., 1, 2] = a[..., 2, 1] = shc
+        rhs = np.stack(np.broadcast_arrays(sy[:, None, None], shy[:, :, None], scy[:, None, :]), axis=-1)
+        beta, solvable = _solve3(a, rhs)
+        fit_sse = syy[:, None, None] - (beta * rhs).sum(axis=-1)
+        ordered = self.cooling_balance_points[None, :] >= self.heating_balance_points[:, None]
+        valid = (solvable & ordered[None] & (beta[..., 0] >= 0)
+                 & (beta[..., 1] > 0) & (beta[..., 2] > 0))
+        sse['5P'], (kh, kc) = best(fit_sse, valid)
+        row = np.arange(len(n))
+        coefs['5P'] = (beta[row, kh, kc, 0], beta[row, kh, kc, 1], beta[row, kh, kc, 2], kh, kc)
+
+        # Model choice by BIC (needs min_months reports)
+        safe_n = np.where(n > 0, n, 1)
+        bic = np.stack([
+            safe_n * np.log(np.maximum(sse[name], 1e-12) / safe_n) + MODEL_PARAMETERS[name] * np.log(safe_n)
+            for name in MODELS
+        ])
+        choice = bic.argmin(axis=0)
+        fitted = (n >= self.min_months) & np.isfinite(bic.min(axis=0))
+        choice = np.where(fitted, choice, -1)
+
+        nb = len(n)
+        baseload = np.full(nb, np.nan)
+        heating_slope, cooling_slope = np.zeros(nb), np.zeros(nb)
+        heating_balance, cooling_balance = np.full(nb, np.nan), np.full(nb, np.nan)
+        chosen_sse = np.full(nb, np.nan)
+        for m, name in enumerate(MODELS):
+            pick = choice == m
+            chosen_sse[pick] = sse[name][pick]
+            if name == '2P':
+                baseload[pick] = coefs[name][0][pick]
+            elif name == '3PH':
+                base, slope, k = coefs[name]
+                baseload[pick], heating_slope[pick] = base[pick], slope[pick]
+                heating_balance[pick] = self.heating_balance_points[k[pick]]
+            elif name == '3PC':
+                base, slope, k = coefs[name]
+                baseload[pick], cooling_slope[pick] = base[pick], slope[pick]
+                cooling_balance[pick] = self.cooling_balance_points[k[pick]]
+            else:
+                base, h_slope, c_slope, kh, kc = coefs[name]
+                baseload[pick] = base[pick]
+                heating_slope[pick], cooling_slope[pick] = h_slope[pick], c_slope[pick]
+                heating_balance[pick] = self.heating_balance_points[kh[pick]]
+                cooling_balance[pick] = self.cooling_balance_points[kc[pick]]
+
+        # Normal-year energy: degree-day normals at each building's balance points
+        normal_hdd = np.zeros(nb)
+        normal_cdd = np.zeros(nb)
+        has_h, has_c = ~np.isnan(heating_balance), ~np.isnan(cooling_balance)
+        normal_hdd[has_h] = np.interp(heating_balance[has_h], self.heating_balance_points, self.normal_hdd)
+        normal_cdd[has_c] = np.interp(cooling_balance[has_c], self.cooling_balance_points, self.normal_cdd)
+        unfitted = choice < 0
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r2 = np.where(total_ss > 0, 1 - chosen_sse / total_ss, np.nan)
+            dof = np.maximum(n - np.array([MODEL_PARAMETERS[MODELS[c]] if c >= 0 else 1 for c in choice]), 1)
+            cv_rmse = np.sqrt(chosen_sse / dof) / (sy / safe_n)
+
+        return ChangePointFits(
+            building_ids=np.asarray(building_ids).astype(str),
+            model=np.array([MODELS[c] if c >= 0 else '' for c in choice]),
+            baseload=baseload,
+            heating_slope=np.where(unfitted, np.nan, heating_slope),
+            cooling_slope=np.where(unfitted, np.nan, cooling_slope),
+            heating_balance=heating_balance,
+            cooling_balance=cooling_balance,
+            r2=r2,
+            cv_rmse=cv_rmse,
+            months=n.astype(int),
+            normal_baseload=baseload * self.normal_days,
+            normal_heating=np.where(unfitted, np.nan, heating_slope * normal_hdd),
+            normal_cooling=np.where(unfitted, np.nan, cooling_slope * normal_cdd),
+        )
@@ -0,0 +1,276 @@
+"""
+Suggested File Name: eui_forecast.py
+File Location: /Users/robertpadgett/Projects/01_My_Notebooks/500_ED_Risk_Retro_BP/src/utils/
+Use: Batched per-building EUI forecasts for the Energize Denver target years
+
+This module:
+1. Stacks every building's reporting history (all years) into one
+   buildings x years log-EUI matrix
+2. Fits a weighted linear trend per building for all buildings at once from
+   closed-form least-squares sums, with Huber reweighting against outlier
+   years and COVID years down-weighted
+3. Shrinks each building's trend toward its property type's median trend
+   (more for short or flat histories) and damps it over the horizon
+4. Forecasts EUI with prediction intervals for the 2025 / 2027 / 2030
+   standard and 2028 / 2032 ACO target years
+5. Hands the forecasts to the penalty engine as per-year actual EUIs
+   (EnergizeDenverPenaltyCalculator 'actual_euis', PortfolioRiskAnalyzer
+   use_eui_forecast) or as Forecast_EUI_<year> columns for the snapshot
+"""
+
+import warnings
+from dataclasses import dataclass
+from statistics import NormalDist
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+TARGET_YEARS = (2025, 2027, 2028, 2030, 2032)
+
+
+def history_matrix(df_all: pd.DataFrame, id_col: str = 'Building ID',
+                   year_col: str = 'Reporting Year',
+                   eui_col: str = 'Weather Normalized Site EUI'):
+    """
+    Stack a long reporting history into a buildings x years matrix
+
+    Returns:
+        (building_ids, years, eui) - eui is float64 (buildings, years) with
+        NaN where a building did not report (first row wins on duplicates)
+    """
+    ids, id_codes = np.unique(df_all[id_col].astype(str).to_numpy(), return_inverse=True)
+    years = pd.to_numeric(df_all[year_col], errors='coerce').to_numpy()
+    eui = pd.to_numeric(df_all[eui_col], errors='coerce').to_numpy(dtype=np.float64)
+    known = ~np.isnan(years)
+    year_labels, year_codes = np.unique(years[known].astype(int), return_inverse=True)
+
+    # First row of a duplicated building-year wins
+    cells = id_codes[known] * len(year_labels) + year_codes
+    cells, first = np.unique(cells, return_index=True)
+    matrix = np.full(len(ids) * len(year_labels), np.nan)
+    matrix[cells] = eui[known][first]
+    return ids, year_labels, matrix.reshape(len(ids), len(year_labels))
+
+
+@dataclass
+class EUIForecast:
+    """Forecast EUI (median and interval) per building and target year"""
+    building_ids: np.ndarray
+    years: tuple
+    point: np.ndarray            # (buildings, years)
+    lower: np.ndarray
+    upper: np.ndarray
+    trend: np.ndarray            # annual log-EUI trend after shrinkage
+    sigma: np.ndarray            # residual log-EUI standard deviation
+    observations: np.ndarray     # reported years used in the fit
+    last_year: np.ndarray
+    interval: float
+
+    def __len__(self) -> int:
+        return len(self.building_ids)
+
+    def at(self, year: int) -> pd.Series:
+        """Forecast EUI for one target year, indexed by building ID"""
+        return pd.Series(self.point[:, self.years.index(year)], index=self.building_ids)
+
+    def actual_euis(self, building_id: str) -> Dict[int, float]:
+        """Year -> forecast EUI for one building (the calculator's 'actual_euis')"""
+        row = np.flatnonzero(self.building_ids == str(building_id))
+        if not len(row):
+            return {}
+        values = self.point[row[0]]
+        return {year: float(v) for year, v in zip(self.years, values) if not np.isnan(v)}
+
+    def eui_by_year(self) -> Dict[str, Dict[int, float]]:
+        """Building ID -> {year: forecast EUI} for every forecast building"""
+        return {
+            building_id: {year: float(v) for year, v in zip(self.years, values) if not np.isnan(v)}
+            for building_id, values in zip(self.building_ids, self.point)
+            if not np.isnan(values).all()
+        }
+
+    def frame(self) -> pd.DataFrame:
+        """One row per building: trend, observations and Forecast_EUI_<year>[_Low/_High]"""
+        table = pd.DataFrame({
+            'Building ID': self.building_ids,
+            'Forecast_Trend_Pct': np.expm1(self.trend) * 100,
+            'Forecast_Obs_Years': self.observations,
+        })
+        for j, year in enumerate(self.years):
+            table[f'Forecast_EUI_{year}'] = self.point[:, j]
+            table[f'Forecast_EUI_{year}_Low'] = self.lower[:, j]
+            table[f'Forecast_EUI_{year}_High'] = self.upper[:, j]
+        return table
+
+
+class EUIForecaster:
+    """
+    Damped, shrunk per-building log-EUI trend model fitted for all buildings at once
+
+    Each building's log EUI follows level + trend * (year - last reported
+    year). The trend is a weighted least-squares slope (Huber-reweighted),
+    combined with the property-type median slope in proportion to the
+    history's spread in years. Forecasts damp the trend by damping ** h.
+    """
+
+    def __init__(self, damping: float = 0.85, shrinkage: float = 4.0,
+                 year_weights: Optional[Dict[int, float]] = None,
+                 robust_iterations: int = 3, huber_k: float = 1.345,
+                 max_trend: float = 0.15, prior_dof: float = 2.0,
+                 default_sigma: float = 0.05):
+        """
+        Args:
+            damping: Per-year trend damping (1 = linear extrapolation)
+            shrinkage: Prior strength of the type median trend, in weighted
+                year^2 (a building reporting 3 consecutive years has 2)
+            year_weights: Reporting year -> weight (default halves 2020/2021)
+            robust_iterations: Huber reweighting passes
+            huber_k: Huber threshold in robust standard deviations
+            max_trend: Cap on |annual log-EUI trend|
+            prior_dof: Pseudo-observations pooling each building's residual
+                variance with its property type's
+            default_sigma: Residual log-EUI std when no building has a spread
+        """
+        self.damping = damping
+        self.shrinkage = shrinkage
+        self.year_weights = {2020: 0.5, 2021: 0.5} if year_weights is None else year_weights
+        self.robust_iterations = robust_iterations
+        self.huber_k = huber_k
+        self.max_trend = max_trend
+        self.prior_dof = prior_dof
+        self.default_sigma = default_sigma
+
+    @staticmethod
+    def _type_median(values: np.ndarray, usable: np.ndarray, codes: np.ndarray,
+                     default: float) -> np.ndarray:
+        """Per-building median of values over usable buildings of the same type"""
+        overall = float(np.median(values[usable])) if usable.any() else default
+        medians = np.full(codes.max() + 1 if len(codes) else 0, overall)
+        for code in np.unique(codes[usable]):
+            medians[code] = np.median(values[usable & (codes == code)])
+        return medians[codes]
+
+    def _weighted_trend(self, w: np.ndarray, x: np.ndarray, log_eui: np.ndarray,
+                        observed: np.ndarray, codes: np.ndarray) -> Dict:
+        """One weighted least-squares pass for every building (closed-form sums)"""
+        sw = w.sum(axis=1)
+        safe_sw = np.where(sw > 0, sw, 1.0)
+        x_bar = (w * x).sum(axis=1) / safe_sw
+        y_bar = (w * log_eui).sum(axis=1) / safe_sw
+        dx = x - x_bar[:, None]
+        cxx = (w * dx * dx).sum(axis=1)
+        cxy = (w * dx * (log_eui - y_bar[:, None])).sum(axis=1)
+
+        # Own slope where the history spans more than one year; type median prior
+        own = cxx > 1e-9
+        slope = np.divide(cxy, cxx, out=np.zeros(len(w)), where=own)
+        prior = self._type_median(slope, own, codes, 0.0)
+        trend = np.clip((cxx * slope + self.shrinkage * prior) / (cxx + self.shrinkage),
+                        -self.max_trend, self.max_trend)
+        residual = np.where(observed, log_eui - y_bar[:, None] - trend[:, None] * dx, np.nan)
+        return {'w': w, 'sw': sw, 'x_bar': x_bar, 'y_bar': y_bar, 'cxx': cxx,
+                'trend': trend, 'residual': residual}
+
+    def fit(self, eui: np.ndarray, years: Sequence[int], building_ids: Sequence[str],
+            property_types: Optional[Sequence[str]] = None,
+            target_years: Sequence[int] = TARGET_YEARS, interval: float = 0.8) -> EUIForecast:
+        """
+        Fit every building and forecast the target years
+
+        Args:
+            eui: (buildings, years) EUI history, NaN where not reported
+            years: Reporting year of each column
+            building_ids: ID of each row
+            property_types: Property type of each row (shrinkage groups);
+                all buildings share one group when omitted
+            target_years: Years to forecast
+            interval: Central prediction interval coverage
+
+        Returns:
+            EUIForecast
+        """
+        years = np.asarray(years, dtype=np.float64)
+        n = eui.shape[0]
+        observed = np.isfinite(eui) & (eui > 0)
+        log_eui = np.log(np.where(observed, eui, 1.0))
+        counts = observed.sum(axis=1)
+        has_data = counts > 0
+
+        # Time axis relative to each building's last reported year
+        last_year = np.where(has_data, np.max(np.where(observed, years, -np.inf), axis=1), np.nan)
+        x = years[None, :] - np.nan_to_num(last_year)[:, None]
+        base = observed * np.array([self.year_weights.get(int(y), 1.0) for y in years])[None, :]
+
+        if property_types is None:
+            codes = np.zeros(n, dtype=np.int64)
+        else:
+            codes = np.unique(np.asarray(property_types).astype(str), return_inverse=True)[1]
+
+        robust = np.ones_like(base)
+        for _ in range(self.robust_iterations):
+            fit = self._weighted_trend(base * robust, x, log_eui, observed, codes)
+            with np.errstate(all='ignore'), warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)  # buildings with no history
+                size = np.abs(fit['residual'])
+                cutoff = self.huber_k * 1.4826 * np.nanmedian(size, axis=1, keepdims=True)
+                robust = np.where(size > cutoff, cutoff / size, 1.0)
+            robust = np.where(np.isfinite(robust) & (cutoff > 0), robust, 1.0)
+        fit = self._weighted_trend(base * robust, x, log_eui, observed, codes)
+        w, sw, cxx, trend, residual = fit['w'], fit['sw'], fit['cxx'], fit['trend'], fit['residual']
+        safe_sw = np.where(sw > 0, sw, 1.0)
+
+        # Residual variance pooled with the property type's
+        dof = counts - 2
+        with np.errstate(all='ignore'):
+            own_var = np.nansum(w * residual ** 2, axis=1) / safe_sw * counts / np.maximum(dof, 1)
+        spread = dof > 0
+        type_var = self._type_median(own_var, spread, codes, self.default_sigma ** 2)
+        dof = np.maximum(dof, 0)
+        variance = (dof * np.nan_to_num(own_var) + self.prior_dof * type_var) / (dof + self.prior_dof)
+
+        # Damped trend over the horizon; uncertainty from level, trend and noise
+        level = fit['y_bar'] - trend * fit['x_bar']
+        horizon = np.asarray(target_years, dtype=np.float64)[None, :] - np.nan_to_num(last_year)[:, None]
+        if self.damping < 1:
+            damped = self.damping * (1 - self.damping ** np.maximum(horizon, 0)) / (1 - self.damping)
+        else:
+            damped = np.maximum(horizon, 0)
+        damped = np.where(horizon > 0, damped, horizon)
+        log_point = level[:, None] + trend[:, None] * damped
+        forecast_var = variance[:, None] * (1 + 1 / safe_sw[:, None]
+                                           + damped ** 2 / (cxx + self.shrinkage)[:, None])
+        z = NormalDist().inv_cdf(0.5 + interval / 2)
+        spread_log = z * np.sqrt(forecast_var)
+
+        missing = ~has_data[:, None]
+        point = np.where(missing, np.nan, np.exp(log_point))
+        return EUIForecast(
+            building_ids=np.asarray(building_ids).astype(str),
+            years=tuple(int(y) for y in target_years),
+            point=point,
+            lower=np.where(missing, np.nan, np.exp(log_point - spread_log)),
+            upper=np.where(missing, np.nan, np.exp(log_point + spread_log)),
+            trend=np.where(has_data, trend, np.nan),
+            sigma=np.where(has_data, np.sqrt(variance), np.nan),
+            observations=counts,
+            last_year=last_year,
+            interval=interval,
+        )
+
+    def fit_history(self, df_all: pd.DataFrame, id_col: str = 'Building ID',
+                    year_col: str = 'Reporting Year',
+                    eui_col: str = 'Weather Normalized Site EUI',
+                    type_col: Optional[str] = None, **kwargs) -> EUIForecast:
+        """Fit from a long all-years frame (one row per building and reporting year)"""
+        ids, years, eui = history_matrix(df_all, id_col, year_col, eui_col)
+        property_types = None
+        if type_col and type_col in df_all.columns:
+            # Latest reported property type per building
+            latest = (df_all[[id_col, year_col, type_col]]
+                      .assign(**{id_col: df_all[id_col].astype(str)})
+                      .sort_values(year_col)
+                      .drop_duplicates(id_col, keep='last')
+                      .set_index(id_col)[type_col])
+            property_types = latest.reindex(ids).astype(str).to_numpy()
+        return self.fit(eui, years, ids, property_types, **kwargs)
@@ -17,6 +17,8 @@ from pathlib import Path
 from typing import Dict, Optional, Tuple
 import logging
 
+from . import data_catalog
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -46,7 +48,7 @@ class EUITargetLoader:
         """Load the main targets CSV"""
         if self._targets_df is None:
             logger.info(f"Loading targets from {self.targets_file}")
-            self._targets_df = pd.read_csv(self.targets_file)
+            self._targets_df = data_catalog.read_csv(self.targets_file)
             
             # Standardize column names
             self._targets_df.columns = self._targets_df.columns.str.strip()
@@ -62,7 +64,7 @@ class EUITargetLoader:
         if self._mai_df is None:
             logger.info(f"Loading MAI data from {self.mai_file}")
             try:
-                self._mai_df = pd.read_csv(self.mai_file)
+                self._mai_df = data_catalog.read_csv(self.mai_file)
                 self._mai_df.columns = self._mai_df.columns.str.strip()
                 
                 # Ensure Building ID is string
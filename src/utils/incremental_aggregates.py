@@ -0,0 +1,389 @@
+"""
+Suggested File Name: incremental_aggregates.py
+File Location: /Users/robertpadgett/Projects/01_My_Notebooks/500_ED_Risk_Retro_BP/src/utils/
+Use: Portfolio summaries kept current under single-building edits
+
+This module:
+1. Builds, from the scenario frames, every summary the reports read:
+   yearly penalty totals and buildings at risk per scenario, property-type
+   rollups (buildings, floor area, MAI, opt-ins, yearly penalties and
+   at-risk counts) and a penalty NPV ranking of the buildings
+2. Applies a corrected building (its new scenario rows) as deltas: the old
+   contribution is subtracted and the new one added, so totals and rollups
+   update in O(years) and the ranking - an array max-tree over buildings -
+   in O(log n), independent of the portfolio size
+3. Returns a ChangeReport per edit: yearly penalty changes, at-risk flips,
+   NPV before / after and movements in and out of the top-N ranking
+
+Totals are maintained by repeated addition, so after many edits they may
+differ from a fresh build in the last few bits; rebuild from the frames
+when exact reproduction matters.
+"""
+
+import heapq
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .penalty_cube import DISCOUNT_RATE, YEARS, penalty_columns
+
+TOP_N = 10
+
+
+class MaxTree:
+    """
+    Segment tree over per-building values
+
+    Point updates are O(log n); the n largest values are read with a
+    best-first walk from the root in O(n log size). Ties rank the lower
+    building position first.
+    """
+
+    def __init__(self, values: np.ndarray):
+        values = np.asarray(values, dtype=np.float64)
+        self.n = len(values)
+        self.size = 1 << max(self.n - 1, 0).bit_length()
+        self.best = np.full(2 * self.size, -np.inf)
+        self.arg = np.full(2 * self.size, -1, dtype=np.int64)
+        self.best[self.size:self.size + self.n] = values
+        self.arg[self.size:self.size + self.n] = np.arange(self.n)
+        # Build one level at a time, bottom-up
+        level = self.size // 2
+        while level >= 1:
+            nodes = np.arange(level, 2 * level)
+            left, right = 2 * nodes, 2 * nodes + 1
+            take_left = self.best[left] >= self.best[right]
+            self.best[nodes] = np.where(take_left, self.best[left], self.best[right])
+            self.arg[nodes] = np.where(take_left, self.arg[left], self.arg[right])
+            level //= 2
+
+    def __getitem__(self, position: int) -> float:
+        return float(self.best[self.size + position])
+
+    def update(self, position: int, value: float):
+        node = self.size + position
+        self.best[node] = value
+        node //= 2
+        while node:
+            left, right = 2 * node, 2 * node + 1
+            child = left if self.best[left] >= self.best[right] else right
+            self.best[node] = self.best[child]
+            self.arg[node] = self.arg[child]
+            node //= 2
+
+    def top(self, n: int) -> List[int]:
+        """Positions of the n largest values, largest first"""
+        found = []
+        if self.n == 0:
+            return found
+        heap = [(-self.best[1], self.arg[1], 1)]
+        while heap and len(found) < n:
+            _, position, node = heapq.heappop(heap)
+            if node >= self.size:
+                found.append(int(position))
+                continue
+            for child in (2 * node, 2 * node + 1):
+                if self.arg[child] >= 0:
+                    heapq.heappush(heap, (-self.best[child], self.arg[child], child))
+        return found
+
+
+@dataclass
+class ChangeReport:
+    """What one building edit changed in the portfolio summaries"""
+    building_id: str
+    changes: pd.DataFrame                        # scenario, year, penalty_before / after, delta, at-risk flags
+    npv: Dict[str, tuple] = field(default_factory=dict)       # scenario -> (before, after)
+    property_type: tuple = ('', '')                           # (before, after)
+    rank: Dict[str, tuple] = field(default_factory=dict)      # scenario -> (before, after); None = outside top N
+    entered_top: Dict[str, List[str]] = field(default_factory=dict)
+    left_top: Dict[str, List[str]] = field(default_factory=dict)
+
+    @property
+    def at_risk_flips(self) -> pd.DataFrame:
+        """Scenario-years in which the building started or stopped owing a penalty"""
+        return self.changes[self.changes['at_risk_before'] != self.changes['at_risk_after']]
+
+    def summary(self) -> str:
+        lines = [f"Building {self.building_id}:"]
+        if self.property_type[0] != self.property_type[1]:
+            lines.append(f"  property type {self.property_type[0]} -> {self.property_type[1]}")
+        for scenario, (before, after) in self.npv.items():
+            line = f"  {scenario}: NPV ${before:,.0f} -> ${after:,.0f} ({after - before:+,.0f})"
+            rank_before, rank_after = self.rank.get(scenario, (None, None))
+            if rank_before != rank_after:
+                line += f", top rank {rank_before or '-'} -> {rank_after or '-'}"
+            lines.append(line)
+        flips = self.at_risk_flips
+        if len(flips):
+            lines.append(f"  at-risk flips: {len(flips)} scenario-years")
+        return "\n".join(lines)
+
+
+class IncrementalAggregates:
+    """Scenario summaries that absorb single-building changes as deltas"""
+
+    def __init__(self, scenarios: Dict[str, pd.DataFrame], dimensions: Optional[pd.DataFrame] = None,
+                 years: Sequence[int] = YEARS, rate: float = DISCOUNT_RATE, base_year: int = 2025,
+                 top_n: int = TOP_N):
+        """
+        Args:
+            scenarios: Scenario name -> frame with building_id, property_type,
+                sqft, penalty_YYYY and optionally should_opt_in
+            dimensions: rollup_dimensions() frame for the MAI flags
+            years: Years tracked
+            rate, base_year: Discounting of the NPV ranking
+            top_n: Size of the ranking compared in change reports
+        """
+        self.years = tuple(int(y) for y in years)
+        self.scenario_names = tuple(scenarios)
+        self.top_n = top_n
+        years_array = np.array(self.years)
+        self.discount = np.where(years_array >= base_year,
+                                 (1 + rate) ** -(years_array - base_year).astype(np.float64), 0.0)
+
+        first = next(iter(scenarios.values()))
+        self.building_ids = first['building_id'].astype(str).to_numpy(copy=True)
+        self._positions = {b: i for i, b in enumerate(self.building_ids)}
+        n = len(self.building_ids)
+        types = first['property_type'].astype(str).where(first['property_type'].notna(), 'Unknown')
+        self.type_names = sorted(types.unique())
+        self._type_codes = {t: k for k, t in enumerate(self.type_names)}
+        self.type_code = np.array([self._type_codes[t] for t in types], dtype=np.int64)
+        sqft = pd.to_numeric(first['sqft'], errors='coerce').fillna(0)
+        self.sqft = sqft.to_numpy(dtype=np.float64, copy=True)
+        if dimensions is not None and 'is_mai' in dimensions.columns:
+            is_mai = dimensions['is_mai'].reindex(self.building_ids).fillna(False)
+            self.is_mai = is_mai.to_numpy(dtype=bool, copy=True)
+        else:
+            self.is_mai = np.zeros(n, dtype=bool)
+
+        k = len(self.type_names)
+        self.type_buildings = np.bincount(self.type_code, minlength=k).astype(np.float64)
+        self.type_sqft = np.bincount(self.type_code, weights=self.sqft, minlength=k)
+        self.type_mai = np.bincount(self.type_code, weights=self.is_mai.astype(np.float64), minlength=k)
+
+        self.values, self.reported, self.opt_in = {}, {}, {}
+        self.totals, self.at_risk = {}, {}
+        self.type_penalty, self.type_at_risk, self.type_opt_in = {}, {}, {}
+        self.npv, self.npv_total, self.ranking = {}, {}, {}
+        for name, df in scenarios.items():
+            ids = df['building_id'].astype(str).to_numpy()
+            if len(ids) != n or not (ids == self.building_ids).all():
+                df = df.set_index(df['building_id'].astype(str)).reindex(self.building_ids)
+            values = np.zeros((n, len(self.years)))
+            columns = penalty_columns(df)
+            reported = np.array([year in columns for year in self.years])
+            for j, year in enumerate(self.years):
+                if reported[j]:
+                    values[:, j] = np.nan_to_num(df[columns[year]].to_numpy(dtype=np.float64))
+            self.values[name] = values
+            self.reported[name] = reported
+            self.totals[name] = values.sum(axis=0)
+            self.at_risk[name] = (values > 0).sum(axis=0)
+            self.type_penalty[name] = np.zeros((k, len(self.years)))
+            np.add.at(self.type_penalty[name], self.type_code, values)
+            self.type_at_risk[name] = np.zeros((k, len(self.years)), dtype=np.int64)
+            np.add.at(self.type_at_risk[name], self.type_code, (values > 0).astype(np.int64))
+            if 'should_opt_in' in df.columns:
+                opt_in = pd.to_numeric(df['should_opt_in'].astype('float64'), errors='coerce')
+                self.opt_in[name] = opt_in.fillna(0).to_numpy(dtype=np.float64, copy=True)
+                self.type_opt_in[name] = np.bincount(self.type_code, weights=self.opt_in[name], minlength=k)
+            self.npv[name] = values @ self.discount
+            self.npv_total[name] = float(self.npv[name].sum())
+            self.ranking[name] = MaxTree(self.npv[name])
+
+    def __len__(self) -> int:
+        return len(self.building_ids)
+
+    def __contains__(self, building_id) -> bool:
+        return str(building_id) in self._positions
+
+    # ------------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------------
+
+    def _type(self, property_type) -> int:
+        """Code of a property type, adding an empty rollup row for a new one"""
+        name = 'Unknown' if property_type is None or pd.isna(property_type) else str(property_type)
+        if name not in self._type_codes:
+            self._type_codes[name] = len(self.type_names)
+            self.type_names.append(name)
+            self.type_buildings = np.append(self.type_buildings, 0.0)
+            self.type_sqft = np.append(self.type_sqft, 0.0)
+            self.type_mai = np.append(self.type_mai, 0.0)
+            for scenario in self.scenario_names:
+                self.type_penalty[scenario] = np.vstack([self.type_penalty[scenario],
+                                                         np.zeros(len(self.years))])
+                self.type_at_risk[scenario] = np.vstack([self.type_at_risk[scenario],
+                                                         np.zeros(len(self.years), dtype=np.int64)])
+                if scenario in self.type_opt_in:
+                    self.type_opt_in[scenario] = np.append(self.type_opt_in[scenario], 0.0)
+        return self._type_codes[name]
+
+    def _row_values(self, scenario: str, row: Dict) -> np.ndarray:
+        values = np.zeros(len(self.years))
+        for j, year in enumerate(self.years):
+            if self.reported[scenario][j]:
+                penalty = row.get(f'penalty_{year}', 0)
+                values[j] = 0.0 if penalty is None or pd.isna(penalty) else float(penalty)
+        return values
+
+    def apply(self, building_id, rows: Dict[str, Dict], is_mai: Optional[bool] = None) -> ChangeReport:
+        """
+        Replace one building's contribution to every summary
+
+        Args:
+            building_id: Building to update (must be in the portfolio)
+            rows: Scenario name -> new scenario row (property_type, sqft,
+                penalty_YYYY, should_opt_in); scenarios not given keep
+                their current values
+            is_mai: New MAI flag (None keeps the current one)
+
+        Returns:
+            ChangeReport
+        """
+        i = self._positions.get(str(building_id))
+        if i is None:
+            raise KeyError(f"Building {building_id} is not in the aggregates")
+        unknown = set(rows) - set(self.scenario_names)
+        if unknown:
+            raise KeyError(f"Unknown scenarios: {sorted(unknown)}")
+        top_before = {s: self.top_positions(s) for s in rows}
+
+        # Building-level dimensions (shared by every scenario)
+        sample = next(iter(rows.values()), {})
+        old_type = int(self.type_code[i])
+        new_type = self._type(sample['property_type']) if 'property_type' in sample else old_type
+        new_sqft = float(sample['sqft']) if 'sqft' in sample and pd.notna(sample['sqft']) else self.sqft[i]
+        new_mai = self.is_mai[i] if is_mai is None else bool(is_mai)
+        self.type_buildings[old_type] -= 1
+        self.type_buildings[new_type] += 1
+        self.type_sqft[old_type] -= self.sqft[i]
+        self.type_sqft[new_type] += new_sqft
+        self.type_mai[old_type] -= float(self.is_mai[i])
+        self.type_mai[new_type] += float(new_mai)
+
+        changes, npv = [], {}
+        for scenario in self.scenario_names:
+            old = self.values[scenario][i].copy()
+            new = self._row_values(scenario, rows[scenario]) if scenario in rows else old
+            old_risk, new_risk = old > 0, new > 0
+            self.totals[scenario] += new - old
+            self.at_risk[scenario] += new_risk.astype(np.int64) - old_risk
+            self.type_penalty[scenario][old_type] -= old
+            self.type_penalty[scenario][new_type] += new
+            self.type_at_risk[scenario][old_type] -= old_risk
+            self.type_at_risk[scenario][new_type] += new_risk
+            if scenario in self.opt_in:
+                opt_in = self.opt_in[scenario][i]
+                if scenario in rows and 'should_opt_in' in rows[scenario]:
+                    opt_in = float(bool(rows[scenario]['should_opt_in']))
+                self.type_opt_in[scenario][old_type] -= self.opt_in[scenario][i]
+                self.type_opt_in[scenario][new_type] += opt_in
+                self.opt_in[scenario][i] = opt_in
+            self.values[scenario][i] = new
+
+            old_npv, new_npv = float(self.npv[scenario][i]), float(new @ self.discount)
+            self.npv[scenario][i] = new_npv
+            self.npv_total[scenario] += new_npv - old_npv
+            self.ranking[scenario].update(i, new_npv)
+            npv[scenario] = (old_npv, new_npv)
+
+            for j in np.flatnonzero((new != old) & self.reported[scenario]):
+                changes.append({'scenario': scenario, 'year': self.years[j],
+                                'penalty_before': old[j], 'penalty_after': new[j],
+                                'delta': new[j] - old[j],
+                                'at_risk_before': bool(old_risk[j]), 'at_risk_after': bool(new_risk[j])})
+
+        self.type_code[i] = new_type
+        self.sqft[i] = new_sqft
+        self.is_mai[i] = new_mai
+
+        report = ChangeReport(
+            building_id=str(building_id),
+            changes=pd.DataFrame(changes, columns=['scenario', 'year', 'penalty_before', 'penalty_after',
+                                                   'delta', 'at_risk_before', 'at_risk_after']),
+            npv=npv,
+            property_type=(self.type_names[old_type], self.type_names[new_type]),
+        )
+        for scenario, before in top_before.items():
+            after = self.top_positions(scenario)
+            report.rank[scenario] = (before.index(i) + 1 if i in before else None,
+                                     after.index(i) + 1 if i in after else None)
+            report.entered_top[scenario] = [str(self.building_ids[p]) for p in after if p not in before]
+            report.left_top[scenario] = [str(self.building_ids[p]) for p in before if p not in after]
+        return report
+
+    # ------------------------------------------------------------------
+    # Summaries
+    # ------------------------------------------------------------------
+
+    def _reported_years(self, scenario: str) -> List[int]:
+        return [y for y, r in zip(self.years, self.reported[scenario]) if r]
+
+    def year_totals(self, scenario: str) -> pd.Series:
+        """Total penalty by reported year"""
+        reported = self.reported[scenario]
+        return pd.Series(self.totals[scenario][reported], index=self._reported_years(scenario))
+
+    def buildings_at_risk(self, scenario: str) -> pd.Series:
+        """Buildings with a penalty by reported year"""
+        reported = self.reported[scenario]
+        return pd.Series(self.at_risk[scenario][reported], index=self._reported_years(scenario))
+
+    def total_npv(self, scenario: str) -> float:
+        return self.npv_total[scenario]
+
+    def property_types(self, scenario: str, years: Sequence[int] = ()) -> pd.DataFrame:
+        """
+        Property-type rollup (same columns as PenaltyRollup.summary by property_type)
+
+        Types whose buildings all moved away by edits are dropped.
+        """
+        table = pd.DataFrame({
+            'total_buildings': self.type_buildings.round().astype(int),
+            'total_sqft': self.type_sqft,
+            'mai_count': self.type_mai.round().astype(int),
+        }, index=pd.Index(self.type_names, name='property_type'))
+        if scenario in self.type_opt_in:
+            table['opt_in_count'] = self.type_opt_in[scenario].round().astype(int)
+            table['opt_in_rate'] = table['opt_in_count'] / table['total_buildings'].where(
+                table['total_buildings'] > 0)
+        for year in years:
+            j = self.years.index(year) if year in self.years else None
+            reported = j is not None and self.reported[scenario][j]
+            table[f'total_penalty_{year}'] = self.type_penalty[scenario][:, j] if reported else 0.0
+            table[f'buildings_at_risk_{year}'] = self.type_at_risk[scenario][:, j] if reported else 0
+        return table[table['total_buildings'] > 0].sort_index()
+
+    def top_positions(self, scenario: str, n: Optional[int] = None) -> List[int]:
+        return self.ranking[scenario].top(self.top_n if n is None else n)
+
+    def top_buildings(self, scenario: str, n: Optional[int] = None) -> pd.DataFrame:
+        """Highest penalty-NPV buildings of a scenario"""
+        positions = np.array(self.top_positions(scenario, n), dtype=np.int64)
+        return pd.DataFrame({
+            'rank': np.arange(1, len(positions) + 1),
+            'building_id': self.building_ids[positions],
+            'property_type': np.array(self.type_names, dtype=object)[self.type_code[positions]],
+            'sqft': self.sqft[positions],
+            'penalty_npv': self.npv[scenario][positions],
+        })
+
+    def summary(self) -> pd.DataFrame:
+        """One row per scenario: NPV, peak year and buildings at risk in the first year"""
+        rows = []
+        for scenario in self.scenario_names:
+            totals = self.year_totals(scenario)
+            at_risk = self.buildings_at_risk(scenario)
+            rows.append({
+                'Scenario': scenario,
+                'Total NPV': self.npv_total[scenario],
+                'Peak Year': int(totals.idxmax()) if len(totals) else None,
+                'Peak Year Risk': float(totals.max()) if len(totals) else 0.0,
+                f'Buildings at Risk {self.years[0]}': int(at_risk.get(self.years[0], 0)),
+            })
+        return pd.DataFrame(rows)
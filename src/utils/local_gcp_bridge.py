@@ -7,9 +7,13 @@ This script allows you to:
 1. Pull data from BigQuery for local analysis
 2. Test new algorithms locally before deploying to GCP
 3. Create local visualizations and reports
+4. Cache query results on disk so repeated notebook/report runs skip BigQuery
 """
 
 import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 import pandas as pd
 from google.cloud import bigquery
 from google.oauth2 import service_account
@@ -17,20 +21,28 @@ import numpy as np
 from datetime import datetime
 import json
 
+from gcp.arrow_transfer import export_table_to_parquet, write_parquet
+from utils.query_cache import QueryCache, run_query
+
 class LocalGCPBridge:
     """Bridge class to work with GCP data locally"""
     
-    def __init__(self, project_id='energize-denver-eaas', dataset_id='energize_denver'):
+    def __init__(self, project_id='energize-denver-eaas', dataset_id='energize_denver',
+                 use_cache=True, cache_dir='./data/query_cache/', cache_max_mb=512):
         """
         Initialize the bridge connection to GCP
         
         Args:
             project_id: GCP project ID
             dataset_id: BigQuery dataset ID
+            use_cache: Serve repeated queries from the local result cache
+            cache_dir: Directory for cached query results
+            cache_max_mb: Cache size limit before least-recently-used results are evicted
         """
         self.project_id = project_id
         self.dataset_id = dataset_id
         self.client = self._initialize_client()
+        self.cache = QueryCache(cache_dir, max_size_mb=cache_max_mb) if use_cache else None
         
     def _initialize_client(self):
         """Initialize BigQuery client with proper authentication"""
@@ -44,12 +56,29 @@ class LocalGCPBridge:
             print("Run 'gcloud auth application-default login' to authenticate")
             return None
     
-    def get_opt_in_analysis(self, limit=None):
+    def _query(self, query, params=None, refresh=False):
+        """
+        Run a query, reusing a cached result while its source tables are unchanged
+        
+        Args:
+            query: SQL text (@name placeholders for params)
+            params: Named query parameters
+            refresh: Re-run the query even if a cached result exists
+            
+        Returns:
+            Result DataFrame
+        """
+        if self.cache is None:
+            return run_query(self.client, query, params)
+        return self.cache.query(self.client, query, params=params, refresh=refresh)
+    
+    def get_opt_in_analysis(self, limit=None, refresh=False):
         """
         Retrieve the latest opt-in decision analysis from BigQuery
         
         Args:
             limit: Number of rows to retrieve (None for all)
+            refresh: Bypass the local result cache
             
         Returns:
             DataFrame with opt-in analysis data
@@ -63,16 +92,17 @@ class LocalGCPBridge:
             query += f" LIMIT {limit}"
             
         print(f"📊 Retrieving opt-in analysis data...")
-        df = self.client.query(query).to_dataframe()
+        df = self._query(query, refresh=refresh)
         print(f"✅ Retrieved {len(df)} buildings")
         return df
     
-    def get_opt_in_analysis_with_geo(self, limit=None):
+    def get_opt_in_analysis_with_geo(self, limit=None, refresh=False):
         """
         Retrieve opt-in analysis with geographic data
         
         Args:
             limit: Number of rows to retrieve (None for all)
+            refresh: Bypass the local result cache
             
         Returns:
             DataFrame with opt-in analysis and geographic data
@@ -89,7 +119,7 @@ class LocalGCPBridge:
                 query += f" LIMIT {limit}"
                 
             print(f"📊 Retrieving opt-in analysis data with geographic info...")
-            df = self.client.query(query).to_dataframe()
+            df = self._query(query, refresh=refresh)
             print(f"✅ Retrieved {len(df)} buildings with coordinates")
             return df
             
@@ -113,16 +143,17 @@ class LocalGCPBridge:
             if limit:
                 query += f" LIMIT {limit}"
                 
-            df = self.client.query(query).to_dataframe()
+            df = self._query(query, refresh=refresh)
             print(f"✅ Retrieved {len(df)} buildings")
             return df
     
-    def get_der_clustering_data(self, limit=None):
+    def get_der_clustering_data(self, limit=None, refresh=False):
         """
         Get data optimized for DER clustering analysis
         
         Args:
             limit: Number of rows to retrieve (None for all)
+            refresh: Bypass the local result cache
             
         Returns:
             DataFrame ready for DER clustering
@@ -136,16 +167,17 @@ class LocalGCPBridge:
             query += f" LIMIT {limit}"
             
         print(f"🏢 Retrieving DER clustering data...")
-        df = self.client.query(query).to_dataframe()
+        df = self._query(query, refresh=refresh)
         print(f"✅ Retrieved {len(df)} buildings for clustering analysis")
         return df
     
-    def get_high_risk_buildings(self, penalty_threshold=100000):
+    def get_high_risk_buildings(self, penalty_threshold=100000, refresh=False):
         """
         Get buildings with high penalty exposure
         
         Args:
             penalty_threshold: Minimum total penalty to be considered high risk
+            refresh: Bypass the local result cache
             
         Returns:
             DataFrame of high-risk buildings
@@ -162,18 +194,19 @@ class LocalGCPBridge:
             should_opt_in,
             primary_rationale
         FROM `{self.project_id}.{self.dataset_id}.opt_in_decision_analysis_v3`
-        WHERE total_penalties_default > {penalty_threshold}
+        WHERE total_penalties_default > @penalty_threshold
         ORDER BY total_penalties_default DESC
         """
         
-        return self.client.query(query).to_dataframe()
+        return self._query(query, params={'penalty_threshold': penalty_threshold}, refresh=refresh)
     
-    def get_building_by_id(self, building_id):
+    def get_building_by_id(self, building_id, refresh=False):
         """
         Get detailed information for a specific building
         
         Args:
             building_id: The building ID to look up
+            refresh: Bypass the local result cache
             
         Returns:
             Dictionary with building details
@@ -181,18 +214,21 @@ class LocalGCPBridge:
         query = f"""
         SELECT *
         FROM `{self.project_id}.{self.dataset_id}.opt_in_decision_analysis_v3`
-        WHERE building_id = '{building_id}'
+        WHERE building_id = @building_id
         """
         
-        df = self.client.query(query).to_dataframe()
+        df = self._query(query, params={'building_id': str(building_id)}, refresh=refresh)
         if len(df) == 0:
             return None
         return df.iloc[0].to_dict()
     
-    def analyze_property_type_summary(self):
+    def analyze_property_type_summary(self, refresh=False):
         """
         Create a summary analysis by property type
         
+        Args:
+            refresh: Bypass the local result cache
+        
         Returns:
             DataFrame with property type statistics
         """
@@ -213,38 +249,74 @@ class LocalGCPBridge:
         ORDER BY total_default_penalties DESC
         """
         
-        return self.client.query(query).to_dataframe()
+        return self._query(query, refresh=refresh)
+    
+    def _save_export(self, df, output_dir, name, file_format):
+        """Write one export as CSV or zstd Parquet"""
+        if file_format == 'csv':
+            df.to_csv(os.path.join(output_dir, f"{name}.csv"), index=False)
+        else:
+            write_parquet(df, os.path.join(output_dir, f"{name}.parquet"))
+    
+    def export_table(self, table_name, output_path=None, page_size=50000):
+        """
+        Stream a whole BigQuery table to a local Parquet file
+        
+        Rows are read from table storage (no query cost) as Arrow batches and
+        written as they arrive, so large city tables never sit in memory.
+        
+        Args:
+            table_name: Table in this dataset
+            output_path: Destination file (default ./data/gcp_exports/<table>.parquet)
+            page_size: Rows per page
+            
+        Returns:
+            Number of rows written
+        """
+        output_path = output_path or os.path.join('./data/gcp_exports/', f"{table_name}.parquet")
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        
+        table_id = f"{self.project_id}.{self.dataset_id}.{table_name}"
+        rows = export_table_to_parquet(self.client, table_id, output_path, page_size=page_size)
+        print(f"✅ Exported {rows:,} rows from {table_name} to {output_path}")
+        return rows
     
-    def export_for_local_analysis(self, output_dir='./data/gcp_exports/'):
+    def export_for_local_analysis(self, output_dir='./data/gcp_exports/', refresh=False,
+                                  file_format='csv'):
         """
         Export key datasets for local analysis
         
         Args:
             output_dir: Directory to save exported files
+            refresh: Re-query BigQuery instead of using cached results
+            file_format: 'csv' (read by the consistency tests) or 'parquet'
+                (typed, compressed)
         """
         os.makedirs(output_dir, exist_ok=True)
         
         # Export main analysis
         print("📥 Exporting opt-in analysis...")
-        opt_in_df = self.get_opt_in_analysis()
-        opt_in_df.to_csv(os.path.join(output_dir, 'opt_in_analysis_v3.csv'), index=False)
+        opt_in_df = self.get_opt_in_analysis(refresh=refresh)
+        self._save_export(opt_in_df, output_dir, 'opt_in_analysis_v3', file_format)
         
         # Export property type summary
         print("📥 Exporting property type summary...")
-        property_summary = self.analyze_property_type_summary()
-        property_summary.to_csv(os.path.join(output_dir, 'property_type_summary.csv'), index=False)
+        property_summary = self.analyze_property_type_summary(refresh=refresh)
+        self._save_export(property_summary, output_dir, 'property_type_summary', file_format)
         
         # Export high risk buildings
         print("📥 Exporting high-risk buildings...")
-        high_risk = self.get_high_risk_buildings()
-        high_risk.to_csv(os.path.join(output_dir, 'high_risk_buildings.csv'), index=False)
+        high_risk = self.get_high_risk_buildings(refresh=refresh)
+        self._save_export(high_risk, output_dir, 'high_risk_buildings', file_format)
         
         # Export with geographic data
         print("📥 Exporting data with geographic info...")
-        geo_df = self.get_opt_in_analysis_with_geo()
-        geo_df.to_csv(os.path.join(output_dir, 'opt_in_analysis_with_geo.csv'), index=False)
+        geo_df = self.get_opt_in_analysis_with_geo(refresh=refresh)
+        self._save_export(geo_df, output_dir, 'opt_in_analysis_with_geo', file_format)
         
         print(f"✅ All exports complete! Files saved to: {output_dir}")
+        if self.cache is not None:
+            print(f"   Query cache: {self.cache.hits} hits, {self.cache.misses} BigQuery queries")
         
     def test_local_algorithm(self, df, algorithm_func):
         """
@@ -0,0 +1,255 @@
+"""
+Suggested File Name: measure_library.py
+File Location: /Users/robertpadgett/Projects/01_My_Notebooks/500_ED_Risk_Retro_BP/src/utils/
+Use: Retrofit measure library and cost-vs-EUI frontiers from stacking measures
+
+This module:
+1. Defines individual retrofit measures (envelope, lighting, controls, DHW
+   heat pump, thermal storage, full electrification) with EUI savings that
+   may vary by property type, $/sqft cost, property-type eligibility and
+   requires / conflicts rules between measures
+2. Stacks measures multiplicatively - each removes its share of the EUI
+   left by the others - so a package keeps (1 - s1)(1 - s2)... of the EUI
+3. Enumerates every package (2^k) as a bit matrix, prunes packages that
+   break a requires / conflicts rule or include a measure the property type
+   cannot take, and scores the rest with one matrix product per type
+4. Keeps only Pareto-efficient packages (no cheaper package saves as much)
+   and applies each type's frontier to all of its buildings at once
+
+Because savings are fractions and costs are per square foot, a package's
+EUI factor and $/sqft are the same for every building of a property type;
+the frontier is computed once per type and scaled by each building's EUI
+and floor area.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+MAX_MEASURES = 20  # 2^20 packages per property type
+
+HOT_WATER_TYPES = ('Multifamily Housing', 'Hotel', 'Hospital', 'Senior Care Community',
+                   'Senior Living Community', 'Residence Hall/Dormitory')
+
+
+@dataclass(frozen=True)
+class Measure:
+    """One retrofit measure"""
+    name: str
+    category: str
+    savings: Union[float, Dict[str, float]]  # fraction of EUI removed; by property type with 'default'
+    cost_per_sqft: float
+    eligible_types: Optional[tuple] = None   # None = every property type
+    excluded_types: tuple = ()
+    requires: tuple = ()                     # measures that must be in the same package
+    conflicts: tuple = ()                    # measures that cannot be in the same package
+
+    def savings_for(self, property_type: str) -> float:
+        if isinstance(self.savings, dict):
+            return self.savings.get(property_type, self.savings['default'])
+        return self.savings
+
+    def eligible(self, property_type: str) -> bool:
+        if property_type in self.excluded_types:
+            return False
+        return self.eligible_types is None or property_type in self.eligible_types
+
+
+# Planning-level savings (share of whole-building site EUI) and costs; the
+# heat pump and TES costs match HVACSystemImpactModeler._estimate_cost_per_sqft
+DEFAULT_MEASURES = (
+    Measure('envelope', 'envelope', 0.12, 12.0,
+            excluded_types=('Data Center', 'Parking')),
+    Measure('lighting', 'lighting', {'default': 0.08, 'Retail Store': 0.12, 'Office': 0.10}, 3.0),
+    Measure('controls', 'controls', {'default': 0.07, 'Office': 0.09, 'K-12 School': 0.09}, 1.5),
+    Measure('dhw_heat_pump', 'dhw', {'default': 0.06, 'Hotel': 0.08, 'Multifamily Housing': 0.09}, 2.0,
+            eligible_types=HOT_WATER_TYPES),
+    Measure('4pipe_wshp', 'electrification', 0.50, 25.0,
+            excluded_types=('Manufacturing/Industrial Plant',)),
+    Measure('tes', 'tes', 0.05, 5.0, requires=('4pipe_wshp',)),
+)
+
+
+class MeasureLibrary:
+    """A set of measures and the packages that can be built from them"""
+
+    def __init__(self, measures: Sequence[Measure] = DEFAULT_MEASURES):
+        self.measures = tuple(measures)
+        self.names = tuple(m.name for m in self.measures)
+        if len(set(self.names)) != len(self.names):
+            raise ValueError("Measure names must be unique")
+        if len(self.measures) > MAX_MEASURES:
+            raise ValueError(f"At most {MAX_MEASURES} measures can be stacked exhaustively")
+        for measure in self.measures:
+            unknown = set(measure.requires) | set(measure.conflicts)
+            unknown -= set(self.names)
+            if unknown:
+                raise ValueError(f"Measure '{measure.name}' refers to unknown measures {sorted(unknown)}")
+        self.cost_per_sqft = np.array([m.cost_per_sqft for m in self.measures])
+        self.packages = self._packages()
+
+    def _packages(self) -> np.ndarray:
+        """Bool (packages, measures) of every package obeying requires / conflicts"""
+        k = len(self.measures)
+        masks = (np.arange(2 ** k)[:, None] >> np.arange(k)[None, :]) & 1 == 1
+        keep = np.ones(len(masks), dtype=bool)
+        position = {name: i for i, name in enumerate(self.names)}
+        for i, measure in enumerate(self.measures):
+            for other in measure.requires:
+                keep &= ~masks[:, i] | masks[:, position[other]]
+            for other in measure.conflicts:
+                keep &= ~(masks[:, i] & masks[:, position[other]])
+        return masks[keep]
+
+    def labels(self, packages: np.ndarray) -> np.ndarray:
+        """'lighting+controls' style label per package ('' = no measures)"""
+        names = np.array(self.names, dtype=object)
+        return np.array(['+'.join(names[row]) for row in packages], dtype=object)
+
+    def type_frontier(self, property_type: str) -> Dict[str, np.ndarray]:
+        """
+        Pareto-efficient packages for one property type
+
+        Returns:
+            Dict with 'packages' (bool rows, cheapest first), 'factor'
+            (share of EUI kept) and 'cost_per_sqft'
+        """
+        eligible = np.array([m.eligible(property_type) for m in self.measures])
+        packages = self.packages[~(self.packages[:, ~eligible]).any(axis=1)]
+        kept = np.log1p(-np.array([m.savings_for(property_type) for m in self.measures]))
+        factor = np.exp(packages @ kept)
+        cost = packages @ self.cost_per_sqft
+
+        # Cheapest first (ties: most savings first); keep strict improvements in EUI
+        order = np.lexsort((factor, cost))
+        factor, cost, packages = factor[order], cost[order], packages[order]
+        best_before = np.concatenate([[np.inf], np.minimum.accumulate(factor)[:-1]])
+        efficient = factor < best_before - 1e-12
+        return {'packages': packages[efficient], 'factor': factor[efficient],
+                'cost_per_sqft': cost[efficient]}
+
+    def evaluate(self, eui, sqft, property_types, building_ids) -> 'MeasureFrontier':
+        """
+        Cost-vs-EUI frontier of every building
+
+        Args:
+            eui: Current site EUI per building
+            sqft: Floor area per building
+            property_types: Property type per building
+            building_ids: ID per building
+
+        Returns:
+            MeasureFrontier
+        """
+        types = np.asarray(property_types).astype(str)
+        frontiers = {t: self.type_frontier(t) for t in np.unique(types)}
+        return MeasureFrontier(self, np.asarray(building_ids).astype(str), types,
+                               np.asarray(eui, dtype=np.float64), np.asarray(sqft, dtype=np.float64),
+                               frontiers)
+
+
+class MeasureFrontier:
+    """Pareto frontiers of measure packages for a portfolio"""
+
+    def __init__(self, library: MeasureLibrary, building_ids: np.ndarray, property_types: np.ndarray,
+                 eui: np.ndarray, sqft: np.ndarray, frontiers: Dict[str, Dict[str, np.ndarray]]):
+        self.library = library
+        self.building_ids = building_ids
+        self.property_types = property_types
+        self.eui = eui
+        self.sqft = sqft
+        self.frontiers = frontiers
+        self._positions = {b: i for i, b in enumerate(building_ids)}
+
+    def __len__(self) -> int:
+        return len(self.building_ids)
+
+    def frame(self) -> pd.DataFrame:
+        """Long table: one row per building x frontier package, cheapest first"""
+        parts = []
+        for property_type, frontier in self.frontiers.items():
+            rows = np.flatnonzero(self.property_types == property_type)
+            points = len(frontier['factor'])
+            building = np.repeat(rows, points)
+            factor = np.tile(frontier['factor'], len(rows))
+            parts.append(pd.DataFrame({
+                'building_id': self.building_ids[building],
+                'property_type': property_type,
+                'measures': np.tile(self.library.labels(frontier['packages']), len(rows)),
+                'n_measures': np.tile(frontier['packages'].sum(axis=1), len(rows)),
+                'cost': np.tile(frontier['cost_per_sqft'], len(rows)) * self.sqft[building],
+                'eui_after': factor * self.eui[building],
+                'eui_reduction_pct': (1 - factor) * 100,
+                '_order': building * points + np.tile(np.arange(points), len(rows)),
+            }))
+        table = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=['_order'])
+        return table.sort_values('_order').drop(columns='_order').reset_index(drop=True)
+
+    def frontier(self, building_id) -> Optional[pd.DataFrame]:
+        """Frontier packages of one building (None if unknown)"""
+        index = self._positions.get(str(building_id))
+        if index is None:
+            return None
+        frontier = self.frontiers[self.property_types[index]]
+        return pd.DataFrame({
+            'measures': self.library.labels(frontier['packages']),
+            'cost': frontier['cost_per_sqft'] * self.sqft[index],
+            'eui_after': frontier['factor'] * self.eui[index],
+            'eui_reduction_pct': (1 - frontier['factor']) * 100,
+        })
+
+    def cheapest_reaching(self, target_eui) -> pd.DataFrame:
+        """
+        Cheapest package that brings each building to its target EUI
+
+        Buildings no package can bring to target get the deepest package
+        on their frontier with meets_target False.
+
+        Args:
+            target_eui: Target EUI per building (array aligned with the buildings)
+        """
+        target = np.asarray(target_eui, dtype=np.float64)
+        pick = np.zeros(len(self), dtype=np.int64)
+        factor = np.ones(len(self))
+        cost = np.zeros(len(self))
+        labels = np.empty(len(self), dtype=object)
+        for property_type, frontier in self.frontiers.items():
+            rows = np.flatnonzero(self.property_types == property_type)
+            # Frontier factors fall as cost rises: first point at or under the needed factor
+            needed = np.where(self.eui[rows] > 0, target[rows] / self.eui[rows], np.inf)
+            descending = -frontier['factor']
+            index = np.searchsorted(descending, -needed - 1e-12, side='left')
+            index = np.minimum(index, len(descending) - 1)
+            pick[rows] = index
+            factor[rows] = frontier['factor'][index]
+            cost[rows] = frontier['cost_per_sqft'][index] * self.sqft[rows]
+            labels[rows] = self.library.labels(frontier['packages'])[index]
+        eui_after = factor * self.eui
+        return pd.DataFrame({
+            'building_id': self.building_ids,
+            'property_type': self.property_types,
+            'measures': labels,
+            'cost': cost,
+            'eui_after': eui_after,
+            'target_eui': target,
+            'meets_target': eui_after <= target + 1e-9,
+        })
+
+
+def print_frontier_summary(frontier: MeasureFrontier, targets: Optional[np.ndarray] = None):
+    """Console summary of frontier sizes and, with targets, the cost to comply"""
+    print("\n🧱 RETROFIT MEASURE FRONTIERS")
+    print("=" * 60)
+    print(f"  Measures: {', '.join(frontier.library.names)}")
+    print(f"  Feasible packages: {len(frontier.library.packages)}")
+    for property_type, points in frontier.frontiers.items():
+        count = int((frontier.property_types == property_type).sum())
+        print(f"  {property_type[:30]:<32} {count:>6,} buildings  {len(points['factor']):>3} efficient packages "
+              f"(max {(1 - points['factor'][-1]) * 100:.0f}% EUI cut)")
+    if targets is not None:
+        plan = frontier.cheapest_reaching(targets)
+        reached = plan['meets_target']
+        print(f"\n  Reach target: {int(reached.sum()):,} of {len(plan):,} buildings "
+              f"for ${plan.loc[reached, 'cost'].sum():,.0f}")
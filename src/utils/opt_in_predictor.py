@@ -15,6 +15,8 @@ import numpy as np
 from typing import Dict, List, Tuple, Optional
 from dataclasses import dataclass
 
+from .penalty_rules import load_rules
+
 
 @dataclass
 class OptInDecision:
@@ -37,10 +39,12 @@ class OptInPredictor:
     def __init__(self):
         """Initialize with decision parameters"""
         
-        # Penalty rates (corrected from BigQuery script)
-        self.PENALTY_RATE_STANDARD = 0.15  # $/kBtu over target
-        self.PENALTY_RATE_ACO = 0.23       # $/kBtu over target
-        self.DISCOUNT_RATE = 0.07           # 7% for NPV calculations
+        rules = load_rules()
+
+        # Penalty rates (config/penalty_rules.json)
+        self.PENALTY_RATE_STANDARD = rules.rate('standard')  # $/kBtu over target
+        self.PENALTY_RATE_ACO = rules.rate('aco')            # $/kBtu over target
+        self.DISCOUNT_RATE = rules.discount_rate             # 7% for NPV calculations
         
         # Retrofit cost assumptions ($/sqft) by reduction needed
         self.retrofit_cost_per_reduction = {
@@ -50,7 +54,7 @@ class OptInPredictor:
         }
         
         # MAI floor for manufacturing buildings
-        self.MAI_FLOOR = 52.9  # kBtu/sqft
+        self.MAI_FLOOR = rules.mai_floor_eui  # kBtu/sqft
         
     def predict_opt_in(self, building_data: Dict) -> OptInDecision:
         """
@@ -14,32 +14,39 @@ from typing import Dict, List, Tuple, Optional
 from dataclasses import dataclass
 from datetime import datetime
 
+from .penalty_rules import load_rules
+
+_RULES = load_rules()
+
 
 @dataclass
 class PenaltyConfig:
     """Configuration for penalty calculations"""
-    # Penalty rates by compliance path
-    STANDARD_RATE: float = 0.15  # $/kBtu for 3-target path
-    ACO_RATE: float = 0.23       # $/kBtu for 2-target Alternate Compliance Option
-    EXTENSION_RATE: float = 0.35  # $/kBtu for 1-target timeline extension
-    LATE_EXTENSION_ADDON: float = 0.10  # $/kBtu added for late extensions
-    NEVER_BENCHMARKED_RATE: float = 10.00  # $/sqft for never benchmarked
+    # Penalty rates by compliance path (config/penalty_rules.json)
+    STANDARD_RATE: float = _RULES.rate('standard')    # $/kBtu for 3-target path
+    ACO_RATE: float = _RULES.rate('aco')              # $/kBtu for 2-target Alternate Compliance Option
+    EXTENSION_RATE: float = _RULES.rate('extension')  # $/kBtu for 1-target timeline extension
+    LATE_EXTENSION_ADDON: float = _RULES.late_extension_addon  # $/kBtu added for late extensions
+    NEVER_BENCHMARKED_RATE: float = _RULES.never_benchmarked_per_sqft  # $/sqft for never benchmarked
     
     # Target years by path
-    STANDARD_TARGET_YEARS: List[int] = None  # Set in __post_init__
-    ACO_TARGET_YEARS: List[int] = None       # Set in __post_init__
+    STANDARD_TARGET_YEARS: List[int] = None   # Set in __post_init__
+    ACO_TARGET_YEARS: List[int] = None        # Set in __post_init__
+    EXTENSION_TARGET_YEARS: List[int] = None  # Set in __post_init__
     
     # Caps and floors
-    MAX_REDUCTION_PCT: float = 0.42  # 42% maximum reduction for non-MAI
-    MAI_REDUCTION_PCT: float = 0.30  # 30% reduction for MAI
-    MAI_FLOOR_EUI: float = 52.9      # Minimum EUI for MAI buildings
+    MAX_REDUCTION_PCT: float = _RULES.max_reduction_pct  # 42% maximum reduction for non-MAI
+    MAI_REDUCTION_PCT: float = _RULES.mai_reduction_pct  # 30% reduction for MAI
+    MAI_FLOOR_EUI: float = _RULES.mai_floor_eui          # Minimum EUI for MAI buildings
     MAI_BASELINE_THRESHOLD: float = 75.5  # Threshold for MAI floor application
     
     def __post_init__(self):
         if self.STANDARD_TARGET_YEARS is None:
-            self.STANDARD_TARGET_YEARS = [2025, 2027, 2030]
+            self.STANDARD_TARGET_YEARS = list(_RULES.target_years('standard'))
         if self.ACO_TARGET_YEARS is None:
-            self.ACO_TARGET_YEARS = [2028, 2032]
+            self.ACO_TARGET_YEARS = list(_RULES.target_years('aco'))
+        if self.EXTENSION_TARGET_YEARS is None:
+            self.EXTENSION_TARGET_YEARS = list(_RULES.target_years('extension'))
 
 
 class EnergizeDenverPenaltyCalculator:
@@ -81,7 +88,7 @@ class EnergizeDenverPenaltyCalculator:
         # Fallback to property type check (less accurate)
         # This should only be used if MAI designation list is not available
         if property_type:
-            return property_type == 'Manufacturing/Industrial Plant'
+            return property_type in _RULES.mai_fallback_types
             
         return False
     def apply_target_caps_and_floors(self, raw_target_eui: float, baseline_eui: float, 
@@ -210,8 +217,7 @@ class EnergizeDenverPenaltyCalculator:
                 return [year + offset for year in self.config.STANDARD_TARGET_YEARS]
             return self.config.STANDARD_TARGET_YEARS
         elif compliance_path.lower() == 'extension':
-            # Extension typically to 2030 or 2032
-            return [2030]  # Or 2032 depending on specifics
+            return self.config.EXTENSION_TARGET_YEARS
         else:
             return self.config.STANDARD_TARGET_YEARS
     
@@ -0,0 +1,237 @@
+"""
+Suggested File Name: penalty_cube.py
+File Location: /Users/robertpadgett/Projects/01_My_Notebooks/500_ED_Risk_Retro_BP/src/utils/
+Use: Dense building x year x path penalty cube shared by every portfolio report
+
+This module:
+1. Stores each building's yearly penalty on both compliance paths as one
+   float64 array of shape (buildings, years, paths), with index arrays for
+   building metadata (ID, property type, floor area)
+2. Turns any scenario - a path choice per building - into a gather over the
+   cube instead of a new wide DataFrame
+3. Computes year totals, buildings at risk, NPV and $/sqft as array
+   reductions, cached per scenario so every report shares them
+4. Persists the cube as a memory-mapped .npy plus an Arrow (Feather) file of
+   building metadata, so later reports open it without recomputing
+
+Layout on disk:
+    <directory>/penalties.npy     float64 (buildings, years, paths)
+    <directory>/buildings.feather building_id, property_type, sqft
+    <directory>/cube.json         years, paths, which years each path defines
+"""
+
+import json
+import os
+from typing import Dict, Iterable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .penalty_rules import load_rules
+
+YEARS = load_rules().years
+PATHS = ('standard', 'aco')
+DISCOUNT_RATE = load_rules().discount_rate
+
+
+def penalty_columns(df: pd.DataFrame) -> Dict[int, str]:
+    """Year -> penalty_YYYY column name for the penalty columns present in df"""
+    return {int(col.replace('penalty_', '')): col for col in df.columns if col.startswith('penalty_')}
+
+
+class PenaltyMatrix:
+    """
+    One scenario's penalties (buildings x years) with cached reductions
+
+    Reductions are computed once per scenario and reused by every report.
+    """
+
+    def __init__(self, values: np.ndarray, years: Sequence[int], sqft: np.ndarray):
+        self.values = values
+        self.years = tuple(int(y) for y in years)
+        self.sqft = sqft
+        self._year_index = {year: i for i, year in enumerate(self.years)}
+        self._cache = {}
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'PenaltyMatrix':
+        """Matrix from a wide scenario frame (one scan of its penalty_YYYY columns; NaN = no penalty)"""
+        columns = dict(sorted(penalty_columns(df).items()))
+        values = np.nan_to_num(df[list(columns.values())].to_numpy(dtype=np.float64))
+        return cls(values, list(columns), df['sqft'].to_numpy(dtype=np.float64))
+
+    def __len__(self) -> int:
+        return self.values.shape[0]
+
+    def has_year(self, year: int) -> bool:
+        return year in self._year_index
+
+    def column(self, year: int) -> np.ndarray:
+        """Per-building penalties for one year"""
+        return self.values[:, self._year_index[year]]
+
+    def year_totals(self) -> pd.Series:
+        """Total penalties by year"""
+        if 'totals' not in self._cache:
+            self._cache['totals'] = pd.Series(self.values.sum(axis=0), index=list(self.years))
+        return self._cache['totals']
+
+    def buildings_at_risk(self) -> pd.Series:
+        """Buildings with a penalty, by year"""
+        if 'at_risk' not in self._cache:
+            self._cache['at_risk'] = pd.Series((self.values > 0).sum(axis=0), index=list(self.years))
+        return self._cache['at_risk']
+
+    def total(self, year: int, default: float = 0.0) -> float:
+        return float(self.year_totals()[year]) if self.has_year(year) else default
+
+    def at_risk(self, year: int) -> int:
+        return int(self.buildings_at_risk()[year]) if self.has_year(year) else 0
+
+    def npv(self, rate: float = DISCOUNT_RATE, base_year: int = 2025,
+            through: Optional[int] = None) -> float:
+        """NPV of the yearly totals from base_year (optionally only through a year)"""
+        totals = self.year_totals()
+        years = np.array(self.years)
+        keep = (years >= base_year) & (years <= (through if through is not None else years.max()))
+        factors = (1 + rate) ** -(years[keep] - base_year)
+        return float((totals.to_numpy()[keep] * factors).sum())
+
+    def peak_year(self):
+        """(year, total) of the highest yearly total"""
+        totals = self.year_totals()
+        year = int(totals.idxmax())
+        return year, float(totals[year])
+
+    def penalty_per_sqft(self, year: int, at_risk_only: bool = False) -> float:
+        """Total penalty / total floor area (optionally over buildings with a penalty only)"""
+        if not self.has_year(year):
+            return 0.0
+        penalties = self.column(year)
+        sqft = self.sqft[penalties > 0] if at_risk_only else self.sqft
+        return float(penalties.sum() / sqft.sum()) if sqft.sum() else 0.0
+
+
+class PenaltyCube:
+    """Penalties for every building, year and compliance path"""
+
+    def __init__(self, values: np.ndarray, buildings: pd.DataFrame,
+                 years: Sequence[int] = YEARS, paths: Sequence[str] = PATHS,
+                 defined: Optional[np.ndarray] = None):
+        """
+        Args:
+            values: float64 array (buildings, years, paths); may be a memmap
+            buildings: building_id, property_type, sqft in cube order
+            years, paths: Labels of the year and path axes
+            defined: bool (years, paths) - which years a path reports at all
+                (the standard path has no 2026/2028/2029 penalty columns);
+                all True when omitted
+        """
+        if values.shape != (len(buildings), len(years), len(paths)):
+            raise ValueError(f"Cube shape {values.shape} does not match "
+                             f"{len(buildings)} buildings x {len(years)} years x {len(paths)} paths")
+        self.values = values
+        self.buildings = buildings.reset_index(drop=True)
+        self.years = tuple(int(y) for y in years)
+        self.paths = tuple(paths)
+        self.building_ids = self.buildings['building_id'].astype(str).to_numpy()
+        self.sqft = self.buildings['sqft'].to_numpy(dtype=np.float64)
+        self.defined = (np.ones((len(self.years), len(self.paths)), dtype=bool)
+                        if defined is None else np.asarray(defined, dtype=bool))
+        self._path_codes = {path: i for i, path in enumerate(self.paths)}
+        self._scenarios: Dict[bytes, PenaltyMatrix] = {}
+
+    @classmethod
+    def from_scenarios(cls, standard: pd.DataFrame, aco: pd.DataFrame) -> 'PenaltyCube':
+        """
+        Cube from the all-standard and all-ACO scenario frames (same building order)
+
+        Years missing from a path's frame (no penalty column) are zero and
+        marked undefined for that path.
+        """
+        if not np.array_equal(standard['building_id'].astype(str).to_numpy(),
+                              aco['building_id'].astype(str).to_numpy()):
+            raise ValueError("Scenario frames must list the same buildings in the same order")
+        values = np.zeros((len(standard), len(YEARS), len(PATHS)))
+        defined = np.zeros((len(YEARS), len(PATHS)), dtype=bool)
+        for p, frame in enumerate((standard, aco)):
+            for year, column in penalty_columns(frame).items():
+                if year in YEARS:
+                    values[:, YEARS.index(year), p] = frame[column].to_numpy(dtype=np.float64)
+                    defined[YEARS.index(year), p] = True
+        buildings = pd.DataFrame({
+            'building_id': standard['building_id'].astype(str).to_numpy(),
+            'property_type': standard['property_type'].astype(str).to_numpy(),
+            'sqft': standard['sqft'].to_numpy(dtype=np.float64),
+        })
+        return cls(values, buildings, defined=defined)
+
+    def __len__(self) -> int:
+        return len(self.building_ids)
+
+    def path_codes(self, paths: Iterable[str]) -> np.ndarray:
+        """Path names -> path axis indices"""
+        return np.array([self._path_codes[str(p)] for p in paths], dtype=np.int8)
+
+    def path_penalties(self, path: str, year: int) -> np.ndarray:
+        """Per-building penalties in one year on one path"""
+        return self.values[:, self.years.index(year), self._path_codes[path]]
+
+    def building_npv(self, path: str, rate: float = DISCOUNT_RATE, base_year: int = 2025) -> np.ndarray:
+        """Per-building NPV on one path from base_year (years accumulated in order)"""
+        p = self._path_codes[path]
+        npv = np.zeros(len(self))
+        for j, year in enumerate(self.years):
+            if year >= base_year:
+                npv = npv + self.values[:, j, p] / (1 + rate) ** (year - base_year)
+        return npv
+
+    def covers(self, df: pd.DataFrame) -> bool:
+        """True when df is a scenario over exactly the cube's buildings, in cube order, on cube paths"""
+        return ('path' in df.columns and len(df) == len(self)
+                and np.array_equal(df['building_id'].astype(str).to_numpy(), self.building_ids)
+                and set(pd.unique(df['path'].astype(str))) <= set(self.paths))
+
+    def scenario(self, paths) -> PenaltyMatrix:
+        """
+        Penalties when each building follows the given path
+
+        Args:
+            paths: One path per building (names or axis indices), or a single
+                path name for every building
+
+        Returns:
+            PenaltyMatrix over the years defined for any selected path
+            (cached per distinct path vector)
+        """
+        if isinstance(paths, str):
+            codes = np.full(len(self), self._path_codes[paths], dtype=np.int8)
+        else:
+            paths = np.asarray(paths)
+            codes = paths.astype(np.int8) if paths.dtype.kind in 'iu' else self.path_codes(paths)
+        key = codes.tobytes()
+        if key not in self._scenarios:
+            years = self.defined[:, np.unique(codes)].any(axis=1)
+            gathered = np.take_along_axis(self.values[:, years, :],
+                                          codes[:, None, None].astype(np.intp), axis=2)
+            self._scenarios[key] = PenaltyMatrix(gathered[:, :, 0],
+                                                 np.array(self.years)[years], self.sqft)
+        return self._scenarios[key]
+
+    def save(self, directory: str):
+        """Write penalties.npy, buildings.feather and cube.json to a directory"""
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, 'penalties.npy'), np.ascontiguousarray(self.values))
+        self.buildings.to_feather(os.path.join(directory, 'buildings.feather'))
+        with open(os.path.join(directory, 'cube.json'), 'w') as f:
+            json.dump({'years': list(self.years), 'paths': list(self.paths),
+                       'defined': self.defined.tolist()}, f)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> 'PenaltyCube':
+        """Open a saved cube (penalties memory-mapped read-only by default)"""
+        with open(os.path.join(directory, 'cube.json')) as f:
+            axes = json.load(f)
+        values = np.load(os.path.join(directory, 'penalties.npy'), mmap_mode='r' if mmap else None)
+        buildings = pd.read_feather(os.path.join(directory, 'buildings.feather'))
+        return cls(values, buildings, axes['years'], axes['paths'], axes.get('defined'))
@@ -0,0 +1,429 @@
+"""
+Suggested File Name: penalty_monte_carlo.py
+File Location: /Users/robertpadgett/Projects/01_My_Notebooks/500_ED_Risk_Retro_BP/src/utils/
+Use: Stochastic portfolio penalty engine (EUI drift, correlated shocks, retrofits)
+
+This module:
+1. Simulates each building's EUI from 2025 to 2042 as a log random walk:
+   - drift from its recent trend (EUI_Trend_Pct), shrunk toward its
+     property type's median trend
+   - volatility from how far its current EUI sits from its recent average
+     (Average_EUI_Recent)
+   - shocks shared portfolio-wide, shared within a property type and
+     idiosyncratic
+2. Lets buildings adopt a retrofit (a one-off EUI cut) with an annual
+   hazard that rises with their gap to the final target
+3. Applies the compliance-path penalty schedule to every simulated year
+   (standard: 2025 / 2027 / 2030+, ACO: 2028 / 2032+, extension: 2030+)
+4. Runs the paths in vectorized chunks, across processes when asked, with
+   one independent seed per chunk so results do not depend on the number
+   of workers
+5. Reports yearly penalty distributions, NPV VaR / CVaR and the buildings
+   that drive the tail
+
+With zero volatility, zero drift and no retrofits every path reproduces the
+deterministic PortfolioRiskAnalyzer penalties.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .penalty_cube import DISCOUNT_RATE, YEARS
+from .penalty_plan import PenaltyPlan, default_plan
+
+PATH_CODES = {path: code for code, path in enumerate(default_plan().paths)}
+
+# Float64 values per chunk (paths x years x buildings) before chunks are split
+CHUNK_BUDGET = 2_000_000
+
+
+@dataclass
+class MonteCarloParams:
+    """Stochastic model settings"""
+    volatility: float = 0.04            # default annual log-EUI volatility
+    min_volatility: float = 0.02
+    max_volatility: float = 0.15
+    market_correlation: float = 0.2     # share of shock variance common to all buildings
+    type_correlation: float = 0.3       # share common within a property type
+    trend_window_years: float = 2.0     # EUI_Trend_Pct spans the recent (up to 3-year) window
+    trend_shrinkage: float = 0.5        # weight of a building's own trend vs its type median
+    max_drift: float = 0.08             # cap on |annual log drift|
+    retrofit_base_hazard: float = 0.02  # annual retrofit probability with no target gap
+    retrofit_gap_hazard: float = 0.10   # added per unit of relative gap to the final target
+    retrofit_savings: tuple = (0.15, 0.35)  # uniform range of EUI reduction
+    discount_rate: float = DISCOUNT_RATE
+    base_year: int = 2025
+
+    def __post_init__(self):
+        if self.market_correlation + self.type_correlation > 1:
+            raise ValueError("market_correlation + type_correlation must not exceed 1")
+
+
+@dataclass
+class MonteCarloInputs:
+    """Per-building arrays the simulation needs (one entry per building)"""
+    building_ids: np.ndarray
+    property_types: np.ndarray
+    type_codes: np.ndarray
+    sqft: np.ndarray
+    current_eui: np.ndarray
+    first_interim_target: np.ndarray
+    second_interim_target: np.ndarray
+    final_target: np.ndarray
+    path_codes: np.ndarray
+    trend_pct: np.ndarray = None
+    recent_eui: np.ndarray = None
+
+    def __len__(self) -> int:
+        return len(self.building_ids)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, paths) -> 'MonteCarloInputs':
+        """
+        Inputs from a portfolio frame (analyzer column names) and a path per building
+
+        Args:
+            df: Portfolio with Building ID, Master Property Type, Master Sq Ft,
+                Weather Normalized Site EUI, the interim / final target EUIs and
+                optionally EUI_Trend_Pct and Average_EUI_Recent
+            paths: 'standard' / 'aco' / 'extension' per building (or one for all)
+        """
+        def column(name, default=np.nan):
+            if name not in df.columns:
+                return np.full(len(df), default)
+            return pd.to_numeric(df[name], errors='coerce').to_numpy(dtype=np.float64)
+
+        final = column('Adjusted Final Target EUI')
+        final = np.where(np.isnan(final), column('Original Final Target EUI'), final)
+        types = df['Master Property Type'].astype(str).to_numpy()
+        labels, codes = np.unique(types, return_inverse=True)
+        if isinstance(paths, str):
+            paths = [paths] * len(df)
+        return cls(
+            building_ids=df['Building ID'].astype(str).to_numpy(),
+            property_types=types,
+            type_codes=codes.astype(np.int32),
+            sqft=column('Master Sq Ft'),
+            current_eui=column('Weather Normalized Site EUI'),
+            first_interim_target=column('First Interim Target EUI'),
+            second_interim_target=column('Second Interim Target EUI'),
+            final_target=final,
+            path_codes=np.array([PATH_CODES[str(p)] for p in paths], dtype=np.int8),
+            trend_pct=column('EUI_Trend_Pct'),
+            recent_eui=column('Average_EUI_Recent'),
+        )
+
+
+def annual_drift(inputs: MonteCarloInputs, params: MonteCarloParams) -> np.ndarray:
+    """Annual log-EUI drift per building (own trend shrunk toward its type median)"""
+    trend = inputs.trend_pct if inputs.trend_pct is not None else np.full(len(inputs), np.nan)
+    own = np.log1p(np.clip(trend, -90, 900) / 100) / params.trend_window_years
+    drift = np.zeros(len(inputs))
+    for code in np.unique(inputs.type_codes):
+        members = inputs.type_codes == code
+        known = own[members & ~np.isnan(own)]
+        type_median = float(np.median(known)) if len(known) else 0.0
+        member_own = np.where(np.isnan(own[members]), type_median, own[members])
+        drift[members] = (params.trend_shrinkage * member_own
+                          + (1 - params.trend_shrinkage) * type_median)
+    return np.clip(drift, -params.max_drift, params.max_drift)
+
+
+def building_volatility(inputs: MonteCarloInputs, params: MonteCarloParams) -> np.ndarray:
+    """Annual log-EUI volatility from the gap between current and recent-average EUI"""
+    recent = inputs.recent_eui if inputs.recent_eui is not None else np.full(len(inputs), np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        deviation = np.abs(inputs.current_eui / recent - 1)
+    vol = np.where(np.isfinite(deviation), deviation, params.volatility)
+    return np.clip(vol, params.min_volatility, params.max_volatility)
+
+
+def retrofit_hazard(inputs: MonteCarloInputs, params: MonteCarloParams) -> np.ndarray:
+    """Annual retrofit adoption probability (higher for buildings far above final target)"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gap = np.clip((inputs.current_eui - inputs.final_target) / inputs.current_eui, 0, 1)
+    gap = np.nan_to_num(gap)
+    return np.clip(params.retrofit_base_hazard + params.retrofit_gap_hazard * gap, 0, 1)
+
+
+def penalty_schedule(inputs: MonteCarloInputs, years: Sequence[int] = YEARS,
+                     plan: Optional[PenaltyPlan] = None):
+    """
+    Target EUI and $/kBtu rate for every (year, building)
+
+    Args:
+        inputs: Per-building arrays
+        years: Years to schedule
+        plan: Compiled penalty rules (config/penalty_rules.json by default)
+
+    Returns:
+        (targets, rates) float arrays of shape (years, buildings); years
+        without a penalty have an infinite target and a zero rate
+    """
+    plan = plan or default_plan()
+    return plan.schedule(inputs.first_interim_target, inputs.second_interim_target,
+                         inputs.final_target, inputs.path_codes, years)
+
+
+def _prepare(inputs: MonteCarloInputs, params: MonteCarloParams, years: Sequence[int]) -> Dict:
+    """Arrays shared by every chunk (computed once, sent to each worker once)"""
+    targets, rates = penalty_schedule(inputs, years)
+    valid = inputs.current_eui > 0
+    years = np.asarray(years)
+    return {
+        # Simulated EUIs are float32 (ample for sampled paths, half the memory traffic)
+        'log_eui': np.log(np.where(valid, inputs.current_eui, 1.0)).astype(np.float32),
+        'type_codes': inputs.type_codes,
+        'n_types': int(inputs.type_codes.max()) + 1 if len(inputs) else 0,
+        'drift': annual_drift(inputs, params).astype(np.float32),
+        'vol': building_volatility(inputs, params).astype(np.float32),
+        'hazard': retrofit_hazard(inputs, params),
+        'targets': np.minimum(targets, np.finfo(np.float32).max).astype(np.float32),
+        # $ per kBtu/sqft over target, per (year, building); zero without a valid EUI
+        'dollars_per_eui': (rates * np.nan_to_num(inputs.sqft) * valid).astype(np.float32),
+        'discount': ((1 + params.discount_rate) ** -(years - params.base_year).clip(min=0)
+                     ).astype(np.float32),
+        'params': params,
+    }
+
+
+def simulate_chunk(shared: Dict, n_paths: int, seed, tail_threshold: Optional[float] = None) -> Dict:
+    """
+    Simulate n_paths portfolio paths
+
+    Args:
+        shared: _prepare() arrays
+        seed: SeedSequence / int for this chunk (re-running a seed reproduces it)
+        tail_threshold: When set, also sum each building's NPV over the
+            paths whose portfolio NPV is at or above it
+
+    Returns:
+        Dict with 'yearly' (paths x years), 'npv' (paths,), 'building_npv'
+        (sum over paths, per building) and, with tail_threshold,
+        'tail_building_npv' and 'tail_paths'
+    """
+    params = shared['params']
+    rng = np.random.default_rng(seed)
+    n_years = len(shared['discount'])
+    n_buildings = len(shared['log_eui'])
+
+    # Correlated log-EUI shocks: market + property type + idiosyncratic
+    a = np.float32(np.sqrt(params.market_correlation))
+    b = np.float32(np.sqrt(params.type_correlation))
+    c = np.float32(np.sqrt(1 - params.market_correlation - params.type_correlation))
+    common = b * rng.standard_normal((n_paths, n_years, shared['n_types']), dtype=np.float32)
+    common += a * rng.standard_normal((n_paths, n_years, 1), dtype=np.float32)
+    log_eui = rng.standard_normal((n_paths, n_years, n_buildings), dtype=np.float32)
+    log_eui *= c
+    log_eui += common[:, :, shared['type_codes']]
+    log_eui *= shared['vol']
+    log_eui += shared['drift']
+    np.cumsum(log_eui, axis=1, out=log_eui)
+    log_eui += shared['log_eui']
+
+    # Retrofit: geometric adoption year from a constant hazard, one-off EUI cut
+    hazard = shared['hazard']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        adopt = np.floor(np.log(rng.random((n_paths, n_buildings)))
+                         / np.log1p(-np.minimum(hazard, 1 - 1e-12)))
+    adopt = np.where(hazard > 0, adopt, np.inf)
+    cut = np.log1p(-rng.uniform(*params.retrofit_savings, size=(n_paths, n_buildings))).astype(np.float32)
+    for t in range(n_years):
+        log_eui[:, t, :] += np.where(adopt <= t, cut, np.float32(0))
+
+    # Penalty = max(EUI - target, 0) x rate x sqft, in place over the EUI array
+    penalties = np.exp(log_eui, out=log_eui)
+    penalties -= shared['targets']
+    np.maximum(penalties, 0, out=penalties)
+    penalties *= shared['dollars_per_eui']
+    building_npv = np.matmul(shared['discount'], penalties, dtype=np.float64)
+    npv = building_npv.sum(axis=1)
+
+    result = {
+        'yearly': penalties.sum(axis=2, dtype=np.float64),
+        'npv': npv,
+        'building_npv': building_npv.sum(axis=0),
+    }
+    if tail_threshold is not None:
+        tail = npv >= tail_threshold
+        result['tail_building_npv'] = building_npv[tail].sum(axis=0)
+        result['tail_paths'] = int(tail.sum())
+    return result
+
+
+# Worker-process state (set once per worker by _init_worker)
+_SHARED = None
+
+
+def _init_worker(shared: Dict):
+    global _SHARED
+    _SHARED = shared
+
+
+def _run_chunk(args):
+    n_paths, seed, tail_threshold = args
+    return simulate_chunk(_SHARED, n_paths, seed, tail_threshold)
+
+
+@dataclass
+class MonteCarloResult:
+    """Simulated portfolio penalties"""
+    years: tuple
+    yearly: np.ndarray           # (paths, years) total penalty per simulated year
+    npv: np.ndarray              # (paths,) portfolio penalty NPV
+    building_ids: np.ndarray
+    property_types: np.ndarray
+    mean_building_npv: np.ndarray
+    alpha: float
+    tail_building_npv: Optional[np.ndarray] = None  # mean over tail paths
+    params: MonteCarloParams = field(default_factory=MonteCarloParams)
+
+    @property
+    def n_paths(self) -> int:
+        return len(self.npv)
+
+    def var(self, alpha: Optional[float] = None) -> float:
+        """Value at risk: the alpha quantile of the penalty NPV"""
+        return float(np.quantile(self.npv, self.alpha if alpha is None else alpha))
+
+    def cvar(self, alpha: Optional[float] = None) -> float:
+        """Conditional VaR: mean penalty NPV over paths at or above VaR"""
+        threshold = self.var(alpha)
+        return float(self.npv[self.npv >= threshold].mean())
+
+    def yearly_distribution(self, percentiles: Sequence[float] = (5, 25, 50, 75, 95)) -> pd.DataFrame:
+        """Mean, percentiles, VaR and CVaR of total penalties for each year"""
+        table = pd.DataFrame({'year': list(self.years), 'mean': self.yearly.mean(axis=0)})
+        for p, values in zip(percentiles, np.percentile(self.yearly, percentiles, axis=0)):
+            table[f'p{p:g}'] = values
+        var = np.quantile(self.yearly, self.alpha, axis=0)
+        table[f'var_{self.alpha * 100:g}'] = var
+        table[f'cvar_{self.alpha * 100:g}'] = [
+            column[column >= threshold].mean() for column, threshold in zip(self.yearly.T, var)
+        ]
+        return table
+
+    def tail_drivers(self, top: int = 20) -> pd.DataFrame:
+        """
+        Buildings contributing most to tail-path penalty NPV
+
+        Columns: building_id, property_type, mean_npv (all paths),
+        tail_npv (mean over tail paths), tail_excess (tail - mean) and
+        tail_share (of total tail NPV).
+        """
+        if self.tail_building_npv is None:
+            raise ValueError("Tail attribution was not run (tail_attribution=False)")
+        drivers = pd.DataFrame({
+            'building_id': self.building_ids,
+            'property_type': self.property_types,
+            'mean_npv': self.mean_building_npv,
+            'tail_npv': self.tail_building_npv,
+        })
+        drivers['tail_excess'] = drivers['tail_npv'] - drivers['mean_npv']
+        total = drivers['tail_npv'].sum()
+        drivers['tail_share'] = drivers['tail_npv'] / total if total else 0.0
+        return drivers.sort_values('tail_npv', ascending=False).head(top).reset_index(drop=True)
+
+    def summary(self) -> Dict:
+        return {
+            'paths': self.n_paths,
+            'alpha': self.alpha,
+            'mean_npv': float(self.npv.mean()),
+            'median_npv': float(np.median(self.npv)),
+            'var': self.var(),
+            'cvar': self.cvar(),
+            'p5_npv': float(np.percentile(self.npv, 5)),
+            'p95_npv': float(np.percentile(self.npv, 95)),
+        }
+
+
+def run_monte_carlo(inputs: MonteCarloInputs, n_paths: int = 20_000,
+                    params: Optional[MonteCarloParams] = None, seed: int = 42,
+                    alpha: float = 0.95, workers: Optional[int] = None,
+                    chunk_size: Optional[int] = None, years: Sequence[int] = YEARS,
+                    tail_attribution: bool = True) -> MonteCarloResult:
+    """
+    Simulate portfolio penalty paths
+
+    Args:
+        inputs: Per-building arrays (MonteCarloInputs.from_frame)
+        n_paths: Number of simulated portfolio paths
+        seed: Root seed; chunk seeds are spawned from it
+        alpha: VaR / CVaR level
+        workers: Processes (None = all CPUs, 1 = run in this process)
+        chunk_size: Paths per vectorized chunk (default keeps a chunk's
+            paths x years x buildings arrays near CHUNK_BUDGET values)
+        tail_attribution: Re-simulate the chunks (same seeds) to attribute
+            tail-path NPV to buildings
+
+    Returns:
+        MonteCarloResult
+    """
+    params = params or MonteCarloParams()
+    years = tuple(years)
+    shared = _prepare(inputs, params, years)
+    if chunk_size is None:
+        chunk_size = max(1, CHUNK_BUDGET // max(1, len(years) * len(inputs)))
+    sizes = [min(chunk_size, n_paths - start) for start in range(0, n_paths, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    workers = os.cpu_count() if workers is None else workers
+    workers = max(1, min(workers, len(sizes)))
+
+    def run(tail_threshold=None):
+        tasks = [(size, chunk_seed, tail_threshold) for size, chunk_seed in zip(sizes, seeds)]
+        if workers == 1:
+            return [simulate_chunk(shared, *task) for task in tasks]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(shared,)) as pool:
+            return list(pool.map(_run_chunk, tasks))
+
+    chunks = run()
+    npv = np.concatenate([chunk['npv'] for chunk in chunks])
+    result = MonteCarloResult(
+        years=years,
+        yearly=np.concatenate([chunk['yearly'] for chunk in chunks]),
+        npv=npv,
+        building_ids=inputs.building_ids,
+        property_types=inputs.property_types,
+        mean_building_npv=sum(chunk['building_npv'] for chunk in chunks) / max(n_paths, 1),
+        alpha=alpha,
+        params=params,
+    )
+    if tail_attribution and n_paths:
+        tail_chunks = run(result.var())
+        tail_paths = sum(chunk['tail_paths'] for chunk in tail_chunks)
+        result.tail_building_npv = sum(chunk['tail_building_npv'] for chunk in tail_chunks) / tail_paths
+    return result
+
+
+def print_report(result: MonteCarloResult, milestone_years: Sequence[int] = (2025, 2027, 2028, 2030, 2032, 2035, 2040),
+                 top: int = 10):
+    """Console summary: NPV range, VaR / CVaR, yearly bands and tail drivers"""
+    summary = result.summary()
+    level = f"{result.alpha * 100:g}%"
+    print("\n🎲 PORTFOLIO PENALTY MONTE CARLO")
+    print("=" * 60)
+    print(f"  Paths simulated: {summary['paths']:,}")
+    print(f"  Penalty NPV mean: ${summary['mean_npv']:,.0f} (median ${summary['median_npv']:,.0f})")
+    print(f"  90% range: ${summary['p5_npv']:,.0f} - ${summary['p95_npv']:,.0f}")
+    print(f"  VaR {level}: ${summary['var']:,.0f}")
+    print(f"  CVaR {level}: ${summary['cvar']:,.0f}")
+
+    table = result.yearly_distribution()
+    print(f"\n{'Year':<6} {'P5 ($M)':>10} {'Median ($M)':>12} {'P95 ($M)':>10} {'CVaR ($M)':>10}")
+    print("-" * 52)
+    for _, row in table[table['year'].isin(milestone_years)].iterrows():
+        print(f"{int(row['year']):<6} {row['p5'] / 1e6:>10.1f} {row['p50'] / 1e6:>12.1f} "
+              f"{row['p95'] / 1e6:>10.1f} {row[f'cvar_{result.alpha * 100:g}'] / 1e6:>10.1f}")
+
+    if result.tail_building_npv is not None:
+        print(f"\nBuildings driving tail risk (mean NPV over worst {100 - result.alpha * 100:g}% of paths):")
+        for _, row in result.tail_drivers(top).iterrows():
+            print(f"  {row['building_id']:<10} {str(row['property_type'])[:30]:<32} "
+                  f"${row['tail_npv']:>12,.0f} (+${row['tail_excess']:,.0f} vs mean, "
+                  f"{row['tail_share'] * 100:.1f}% of tail)")
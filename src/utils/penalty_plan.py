@@ -0,0 +1,214 @@
+"""
+Suggested File Name: penalty_plan.py
+File Location: /Users/robertpadgett/Projects/01_My_Notebooks/500_ED_Risk_Retro_BP/src/utils/
+Use: Penalty rules compiled for vectorized evaluation and BigQuery SQL
+
+This module:
+1. Compiles PenaltyRules into (path x year) arrays over the horizon - the
+   target applied, the rate and the event year each year repeats - so any
+   portfolio's target / rate schedule is a single gather
+2. Evaluates the plan for arrays of buildings (targets, rates, penalties,
+   capped final targets) and for one building's dict of yearly penalties
+3. Emits the same rules (coverage, per-event penalties, their NPV) as SQL
+   expressions for the BigQuery views
+"""
+
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .penalty_rules import TARGET_KINDS, PenaltyRules, load_rules
+
+# building_data keys holding each target (PortfolioRiskAnalyzer.prepare_building_for_analysis)
+TARGET_KEYS = {'first_interim': 'first_interim_target',
+               'second_interim': 'second_interim_target',
+               'final': 'final_target'}
+
+
+@lru_cache(maxsize=None)
+def default_plan() -> 'PenaltyPlan':
+    """Compiled plan of the default rules file"""
+    return PenaltyPlan(load_rules())
+
+
+class PenaltyPlan:
+    """Rules compiled to (path x year) arrays"""
+
+    def __init__(self, rules: PenaltyRules):
+        self.rules = rules
+        self.paths = tuple(rules.paths)
+        self.years = np.array(rules.years)
+        shape = (len(self.paths), len(self.years))
+        self.kind = np.full(shape, -1, dtype=np.int8)          # index into TARGET_KINDS, -1 = none
+        self.event_year = np.zeros(shape, dtype=np.int64)      # event whose assessment a year repeats
+        self.rate = np.zeros(shape)
+        self.reported = np.zeros(shape, dtype=bool)
+        for p, path in enumerate(rules.paths.values()):
+            for event in path.targets:
+                last = self.years[-1] if event.recurring else event.year
+                cells = (self.years >= event.year) & (self.years <= last)
+                self.kind[p, cells] = TARGET_KINDS.index(event.target)
+                self.event_year[p, cells] = event.year
+                self.rate[p, cells] = path.rate
+            self.reported[p] = True if path.report_all_years else self.kind[p] >= 0
+        self._codes = {name: i for i, name in enumerate(self.paths)}
+
+    def path_codes(self, paths) -> np.ndarray:
+        """Path names -> path indices"""
+        if isinstance(paths, str):
+            paths = [paths]
+        try:
+            return np.array([self._codes[str(p).lower()] for p in paths], dtype=np.int8)
+        except KeyError as e:
+            raise ValueError(f"Unknown compliance path {e} (expected one of {self.paths})")
+
+    # -- Vectorized evaluation ------------------------------------------------
+
+    def schedule(self, first_interim, second_interim, final, path_codes,
+                 years: Optional[Sequence[int]] = None):
+        """
+        Target EUI and $/kBtu rate for every (year, building)
+
+        Args:
+            first_interim, second_interim, final: Target arrays per building
+            path_codes: Path index per building (path_codes())
+            years: Years to return (the horizon by default); years outside
+                the horizon carry no penalty
+
+        Returns:
+            (targets, rates) of shape (years, buildings); no penalty means an
+            infinite target and a zero rate (missing targets included)
+        """
+        stack = np.stack([np.asarray(t, dtype=np.float64) for t in (first_interim, second_interim, final)])
+        codes = np.asarray(path_codes, dtype=np.intp)
+        kind = self.kind[codes].T                                           # (years, buildings)
+        rates = self.rate[codes].T.copy()
+        targets = np.where(kind >= 0, stack[np.clip(kind, 0, None), np.arange(len(codes))], np.inf)
+        missing = np.isnan(targets)
+        rates[missing] = 0.0
+        targets[missing] = np.inf
+        if years is None:
+            return targets, rates
+
+        years = np.asarray(years)
+        inside = (years >= self.years[0]) & (years <= self.years[-1])
+        rows = np.clip(years - self.years[0], 0, len(self.years) - 1)
+        return (np.where(inside[:, None], targets[rows], np.inf),
+                np.where(inside[:, None], rates[rows], 0.0))
+
+    def penalties(self, eui, sqft, first_interim, second_interim, final, path_codes) -> np.ndarray:
+        """Yearly penalties (years, buildings) at a constant EUI"""
+        targets, rates = self.schedule(first_interim, second_interim, final, path_codes)
+        eui = np.asarray(eui, dtype=np.float64)
+        return np.maximum(eui[None, :] - targets, 0) * rates * np.asarray(sqft, dtype=np.float64)[None, :]
+
+    def final_targets(self, raw_target, baseline, is_mai, mai_adjusted=None) -> np.ndarray:
+        """
+        Caps and floors: non-MAI targets never ask for more than the maximum
+        reduction; MAI targets take the most lenient of the raw target, the
+        MAI reduction from baseline, the MAI floor and the MAI summary target
+        """
+        rules = self.rules
+        raw = np.asarray(raw_target, dtype=np.float64)
+        baseline = np.asarray(baseline, dtype=np.float64)
+        capped = np.maximum(raw, baseline * (1 - rules.max_reduction_pct))
+        mai = np.maximum(raw, np.maximum(baseline * (1 - rules.mai_reduction_pct), rules.mai_floor_eui))
+        if mai_adjusted is not None:
+            mai = np.fmax(mai, np.asarray(mai_adjusted, dtype=np.float64))
+        return np.where(np.asarray(is_mai, dtype=bool), mai, capped)
+
+    # -- One building ---------------------------------------------------------
+
+    def building_penalties(self, path: str, building_data: Dict, rate: Optional[float] = None) -> Dict[str, float]:
+        """
+        {'YYYY': penalty} over the path's reported years for one building
+
+        Each target event uses the building's EUI for that year
+        (building_data['actual_euis'], else current_eui); recurring years
+        repeat their event's penalty.
+
+        Args:
+            path: Compliance path name
+            building_data: sqft, current_eui, the three targets and optionally actual_euis
+            rate: Override of the path rate ($/kBtu)
+        """
+        p = self.path_codes(path)[0]
+        sqft = building_data['sqft']
+        current_eui = building_data['current_eui']
+        actual_euis = building_data.get('actual_euis', {})
+        rate = self.rules.paths[self.paths[p]].rate if rate is None else rate
+
+        assessed = {}
+        penalties = {}
+        for year, kind, event_year, reported in zip(self.years.tolist(), self.kind[p].tolist(),
+                                                    self.event_year[p].tolist(), self.reported[p].tolist()):
+            if not reported:
+                continue
+            if kind < 0:
+                penalties[str(year)] = 0
+                continue
+            if event_year not in assessed:
+                gap = max(0, actual_euis.get(event_year, current_eui)
+                          - building_data[TARGET_KEYS[TARGET_KINDS[kind]]])
+                assessed[event_year] = gap * sqft * rate
+            penalties[str(year)] = assessed[event_year]
+        return penalties
+
+    # -- SQL ------------------------------------------------------------------
+
+    def penalty_columns(self, path: str) -> List[str]:
+        """penalty_<year>_<path> column names of a path's target events, in order"""
+        return [f"penalty_{year}_{path}" for year in self.rules.target_years(path)]
+
+    def sql_npv(self, path: str) -> str:
+        """
+        SQL expression for the NPV of a path's event penalty columns
+
+        Each event is discounted at the rules' discount rate by its years
+        since the year before the horizon (the first horizon year counts
+        as one year out).
+        """
+        growth = 1 + self.rules.discount_rate
+        return " + ".join(f"{column} / POWER({growth:g}, {year - self.rules.first_year + 1})"
+                          for column, year in zip(self.penalty_columns(path),
+                                                  self.rules.target_years(path)))
+
+    def sql_covered(self, sqft: str) -> str:
+        """SQL condition for buildings the ordinance covers"""
+        return f"{sqft} >= {self.rules.min_sqft:g}"
+
+    def sql_penalty_columns(self, gap_columns: Dict[str, str], sqft: str,
+                            paths: Optional[Sequence[str]] = None,
+                            conditions: Optional[Dict[Tuple[str, int], str]] = None) -> List[str]:
+        """
+        SELECT-list expressions with one penalty column per path target event
+
+        Produces penalty_<year>_<path> for every event, total_penalties_<path>
+        (each event once) and rate_<path>_used.
+
+        Args:
+            gap_columns: Target kind -> SQL column holding (EUI - target)
+            sqft: SQL column holding floor area
+            paths: Paths to emit (all by default)
+            conditions: (path, year) -> extra SQL condition for that event
+
+        Returns:
+            List of "<expression> as <column>" strings
+        """
+        conditions = conditions or {}
+        columns, totals, rates = [], [], []
+        for name in paths or self.paths:
+            rule = self.rules.path(name)
+            cases = []
+            for event in rule.targets:
+                gap = gap_columns[event.target]
+                condition = f"{gap} > 0"
+                if (name, event.year) in conditions:
+                    condition = f"{conditions[(name, event.year)]} AND {condition}"
+                case = f"CASE WHEN {condition} THEN {gap} * {sqft} * {rule.rate:g} ELSE 0 END"
+                cases.append(case)
+                columns.append(f"{case} as penalty_{event.year}_{name}")
+            totals.append(" + ".join(cases) + f" as total_penalties_{name}")
+            rates.append(f"{rule.rate:g} as rate_{name}_used")
+        return columns + totals + rates
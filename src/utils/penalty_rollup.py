@@ -0,0 +1,312 @@
+"""
+Suggested File Name: penalty_rollup.py
+File Location: /Users/robertpadgett/Projects/01_My_Notebooks/500_ED_Risk_Retro_BP/src/utils/
+Use: Precomputed OLAP rollup of scenario penalties for report assembly
+
+This module:
+1. Aggregates every scenario frame in one grouped pass into cells keyed by
+   (scenario, property type, EPB, MAI, ZIP) holding sums and counts:
+   buildings, floor area, opt-ins, NPV advantage and, per year, total
+   penalty, buildings at risk and floor area at risk
+2. Answers slice / drill-down queries (e.g. hybrid -> MAI -> by property
+   type) by summing the small cell table instead of re-filtering and
+   re-grouping the building-level frames
+3. Derives the report metrics (opt-in rate, average NPV advantage, NPV,
+   $/sqft overall or for at-risk buildings only) from those sums
+
+Years a scenario never reports (no penalty_YYYY column) are tracked so
+reports can still distinguish "not reported" from "zero". Source frames are
+recognised by a content fingerprint, so a frame edited in place no longer
+matches the rollup built from it.
+"""
+
+import hashlib
+from typing import Dict, Iterable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .penalty_cube import YEARS, DISCOUNT_RATE, penalty_columns
+
+DIMENSIONS = ('scenario', 'property_type', 'is_epb', 'is_mai', 'zip_code')
+
+# Candidate source columns for the building-level dimensions, in preference order
+EPB_COLUMNS = ('Is EPB', 'is_epb')
+ZIP_COLUMNS = ('zip_code', 'Zip Code', 'ZIP Code', 'zip', 'Zip')
+UNKNOWN = 'Unknown'
+
+
+def _flags(series: pd.Series) -> np.ndarray:
+    """Boolean array from bool / 0-1 / 'Yes'-'True' style values (missing = False)"""
+    if series.dtype == bool:
+        return series.to_numpy()
+    text = series.astype(str).str.strip().str.lower()
+    return text.isin(['true', 'yes', 'y', '1', '1.0']).to_numpy()
+
+
+def _zip_labels(series: pd.Series) -> pd.Series:
+    """ZIP codes as 5-digit strings (80202, not 80202.0); missing = 'Unknown'"""
+    numeric = pd.to_numeric(series, errors='coerce')
+    labels = series.astype(str).str.strip().where(series.notna(), UNKNOWN)
+    return labels.where(numeric.isna(), numeric.round().astype('Int64').astype(str))
+
+
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    """Hash of a frame's row count, column names and values in row order"""
+    digest = hashlib.sha1(f"{len(df)}|{'|'.join(map(str, df.columns))}".encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def rollup_dimensions(portfolio: pd.DataFrame) -> pd.DataFrame:
+    """
+    Building-level dimensions (EPB flag, ZIP code, MAI flag) indexed by building ID
+
+    Columns absent from the portfolio default to False / 'Unknown'.
+    """
+    dims = pd.DataFrame(index=portfolio['Building ID'].astype(str).to_numpy())
+    epb = next((c for c in EPB_COLUMNS if c in portfolio.columns), None)
+    dims['is_epb'] = _flags(portfolio[epb]) if epb else False
+    zip_column = next((c for c in ZIP_COLUMNS if c in portfolio.columns), None)
+    dims['zip_code'] = _zip_labels(portfolio[zip_column]).to_numpy() if zip_column else UNKNOWN
+    if 'is_mai' in portfolio.columns:
+        dims['is_mai'] = _flags(portfolio['is_mai'])
+    return dims[~dims.index.duplicated()]
+
+
+class PenaltyRollup:
+    """
+    Sums and counts of scenario penalties over (scenario, property type, EPB, MAI, ZIP)
+
+    Slicing returns another rollup over the matching cells, so drill-downs
+    chain: rollup.slice(scenario='hybrid', is_mai=True).query('property_type').
+    """
+
+    def __init__(self, cells: pd.DataFrame, scenario_years: Dict[str, tuple],
+                 opt_in_scenarios: Iterable[str] = (), fingerprints: Optional[Dict[str, str]] = None,
+                 version: str = ''):
+        """
+        Args:
+            cells: One row per dimension combination with measure columns
+            scenario_years: Years each scenario reports a penalty for
+            opt_in_scenarios: Scenarios that carry opt-in decisions
+            fingerprints: frame_fingerprint of each source frame (to recognise them later)
+            version: Caller's model version the rollup was built under
+        """
+        self.cells = cells
+        self.scenario_years = dict(scenario_years)
+        self.opt_in_scenarios = set(opt_in_scenarios)
+        self.fingerprints = dict(fingerprints or {})
+        self.version = version
+
+    @classmethod
+    def build(cls, scenarios: Dict[str, pd.DataFrame], dimensions: Optional[pd.DataFrame] = None,
+              years: Sequence[int] = YEARS, version: str = '') -> 'PenaltyRollup':
+        """
+        Aggregate scenario frames in a single grouped pass
+
+        Args:
+            scenarios: Scenario name -> frame with building_id, property_type,
+                sqft, penalty_YYYY and optionally is_mai, should_opt_in,
+                npv_advantage
+            dimensions: rollup_dimensions() frame for EPB / ZIP / MAI lookups
+            version: Model version to record (e.g. the analyzer's model_version())
+        """
+        leaves = []
+        scenario_years, opt_in_scenarios = {}, []
+        for name, df in scenarios.items():
+            n = len(df)
+            ids = df['building_id'].astype(str).to_numpy()
+            dims = dimensions.reindex(ids) if dimensions is not None else None
+            sqft = pd.to_numeric(df['sqft'], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+
+            if 'is_mai' in df.columns:
+                is_mai = _flags(df['is_mai'])
+            elif dims is not None and 'is_mai' in dims.columns:
+                is_mai = dims['is_mai'].fillna(False).to_numpy(dtype=bool)
+            else:
+                is_mai = np.zeros(n, dtype=bool)
+
+            leaf = {
+                'scenario': np.full(n, name, dtype=object),
+                'property_type': df['property_type'].astype(str).where(df['property_type'].notna(),
+                                                                       UNKNOWN).to_numpy(),
+                'is_epb': (dims['is_epb'].fillna(False).to_numpy(dtype=bool) if dims is not None
+                           else np.zeros(n, dtype=bool)),
+                'is_mai': is_mai,
+                'zip_code': (dims['zip_code'].fillna(UNKNOWN).to_numpy() if dims is not None
+                             else np.full(n, UNKNOWN, dtype=object)),
+                'buildings': np.ones(n),
+                'sqft': sqft,
+                'mai': is_mai.astype(np.float64),
+            }
+            if 'should_opt_in' in df.columns:
+                opt_in_scenarios.append(name)
+                opt_in = pd.to_numeric(df['should_opt_in'].astype('float64'), errors='coerce')
+                leaf['opt_in'] = opt_in.fillna(0).to_numpy()
+                leaf['opt_in_n'] = opt_in.notna().to_numpy(dtype=np.float64)
+            if 'npv_advantage' in df.columns:
+                advantage = pd.to_numeric(df['npv_advantage'], errors='coerce')
+                leaf['npv_advantage'] = advantage.fillna(0).to_numpy(dtype=np.float64)
+                leaf['npv_advantage_n'] = advantage.notna().to_numpy(dtype=np.float64)
+
+            columns = {y: c for y, c in sorted(penalty_columns(df).items()) if y in years}
+            scenario_years[name] = tuple(columns)
+            values = np.nan_to_num(df[list(columns.values())].to_numpy(dtype=np.float64))
+            at_risk = values > 0
+            for j, year in enumerate(columns):
+                leaf[f'penalty_{year}'] = values[:, j]
+                leaf[f'at_risk_{year}'] = at_risk[:, j].astype(np.float64)
+                leaf[f'at_risk_sqft_{year}'] = np.where(at_risk[:, j], sqft, 0.0)
+            leaves.append(pd.DataFrame(leaf))
+
+        if leaves:
+            cells = (pd.concat(leaves, ignore_index=True)
+                     .groupby(list(DIMENSIONS), sort=False, dropna=False).sum()
+                     .reset_index())
+        else:
+            cells = pd.DataFrame(columns=list(DIMENSIONS) + ['buildings', 'sqft', 'mai'])
+        fingerprints = {name: frame_fingerprint(df) for name, df in scenarios.items()}
+        return cls(cells, scenario_years, opt_in_scenarios, fingerprints, version)
+
+    # ------------------------------------------------------------------
+    # Slicing and drill-down
+    # ------------------------------------------------------------------
+
+    def covers(self, scenarios: Dict[str, pd.DataFrame], version: str = '') -> bool:
+        """True when the rollup was built, under this version, from frames with exactly this content"""
+        return (version == self.version and set(scenarios) == set(self.fingerprints)
+                and all(self.fingerprints[name] == frame_fingerprint(df) for name, df in scenarios.items()))
+
+    def scenario_name(self, frame: pd.DataFrame) -> Optional[str]:
+        """Name of the scenario built from a frame with this content, if any"""
+        fingerprint = frame_fingerprint(frame)
+        return next((name for name, f in self.fingerprints.items() if f == fingerprint), None)
+
+    def slice(self, **filters) -> 'PenaltyRollup':
+        """
+        Rollup over the cells matching every filter
+
+        Args:
+            filters: dimension=value, or dimension=[values] to keep several
+        """
+        mask = np.ones(len(self.cells), dtype=bool)
+        for dimension, value in filters.items():
+            if dimension not in DIMENSIONS:
+                raise KeyError(f"Unknown rollup dimension: {dimension}")
+            if isinstance(value, (list, tuple, set, frozenset)):
+                mask &= self.cells[dimension].isin(list(value)).to_numpy()
+            else:
+                mask &= (self.cells[dimension] == value).to_numpy()
+
+        scenarios = set(self.scenario_years)
+        if 'scenario' in filters:
+            wanted = filters['scenario']
+            scenarios &= set(wanted) if isinstance(wanted, (list, tuple, set, frozenset)) else {wanted}
+        return PenaltyRollup(self.cells[mask],
+                             {s: y for s, y in self.scenario_years.items() if s in scenarios},
+                             self.opt_in_scenarios & scenarios,
+                             {s: f for s, f in self.fingerprints.items() if s in scenarios},
+                             self.version)
+
+    def query(self, by=(), measures: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """
+        Summed measures grouped by one or more dimensions
+
+        Returns:
+            DataFrame indexed by the 'by' dimensions (sorted); a single row
+            of totals when by is empty
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        measures = list(measures) if measures is not None else self.measures
+        measures = [m for m in measures if m in self.cells.columns]
+        if not by:
+            return self.cells[measures].sum().to_frame().T
+        return self.cells.groupby(by, sort=True)[measures].sum()
+
+    def drill_down(self, dimension, years: Sequence[int] = (), **filters) -> pd.DataFrame:
+        """Report summary (see summary()) of one slice broken down by dimension(s)"""
+        return self.slice(**filters).summary(by=dimension, years=years)
+
+    @property
+    def measures(self):
+        return [c for c in self.cells.columns if c not in DIMENSIONS]
+
+    # ------------------------------------------------------------------
+    # Report metrics
+    # ------------------------------------------------------------------
+
+    def total(self, measure: str) -> float:
+        return float(self.cells[measure].sum()) if measure in self.cells.columns else 0.0
+
+    def buildings(self) -> int:
+        return int(round(self.total('buildings')))
+
+    def has_year(self, year: int) -> bool:
+        """True when any scenario in the rollup reports a penalty for the year"""
+        return any(year in years for years in self.scenario_years.values())
+
+    @property
+    def has_opt_in(self) -> bool:
+        """True when any scenario in the rollup carries opt-in decisions"""
+        return bool(self.opt_in_scenarios)
+
+    def penalty(self, year: int) -> float:
+        return self.total(f'penalty_{year}')
+
+    def at_risk(self, year: int) -> int:
+        return int(round(self.total(f'at_risk_{year}')))
+
+    def npv(self, rate: float = DISCOUNT_RATE, base_year: int = 2025,
+            through: Optional[int] = None) -> float:
+        """NPV of the yearly penalty totals from base_year (optionally only through a year)"""
+        years = sorted({y for ys in self.scenario_years.values() for y in ys
+                        if y >= base_year and (through is None or y <= through)})
+        return float(sum(self.penalty(y) / (1 + rate) ** (y - base_year) for y in years))
+
+    def penalty_per_sqft(self, year: int, at_risk_only: bool = False) -> float:
+        """Total penalty / floor area (of all buildings, or of at-risk buildings only)"""
+        sqft = self.total(f'at_risk_sqft_{year}') if at_risk_only else self.total('sqft')
+        return self.penalty(year) / sqft if sqft else 0.0
+
+    def opt_in_rate(self) -> float:
+        count = self.total('opt_in_n')
+        return self.total('opt_in') / count if count else np.nan
+
+    def summary(self, by=(), years: Sequence[int] = ()) -> pd.DataFrame:
+        """
+        Report-ready metrics per group
+
+        Columns: total_buildings, total_sqft, mai_count, opt_in_count,
+        opt_in_rate, avg_npv_advantage (when the data has them) and
+        total_penalty_YYYY / buildings_at_risk_YYYY for the requested years.
+        """
+        sums = self.query(by)
+        table = pd.DataFrame(index=sums.index)
+        table['total_buildings'] = sums['buildings'].round().astype(int)
+        table['total_sqft'] = sums['sqft']
+        table['mai_count'] = sums['mai'].round().astype(int)
+        if 'opt_in' in sums.columns:
+            table['opt_in_count'] = sums['opt_in'].round().astype(int)
+            table['opt_in_rate'] = sums['opt_in'] / sums['opt_in_n'].where(sums['opt_in_n'] > 0)
+        if 'npv_advantage' in sums.columns:
+            table['avg_npv_advantage'] = (sums['npv_advantage']
+                                          / sums['npv_advantage_n'].where(sums['npv_advantage_n'] > 0))
+        for year in years:
+            reported = f'penalty_{year}' in sums.columns
+            table[f'total_penalty_{year}'] = sums[f'penalty_{year}'] if reported else 0.0
+            table[f'buildings_at_risk_{year}'] = (sums[f'at_risk_{year}'].round().astype(int)
+                                                  if reported else 0)
+        return table
+
+    def time_series(self, years: Sequence[int] = YEARS) -> pd.DataFrame:
+        """Long table of scenario, year, total_penalty, buildings_at_risk (reported years only)"""
+        rows = []
+        for scenario, scenario_years in self.scenario_years.items():
+            part = self.slice(scenario=scenario)
+            for year in years:
+                if year in scenario_years:
+                    rows.append({'scenario': scenario, 'year': year,
+                                 'total_penalty': part.penalty(year),
+                                 'buildings_at_risk': part.at_risk(year)})
+        return pd.DataFrame(rows)
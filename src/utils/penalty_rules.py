@@ -0,0 +1,140 @@
+"""
+Suggested File Name: penalty_rules.py
+File Location: /Users/robertpadgett/Projects/01_My_Notebooks/500_ED_Risk_Retro_BP/src/utils/
+Use: Declarative Energize Denver penalty rules shared by every module
+
+This module:
+1. Reads config/penalty_rules.json - compliance paths with their rate and
+   target events (year, which target, whether it recurs every year after),
+   the analysis horizon, the 42% reduction cap, the MAI 30% / 52.9 floor,
+   the late-extension add-on and the coverage threshold
+2. Validates the table once and caches it per file
+3. Compiles it into a vectorized PenaltyPlan (utils.penalty_plan) that
+   evaluates the rules for arrays of buildings and emits them as SQL
+
+PenaltyConfig, OptInPredictor, ProjectConfig, YearNormalizer, the penalty
+cube and the BigQuery view regeneration all read their rates, years, caps
+and floors from here, so a rule change from the city is an edit to the
+JSON file. Standard library only, so the light CLI commands can load it.
+"""
+
+import json
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+RULES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          'config', 'penalty_rules.json')
+
+TARGET_KINDS = ('first_interim', 'second_interim', 'final')
+
+
+@dataclass(frozen=True)
+class TargetEvent:
+    """A year in which a path assesses a target"""
+    year: int
+    target: str
+    recurring: bool = False   # assessed again every year through the horizon
+
+
+@dataclass(frozen=True)
+class PathRule:
+    """Rate and target events of one compliance path"""
+    name: str
+    rate: float
+    targets: Tuple[TargetEvent, ...]
+    report_all_years: bool = False   # scenario tables list every horizon year (zeros included)
+    description: str = ''
+
+    @property
+    def target_years(self) -> Tuple[int, ...]:
+        return tuple(event.year for event in self.targets)
+
+
+@dataclass(frozen=True)
+class PenaltyRules:
+    """The full rule table"""
+    paths: Dict[str, PathRule]
+    first_year: int
+    last_year: int
+    discount_rate: float
+    late_extension_addon: float
+    never_benchmarked_per_sqft: float
+    max_reduction_pct: float
+    mai_reduction_pct: float
+    mai_floor_eui: float
+    mai_fallback_types: Tuple[str, ...]
+    min_sqft: float
+    source: str = ''
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'PenaltyRules':
+        """Rules from the parsed JSON document (validated)"""
+        paths = {}
+        for name, path in data['paths'].items():
+            events = tuple(sorted((TargetEvent(int(t['year']), t['target'], bool(t.get('recurring', False)))
+                                   for t in path['targets']), key=lambda event: event.year))
+            for event in events:
+                if event.target not in TARGET_KINDS:
+                    raise ValueError(f"Path '{name}': unknown target '{event.target}' "
+                                     f"(expected one of {TARGET_KINDS})")
+            if not events:
+                raise ValueError(f"Path '{name}' has no target years")
+            paths[name] = PathRule(name, float(path['rate']), events,
+                                   bool(path.get('report_all_years', False)),
+                                   path.get('description', ''))
+
+        horizon = data['horizon']
+        rules = cls(
+            paths=paths,
+            first_year=int(horizon['first_year']),
+            last_year=int(horizon['last_year']),
+            discount_rate=float(data['discount_rate']),
+            late_extension_addon=float(data.get('late_extension_addon', 0.0)),
+            never_benchmarked_per_sqft=float(data.get('never_benchmarked_per_sqft', 0.0)),
+            max_reduction_pct=float(data['target_caps']['max_reduction_pct']),
+            mai_reduction_pct=float(data['mai']['reduction_pct']),
+            mai_floor_eui=float(data['mai']['floor_eui']),
+            mai_fallback_types=tuple(data['mai'].get('fallback_property_types', ())),
+            min_sqft=float(data['coverage']['min_sqft']),
+            source=data.get('source', ''),
+        )
+        outside = [(p.name, e.year) for p in paths.values() for e in p.targets
+                   if not rules.first_year <= e.year <= rules.last_year]
+        if outside:
+            raise ValueError(f"Target years outside the {rules.first_year}-{rules.last_year} horizon: {outside}")
+        return rules
+
+    @property
+    def years(self) -> Tuple[int, ...]:
+        return tuple(range(self.first_year, self.last_year + 1))
+
+    def path(self, name: str) -> PathRule:
+        try:
+            return self.paths[name.lower()]
+        except KeyError:
+            raise ValueError(f"Unknown compliance path '{name}' (expected one of {tuple(self.paths)})")
+
+    def rate(self, path: str) -> float:
+        return self.path(path).rate
+
+    def target_years(self, path: str) -> Tuple[int, ...]:
+        return self.path(path).target_years
+
+    def normalized_years(self) -> Dict[str, Dict[str, int]]:
+        """Path -> {target kind: year} (the year each target is aggregated under)"""
+        return {name: {event.target: event.year for event in path.targets}
+                for name, path in self.paths.items()}
+
+    def compile(self):
+        """Vectorized PenaltyPlan of these rules (utils.penalty_plan, numpy)"""
+        from .penalty_plan import PenaltyPlan
+        return PenaltyPlan(self)
+
+
+@lru_cache(maxsize=None)
+def load_rules(path: Optional[str] = None) -> PenaltyRules:
+    """Rules from a JSON file (config/penalty_rules.json by default), parsed once per path"""
+    with open(path or RULES_PATH) as f:
+        return PenaltyRules.from_dict(json.load(f))
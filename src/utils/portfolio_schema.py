@@ -0,0 +1,186 @@
+"""
+Suggested File Name: portfolio_schema.py
+File Location: /Users/robertpadgett/Projects/01_My_Notebooks/500_ED_Risk_Retro_BP/src/utils/
+Use: Typed, column-projected portfolio and scenario frames for the portfolio analyzers
+
+This module:
+1. Declares the columns the portfolio analysis actually reads and their
+   storage types; only those are parsed from the comprehensive and targets CSVs
+2. Stores property types, compliance paths and statuses as categoricals,
+   EUIs / targets / floor area as float32 and years as small nullable ints
+3. Builds scenario tables on one shared base frame (building ID, property
+   type, floor area) so the scenarios and their sensitivity variants only
+   add the columns that differ
+4. Reports the deep memory footprint of a frame
+
+The source EUIs and floor areas carry at most a few significant digits, so
+float32 stores them exactly in decimal terms (see number()). Dollar amounts
+(penalties, NPVs) stay float64: float32 would round a $1M penalty to the
+nearest $0.06-0.12.
+"""
+
+from typing import Dict, Iterable, List
+
+import numpy as np
+import pandas as pd
+
+# Portfolio columns read by the analyzers (absent columns are skipped)
+PORTFOLIO_SCHEMA = {
+    'Building ID': 'str',
+    'Building Name': 'str',
+    'Master Property Type': 'category',
+    'Master Sq Ft': 'float32',
+    'Weather Normalized Site EUI': 'float32',
+    'Baseline EUI': 'float32',
+    'First Interim Target EUI': 'float32',
+    'Second Interim Target EUI': 'float32',
+    'Original Final Target EUI': 'float32',
+    'Adjusted Final Target EUI': 'float32',
+    'Year Built': 'Int16',
+    'Is EPB': 'category',
+    'is_epb': 'category',
+    'zip_code': 'category',
+    'Average_EUI_Recent': 'float32',
+    'EUI_Trend_Pct': 'float32',
+    'Baseline Year': 'Int16',
+    'First Interim Target Year': 'Int16',
+    'Second Interim Target Year': 'Int16',
+}
+
+# Scenario table columns (penalty_YYYY columns are float64 and not listed)
+SCENARIO_SCHEMA = {
+    'building_id': 'str',
+    'property_type': 'category',
+    'sqft': 'float32',
+    'path': pd.CategoricalDtype(['standard', 'aco', 'extension']),
+    'should_opt_in': 'bool',
+    'opt_in_confidence': 'float32',
+    'opt_in_rationale': 'category',
+    'npv_advantage': 'float64',
+    'normalized_first_year': 'Int16',
+    'normalized_second_year': 'Int16',
+    'normalized_final_year': 'Int16',
+    'retrofit_option': 'category',
+}
+
+# Columns every scenario shares through the base frame
+BASE_COLUMNS = ('building_id', 'property_type', 'sqft')
+
+
+def _coerce(series: pd.Series, dtype) -> pd.Series:
+    if isinstance(dtype, pd.CategoricalDtype) or dtype == 'category':
+        return series.astype(dtype)
+    if dtype == 'str':
+        return series.astype(str).where(series.notna())
+    if dtype == 'bool':
+        return series.astype(bool)
+    if dtype in ('Int16', 'Int32'):
+        return pd.to_numeric(series, errors='coerce').round().astype(dtype)
+    return pd.to_numeric(series, errors='coerce').astype(dtype)
+
+
+def apply_schema(df: pd.DataFrame, schema: Dict = PORTFOLIO_SCHEMA) -> pd.DataFrame:
+    """Convert the schema's columns present in df to their storage types"""
+    return df.assign(**{column: _coerce(df[column], dtype)
+                        for column, dtype in schema.items() if column in df.columns})
+
+
+def load_portfolio_frame(current_csv: str, targets_csv: str,
+                         schema: Dict = PORTFOLIO_SCHEMA) -> pd.DataFrame:
+    """
+    Parse only the schema's columns from both CSVs and inner-join them on Building ID
+
+    Columns present in both files are taken from the comprehensive (current)
+    file, as the analyzers' merge with suffixes=('', '_targets') did.
+
+    Returns:
+        Typed portfolio frame (unfiltered)
+    """
+    wanted = set(schema)
+    current = pd.read_csv(current_csv, usecols=lambda c: c in wanted,
+                          dtype={'Building ID': str}, low_memory=False)
+    from_current = set(current.columns)
+    targets = pd.read_csv(targets_csv,
+                          usecols=lambda c: c == 'Building ID' or (c in wanted and c not in from_current),
+                          dtype={'Building ID': str}, low_memory=False)
+    portfolio = pd.merge(current, targets, on='Building ID', how='inner')
+    return apply_schema(portfolio, schema)
+
+
+def compact(df: pd.DataFrame) -> pd.DataFrame:
+    """Drop categories no longer present (after filtering) and reset to a RangeIndex"""
+    categorical = [c for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)]
+    df = df.reset_index(drop=True)
+    if categorical:
+        df = df.assign(**{c: df[c].cat.remove_unused_categories() for c in categorical})
+    return df
+
+
+def base_frame(portfolio: pd.DataFrame) -> pd.DataFrame:
+    """Shared building columns (building_id, property_type, sqft) in portfolio order"""
+    return pd.DataFrame({
+        'building_id': portfolio['Building ID'].astype(str),
+        'property_type': portfolio['Master Property Type'].astype('category'),
+        'sqft': portfolio['Master Sq Ft'].astype('float32'),
+    }).reset_index(drop=True)
+
+
+def _join(base: pd.DataFrame, extra: pd.DataFrame) -> pd.DataFrame:
+    """Frame holding base's column arrays (not copies) followed by extra's"""
+    columns = {c: base[c] for c in base.columns}
+    columns.update({c: extra[c] for c in extra.columns if c not in columns})
+    return pd.DataFrame(columns, copy=False)
+
+
+def scenario_frame(base: pd.DataFrame, rows: List[Dict]) -> pd.DataFrame:
+    """
+    Typed scenario table from per-building rows in base's order
+
+    The base columns are shared with every other scenario built on the same
+    base; only the scenario's own columns are materialized.
+    """
+    if len(rows) != len(base):
+        raise ValueError(f"{len(rows)} scenario rows for {len(base)} base buildings")
+    if rows and str(rows[0].get('building_id')) != base['building_id'].iat[0]:
+        raise ValueError("Scenario rows are not in base frame order")
+    extra = pd.DataFrame.from_records(rows, exclude=[c for c in BASE_COLUMNS if rows and c in rows[0]])
+    extra = apply_schema(extra, SCENARIO_SCHEMA)
+    penalties = [c for c in extra.columns if c.startswith('penalty_')]
+    if penalties:
+        extra = extra.astype({c: 'float64' for c in penalties})
+    return _join(base, extra)
+
+
+def fork(frame: pd.DataFrame, columns: Iterable[str]) -> pd.DataFrame:
+    """
+    Variant of frame that may modify the given columns
+
+    Only those columns are copied; the rest stay shared with frame.
+    """
+    columns = set(columns)
+    return pd.DataFrame({c: frame[c].copy() if c in columns else frame[c] for c in frame.columns},
+                        copy=False)
+
+
+def frame_memory(df: pd.DataFrame) -> int:
+    """Deep memory footprint in bytes (object strings included)"""
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+def number(value, default: float = np.nan) -> float:
+    """
+    Python float from a typed cell (float32 / nullable int / NA-safe)
+
+    A value that is exactly representable as float32 is taken to have been
+    stored as float32 and is widened to the shortest decimal that round-trips
+    (85.3, not 85.30000305), so calculations on the typed frame match the
+    ones on the float64 source data.
+    """
+    if value is None or pd.isna(value):
+        return default
+    value = float(value)
+    if abs(value) < 3.0e38:
+        narrowed = np.float32(value)
+        if float(narrowed) == value:
+            return float(str(narrowed))
+    return value
@@ -0,0 +1,231 @@
+"""
+Suggested File Name: query_cache.py
+File Location: /Users/robertpadgett/Projects/01_My_Notebooks/500_ED_Risk_Retro_BP/src/utils/
+Use: On-disk cache of BigQuery query results for LocalGCPBridge
+
+This module:
+1. Keys each result by normalized SQL + query parameters + the last
+   modification time of every table the query reads (views are expanded
+   to their underlying tables, dataset.table references resolve against the
+   default project), so changed source data is never served stale
+2. Stores results as Parquet files (Arrow columnar, compressed)
+3. Evicts least-recently-used results once the cache exceeds its size limit
+4. Supports an explicit refresh flag to bypass and rewrite a cached result
+"""
+
+import hashlib
+import json
+import os
+import re
+import time
+from datetime import date, datetime
+from typing import Dict, Optional
+
+import pandas as pd
+
+# Backticked project.dataset.table or dataset.table references
+TABLE_PATTERN = re.compile(r"`((?:[\w-]+\.)?[\w-]+\.[\w$-]+)`")
+# How deep to follow views to their source tables
+MAX_VIEW_DEPTH = 5
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Canonical form of a query for cache keys
+
+    Drops -- comments and collapses whitespace outside string literals, so
+    queries that only differ in formatting share a cache entry.
+    """
+    parts = re.split(r"('(?:[^'\\]|\\.)*')", sql)
+    normalized = []
+    for k, part in enumerate(parts):
+        if k % 2:  # string literal - keep verbatim
+            normalized.append(part)
+        else:
+            part = re.sub(r"--[^\n]*", " ", part)
+            normalized.append(re.sub(r"\s+", " ", part))
+    return ''.join(normalized).strip()
+
+
+def referenced_tables(sql: str, default_project: Optional[str] = None) -> list:
+    """
+    Sorted backticked table identifiers in a query
+
+    Two-part dataset.table references are qualified with default_project
+    (left as they are when there is none).
+    """
+    tables = set()
+    for name in TABLE_PATTERN.findall(sql):
+        if name.count('.') == 1 and default_project:
+            name = f"{default_project}.{name}"
+        tables.add(name)
+    return sorted(tables)
+
+
+def query_parameters(params: Optional[Dict]):
+    """
+    BigQuery named query parameters for a {name: value} dict
+
+    Returns:
+        List of ScalarQueryParameter (empty when params is empty)
+    """
+    from google.cloud import bigquery
+
+    types = [(bool, 'BOOL'), (int, 'INT64'), (float, 'FLOAT64'),
+             (datetime, 'TIMESTAMP'), (date, 'DATE')]
+    parameters = []
+    for name, value in (params or {}).items():
+        bq_type = next((t for py_type, t in types if isinstance(value, py_type)), 'STRING')
+        parameters.append(bigquery.ScalarQueryParameter(name, bq_type, value))
+    return parameters
+
+
+class QueryCache:
+    """Parquet-backed, size-bounded LRU cache of query results"""
+
+    def __init__(self, cache_dir='./data/query_cache/', max_size_mb=512, metadata_ttl=60):
+        """
+        Args:
+            cache_dir: Directory for cached Parquet files
+            max_size_mb: Total cache size before least-recently-used files are evicted
+            metadata_ttl: Seconds to reuse table modification times between lookups
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+        self.metadata_ttl = metadata_ttl
+        self.hits = 0
+        self.misses = 0
+        self._modified = {}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def table_modified(self, client, table_id: str, depth: int = 0) -> Optional[str]:
+        """
+        Latest modification time of a table, or of a view's source tables
+
+        Returns:
+            ISO timestamp string, or None if the metadata could not be read
+        """
+        cached = self._modified.get(table_id)
+        if cached and time.time() - cached[1] < self.metadata_ttl:
+            return cached[0]
+
+        try:
+            table = client.get_table(table_id)
+        except Exception:
+            return None
+
+        stamps = [table.modified.isoformat() if table.modified else None]
+        if getattr(table, 'table_type', None) == 'VIEW' and table.view_query and depth < MAX_VIEW_DEPTH:
+            # Unqualified references in a view resolve to the view's own project
+            project = table_id.split('.')[0] if table_id.count('.') == 2 else client.project
+            stamps += [self.table_modified(client, source, depth + 1)
+                       for source in referenced_tables(table.view_query, project)]
+        modified = None if None in stamps else max(stamps)
+
+        self._modified[table_id] = (modified, time.time())
+        return modified
+
+    def cache_key(self, client, sql: str, params: Optional[Dict] = None) -> Optional[str]:
+        """
+        Hash of normalized SQL, parameters and source-table modification times
+
+        Returns:
+            Hex key, or None when a source table's metadata is unavailable
+            (such queries are not cached)
+        """
+        tables = {}
+        for table_id in referenced_tables(sql, client.project):
+            modified = self.table_modified(client, table_id)
+            if modified is None:
+                return None
+            tables[table_id] = modified
+
+        payload = json.dumps({'sql': normalize_sql(sql), 'params': params or {}, 'tables': tables},
+                             sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.parquet")
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        """Cached result for a key (marks it recently used), or None"""
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            df = pd.read_parquet(path)
+        except Exception:
+            os.remove(path)
+            return None
+        os.utime(path)
+        return df
+
+    def put(self, key: str, df: pd.DataFrame):
+        """Store a result, then evict old entries if over the size limit"""
+        path = self._path(key)
+        tmp_path = f"{path}.tmp"
+        try:
+            df.to_parquet(tmp_path, index=False, compression='zstd')
+            os.replace(tmp_path, path)
+        except Exception as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            print(f"⚠️  Could not cache query result: {e}")
+            return
+        self.evict()
+
+    def evict(self):
+        """Remove least-recently-used files until the cache fits max_bytes"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.parquet'):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.cache_dir, name))
+            total -= size
+
+    def clear(self):
+        """Delete every cached result"""
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.parquet'):
+                os.remove(os.path.join(self.cache_dir, name))
+
+    def query(self, client, sql: str, params: Optional[Dict] = None, refresh: bool = False) -> pd.DataFrame:
+        """
+        Run a query through the cache
+
+        Args:
+            client: bigquery.Client
+            sql: Query text (use @name placeholders for params)
+            params: Named query parameters
+            refresh: Ignore any cached result and re-run the query
+
+        Returns:
+            Result DataFrame
+        """
+        key = self.cache_key(client, sql, params)
+        if key is not None and not refresh:
+            df = self.get(key)
+            if df is not None:
+                self.hits += 1
+                return df
+
+        self.misses += 1
+        df = run_query(client, sql, params)
+        if key is not None:
+            self.put(key, df)
+        return df
+
+
+def run_query(client, sql: str, params: Optional[Dict] = None) -> pd.DataFrame:
+    """Run a (optionally parameterized) query straight against BigQuery"""
+    if params:
+        from google.cloud import bigquery
+        job_config = bigquery.QueryJobConfig(query_parameters=query_parameters(params))
+        return client.query(sql, job_config=job_config).to_dataframe()
+    return client.query(sql).to_dataframe()
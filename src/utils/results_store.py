@@ -0,0 +1,278 @@
+"""
+Suggested File Name: results_store.py
+File Location: /Users/robertpadgett/Projects/01_My_Notebooks/500_ED_Risk_Retro_BP/src/utils/
+Use: Persistent per-building results store for incremental portfolio reruns
+
+This module:
+1. Keeps one row per building (SQLite, keyed by building ID) with the hash
+   of its inputs and its derived outputs as JSON
+2. Diffs a new snapshot's input hashes against the store so only added and
+   changed buildings are recomputed (and removed ones dropped)
+3. Maintains portfolio aggregates incrementally: each building's
+   contributions are stored, and a rerun subtracts the old and adds the
+   new contributions of changed buildings only
+4. Invalidates everything when the model version (rates, rules) changes
+
+A nightly refresh therefore costs in proportion to the number of changed
+buildings rather than the portfolio size.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_STORE_PATH = './data/results_store/portfolio_results.sqlite'
+
+# (aggregate, group_key, metric, value)
+Contribution = Tuple[str, str, str, float]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS building_results (
+    building_id TEXT PRIMARY KEY,
+    input_hash TEXT NOT NULL,
+    outputs TEXT NOT NULL,
+    snapshot TEXT,
+    updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS aggregate_contributions (
+    building_id TEXT NOT NULL,
+    aggregate TEXT NOT NULL,
+    group_key TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (building_id, aggregate, group_key, metric)
+);
+CREATE INDEX IF NOT EXISTS contributions_by_group
+    ON aggregate_contributions (aggregate, group_key, metric);
+CREATE TABLE IF NOT EXISTS aggregates (
+    aggregate TEXT NOT NULL,
+    group_key TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (aggregate, group_key, metric)
+);
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (datetime, pd.Timestamp)):
+        return value.isoformat()
+    return str(value)
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, sort_keys=True, default=_json_default)
+
+
+def input_hash(inputs: Dict) -> str:
+    """
+    Stable hash of one building's inputs
+
+    Keys are sorted and NaN is normalized to null so that reloading the same
+    snapshot always produces the same hash.
+    """
+    def clean(value):
+        if isinstance(value, dict):
+            return {str(k): clean(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [clean(v) for v in value]
+        if isinstance(value, np.generic):
+            value = value.item()
+        if isinstance(value, float) and np.isnan(value):
+            return None
+        return value
+
+    return hashlib.sha256(_dumps(clean(inputs)).encode()).hexdigest()
+
+
+@dataclass
+class StoreDiff:
+    """Buildings grouped by how they differ from the store"""
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+
+    @property
+    def to_compute(self) -> List[str]:
+        return self.added + self.changed
+
+    def summary(self) -> str:
+        return (f"{len(self.added)} added, {len(self.changed)} changed, "
+                f"{len(self.removed)} removed, {len(self.unchanged)} unchanged")
+
+
+class ResultsStore:
+    """SQLite store of per-building outputs and incrementally maintained aggregates"""
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH, model_version: str = ''):
+        """
+        Args:
+            path: SQLite file (':memory:' for a throwaway store)
+            model_version: Identifier of the calculation rules; a different value
+                than the one stored forces every building to be recomputed
+        """
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.model_version = model_version
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM building_results").fetchone()[0]
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self.connection.execute("SELECT value FROM store_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def stored_hashes(self) -> Dict[str, str]:
+        return dict(self.connection.execute("SELECT building_id, input_hash FROM building_results"))
+
+    def diff(self, hashes: Dict[str, str]) -> StoreDiff:
+        """
+        Compare new input hashes with the store
+
+        Every stored building counts as changed when the model version differs.
+        """
+        stored = self.stored_hashes()
+        model_changed = self._meta('model_version') != self.model_version
+
+        result = StoreDiff()
+        for building_id, digest in hashes.items():
+            if building_id not in stored:
+                result.added.append(building_id)
+            elif model_changed or stored[building_id] != digest:
+                result.changed.append(building_id)
+            else:
+                result.unchanged.append(building_id)
+        result.removed = [b for b in stored if b not in hashes]
+        return result
+
+    def refresh(self, inputs: Dict[str, Dict], compute: Callable[[Dict], Dict],
+                contributions: Optional[Callable[[str, Dict], Iterable[Contribution]]] = None,
+                snapshot: Optional[str] = None) -> StoreDiff:
+        """
+        Recompute added/changed buildings and update aggregates by their deltas
+
+        Args:
+            inputs: Building ID -> input record (everything the outputs depend on)
+            compute: Input record -> JSON-serializable outputs
+            contributions: (building ID, outputs) -> (aggregate, group, metric, value)
+                rows this building adds to portfolio aggregates
+            snapshot: Source snapshot name recorded with each recomputed row
+
+        Returns:
+            StoreDiff of what was recomputed / removed
+        """
+        inputs = {str(b): record for b, record in inputs.items()}
+        hashes = {b: input_hash(record) for b, record in inputs.items()}
+        result = self.diff(hashes)
+
+        computed = {b: compute(inputs[b]) for b in result.to_compute}
+        stale = result.changed + result.removed
+        now = datetime.now().isoformat(timespec='seconds')
+
+        with self.connection:
+            self._retract(stale)
+            self.connection.executemany(
+                "DELETE FROM building_results WHERE building_id = ?", [(b,) for b in stale])
+            self.connection.executemany(
+                "INSERT INTO building_results (building_id, input_hash, outputs, snapshot, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(b, hashes[b], json.dumps(outputs, default=_json_default), snapshot, now)
+                 for b, outputs in computed.items()])
+            if contributions is not None:
+                rows = [(b, *row) for b, outputs in computed.items() for row in contributions(b, outputs)]
+                self._contribute(rows)
+            self.connection.execute(
+                "INSERT OR REPLACE INTO store_meta (key, value) VALUES ('model_version', ?)",
+                (self.model_version,))
+        return result
+
+    def _retract(self, building_ids: List[str]):
+        """Subtract buildings' stored contributions from the aggregates"""
+        if not building_ids:
+            return
+        deltas = {}
+        for start in range(0, len(building_ids), 500):
+            chunk = building_ids[start:start + 500]
+            placeholders = ', '.join('?' * len(chunk))
+            for aggregate, group_key, metric, value in self.connection.execute(
+                    f"SELECT aggregate, group_key, metric, SUM(value) FROM aggregate_contributions "
+                    f"WHERE building_id IN ({placeholders}) GROUP BY aggregate, group_key, metric",
+                    chunk):
+                key = (aggregate, group_key, metric)
+                deltas[key] = deltas.get(key, 0.0) + value
+            self.connection.execute(
+                f"DELETE FROM aggregate_contributions WHERE building_id IN ({placeholders})", chunk)
+
+        self.connection.executemany(
+            "UPDATE aggregates SET value = value - ? WHERE aggregate = ? AND group_key = ? AND metric = ?",
+            [(value, *key) for key, value in deltas.items()])
+        # Drop groups no building contributes to any more
+        self.connection.executemany(
+            "DELETE FROM aggregates WHERE aggregate = ? AND group_key = ? AND metric = ? "
+            "AND NOT EXISTS (SELECT 1 FROM aggregate_contributions c WHERE c.aggregate = ? "
+            "AND c.group_key = ? AND c.metric = ?)",
+            [(*key, *key) for key in deltas])
+
+    def _contribute(self, rows: List[Tuple]):
+        """Store new contributions and add them to the aggregates"""
+        self.connection.executemany(
+            "INSERT INTO aggregate_contributions (building_id, aggregate, group_key, metric, value) "
+            "VALUES (?, ?, ?, ?, ?)", rows)
+        totals = {}
+        for _, aggregate, group_key, metric, value in rows:
+            key = (aggregate, str(group_key), metric)
+            totals[key] = totals.get(key, 0.0) + float(value)
+        self.connection.executemany(
+            "INSERT INTO aggregates (aggregate, group_key, metric, value) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (aggregate, group_key, metric) DO UPDATE SET value = value + excluded.value",
+            [(*key, value) for key, value in totals.items()])
+
+    def outputs(self, building_ids: Optional[Iterable[str]] = None) -> Dict[str, Dict]:
+        """
+        Stored outputs by building ID
+
+        Args:
+            building_ids: IDs to fetch, in the order wanted (all buildings when None)
+        """
+        if building_ids is None:
+            rows = self.connection.execute("SELECT building_id, outputs FROM building_results")
+            return {building_id: json.loads(outputs) for building_id, outputs in rows}
+
+        ids = [str(b) for b in building_ids]
+        found = {}
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            found.update(self.connection.execute(
+                f"SELECT building_id, outputs FROM building_results "
+                f"WHERE building_id IN ({', '.join('?' * len(chunk))})", chunk))
+        return {b: json.loads(found[b]) for b in ids if b in found}
+
+    def aggregates(self, aggregate: Optional[str] = None) -> pd.DataFrame:
+        """Aggregate totals (optionally one aggregate) as a DataFrame"""
+        sql = "SELECT aggregate, group_key, metric, value FROM aggregates"
+        params = ()
+        if aggregate is not None:
+            sql += " WHERE aggregate = ?"
+            params = (aggregate,)
+        return pd.read_sql_query(sql + " ORDER BY aggregate, group_key, metric", self.connection,
+                                 params=params)
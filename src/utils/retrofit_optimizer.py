@@ -0,0 +1,485 @@
+"""
+Suggested File Name: retrofit_optimizer.py
+File Location: /Users/robertpadgett/Projects/01_My_Notebooks/500_ED_Risk_Retro_BP/src/utils/
+Use: Choose which buildings a retrofit fund should do, and when, under a capital budget
+
+This module:
+1. Builds every building x retrofit option x deployment year candidate once:
+   capital cost ($/sqft buckets from OptInPredictor._estimate_retrofit_cost
+   plus the 4-pipe WSHP + TES system cost), incentive capture (ITC for
+   electrification, EPB grants) and avoided penalty NPV on the building's
+   compliance path
+2. Selects at most one option per building to maximize avoided penalties
+   or developer profit within the budget - a multiple-choice knapsack
+   solved exactly on a budget grid by dynamic programming, alongside a
+   greedy convex-hull pass that gives the LP upper bound (and wins when the
+   grid's rounded-up costs leave budget unused)
+3. Handles the EPB spending quota and per-year deployment limits with
+   Lagrangian prices on the DP values, then repairs the result (defers or
+   drops over-capacity projects, swaps to meet the quota, greedily refills
+   the leftover budget)
+4. Reuses the candidates across fund sizes so budgets can be iterated on
+   in seconds for the whole city
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .penalty_cube import DISCOUNT_RATE, YEARS
+from .penalty_monte_carlo import MonteCarloInputs, penalty_schedule
+
+OBJECTIVES = ('avoided_penalties', 'developer_profit')
+
+
+@dataclass
+class RetrofitOption:
+    """One retrofit package"""
+    name: str
+    cost_per_sqft: float
+    eui_reduction: float        # fraction of current EUI removed
+    itc_eligible: bool = False  # electrification (federal ITC)
+
+
+def default_options(retrofit_cost_per_reduction: Optional[Dict[str, float]] = None) -> tuple:
+    """
+    Light / moderate / deep retrofits (OptInPredictor $/sqft buckets) plus
+    the 4-pipe WSHP + TES electrification system
+    """
+    costs = retrofit_cost_per_reduction or {'light': 5.0, 'moderate': 12.0, 'deep': 25.0}
+    return (
+        RetrofitOption('light', costs['light'], 0.10),          # <15% reduction bucket
+        RetrofitOption('moderate', costs['moderate'], 0.225),   # 15-30%
+        RetrofitOption('deep', costs['deep'], 0.40),            # >30%
+        # HVACSystemImpactModeler: $25/sqft WSHP + $5/sqft TES; ProjectConfig 70% EUI cut
+        RetrofitOption('4pipe_wshp_tes', 30.0, 0.70, itc_eligible=True),
+    )
+
+
+@dataclass
+class OptimizerParams:
+    """Financial and solver settings"""
+    deployment_years: tuple = (2026, 2027, 2028, 2029, 2030)
+    discount_rate: float = DISCOUNT_RATE
+    base_year: int = 2025
+    itc_share: float = 0.40 * 0.95       # ProjectConfig itc_rate x tax_credit_sale_rate
+    epb_grant_per_sqft: float = 5.0      # DRCOG $5,000/unit at ~1,000 sqft/unit
+    budget_basis: str = 'net'            # 'net' (after incentives) or 'gross' cost
+    grid_cells: int = 2000               # budget resolution of the DP
+    iterations: int = 25                 # Lagrangian price updates
+
+
+class RetrofitCandidates:
+    """Cost, incentives and avoided penalty NPV for every building x option x deployment year"""
+
+    def __init__(self, inputs: MonteCarloInputs, is_epb: np.ndarray,
+                 options: Sequence[RetrofitOption] = None,
+                 params: Optional[OptimizerParams] = None):
+        """
+        Args:
+            inputs: Per-building arrays (MonteCarloInputs.from_frame) - targets,
+                floor area, current EUI and compliance path
+            is_epb: Bool per building
+            options: Retrofit packages (default_options())
+            params: OptimizerParams
+        """
+        self.params = params or OptimizerParams()
+        self.options = tuple(options or default_options())
+        self.years = tuple(self.params.deployment_years)
+        self.building_ids = inputs.building_ids
+        self.property_types = inputs.property_types
+        self.is_epb = np.asarray(is_epb, dtype=bool)
+        sqft = np.nan_to_num(inputs.sqft)
+        self.sqft = sqft
+
+        cost_per_sqft = np.array([o.cost_per_sqft for o in self.options])
+        self.cost = cost_per_sqft[:, None] * sqft[None, :]                       # (options, buildings)
+        itc = np.array([o.itc_eligible for o in self.options])[:, None] * self.params.itc_share
+        grant = self.params.epb_grant_per_sqft * sqft * self.is_epb
+        self.incentives = np.minimum(self.cost * itc + grant[None, :], self.cost)
+        self.net_cost = self.cost - self.incentives
+
+        # Yearly penalty at current and retrofitted EUI (years, buildings)
+        targets, rates = penalty_schedule(inputs, YEARS)
+        years = np.asarray(YEARS)
+        discount = (1 + self.params.discount_rate) ** -(years - self.params.base_year).clip(min=0)
+        eui = np.nan_to_num(inputs.current_eui)
+        dollars = rates * sqft[None, :] * discount[:, None]
+        before = np.maximum(eui[None, :] - targets, 0) * dollars
+
+        # avoided[o, d, b]: discounted penalties avoided from deployment year d onward
+        self.avoided = np.empty((len(self.options), len(self.years), len(eui)))
+        for o, option in enumerate(self.options):
+            after = np.maximum(eui[None, :] * (1 - option.eui_reduction) - targets, 0) * dollars
+            from_year = np.cumsum((before - after)[::-1], axis=0)[::-1]
+            self.avoided[o] = from_year[[YEARS.index(y) for y in self.years]]
+
+    def __len__(self) -> int:
+        return len(self.building_ids)
+
+    def budget_cost(self) -> np.ndarray:
+        return self.net_cost if self.params.budget_basis == 'net' else self.cost
+
+    def values(self, objective: str) -> np.ndarray:
+        """Objective value per (option, year, building)"""
+        if objective == 'avoided_penalties':
+            return self.avoided
+        if objective == 'developer_profit':
+            return self.avoided - self.net_cost[:, None, :]
+        raise ValueError(f"Unknown objective '{objective}' (expected one of {OBJECTIVES})")
+
+
+def greedy_select(values: np.ndarray, costs: np.ndarray, budget: float):
+    """
+    Greedy multiple-choice knapsack over each building's upper convex hull
+
+    Args:
+        values, costs: (options, buildings)
+        budget: Capacity in cost units
+
+    Returns:
+        (choice per building (-1 = none), LP relaxation upper bound)
+    """
+    increments = []
+    for b in np.flatnonzero((values > 0).any(axis=0)):
+        order = np.argsort(costs[:, b], kind='stable')
+        hull = [(-1, 0.0, 0.0)]
+        for o in order:
+            c, v = costs[o, b], values[o, b]
+            if v <= hull[-1][2]:
+                continue
+            # Drop points under the chord (keep the hull concave)
+            while len(hull) >= 2:
+                (_, c1, v1), (_, c2, v2) = hull[-2], hull[-1]
+                if (v2 - v1) * (c - c1) <= (v - v1) * (c2 - c1):
+                    hull.pop()
+                else:
+                    break
+            hull.append((o, c, v))
+        for (prev, c1, v1), (o, c2, v2) in zip(hull, hull[1:]):
+            dc = c2 - c1
+            increments.append((np.inf if dc <= 0 else (v2 - v1) / dc, b, prev, o, dc, v2 - v1))
+
+    increments.sort(key=lambda item: -item[0])
+    choice = np.full(values.shape[1], -1)
+    remaining = budget
+    bound, bound_room, bound_open = 0.0, budget, True
+    for efficiency, b, prev, o, dc, dv in increments:
+        if bound_open:
+            if dc <= bound_room:
+                bound += dv
+                bound_room -= dc
+            else:
+                bound += dv * bound_room / dc
+                bound_open = False
+        if choice[b] == prev and dc <= remaining:
+            choice[b] = o
+            remaining -= dc
+    return choice, bound
+
+
+def knapsack_select(values: np.ndarray, costs: np.ndarray, budget: float, cells: int = 2000):
+    """
+    Exact multiple-choice knapsack on a budget grid (costs rounded up, so feasible)
+
+    Args:
+        values, costs: (options, buildings)
+        budget: Capacity in cost units
+        cells: Grid cells across the budget
+
+    Returns:
+        choice per building (-1 = none)
+    """
+    choice = np.full(values.shape[1], -1)
+    if budget <= 0:
+        return choice
+    unit = budget / cells
+    units = np.ceil(costs / unit - 1e-9).astype(np.int64)
+    usable = (values > 0) & (units <= cells)
+    active = np.flatnonzero(usable.any(axis=0))
+
+    best = np.zeros(cells + 1)
+    picks = np.full((len(active), cells + 1), -1, dtype=np.int8)
+    for i, b in enumerate(active):
+        updated = best.copy()
+        for o in np.flatnonzero(usable[:, b]):
+            c = units[o, b]
+            candidate = np.full(cells + 1, -np.inf)
+            candidate[c:] = best[:cells + 1 - c] + values[o, b]
+            better = candidate > updated
+            updated[better] = candidate[better]
+            picks[i, better] = o
+        best = updated
+
+    g = cells
+    for i in range(len(active) - 1, -1, -1):
+        o = picks[i, g]
+        if o >= 0:
+            choice[active[i]] = o
+            g -= units[o, active[i]]
+    return choice
+
+
+@dataclass
+class RetrofitPlan:
+    """Selected retrofits and how they sit against the constraints"""
+    selections: pd.DataFrame
+    objective: str
+    budget: float
+    upper_bound: float
+    min_epb_share: float
+    yearly_limits: Dict[int, int] = field(default_factory=dict)
+
+    @property
+    def value(self) -> float:
+        column = 'avoided_npv' if self.objective == 'avoided_penalties' else 'profit'
+        return float(self.selections[column].sum())
+
+    @property
+    def spend(self) -> float:
+        return float(self.selections['budget_cost'].sum())
+
+    def epb_share(self) -> float:
+        spend = self.spend
+        return float(self.selections.loc[self.selections['is_epb'], 'budget_cost'].sum() / spend) if spend else 0.0
+
+    def by_year(self) -> pd.DataFrame:
+        """Projects, spend and avoided NPV per deployment year"""
+        return self.selections.groupby('year').agg(
+            projects=('building_id', 'count'), budget_cost=('budget_cost', 'sum'),
+            avoided_npv=('avoided_npv', 'sum'))
+
+    def summary(self) -> Dict:
+        return {
+            'objective': self.objective,
+            'budget': self.budget,
+            'spend': self.spend,
+            'projects': len(self.selections),
+            'value': self.value,
+            'upper_bound': self.upper_bound,
+            'gap_pct': (1 - self.value / self.upper_bound) * 100 if self.upper_bound > 0 else 0.0,
+            'avoided_npv': float(self.selections['avoided_npv'].sum()),
+            'incentives': float(self.selections['incentives'].sum()),
+            'epb_share': self.epb_share(),
+        }
+
+
+class _PlanState:
+    """Mutable (option, year) per building used while repairing a relaxed solution"""
+
+    def __init__(self, candidates: RetrofitCandidates, values: np.ndarray, costs: np.ndarray,
+                 budget: float, min_epb_share: float, limits: np.ndarray):
+        self.c = candidates
+        self.values, self.costs = values, costs
+        self.budget, self.share, self.limits = budget, min_epb_share, limits
+        self.option = np.full(len(candidates), -1)
+        self.year = np.full(len(candidates), -1)
+
+    def selected(self) -> np.ndarray:
+        return np.flatnonzero(self.option >= 0)
+
+    def value_of(self, b) -> float:
+        return self.values[self.option[b], self.year[b], b]
+
+    def spend(self, epb_only: bool = False) -> float:
+        chosen = self.selected()
+        if epb_only:
+            chosen = chosen[self.c.is_epb[chosen]]
+        return float(self.costs[self.option[chosen], chosen].sum())
+
+    def counts(self) -> np.ndarray:
+        return np.bincount(self.year[self.selected()], minlength=len(self.limits))
+
+    def quota_met(self) -> bool:
+        return self.spend(epb_only=True) >= self.share * self.spend() - 1e-6
+
+    def total(self) -> float:
+        chosen = self.selected()
+        return float(self.values[self.option[chosen], self.year[chosen], chosen].sum())
+
+    def enforce_capacity(self):
+        """Defer the projects that lose least by waiting; drop what no year can take"""
+        for d in range(len(self.limits)):
+            in_year = np.flatnonzero(self.year == d)
+            excess = len(in_year) - self.limits[d]
+            if excess <= 0:
+                continue
+            if d + 1 < len(self.limits):
+                loss = (self.values[self.option[in_year], d, in_year]
+                        - self.values[self.option[in_year], d + 1, in_year])
+            else:
+                loss = self.values[self.option[in_year], d, in_year]
+            for b in in_year[np.argsort(loss, kind='stable')[:excess]]:
+                if d + 1 < len(self.limits) and self.values[self.option[b], d + 1, b] > 0:
+                    self.year[b] = d + 1
+                else:
+                    self.option[b] = self.year[b] = -1
+
+    def enforce_quota(self):
+        """Drop the least efficient non-EPB projects until EPB spending meets the share"""
+        while not self.quota_met():
+            chosen = self.selected()
+            other = chosen[~self.c.is_epb[chosen]]
+            if not len(other):
+                break
+            efficiency = (self.values[self.option[other], self.year[other], other]
+                          / np.maximum(self.costs[self.option[other], other], 1e-9))
+            b = other[np.argmin(efficiency)]
+            self.option[b] = self.year[b] = -1
+
+    def refill(self):
+        """Greedily add the most efficient remaining (option, year) that keeps every constraint"""
+        remaining = self.budget - self.spend()
+        free = self.option < 0
+        o_idx, d_idx, b_idx = np.nonzero((self.values > 0) & free[None, None, :])
+        if not len(b_idx):
+            return
+        cost = self.costs[o_idx, b_idx]
+        efficiency = self.values[o_idx, d_idx, b_idx] / np.maximum(cost, 1e-9)
+        counts = self.counts()
+        spend, epb_spend = self.spend(), self.spend(epb_only=True)
+        for k in np.argsort(-efficiency, kind='stable'):
+            b, o, d = b_idx[k], o_idx[k], d_idx[k]
+            if self.option[b] >= 0 or cost[k] > remaining or counts[d] >= self.limits[d]:
+                continue
+            epb = self.c.is_epb[b]
+            if epb_spend + cost[k] * epb < self.share * (spend + cost[k]) - 1e-6:
+                continue
+            self.option[b], self.year[b] = o, d
+            remaining -= cost[k]
+            spend += cost[k]
+            epb_spend += cost[k] * epb
+            counts[d] += 1
+
+
+def optimize_retrofits(candidates: RetrofitCandidates, budget: float,
+                       objective: str = 'avoided_penalties', min_epb_share: float = 0.0,
+                       yearly_limits: Optional[Dict[int, int]] = None,
+                       method: str = 'dp') -> RetrofitPlan:
+    """
+    Best retrofit portfolio within a capital budget
+
+    Args:
+        candidates: RetrofitCandidates (build once, reuse across budgets)
+        budget: Fund size ($, on the params.budget_basis)
+        objective: 'avoided_penalties' (NPV) or 'developer_profit'
+            (avoided NPV - net cost)
+        min_epb_share: Minimum share of spending on EPB buildings
+        yearly_limits: Deployment year -> max projects started that year
+            (years not listed are unlimited)
+        method: 'dp' (budget-grid dynamic programming) or 'greedy'
+
+    Returns:
+        RetrofitPlan
+    """
+    if min_epb_share > 0 and not candidates.is_epb.any():
+        raise ValueError("min_epb_share set but the portfolio has no EPB buildings")
+    params = candidates.params
+    values = candidates.values(objective)
+    costs = candidates.budget_cost()
+    n_years = len(candidates.years)
+    limits = np.array([(yearly_limits or {}).get(y, len(candidates)) for y in candidates.years])
+    epb_weight = candidates.is_epb.astype(float) - min_epb_share
+
+    def select(option_values):
+        greedy = greedy_select(option_values, costs, budget)[0]
+        if method == 'greedy':
+            return greedy
+        # The grid rounds costs up, so keep the greedy pick when it does better
+        exact = knapsack_select(option_values, costs, budget, params.grid_cells)
+        total = lambda choice: option_values[choice[choice >= 0], np.flatnonzero(choice >= 0)].sum()
+        return exact if total(exact) >= total(greedy) else greedy
+
+    prices = np.zeros(n_years)
+    epb_price = 0.0
+    best_state, bound = None, None
+    for iteration in range(params.iterations):
+        adjusted = values - prices[None, :, None] + epb_price * costs[:, None, :] * epb_weight[None, None, :]
+        best_year = adjusted.argmax(axis=1)
+        option_values = adjusted.max(axis=1)
+        if bound is None:
+            bound = greedy_select(option_values, costs, budget)[1]
+
+        state = _PlanState(candidates, values, costs, budget, min_epb_share, limits)
+        chosen = select(option_values)
+        picked = np.flatnonzero(chosen >= 0)
+        state.option[picked] = chosen[picked]
+        state.year[picked] = best_year[chosen[picked], picked]
+
+        # Subgradients of the relaxed constraints, measured before repair
+        over = state.counts() - limits
+        spend = state.spend()
+        shortfall = (min_epb_share * spend - state.spend(epb_only=True)) / spend if spend else 0.0
+
+        state.enforce_capacity()
+        state.enforce_quota()
+        state.refill()
+        if best_state is None or state.total() > best_state.total():
+            best_state = state
+
+        if (over <= 0).all() and shortfall <= 1e-9:
+            break
+        step = 1.0 / (iteration + 1)
+        typical = np.abs(option_values[option_values > 0]).mean() if (option_values > 0).any() else 1.0
+        prices = np.maximum(prices + step * typical * over / np.maximum(limits, 1), 0)
+        ratio = typical / max(np.mean(costs[costs > 0]) if (costs > 0).any() else 1.0, 1e-9)
+        epb_price = max(epb_price + step * ratio * shortfall * 4, 0.0)
+
+    return RetrofitPlan(
+        selections=_selections(candidates, best_state),
+        objective=objective,
+        budget=budget,
+        upper_bound=float(bound),
+        min_epb_share=min_epb_share,
+        yearly_limits=dict(yearly_limits or {}),
+    )
+
+
+def _selections(candidates: RetrofitCandidates, state: _PlanState) -> pd.DataFrame:
+    """Selected projects, most valuable first"""
+    b = state.selected()
+    o, d = state.option[b], state.year[b]
+    avoided = candidates.avoided[o, d, b]
+    table = pd.DataFrame({
+        'building_id': candidates.building_ids[b],
+        'property_type': candidates.property_types[b],
+        'is_epb': candidates.is_epb[b],
+        'sqft': candidates.sqft[b],
+        'option': [candidates.options[k].name for k in o],
+        'year': np.asarray(candidates.years)[d] if len(d) else np.array([], dtype=int),
+        'cost': candidates.cost[o, b],
+        'incentives': candidates.incentives[o, b],
+        'net_cost': candidates.net_cost[o, b],
+        'budget_cost': candidates.budget_cost()[o, b],
+        'avoided_npv': avoided,
+        'profit': avoided - candidates.net_cost[o, b],
+    })
+    return table.sort_values('avoided_npv', ascending=False).reset_index(drop=True)
+
+
+def print_plan(plan: RetrofitPlan, top: int = 10):
+    """Console summary of a retrofit plan"""
+    summary = plan.summary()
+    print("\n🏗️  RETROFIT FUND ALLOCATION")
+    print("=" * 60)
+    print(f"  Objective: {plan.objective.replace('_', ' ')}")
+    print(f"  Budget: ${summary['budget']:,.0f}  (spent ${summary['spend']:,.0f})")
+    print(f"  Projects: {summary['projects']:,}")
+    print(f"  Avoided penalty NPV: ${summary['avoided_npv']:,.0f}")
+    print(f"  Incentives captured: ${summary['incentives']:,.0f}")
+    print(f"  Objective value: ${summary['value']:,.0f} ({summary['gap_pct']:.1f}% below LP bound)")
+    print(f"  EPB share of spend: {summary['epb_share'] * 100:.1f}% (min {plan.min_epb_share * 100:.0f}%)")
+
+    if len(plan.selections):
+        print(f"\n{'Year':<6} {'Projects':>9} {'Spend ($M)':>11} {'Avoided ($M)':>13}")
+        print("-" * 42)
+        for row in plan.by_year().itertuples():
+            print(f"{row.Index:<6} {row.projects:>9,} {row.budget_cost / 1e6:>11.1f} {row.avoided_npv / 1e6:>13.1f}")
+
+        print(f"\nTop {min(top, len(plan.selections))} projects:")
+        for _, row in plan.selections.head(top).iterrows():
+            epb = ' EPB' if row['is_epb'] else ''
+            print(f"  {row['building_id']:<10} {str(row['property_type'])[:28]:<30} {row['option']:<15} "
+                  f"{row['year']}  cost ${row['budget_cost']:>11,.0f}  avoided ${row['avoided_npv']:>12,.0f}{epb}")
@@ -8,11 +8,33 @@ This module provides functionality to:
 2. Track how many buildings map to each normalized year
 3. Support both Standard and ACO pathway normalization
 4. Enable portfolio-wide risk assessment across different compliance years
+
+Portfolio-level methods work on one long table of building x target rows
+(target type, actual year, normalized year, penalty) built with array
+operations, so mapping statistics, alignment reports, penalty aggregation
+and shift impact are single grouped reductions for any number of targets.
 """
 
+import numpy as np
 import pandas as pd
 from typing import Dict, List, Tuple, Optional
 from collections import defaultdict
+from functools import partial
+
+from .penalty_rules import load_rules
+
+# Building columns holding each target's actual year (other targets are fixed-year)
+TARGET_YEAR_COLUMNS = {
+    'first_interim': 'First Interim Target Year',
+    'second_interim': 'Second Interim Target Year',
+}
+
+
+def _year_key(year):
+    """Dictionary key of an actual / normalized year (int when whole)"""
+    if pd.isna(year):
+        return year
+    return int(year) if float(year).is_integer() else float(year)
 
 
 class YearNormalizer:
@@ -26,21 +48,12 @@ class YearNormalizer:
     def __init__(self):
         """Initialize with standard normalized year mappings"""
         
-        # Define normalized years for aggregation
-        self.NORMALIZED_YEARS = {
-            'standard': {
-                'first_interim': 2025,   # Map 2024, 2025, 2026 → 2025
-                'second_interim': 2027,  # All → 2027
-                'final': 2030           # All → 2030
-            },
-            'aco': {
-                'first_interim': 2028,   # All ACO → 2028
-                'final': 2032           # All ACO → 2032
-            }
-        }
+        # Define normalized years for aggregation (config/penalty_rules.json):
+        # standard 2024-2026 → 2025, then 2027 and 2030; ACO 2028 and 2032
+        self.NORMALIZED_YEARS = load_rules().normalized_years()
         
         # Track mapping statistics
-        self.mapping_stats = defaultdict(lambda: defaultdict(int))
+        self.mapping_stats = defaultdict(partial(defaultdict, int))   # picklable (process pools)
         
     def normalize_standard_path_year(self, actual_year: int, target_type: str) -> int:
         """
@@ -87,6 +100,60 @@ class YearNormalizer:
         """
         return dict(self.mapping_stats)
     
+    def target_table(self, buildings_df: pd.DataFrame, path: str = 'standard',
+                     penalty_columns: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+        """
+        Long table with one row per building and path target.
+        
+        Args:
+            buildings_df: DataFrame with building data (actual target year
+                columns per TARGET_YEAR_COLUMNS where available)
+            path: Compliance path in NORMALIZED_YEARS
+            penalty_columns: Optional target type -> penalty column mapping
+                
+        Returns:
+            DataFrame with row (position in buildings_df), target_type,
+            actual_year (NaN for targets without a building-specific year;
+            ACO years are fixed), normalized_year and penalty (NaN when not
+            mapped), ordered by target then building
+        """
+        if path not in self.NORMALIZED_YEARS:
+            raise ValueError(f"Invalid path: {path}. Must be one of {sorted(self.NORMALIZED_YEARS)}")
+        
+        targets = list(self.NORMALIZED_YEARS[path].items())
+        n = len(buildings_df)
+        penalty_columns = penalty_columns or {}
+        actual, penalty = [], []
+        for target_type, _ in targets:
+            year_column = TARGET_YEAR_COLUMNS.get(target_type)
+            if path == 'standard' and year_column in buildings_df.columns:
+                actual.append(pd.to_numeric(buildings_df[year_column]).to_numpy(dtype=np.float64, na_value=np.nan))
+            else:
+                actual.append(np.full(n, np.nan))
+            column = penalty_columns.get(target_type)
+            if column in buildings_df.columns:
+                penalty.append(pd.to_numeric(buildings_df[column]).to_numpy(dtype=np.float64, na_value=np.nan))
+            else:
+                penalty.append(np.full(n, np.nan))
+        
+        return pd.DataFrame({
+            'row': np.tile(np.arange(n), len(targets)),
+            'target_type': pd.Categorical.from_codes(np.repeat(np.arange(len(targets)), n),
+                                                     categories=[t for t, _ in targets]),
+            'actual_year': np.concatenate(actual) if targets else np.array([]),
+            'normalized_year': np.repeat([year for _, year in targets], n).astype(np.int64),
+            'penalty': np.concatenate(penalty) if targets else np.array([]),
+        })
+    
+    def _track(self, path: str, table: pd.DataFrame, buildings_df: pd.DataFrame):
+        """Add the actual -> normalized year mappings of a target table to mapping_stats"""
+        tracked = [t for t in self.NORMALIZED_YEARS[path]
+                   if TARGET_YEAR_COLUMNS.get(t) in buildings_df.columns]
+        rows = table[table['target_type'].isin(tracked)]
+        counts = rows.groupby(['target_type', 'actual_year'], sort=False, observed=True, dropna=False).size()
+        for (target_type, actual_year), count in counts.items():
+            self.mapping_stats[f'{path}_{target_type}'][_year_key(actual_year)] += int(count)
+    
     def normalize_building_targets(self, building_df: pd.DataFrame, 
                                  path: str = 'standard') -> pd.DataFrame:
         """
@@ -94,39 +161,18 @@ class YearNormalizer:
         
         Args:
             building_df: DataFrame with building data including actual target years
-            path: 'standard' or 'aco' compliance path
+            path: 'standard' or 'aco' compliance path (any path in NORMALIZED_YEARS)
             
         Returns:
-            DataFrame with additional normalized year columns
+            DataFrame with additional normalized_<target>_year columns
         """
-        df = building_df.copy()
-        
+        table = self.target_table(building_df, path)
         if path == 'standard':
-            # Map actual years to normalized years
-            if 'First Interim Target Year' in df.columns:
-                df['normalized_first_interim_year'] = df['First Interim Target Year'].apply(
-                    lambda x: self.normalize_standard_path_year(x, 'first_interim')
-                )
-            else:
-                df['normalized_first_interim_year'] = self.NORMALIZED_YEARS['standard']['first_interim']
-                
-            if 'Second Interim Target Year' in df.columns:
-                df['normalized_second_interim_year'] = df['Second Interim Target Year'].apply(
-                    lambda x: self.normalize_standard_path_year(x, 'second_interim')
-                )
-            else:
-                df['normalized_second_interim_year'] = self.NORMALIZED_YEARS['standard']['second_interim']
-                
-            df['normalized_final_year'] = self.NORMALIZED_YEARS['standard']['final']
-            
-        elif path == 'aco':
-            # ACO path uses fixed normalized years
-            df['normalized_first_interim_year'] = self.NORMALIZED_YEARS['aco']['first_interim']
-            df['normalized_final_year'] = self.NORMALIZED_YEARS['aco']['final']
-            
-        else:
-            raise ValueError(f"Invalid path: {path}. Must be 'standard' or 'aco'")
-            
+            self._track(path, table, building_df)
+        
+        df = building_df.copy()
+        for target_type, normalized_year in self.NORMALIZED_YEARS[path].items():
+            df[f'normalized_{target_type}_year'] = normalized_year
         return df
     
     def aggregate_penalties_by_normalized_year(self, buildings_df: pd.DataFrame,
@@ -142,15 +188,24 @@ class YearNormalizer:
         Returns:
             Dictionary mapping normalized years to total penalties
         """
-        aggregated = defaultdict(float)
+        pairs = [(p, y) for p, y in penalty_columns.items()
+                 if p in buildings_df.columns and y in buildings_df.columns]
+        if not pairs:
+            return {}
+        
+        # (source column, normalized year, penalty) rows, summed in one grouped pass
+        sources = [p for p, _ in pairs]
+        long = pd.DataFrame({
+            'source': pd.Categorical.from_codes(np.repeat(np.arange(len(sources)), len(buildings_df)),
+                                                categories=sources),
+            'year': np.concatenate([buildings_df[y].to_numpy() for _, y in pairs]),
+            'penalty': pd.concat([buildings_df[p] for p, _ in pairs], ignore_index=True).to_numpy(),
+        })
+        grouped = long.groupby(['source', 'year'], sort=True, observed=True)['penalty'].sum()
         
-        for penalty_col, year_col in penalty_columns.items():
-            if penalty_col in buildings_df.columns and year_col in buildings_df.columns:
-                # Group by normalized year and sum penalties
-                grouped = buildings_df.groupby(year_col)[penalty_col].sum()
-                for year, total_penalty in grouped.items():
-                    aggregated[int(year)] += total_penalty
-                    
+        aggregated = defaultdict(float)
+        for (_, year), total_penalty in grouped.items():
+            aggregated[int(year)] += total_penalty
         return dict(aggregated)
     
     def create_year_alignment_report(self, buildings_df: pd.DataFrame) -> pd.DataFrame:
@@ -163,38 +218,30 @@ class YearNormalizer:
         Returns:
             DataFrame summarizing year alignments
         """
-        alignment_data = []
+        table = self.target_table(buildings_df, 'standard')
+        reported = [t for t in self.NORMALIZED_YEARS['standard']
+                    if TARGET_YEAR_COLUMNS.get(t) in buildings_df.columns]
         
-        # Analyze first interim year alignment
-        if 'First Interim Target Year' in buildings_df.columns:
-            first_interim_counts = buildings_df['First Interim Target Year'].value_counts()
-            for actual_year, count in first_interim_counts.items():
-                alignment_data.append({
-                    'Target Type': 'First Interim',
-                    'Actual Year': int(actual_year),
-                    'Normalized Year (Standard)': self.NORMALIZED_YEARS['standard']['first_interim'],
-                    'Normalized Year (ACO)': self.NORMALIZED_YEARS['aco']['first_interim'],
-                    'Building Count': count,
-                    'Percentage': count / len(buildings_df) * 100
-                })
-        
-        # Analyze second interim year alignment
-        if 'Second Interim Target Year' in buildings_df.columns:
-            second_interim_counts = buildings_df['Second Interim Target Year'].value_counts()
-            for actual_year, count in second_interim_counts.items():
+        alignment_data = []
+        for target_type, rows in table.groupby('target_type', sort=False, observed=True):
+            if target_type not in reported:
+                continue
+            for actual_year, count in rows['actual_year'].value_counts().items():
                 alignment_data.append({
-                    'Target Type': 'Second Interim',
+                    'Target Type': target_type.replace('_', ' ').title(),
                     'Actual Year': int(actual_year),
-                    'Normalized Year (Standard)': self.NORMALIZED_YEARS['standard']['second_interim'],
-                    'Normalized Year (ACO)': '-',  # ACO doesn't have second interim
+                    'Normalized Year (Standard)': self.NORMALIZED_YEARS['standard'][target_type],
+                    # ACO has no second interim
+                    'Normalized Year (ACO)': self.NORMALIZED_YEARS['aco'].get(target_type, '-'),
                     'Building Count': count,
                     'Percentage': count / len(buildings_df) * 100
                 })
-        
         return pd.DataFrame(alignment_data)
     
     def calculate_year_shift_impact(self, buildings_df: pd.DataFrame,
-                                  penalty_rate: float = 0.15) -> Dict[str, float]:
+                                  penalty_rate: float = 0.15,
+                                  target_type: str = 'first_interim',
+                                  penalty_column: str = 'penalty_first_interim') -> Dict[str, float]:
         """
         Calculate the financial impact of year normalization.
         
@@ -202,7 +249,10 @@ class YearNormalizer:
         
         Args:
             buildings_df: DataFrame with building data
-            penalty_rate: Penalty rate per kBtu over target
+            penalty_rate: Unused; kept so existing callers passing it keep
+                working (penalties come from penalty_column)
+            target_type: Standard path target whose year shift is measured
+            penalty_column: Column with that target's penalty (optional)
             
         Returns:
             Dictionary with impact metrics
@@ -215,36 +265,34 @@ class YearNormalizer:
             'average_months_shifted': 0.0
         }
         
-        if 'First Interim Target Year' not in buildings_df.columns:
+        if TARGET_YEAR_COLUMNS.get(target_type) not in buildings_df.columns:
             return impact
-            
-        # Calculate shifts for each building
-        shifts = []
-        for _, building in buildings_df.iterrows():
-            actual_year = building.get('First Interim Target Year', 2025)
-            normalized_year = self.NORMALIZED_YEARS['standard']['first_interim']
-            
-            year_shift = normalized_year - actual_year
-            
-            if year_shift < 0:
-                impact['buildings_with_earlier_penalties'] += 1
-            elif year_shift > 0:
-                impact['buildings_with_later_penalties'] += 1
-            else:
-                impact['buildings_unchanged'] += 1
-                
-            shifts.append(year_shift)
-            
-            # Calculate penalty timing impact (simplified)
-            if 'penalty_first_interim' in building:
-                penalty = building['penalty_first_interim']
-                # Discount/compound based on shift
-                if year_shift != 0:
-                    discount_factor = 1.07 ** year_shift  # 7% discount rate
-                    impact['total_penalty_shift_amount'] += penalty * (1 - discount_factor)
         
-        if shifts:
-            impact['average_months_shifted'] = abs(sum(shifts) / len(shifts)) * 12
+        table = self.target_table(buildings_df, 'standard', {target_type: penalty_column})
+        rows = table[table['target_type'] == target_type]
+        shift = (rows['normalized_year'] - rows['actual_year']).to_numpy()
+        
+        impact['buildings_with_earlier_penalties'] = int((shift < 0).sum())
+        impact['buildings_with_later_penalties'] = int((shift > 0).sum())
+        impact['buildings_unchanged'] = len(shift) - (impact['buildings_with_earlier_penalties']
+                                                      + impact['buildings_with_later_penalties'])
+        
+        # Penalty timing impact (simplified): discount / compound each penalty by its shift
+        if penalty_column in buildings_df.columns:
+            moved = shift != 0
+            shifts, inverse = np.unique(shift[moved], return_inverse=True)
+            growth = 1 + load_rules().discount_rate   # 7% discount rate
+            factors = np.array([growth ** float(s) for s in shifts])
+            terms = rows['penalty'].to_numpy()[moved] * (1 - factors[inverse])
+            # Accumulate in building order, one addition at a time, so the total is
+            # bit-identical to the per-building loop (numpy's pairwise sum, fsum
+            # and Python 3.12+ sum() all round differently)
+            for term in terms.tolist():
+                impact['total_penalty_shift_amount'] += term
+        
+        if len(shift):
+            # Integer year shifts, so the sum is exact
+            impact['average_months_shifted'] = abs(shift.sum() / len(shift)) * 12
             
         return impact
 
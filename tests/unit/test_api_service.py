@@ -0,0 +1,225 @@
+"""Unit tests for the compliance API index, HTTP service and load-test client"""
+import asyncio
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from api.building_index import BuildingIndex, BuildingNotFound, building_record
+from api.load_test import HTTPClient, run_load_test
+from api.service import ComplianceService
+from utils.penalty_calculator import EnergizeDenverPenaltyCalculator
+
+
+@pytest.fixture
+def portfolio():
+    rng = np.random.default_rng(11)
+    n = 40
+    baseline = rng.uniform(60, 140, n)
+    return pd.DataFrame({
+        'Building ID': [str(1000 + k) for k in range(n)],
+        'Building Name': [f"Building {k}" for k in range(n)],
+        'Master Property Type': rng.choice(['Office', 'Multifamily Housing', 'Hotel'], n),
+        'Master Sq Ft': rng.uniform(25_000, 400_000, n),
+        'Weather Normalized Site EUI': baseline * rng.uniform(0.7, 1.1, n),
+        'Baseline EUI': baseline,
+        'First Interim Target EUI': baseline * 0.9,
+        'Second Interim Target EUI': baseline * 0.8,
+        'Original Final Target EUI': baseline * 0.6,
+        'Adjusted Final Target EUI': np.where(rng.random(n) < 0.3, np.nan, baseline * 0.65),
+        'Year Built': rng.integers(1950, 2015, n),
+        # Two tight groups 5km apart plus one building without coordinates
+        'latitude': np.r_[39.74 + rng.uniform(0, 0.002, 20), 39.79 + rng.uniform(0, 0.002, 19), np.nan],
+        'longitude': np.r_[-104.99 + rng.uniform(0, 0.002, 20), -104.99 + rng.uniform(0, 0.002, 19), np.nan],
+    })
+
+
+@pytest.fixture
+def index(portfolio):
+    return BuildingIndex(portfolio, mai_ids={'1003'})
+
+
+def index_record(portfolio, building_id):
+    row = portfolio.loc[portfolio['Building ID'] == building_id].iloc[0].to_dict()
+    return building_record(row, set())
+
+
+def _with_service(index, scenario):
+    """Start a service on a free port, run scenario(service), then shut down"""
+    async def run():
+        service = ComplianceService(index, warm=False)
+        await service.start('127.0.0.1', 0)
+        try:
+            return await scenario(service)
+        finally:
+            await service.stop()
+    return asyncio.run(run())
+
+
+class TestBuildingIndex:
+    """Test indexed answers against the shared calculator"""
+
+    def test_paths_match_calculator(self, index):
+        record = index.record('1005')
+        expected = EnergizeDenverPenaltyCalculator().compare_compliance_paths(record)
+
+        answer = index.lookup('paths', '1005')
+        assert answer['aco_total_npv'] == pytest.approx(expected['aco_total_npv'])
+        assert answer['standard_total_npv'] == pytest.approx(expected['standard_total_npv'])
+        assert answer['recommendation'] == expected['recommendation']
+
+    def test_penalty_schedule_totals(self, index):
+        answer = index.lookup('penalties', '1005', 'aco')
+        assert answer['compliance_path'] == 'aco'
+        assert answer['schedule'][0]['target_year'] == 2028
+        assert answer['total_nominal'] == pytest.approx(
+            sum(row['penalty_amount'] for row in answer['schedule']))
+
+    def test_raw_targets_follow_rule_years(self, portfolio):
+        row = portfolio.iloc[0].to_dict()
+        row['First Interim Target Year'] = 2024
+        first, second = row['First Interim Target EUI'], row['Second Interim Target EUI']
+        final = row['Adjusted Final Target EUI']
+        final = row['Original Final Target EUI'] if np.isnan(final) else final
+        # Standard events shift with the first interim year; ACO events do not
+        assert building_record(row, set())['raw_targets'] == {
+            2024: first, 2026: second, 2029: final, 2028: first, 2032: final}
+
+    def test_from_files_filters_and_keeps_coordinates(self, portfolio, tmp_path):
+        # Source files carry one decimal (the typed loader stores float32)
+        numeric = ['Master Sq Ft', 'Weather Normalized Site EUI', 'Baseline EUI', 'First Interim Target EUI',
+                   'Second Interim Target EUI', 'Original Final Target EUI', 'Adjusted Final Target EUI']
+        portfolio[numeric] = portfolio[numeric].round(1)
+        os.makedirs(tmp_path / 'processed')
+        os.makedirs(tmp_path / 'raw')
+        current = portfolio.drop(columns=[c for c in portfolio if 'Target' in c or c == 'Baseline EUI'])
+        current.loc[0, 'Master Sq Ft'] = 20_000
+        current.loc[1, 'Weather Normalized Site EUI'] = 0
+        current.to_csv(tmp_path / 'processed' / 'energize_denver_comprehensive_latest.csv', index=False)
+        portfolio[['Building ID'] + [c for c in portfolio if 'Target' in c or c == 'Baseline EUI']].to_csv(
+            tmp_path / 'raw' / 'Building_EUI_Targets.csv', index=False)
+
+        loaded = BuildingIndex.from_files(str(tmp_path))
+        assert '1000' not in loaded and '1001' not in loaded and len(loaded) == len(portfolio) - 2
+        assert loaded.record('1005') == index_record(portfolio, '1005')
+        assert loaded.lookup('cluster', '1005') == BuildingIndex(portfolio.iloc[2:]).lookup('cluster', '1005')
+
+    def test_mai_and_missing_final_target(self, index, portfolio):
+        assert index.record('1003')['is_mai']
+        missing = portfolio.loc[portfolio['Adjusted Final Target EUI'].isna(), 'Building ID'].iloc[0]
+        row = portfolio.set_index('Building ID').loc[missing]
+        assert index.record(missing)['final_target'] == pytest.approx(row['Original Final Target EUI'])
+
+    def test_cluster_membership(self, index):
+        first, second = index.lookup('cluster', '1000'), index.lookup('cluster', '1025')
+        assert first['cluster_size'] == 20 and second['cluster_size'] == 19
+        assert first['cluster_id'] != second['cluster_id']
+        assert index.lookup('cluster', '1039') == {'building_id': '1039', 'cluster_id': None,
+                                                   'geocoded': False}
+
+    def test_chained_buildings_do_not_merge(self, portfolio):
+        # Ten buildings 200 m apart along a meridian: every neighbor pair is
+        # within 500 m, but the chain spans 1.8 km
+        chain = portfolio.iloc[:10].assign(latitude=39.74 + np.arange(10) * 200 / 111_195,
+                                           longitude=-104.99)
+        index = BuildingIndex(chain)
+        clusters = [index.lookup('cluster', b) for b in chain['Building ID']]
+
+        sizes = {c['cluster_id']: c['cluster_size'] for c in clusters if c['cluster_id'] is not None}
+        assert sorted(sizes.values()) == [4, 4]
+        for c in clusters:
+            if c['cluster_id'] is not None:
+                anchor = int(c['anchor']) - 1000
+                assert abs(int(c['building_id']) - 1000 - anchor) * 200 <= index.cluster_distance
+        assert clusters[-1]['cluster_id'] is None and clusters[-1]['geocoded']
+
+    def test_warm_fills_cache_once(self, index):
+        computed = index.warm()
+        assert computed == len(index) * 6
+        assert index.warm() == 0
+        assert index.cached('opt-in', '1010')
+
+    def test_unknown_building(self, index):
+        with pytest.raises(BuildingNotFound):
+            index.lookup('paths', 'nope')
+
+
+class TestComplianceService:
+    """Test HTTP routing, batch endpoints and the load-test client"""
+
+    def test_single_building_endpoints(self, index):
+        async def scenario(service):
+            client = HTTPClient('127.0.0.1', service.port)
+            responses = {kind: await client.request('GET', f"/buildings/1005/{kind}")
+                         for kind in ('paths', 'opt-in', 'cluster')}
+            responses['aco'] = await client.request('GET', '/buildings/1005/penalties?path=aco')
+            responses['missing'] = await client.request('GET', '/buildings/nope/paths')
+            responses['bad_path'] = await client.request('GET', '/buildings/1005/penalties?path=x')
+            await client.close()
+            return responses
+
+        responses = _with_service(index, scenario)
+        assert responses['paths'] == (200, index.lookup('paths', '1005'))
+        assert responses['opt-in'][1]['building_id'] == '1005'
+        assert responses['aco'][1]['compliance_path'] == 'aco'
+        assert responses['missing'][0] == 404
+        assert responses['bad_path'][0] == 400
+
+    def test_internal_errors_and_bad_requests(self, index, monkeypatch):
+        errors = iter([KeyError('standard_total_npv'), ValueError('cannot convert float NaN to integer')])
+
+        def broken(*args):
+            raise next(errors)
+
+        monkeypatch.setattr(index, 'cached', lambda *args: True)
+        monkeypatch.setattr(index, 'lookup', broken)
+
+        async def scenario(service):
+            client = HTTPClient('127.0.0.1', service.port)
+            internal = [await client.request('GET', '/buildings/1005/paths'),
+                        await client.request('GET', '/buildings/1005/opt-in')]
+            bad_body = await client.request('POST', '/batch/paths', ['1005'])
+            await client.close()
+
+            reader, writer = await asyncio.open_connection('127.0.0.1', service.port)
+            writer.write(b'POST /batch/paths HTTP/1.1\r\nContent-Length: ten\r\n\r\n')
+            await writer.drain()
+            bad_length = await reader.readline()
+            writer.close()
+            return internal, bad_body, bad_length
+
+        internal, bad_body, bad_length = _with_service(index, scenario)
+        # KeyError / ValueError inside an answer are server errors, not client errors
+        assert [status for status, _ in internal] == [500, 500]
+        assert bad_body[0] == 400
+        assert bad_length.startswith(b'HTTP/1.1 400')
+
+    def test_batch_endpoint(self, index):
+        async def scenario(service):
+            client = HTTPClient('127.0.0.1', service.port)
+            response = await client.request('POST', '/batch/paths',
+                                            {'building_ids': ['1001', '1002', 'nope']})
+            await client.close()
+            return response
+
+        status, body = _with_service(index, scenario)
+        assert status == 200
+        assert set(body['results']) == {'1001', '1002'}
+        assert body['not_found'] == ['nope']
+        assert body['results']['1002'] == index.lookup('paths', '1002')
+
+    def test_load_test_harness(self, index):
+        index.warm()
+
+        async def scenario(service):
+            return await run_load_test('127.0.0.1', service.port, list(index.buildings),
+                                       endpoint='paths', total_requests=200, concurrency=8)
+
+        result = _with_service(index, scenario)
+        assert result.errors == 0
+        assert len(result.latencies_ms) == 200
+        assert result.percentile(99) >= result.percentile(50) > 0
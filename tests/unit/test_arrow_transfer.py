@@ -0,0 +1,146 @@
+"""Unit tests for Arrow/Parquet BigQuery transfer (against a local fake client)"""
+import os
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from gcp.arrow_transfer import (arrow_column_types, bigquery_schema, csv_to_parquet,
+                                export_query_to_parquet, export_table_to_parquet, load_csv,
+                                load_dataframe, write_parquet)
+
+
+class FakeRows:
+    def __init__(self, table, page_size):
+        self.table = table
+        self.page_size = page_size
+        self.pages_read = 0
+
+    def to_arrow_iterable(self, bqstorage_client=None):
+        for batch in self.table.to_batches(max_chunksize=self.page_size):
+            self.pages_read += 1
+            yield batch
+
+
+class FakeBigQuery:
+    """Stores loaded Parquet as Arrow tables; queries return a named table"""
+
+    def __init__(self):
+        self.tables = {}
+        self.jobs = []
+
+    def load_table_from_file(self, file_obj, table_id, job_config=None):
+        self.tables[table_id] = pq.read_table(file_obj)
+        self.jobs.append(job_config)
+        return SimpleNamespace(result=lambda: None)
+
+    def list_rows(self, table_id, page_size=None):
+        return FakeRows(self.tables[table_id], page_size)
+
+    def query(self, sql):
+        table_id = sql.split('`')[1]
+        return SimpleNamespace(result=lambda page_size=None: FakeRows(self.tables[table_id], page_size))
+
+
+@pytest.fixture
+def buildings_df():
+    n = 1000
+    rng = np.random.default_rng(1)
+    return pd.DataFrame({
+        'Building ID': np.arange(n),
+        'Site EUI': rng.uniform(20, 300, n),
+        # Excel-style mixed column: numbers, text and blanks
+        'Zip Code': [80202 if k % 3 == 0 else ('80203-1234' if k % 3 == 1 else None) for k in range(n)],
+        'Is EPB': rng.random(n) < 0.2,
+        'Reported': pd.Timestamp('2024-06-01', tz='UTC') + pd.to_timedelta(np.arange(n), unit='h'),
+    })
+
+
+class TestLoads:
+    """Test DataFrame/CSV uploads"""
+
+    def test_load_dataframe_uses_typed_parquet(self, buildings_df):
+        client = FakeBigQuery()
+        rows = load_dataframe(client, buildings_df, 'p.d.buildings', clean_columns=True)
+
+        loaded = client.tables['p.d.buildings']
+        schema = {f.name: f.field_type for f in client.jobs[0].schema}
+        assert rows == len(buildings_df)
+        assert client.jobs[0].source_format == 'PARQUET'
+        assert schema == {'building_id': 'INT64', 'site_eui': 'FLOAT64', 'zip_code': 'STRING',
+                          'is_epb': 'BOOL', 'reported': 'TIMESTAMP'}
+        zips = loaded.column('zip_code').to_pylist()
+        assert zips[:3] == ['80202', '80203-1234', None]
+
+    def test_csv_streams_in_blocks(self, buildings_df, tmp_path):
+        csv_path = tmp_path / 'buildings.csv'
+        buildings_df.drop(columns=['Zip Code']).to_csv(csv_path, index=False)
+
+        parquet_path = tmp_path / 'buildings.parquet'
+        schema = csv_to_parquet(str(csv_path), str(parquet_path), block_size=4096)
+
+        assert schema.names == ['building_id', 'site_eui', 'is_epb', 'reported']
+        assert pq.ParquetFile(parquet_path).metadata.num_row_groups > 1
+        restored = pq.read_table(parquet_path).to_pandas()
+        assert restored['site_eui'].to_numpy() == pytest.approx(buildings_df['Site EUI'].to_numpy())
+
+        client = FakeBigQuery()
+        load_csv(client, str(csv_path), 'p.d.from_csv')
+        assert client.tables['p.d.from_csv'].num_rows == len(buildings_df)
+
+    def test_csv_types_cover_every_block(self, tmp_path):
+        n = 2000
+        df = pd.DataFrame({
+            'Building ID': np.arange(n),
+            # Integers in the first block only, then decimals / text
+            'Floors': [k % 20 if k < n // 2 else k % 20 + 0.5 for k in range(n)],
+            'Zip': [80202 if k < n - 1 else '80203-1234' for k in range(n)],
+            'Flag': [True] * n,
+        })
+        df.loc[n // 4, 'Floors'] = None
+        csv_path = tmp_path / 'late_types.csv'
+        df.to_csv(csv_path, index=False)
+        parquet_path = tmp_path / 'late_types.parquet'
+
+        schema = csv_to_parquet(str(csv_path), str(parquet_path), block_size=4096)
+        assert schema.field('building_id').type == 'int64'
+        assert schema.field('floors').type == 'double' and schema.field('zip').type == 'string'
+        assert schema.field('flag').type == 'bool'
+        restored = pq.read_table(parquet_path)
+        assert restored.column('zip').to_pylist()[-2:] == ['80202', '80203-1234']
+        assert restored.column('floors').null_count == 1
+
+        # Explicit types (e.g. from a BigQuery schema) win over inference
+        types = arrow_column_types(bigquery_schema(pa.schema([('zip', pa.string())])))
+        schema = csv_to_parquet(str(csv_path), str(parquet_path), column_types=types, block_size=4096)
+        assert schema.field('zip').type == 'string' and schema.field('floors').type == 'double'
+
+
+class TestExports:
+    """Test streaming exports"""
+
+    def test_table_and_query_exports_round_trip(self, buildings_df, tmp_path):
+        client = FakeBigQuery()
+        load_dataframe(client, buildings_df, 'p.d.buildings', clean_columns=True)
+
+        table_path = tmp_path / 'table.parquet'
+        rows = export_table_to_parquet(client, 'p.d.buildings', str(table_path), page_size=128)
+        query_path = tmp_path / 'query.parquet'
+        export_query_to_parquet(client, "SELECT * FROM `p.d.buildings`", str(query_path), page_size=128)
+
+        assert rows == len(buildings_df)
+        assert pq.read_table(table_path).equals(client.tables['p.d.buildings'])
+        assert pq.read_table(query_path).num_rows == len(buildings_df)
+
+    def test_write_parquet_consumes_chunks(self, tmp_path):
+        chunks = (pd.DataFrame({'x': np.arange(k * 10, k * 10 + 10)}) for k in range(5))
+        path = tmp_path / 'chunks.parquet'
+
+        assert write_parquet(chunks, str(path)) == 50
+        assert pq.read_table(path).column('x').to_pylist() == list(range(50))
@@ -0,0 +1,113 @@
+"""Unit tests for CLI startup cost, the warm CLI daemon and the data catalog"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from utils import cli_daemon, data_catalog
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+CLI = os.path.join(PROJECT_ROOT, 'run_analysis_cli.py')
+HEAVY_MODULES = ('pandas', 'numpy', 'matplotlib', 'seaborn', 'scipy')
+
+
+def _imported_modules(*args):
+    result = subprocess.run([sys.executable, '-X', 'importtime', CLI, *args], cwd=PROJECT_ROOT,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr[-2000:]
+    modules = {}
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and 'self [us]' not in line:
+            own, cumulative, name = line[len('import time:'):].split('|')
+            modules[name.strip()] = int(cumulative)
+    return modules
+
+
+class TestStartupImports:
+    """Light subcommands must not pay for the analysis stack"""
+
+    @pytest.mark.parametrize('args', [('--show-config', '--no-daemon'), ('--list-scenarios',)])
+    def test_no_heavy_imports(self, args):
+        modules = _imported_modules(*args)
+        heavy = [m for m in modules if m.split('.')[0] in HEAVY_MODULES]
+        assert heavy == []
+
+    def test_cli_import_budget(self):
+        # Cumulative import time of the CLI's own top-level modules (generous bound)
+        modules = _imported_modules('--show-config', '--no-daemon')
+        assert modules['config'] + modules['utils.cli_daemon'] < 250_000
+
+
+@pytest.fixture
+def socket_path():
+    # AF_UNIX paths are limited to ~100 bytes, so avoid pytest's long tmp_path
+    directory = tempfile.mkdtemp(prefix='edcli')
+    yield os.path.join(directory, 'cli.sock')
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+class TestCLIDaemon:
+    """Test request forwarding over the Unix socket"""
+
+    def test_run_ping_and_shutdown(self, socket_path):
+        calls = []
+
+        def handler(argv):
+            calls.append(list(argv))
+            print(f"args={' '.join(argv)} cwd={os.getcwd()}")
+            if '--fail' in argv:
+                sys.exit(3)
+
+        daemon = cli_daemon.CLIDaemon(handler, socket_path)
+        daemon.bind()
+        thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+        thread.start()
+
+        assert cli_daemon.ping(socket_path)['pid'] == os.getpid()
+        cwd = os.path.realpath(tempfile.gettempdir())
+        response = cli_daemon.run_remote(['--building-id', '1234'], socket_path, cwd=cwd)
+        assert response['exit_code'] == 0
+        assert response['stdout'] == f"args=--building-id 1234 cwd={cwd}\n"
+        assert cli_daemon.run_remote(['--fail'], socket_path)['exit_code'] == 3
+        assert calls == [['--building-id', '1234'], ['--fail']]
+
+        assert cli_daemon.shutdown(socket_path)
+        thread.join(5)
+        assert not thread.is_alive()
+        assert not os.path.exists(socket_path)
+        assert cli_daemon.ping(socket_path) is None
+
+    def test_exceptions_become_exit_codes(self):
+        def handler(argv):
+            raise RuntimeError("boom")
+
+        response = cli_daemon.run_captured(handler, [])
+        assert response['exit_code'] == 1
+        assert 'RuntimeError: boom' in response['stderr']
+
+
+class TestDataCatalog:
+    """Test the process-wide parsed-file cache"""
+
+    def test_reads_once_and_reloads_on_change(self, tmp_path):
+        path = tmp_path / 'targets.csv'
+        pd.DataFrame({'Building ID': [1, 2], 'EUI': [50.0, 60.0]}).to_csv(path, index=False)
+
+        first = data_catalog.read_csv(path)
+        first['Building ID'] = first['Building ID'].astype(str)  # caller-side mutation
+        second = data_catalog.read_csv(path)
+        assert second['Building ID'].tolist() == [1, 2]
+        assert str(path) in data_catalog.cached_files()
+
+        pd.DataFrame({'Building ID': [3], 'EUI': [70.0]}).to_csv(path, index=False)
+        os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1_000_000))
+        assert data_catalog.read_csv(path)['Building ID'].tolist() == [3]
+        data_catalog.clear()
+        assert data_catalog.cached_files() == []
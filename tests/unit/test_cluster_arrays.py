@@ -0,0 +1,127 @@
+"""Unit tests for columnar cluster aggregation"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from analytics.cluster_arrays import ClusterMembership
+from analytics.der_clustering_analysis import DERClusterAnalyzer
+from analytics.fixed_enhanced_der_clustering import FixedDERClusterAnalyzer
+
+
+@pytest.fixture
+def buildings_df():
+    rng = np.random.default_rng(11)
+    n = 400
+    types = ['Data Center', 'Office', 'Multifamily Housing', 'Hotel', 'Hospital']
+    return pd.DataFrame({
+        'building_id': [f"B{k:04d}" for k in range(n)],
+        'latitude': 39.74 + rng.uniform(-0.01, 0.01, n),
+        'longitude': -104.99 + rng.uniform(-0.01, 0.01, n),
+        'property_type': rng.choice(types, n, p=[0.05, 0.4, 0.4, 0.1, 0.05]),
+        'gross_floor_area': rng.uniform(25000, 300000, n),
+        'most_recent_site_eui': rng.uniform(40, 200, n),
+        'electric_eui': rng.uniform(0, 120, n),
+        'gas_eui': rng.uniform(0, 80, n),
+        'opt_in_recommendation': rng.choice(['Opt-In', 'Default'], n),
+        'is_epb': rng.random(n) < 0.2,
+        'total_penalties_default': rng.uniform(0, 1e6, n),
+    })
+
+
+class TestClusterMembership:
+    """Test sparse cluster totals"""
+
+    def test_cluster_sums_match_python_sums(self):
+        values = np.array([1.5, 2.0, 4.0, 8.0, 16.0])
+        flags = np.array([True, False, True, True, False])
+        membership = ClusterMembership.from_lists(
+            [0, 4], [np.array([1, 2]), np.array([3])], [np.array([10.0, 20.0]), np.array([5.0])], 5)
+
+        sums = membership.cluster_sums({'value': values, 'flag': flags})
+
+        assert sums['value'].tolist() == [1.5 + 2.0 + 4.0, 16.0 + 8.0]
+        assert sums['flag'].tolist() == [2, 1]
+        assert sums['flag'].dtype == np.int64
+        assert membership.distinct_counts(np.array(['a', 'b', 'a', 'c', 'c'])).tolist() == [2, 1]
+
+    def test_distance_matrix_keeps_member_order(self):
+        membership = ClusterMembership.from_lists(
+            [0], [np.array([3, 1, 2])], [np.array([1.0, 2.0, 3.0])], 4)
+        membership.distance_matrix().max(axis=1)
+
+        _, idx, distance = next(membership.member_slices())
+        assert idx.tolist() == [3, 1, 2]
+        assert distance.tolist() == [1.0, 2.0, 3.0]
+
+
+class TestVectorizedClustering:
+    """Test the sparse clustering path against the per-profile helpers"""
+
+    def test_find_clusters_matches_profile_greedy(self, buildings_df):
+        analyzer = DERClusterAnalyzer(max_distance_meters=250)
+        arrays = analyzer.build_building_arrays(buildings_df)
+        membership = analyzer.find_clusters(arrays)
+
+        # Reference greedy loop over BuildingProfile objects
+        profiles = arrays.to_profiles()
+        expected = []
+        processed = set()
+        for anchor in analyzer.identify_anchor_buildings(profiles):
+            if anchor.building_id in processed:
+                continue
+            nearby = [(b, d) for b, d in analyzer.find_nearby_buildings(anchor, profiles)
+                      if b.building_id not in processed]
+            if len(nearby) >= 3:
+                expected.append((anchor.building_id, [b.building_id for b, _ in nearby]))
+                processed.add(anchor.building_id)
+                processed.update(b.building_id for b, _ in nearby)
+
+        actual = [(arrays.building_id[a], arrays.building_id[idx].tolist())
+                  for a, (_, idx, _) in zip(membership.anchor_idx, membership.member_slices())]
+        assert actual == expected
+
+    def test_single_cluster_metrics_match_generator_sums(self, buildings_df):
+        analyzer = DERClusterAnalyzer(max_distance_meters=250)
+        profiles = analyzer.build_building_profiles(buildings_df)
+        anchor = analyzer.identify_anchor_buildings(profiles)[0]
+        members = analyzer.find_nearby_buildings(anchor, profiles)
+        all_buildings = [anchor] + [b for b, _ in members]
+
+        metrics = analyzer.calculate_cluster_metrics(anchor, members)
+
+        assert metrics['total_sqft'] == pytest.approx(sum(b.gross_floor_area for b in all_buildings))
+        assert metrics['total_thermal_load_mmbtu'] == pytest.approx(
+            sum(b.thermal_load_mmbtu for b in all_buildings))
+        assert metrics['epb_count'] == sum(1 for b in all_buildings if b.is_epb)
+        assert metrics['opt_in_count'] == sum(1 for b in all_buildings if b.opt_in_status == 'Opt-In')
+        assert metrics['property_type_diversity'] == len(set(b.property_type for b in all_buildings))
+        assert metrics['avg_distance_m'] == pytest.approx(np.mean([d for _, d in members]))
+        assert metrics['economic_potential_score'] == analyzer._calculate_economic_score(metrics)
+
+    def test_uncosted_network_takes_no_deduction(self, buildings_df):
+        analyzer = DERClusterAnalyzer(max_distance_meters=250)
+        clusters = analyzer.analyze_clusters(buildings_df)
+        uncosted = analyzer._calculate_economic_scores(clusters.drop(columns='network_cost_per_mmbtu'))
+
+        np.testing.assert_array_equal(
+            analyzer._calculate_economic_scores(clusters.assign(network_cost_per_mmbtu=np.nan)), uncosted)
+        np.testing.assert_array_equal(
+            analyzer._calculate_economic_scores(clusters.assign(network_cost_per_mmbtu=25.0)),
+            np.clip(uncosted - 15, 0, 100))
+
+    def test_fixed_metrics_use_the_given_table(self, buildings_df):
+        analyzer = FixedDERClusterAnalyzer(max_distance_meters=250)
+        profiles = analyzer.build_building_profiles(buildings_df)
+        buildings = analyzer.build_building_arrays(buildings_df)
+
+        for anchor in analyzer.identify_anchor_buildings(profiles)[:3]:
+            members = analyzer.find_nearby_buildings(anchor, profiles)
+            metrics = analyzer.calculate_cluster_metrics(anchor, members, buildings)
+            assert metrics['anchor_building_id'] == anchor.building_id
+            assert metrics['total_sqft'] == pytest.approx(
+                anchor.gross_floor_area + sum(b.gross_floor_area for b, _ in members))
@@ -0,0 +1,133 @@
+"""Unit tests for the compliance path / retrofit timing DP"""
+import itertools
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from utils.compliance_path_optimizer import PathParams, optimize_compliance
+from utils.penalty_monte_carlo import MonteCarloInputs
+from utils.retrofit_optimizer import RetrofitOption
+
+YEARS = np.arange(2025, 2043)
+RATES = {'standard': 0.15, 'aco': 0.23, 'extension': 0.35}
+OPTIONS = (RetrofitOption('light', 5.0, 0.10), RetrofitOption('deep', 25.0, 0.40),
+           RetrofitOption('electrify', 30.0, 0.70, itc_eligible=True))
+
+
+def _inputs(eui, final, sqft=100_000.0):
+    eui, final = np.atleast_1d(eui).astype(float), np.atleast_1d(final).astype(float)
+    frame = pd.DataFrame({
+        'Building ID': [str(k) for k in range(len(eui))],
+        'Master Property Type': 'Office',
+        'Master Sq Ft': sqft,
+        'Weather Normalized Site EUI': eui,
+        'First Interim Target EUI': final * 1.3,
+        'Second Interim Target EUI': final * 1.15,
+        'Original Final Target EUI': final,
+    })
+    return MonteCarloInputs.from_frame(frame, 'standard')
+
+
+def _targets(path, inputs, b):
+    first, second, final = (inputs.first_interim_target[b], inputs.second_interim_target[b],
+                            inputs.final_target[b])
+    if path == 'standard':
+        return {2025: first, 2027: second, **{y: final for y in range(2030, 2043)}}
+    if path == 'aco':
+        return {2028: first, **{y: final for y in range(2032, 2043)}}
+    return {y: final for y in range(2030, 2043)}
+
+
+def _capex(option, params, sqft):
+    if option is None:
+        return 0.0
+    credit = params.itc_share if option.itc_eligible else 0.0
+    return option.cost_per_sqft * (1 - credit) * sqft
+
+
+def _plan_npv(inputs, b, path, stages, params):
+    """Discounted penalties + capex of one explicit plan [(year, option), ...] (deepening over time)"""
+    sqft, eui = inputs.sqft[b], inputs.current_eui[b]
+    total, installed = 0.0, None
+    for year, option in stages:
+        total += max(_capex(option, params, sqft) - _capex(installed, params, sqft), 0) / 1.07 ** (year - 2025)
+        installed = option
+    for y, target in _targets(path, inputs, b).items():
+        current = [o for year, o in stages if year <= y]
+        actual = eui * (1 - current[-1].eui_reduction) if current else eui
+        total += max(actual - target, 0) * sqft * RATES[path] / 1.07 ** (y - 2025)
+    return total
+
+
+def _staged_plans(params):
+    """Every plan of up to len(OPTIONS) retrofits, each deeper than the last, in distinct years"""
+    by_depth = sorted(OPTIONS, key=lambda o: o.eui_reduction)
+    plans = [[]]
+    for size in range(1, len(by_depth) + 1):
+        for options in itertools.combinations(by_depth, size):
+            for years in itertools.combinations(params.retrofit_years, size):
+                plans.append(list(zip(years, options)))
+    return plans
+
+
+class TestComplianceDP:
+    """Test the DP against exhaustive plans and its policy outputs"""
+
+    def test_matches_exhaustive_search(self):
+        params = PathParams()
+        inputs = _inputs([60, 75, 90, 110, 150, 200], [70, 70, 65, 60, 60, 80])
+        policy = optimize_compliance(inputs, OPTIONS, params)
+        plans = _staged_plans(params)
+
+        for b in range(len(inputs)):
+            best = min(_plan_npv(inputs, b, path, stages, params)
+                       for path in params.paths for stages in plans)
+            assert policy.npv[b] == pytest.approx(best, rel=1e-9)
+            assert policy.path_npv[:, b].min() == pytest.approx(best, rel=1e-9)
+            # The chosen plan reproduces its own NPV
+            options = {o.name: o for o in OPTIONS}
+            stages = [(year, options[name]) for year, name in policy.stages(b)]
+            assert _plan_npv(inputs, b, policy.path[b], stages, params) == pytest.approx(best, rel=1e-9)
+            if stages:
+                assert stages[0][0] == policy.retrofit_year[b] and stages[-1][1].name == policy.option[b]
+        # Deepening later beats any single retrofit for some building here
+        assert policy.frame()['retrofit_stages'].max() > 1
+
+    def test_extension_only_where_allowed(self):
+        inputs = _inputs([150, 150], [60, 60])
+        assert optimize_compliance(inputs, OPTIONS).paths == ('standard', 'aco')
+        params = PathParams(paths=('standard', 'aco', 'extension'))
+        allowed = np.array([[True, True], [True, True], [True, False]])
+        policy = optimize_compliance(inputs, OPTIONS, params, allowed=allowed)
+        assert np.isinf(policy.path_npv[2, 1]) and policy.path[1] != 'extension'
+        assert np.isfinite(policy.decision('1')['margin'])
+        with pytest.raises(ValueError, match='allowed'):
+            optimize_compliance(inputs, OPTIONS, params, allowed=allowed[:2])
+
+    def test_compliant_and_static_cases(self):
+        policy = optimize_compliance(_inputs([50, 300], [60, 60]), OPTIONS)
+        assert policy.npv[0] == 0 and policy.option[0] == '' and policy.retrofit_year[0] == 0
+        assert policy.path[0] == 'standard'
+        # A far-off building retrofits early and never does worse than standing still
+        assert policy.option[1] != '' and policy.retrofit_year[1] <= 2026
+        assert (policy.savings_vs_static() >= -1e-6).all()
+
+    def test_penalties_and_decision(self):
+        params = PathParams(paths=('standard', 'aco'), retrofit_years=(2029,))
+        policy = optimize_compliance(_inputs(100, 70), (RetrofitOption('deep', 1.0, 0.40),), params)
+        decision = policy.decision('0')
+        assert decision['option'] == 'deep' and decision['retrofit_year'] == 2029
+        assert set(decision['path_npv']) == {'standard', 'aco'}
+        penalties = decision['penalties']
+        if decision['path'] == 'standard':
+            assert penalties[2027] == pytest.approx((100 - 70 * 1.15) * 100_000 * 0.15)
+        assert penalties[2042] == 0 and penalties[2026] == 0
+        assert policy.decision('missing') is None
+        frame = policy.frame()
+        assert {'path', 'retrofit_option', 'retrofit_year', 'standard_npv', 'aco_npv'} <= set(frame.columns)
+        assert policy.penalty_npv[0] + policy.capex_npv[0] == pytest.approx(policy.npv[0])
@@ -0,0 +1,103 @@
+"""Unit tests for degree-day change-point normalization"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from utils.degree_days import DegreeDayNormalizer, load_weather, monthly_degree_days
+
+
+@pytest.fixture(scope='module')
+def temps():
+    rng = np.random.default_rng(0)
+    days = pd.date_range('2021-01-01', '2023-12-31')
+    season = 50 - 22 * np.cos(2 * np.pi * (days.dayofyear.to_numpy() - 15) / 365)
+    return pd.Series(season + rng.normal(0, 8, len(days)), index=days)
+
+
+@pytest.fixture(scope='module')
+def normalizer(temps):
+    return DegreeDayNormalizer(temps)
+
+
+MONTHS = pd.date_range('2022-01-01', '2023-12-01', freq='MS')
+
+
+def _energy(normalizer, base, heating=(0, 60), cooling=(0, 70)):
+    """Exact monthly kBtu for baseload/day + slope x HDD(bp) + slope x CDD(bp)"""
+    days = MONTHS.days_in_month.to_numpy()
+    return (base * days + heating[0] * normalizer.hdd.loc[MONTHS, heating[1]].to_numpy()
+            + cooling[0] * normalizer.cdd.loc[MONTHS, cooling[1]].to_numpy())
+
+
+class TestDegreeDays:
+    """Test weather loading and degree-day tables"""
+
+    def test_load_weather_falls_back_to_min_max(self, tmp_path):
+        path = tmp_path / 'weather.csv'
+        pd.DataFrame({'DATE': ['2023-01-02', '2023-01-01'], 'TAVG': [np.nan, 30.0],
+                      'TMAX': [50, 40], 'TMIN': [30, 20]}).to_csv(path, index=False)
+        temps = load_weather(str(path))
+        assert temps.index.is_monotonic_increasing
+        assert temps.tolist() == [30.0, 40.0]
+
+    def test_monthly_totals(self):
+        days = pd.date_range('2023-01-01', '2023-02-28')
+        temps = pd.Series(np.where(days.month == 1, 40.0, 70.0), index=days)
+        hdd = monthly_degree_days(temps, [60, 65], 'heating')
+        cdd = monthly_degree_days(temps, [60, 65], 'cooling')
+        assert hdd.loc['2023-01-01'].tolist() == [620.0, 775.0]
+        assert hdd.loc['2023-02-01'].tolist() == [0.0, 0.0]
+        assert cdd.loc['2023-02-01'].tolist() == [280.0, 140.0]
+
+
+class TestChangePointFits:
+    """Test batched model fits against known building models"""
+
+    def test_recovers_models_and_balance_points(self, normalizer):
+        energy = np.vstack([
+            _energy(normalizer, 1000),
+            _energy(normalizer, 800, heating=(150, 58)),
+            _energy(normalizer, 600, cooling=(90, 72)),
+            _energy(normalizer, 2000, heating=(200, 54), cooling=(120, 68)),
+        ])
+        energy *= np.exp(np.random.default_rng(1).normal(0, 0.005, energy.shape))
+        fits = normalizer.fit_matrix(energy, MONTHS, ['a', 'b', 'c', 'd'])
+
+        assert fits.model.tolist() == ['2P', '3PH', '3PC', '5P']
+        assert fits.heating_balance[1] == 58 and fits.cooling_balance[2] == 72
+        assert (fits.heating_balance[3], fits.cooling_balance[3]) == (54, 68)
+        np.testing.assert_allclose(fits.baseload, [1000, 800, 600, 2000], rtol=0.02)
+        assert fits.heating_slope[3] == pytest.approx(200, rel=0.03)
+        assert fits.cooling_slope[3] == pytest.approx(120, rel=0.03)
+        assert (fits.r2[1:] > 0.99).all()
+
+    def test_normal_year_energy_and_split(self, normalizer):
+        energy = _energy(normalizer, 1000, heating=(100, 60), cooling=(50, 70))[None, :]
+        fits = normalizer.fit_matrix(energy, MONTHS, ['2952'])
+        heating = 100 * normalizer.normal_hdd[list(normalizer.heating_balance_points).index(60)]
+        cooling = 50 * normalizer.normal_cdd[list(normalizer.cooling_balance_points).index(70)]
+        total = 1000 * 365.25 + heating + cooling
+
+        assert fits.normalized_annual_kbtu[0] == pytest.approx(total, rel=1e-6)
+        assert fits.normalized_eui({'2952': 10_000})['2952'] == pytest.approx(total / 10_000, rel=1e-6)
+        split = fits.energy_split('2952')
+        assert split == pytest.approx((heating / total, cooling / total, 1000 * 365.25 / total), rel=1e-6)
+        assert fits.energy_split('missing') is None
+
+    def test_long_table_and_sparse_buildings(self, normalizer):
+        monthly = pd.DataFrame({
+            'building_id': ['1'] * len(MONTHS) + ['2'] * 4,
+            'month': list(MONTHS) + list(MONTHS[:4]),
+            'total_kbtu': list(_energy(normalizer, 500, heating=(80, 62))) + [1.0] * 4,
+        })
+        fits = normalizer.fit(monthly)
+        assert fits.building_ids.tolist() == ['1', '2']
+        assert fits.model.tolist() == ['3PH', '']
+        assert fits.months.tolist() == [len(MONTHS), 4]
+        assert np.isnan(fits.normalized_annual_kbtu[1])
+        assert fits.energy_split('2') is None
@@ -0,0 +1,106 @@
+"""Unit tests for the batched per-building EUI forecaster"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from utils.eui_forecast import EUIForecaster, history_matrix
+from utils.penalty_calculator import EnergizeDenverPenaltyCalculator
+
+
+YEARS = np.arange(2016, 2025)
+
+
+def _history(trends, noise=0.0, seed=0):
+    rng = np.random.default_rng(seed)
+    start = np.full(len(trends), 100.0)
+    eui = start[:, None] * np.exp(np.outer(trends, YEARS - YEARS[-1]))
+    return eui * np.exp(rng.normal(0, noise, eui.shape)) if noise else eui
+
+
+class TestHistoryMatrix:
+    """Test stacking the long all-years frame"""
+
+    def test_pivot_keeps_first_duplicate(self):
+        df_all = pd.DataFrame({
+            'Building ID': [7, 7, 7, 8],
+            'Reporting Year': [2022, 2023, 2023, 2023],
+            'Weather Normalized Site EUI': ['80', 70.0, 99.0, 'n/a'],
+        })
+        ids, years, eui = history_matrix(df_all)
+        assert ids.tolist() == ['7', '8'] and years.tolist() == [2022, 2023]
+        np.testing.assert_array_equal(eui[0], [80.0, 70.0])
+        assert np.isnan(eui[1]).all()
+
+
+class TestEUIForecaster:
+    """Test trend fits, shrinkage, intervals and penalty-engine hand-off"""
+
+    def test_exact_trend_recovered_without_damping(self):
+        trends = np.array([-0.03, 0.0, 0.02])
+        forecaster = EUIForecaster(damping=1.0, shrinkage=0.0, year_weights={})
+        forecast = forecaster.fit(_history(trends), YEARS, ['a', 'b', 'c'])
+
+        np.testing.assert_allclose(forecast.trend, trends, atol=1e-12)
+        expected = 100 * np.exp(np.outer(trends, np.array(forecast.years) - 2024))
+        np.testing.assert_allclose(forecast.point, expected, rtol=1e-9)
+
+    def test_damping_and_shrinkage_pull_toward_type(self):
+        # Two-year history is shrunk toward its type's well-measured trend
+        eui = _history(np.array([-0.04, -0.04, 0.05]))
+        eui[2, :-2] = np.nan
+        forecast = EUIForecaster(damping=1.0, year_weights={}).fit(
+            eui, YEARS, ['a', 'b', 'c'], property_types=['Office'] * 3)
+        assert -0.04 < forecast.trend[2] < 0.05
+        assert forecast.trend[2] < EUIForecaster(damping=1.0, year_weights={}).fit(
+            eui, YEARS, ['a', 'b', 'c'], property_types=['Office', 'Office', 'Hotel']).trend[2]
+
+        damped = EUIForecaster(damping=0.5).fit(eui, YEARS, ['a', 'b', 'c'])
+        linear = EUIForecaster(damping=1.0).fit(eui, YEARS, ['a', 'b', 'c'])
+        assert damped.at(2032)['a'] > linear.at(2032)['a']
+
+    def test_outlier_year_downweighted(self):
+        eui = _history(np.array([-0.02] * 4), noise=0.01, seed=3)
+        eui[0, 4] *= 1.8
+        forecast = EUIForecaster(shrinkage=0.0, year_weights={}).fit(eui, YEARS, list('abcd'))
+        assert forecast.trend[0] == pytest.approx(-0.02, abs=0.01)
+
+    def test_intervals_widen_with_horizon(self):
+        eui = _history(np.full(50, -0.01), noise=0.05, seed=4)
+        eui[::3, :4] = np.nan
+        forecast = EUIForecaster().fit(eui, YEARS, [str(k) for k in range(50)])
+        width = np.log(forecast.upper / forecast.lower)
+        assert (forecast.lower < forecast.point).all() and (forecast.point < forecast.upper).all()
+        assert (np.diff(width, axis=1) > 0).all()
+
+    def test_missing_history_and_hand_off(self):
+        eui = _history(np.array([-0.02, 0.0]))
+        eui[1] = np.nan
+        forecast = EUIForecaster().fit(eui, YEARS, ['a', 'b'])
+        assert forecast.actual_euis('b') == {} and forecast.actual_euis('zzz') == {}
+        assert list(forecast.eui_by_year()) == ['a']
+        frame = forecast.frame()
+        assert {'Forecast_EUI_2030', 'Forecast_EUI_2030_Low', 'Forecast_EUI_2030_High'} <= set(frame.columns)
+
+        penalties = EnergizeDenverPenaltyCalculator().calculate_all_penalties({
+            'building_id': 'a', 'sqft': 50_000, 'baseline_eui': 110.0, 'current_eui': 100.0,
+            'raw_targets': {2025: 98.0, 2027: 96.0, 2030: 90.0},
+            'actual_euis': forecast.actual_euis('a'),
+        })
+        first = penalties.iloc[0]
+        assert first['actual_eui'] == pytest.approx(forecast.at(2025)['a'])
+
+    def test_fit_history_uses_latest_property_type(self):
+        df_all = pd.DataFrame({
+            'Building ID': ['1'] * 3 + ['2'] * 3,
+            'Reporting Year': [2021, 2022, 2023] * 2,
+            'Weather Normalized Site EUI': [100, 95, 90, 60, 60, 60],
+            'Property Type': ['Office', 'Office', 'Hotel', 'Hotel', 'Hotel', 'Hotel'],
+        })
+        forecast = EUIForecaster(shrinkage=1e9).fit_history(df_all, type_col='Property Type')
+        # Infinite shrinkage: both buildings take the Hotel median trend
+        assert forecast.trend[0] == pytest.approx(forecast.trend[1])
@@ -0,0 +1,94 @@
+"""Unit tests for streaming GeoJSON / GeoParquet export and zoom tiles"""
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from analytics.geo_export import (build_zoom_tiles, point_features, read_geoparquet_points,
+                                  write_geojson, write_geoparquet)
+
+
+@pytest.fixture
+def points_df():
+    rng = np.random.default_rng(5)
+    n = 250
+    return pd.DataFrame({
+        'cluster_id': [f"cluster_{k}" for k in range(n)],
+        'longitude': -104.99 + rng.uniform(-0.05, 0.05, n),
+        'latitude': 39.74 + rng.uniform(-0.05, 0.05, n),
+        'total_sqft': rng.uniform(1e5, 1e6, n),
+        'epb_percentage': np.where(rng.random(n) < 0.1, np.nan, rng.uniform(0, 100, n)),
+    })
+
+
+class TestGeoJSONStreaming:
+    """Test incremental GeoJSON writers"""
+
+    def test_feature_collection_is_valid_json(self, points_df, tmp_path):
+        path = tmp_path / 'clusters.geojson'
+        count = write_geojson(point_features(points_df, 'longitude', 'latitude', chunk_size=40), str(path))
+
+        geojson = json.loads(path.read_text())
+        assert count == len(points_df)
+        assert geojson['type'] == 'FeatureCollection'
+        assert len(geojson['features']) == len(points_df)
+        first = geojson['features'][0]
+        assert first['geometry']['coordinates'] == pytest.approx(
+            [points_df['longitude'].iloc[0], points_df['latitude'].iloc[0]])
+        # NaN properties become null rather than invalid JSON
+        assert all(f['properties']['epb_percentage'] is None or f['properties']['epb_percentage'] >= 0
+                   for f in geojson['features'])
+
+    def test_ndjson_writes_one_feature_per_line(self, points_df, tmp_path):
+        path = tmp_path / 'clusters.geojsonl'
+        write_geojson(point_features(points_df, 'longitude', 'latitude'), str(path), ndjson=True)
+
+        lines = path.read_text().splitlines()
+        assert len(lines) == len(points_df)
+        assert json.loads(lines[-1])['properties']['cluster_id'] == points_df['cluster_id'].iloc[-1]
+
+
+class TestGeoParquet:
+    """Test GeoParquet output"""
+
+    def test_round_trip_points(self, points_df, tmp_path):
+        path = tmp_path / 'clusters.parquet'
+        written = write_geoparquet(points_df, str(path), lon_col='longitude', lat_col='latitude',
+                                   row_group_size=60)
+
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(str(path))
+        geo = json.loads(parquet_file.schema_arrow.metadata[b'geo'])
+        assert written == len(points_df)
+        assert parquet_file.num_row_groups == 5
+        assert geo['columns']['geometry']['encoding'] == 'WKB'
+
+        restored = read_geoparquet_points(str(path))
+        assert np.array_equal(restored['longitude'].to_numpy(), points_df['longitude'].to_numpy())
+        assert np.array_equal(restored['latitude'].to_numpy(), points_df['latitude'].to_numpy())
+        assert restored['cluster_id'].tolist() == points_df['cluster_id'].tolist()
+
+
+class TestZoomTiles:
+    """Test per-zoom tile aggregation"""
+
+    def test_aggregated_tiles_conserve_counts_and_sums(self, points_df, tmp_path):
+        index = build_zoom_tiles(points_df, 'longitude', 'latitude', str(tmp_path),
+                                 zooms=[10, 12, 14], sum_columns=['total_sqft'], cells_per_tile=16)
+
+        features = []
+        for root, _, files in os.walk(tmp_path / '12'):
+            for name in files:
+                features += json.loads((open(os.path.join(root, name)).read()))['features']
+
+        assert sum(f['properties']['count'] for f in features) == len(points_df)
+        assert sum(f['properties']['total_sqft'] for f in features) == pytest.approx(
+            points_df['total_sqft'].sum())
+        # Coarser zooms collapse more points per feature; the detail zoom keeps every point
+        assert index['zooms']['10']['features'] <= index['zooms']['12']['features']
+        assert index['zooms']['14']['features'] == len(points_df)
@@ -0,0 +1,128 @@
+"""Unit tests for heat source -> sink matching"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from analytics.der_clustering_analysis import BuildingProfile, DERClusterAnalyzer
+from analytics.heat_matching import HeatMatchingEngine
+from analytics.spatial_index import haversine_meters, neighbor_pairs
+
+
+def make_building(building_id, lat, lon, property_type, sqft, electric_eui, gas_eui):
+    return BuildingProfile(
+        building_id=building_id, lat=lat, lon=lon, property_type=property_type,
+        gross_floor_area=sqft, site_eui=electric_eui + gas_eui,
+        electric_eui=electric_eui, gas_eui=gas_eui, opt_in_status='Default',
+        is_epb=False, penalty_exposure=0
+    )
+
+
+class TestNeighborPairs:
+    """Test sparse neighbor search"""
+
+    def test_matches_brute_force(self):
+        rng = np.random.default_rng(7)
+        lat = 39.74 + rng.uniform(-0.02, 0.02, 300)
+        lon = -104.99 + rng.uniform(-0.02, 0.02, 300)
+
+        i, j, distance = neighbor_pairs(lat, lon, 400)
+
+        full = haversine_meters(lat[:, None], lon[:, None], lat[None, :], lon[None, :])
+        bi, bj = np.nonzero(np.triu(full <= 400, k=1))
+        assert set(zip(i.tolist(), j.tolist())) == set(zip(bi.tolist(), bj.tolist()))
+        assert np.allclose(distance, full[i, j])
+
+    def test_single_building_has_no_pairs(self):
+        i, j, distance = neighbor_pairs([39.74], [-104.99], 500)
+        assert len(i) == len(j) == len(distance) == 0
+
+
+class TestHeatMatchingEngine:
+    """Test distance-constrained heat assignment"""
+
+    def test_source_heat_goes_to_nearest_sink_first(self):
+        buildings = [
+            make_building('DC', 39.7392, -104.9903, 'Data Center', 100000, 300, 0),
+            make_building('NEAR', 39.7395, -104.9903, 'Multifamily Housing', 100000, 0, 40),
+            make_building('FAR', 39.7420, -104.9903, 'Multifamily Housing', 100000, 0, 40),
+        ]
+        engine = HeatMatchingEngine(max_distance_meters=500)
+        profiles = engine.estimate_heat_profiles(buildings)
+        matches = engine.match(profiles)
+
+        supply = 100000 * 300 * 0.85 / 1000
+        demand = 100000 * 40 * 0.80 / 1000
+        from_dc = matches[matches['source_building_id'] == 'DC'].set_index('sink_building_id')
+
+        # Sink demand caps the near match, the remainder flows to the far sink
+        assert from_dc.loc['NEAR', 'matched_mmbtu'] == pytest.approx(demand)
+        assert from_dc.loc['FAR', 'matched_mmbtu'] == pytest.approx(min(demand, supply - demand))
+
+    def test_no_matches_beyond_distance_limit(self):
+        buildings = [
+            make_building('DC', 39.7392, -104.9903, 'Data Center', 100000, 300, 0),
+            make_building('HOME', 39.7600, -104.9903, 'Multifamily Housing', 100000, 0, 40),
+        ]
+        engine = HeatMatchingEngine(max_distance_meters=500)
+        matches = engine.match(engine.estimate_heat_profiles(buildings))
+        assert matches.empty
+
+    def test_identical_buildings_do_not_trade_heat(self):
+        buildings = [
+            make_building('A', 39.7392, -104.9903, 'Office', 100000, 50, 10),
+            make_building('B', 39.7395, -104.9903, 'Office', 100000, 50, 10),
+        ]
+        engine = HeatMatchingEngine(max_distance_meters=500)
+        matches = engine.match(engine.estimate_heat_profiles(buildings))
+        assert matches.empty
+
+    def test_no_pair_has_flow_both_ways(self):
+        rng = np.random.default_rng(5)
+        n = 200
+        types = ['Data Center', 'Office', 'Hospital', 'Multifamily Housing', 'Supermarket']
+        buildings = [make_building(f"B{k}", 39.74 + rng.uniform(-0.005, 0.005),
+                                   -104.99 + rng.uniform(-0.005, 0.005), rng.choice(types),
+                                   rng.uniform(2e4, 3e5), rng.uniform(0, 200), rng.uniform(0, 80))
+                     for k in range(n)]
+        engine = HeatMatchingEngine(max_distance_meters=400, min_match_mmbtu=0, max_sinks_per_source=None)
+        profiles = engine.estimate_heat_profiles(buildings)
+        matches = engine.match(profiles)
+
+        flows = matches[matches['matched_mmbtu'] > 0]
+        pairs = set(zip(flows['source_building_id'], flows['sink_building_id']))
+        assert pairs and not any((sink, source) in pairs for source, sink in pairs)
+        assert not set(flows['source_building_id']) & set(flows['sink_building_id'])
+
+        # Exports never exceed the building's surplus over its own heat demand
+        surplus = (profiles['rejectable_heat_mmbtu'] - profiles['heat_demand_mmbtu']).clip(lower=0)
+        exported = flows.groupby('source_building_id')['matched_mmbtu'].sum()
+        assert (exported <= surplus.set_axis(profiles['building_id'])[exported.index] + 1e-6).all()
+
+    def test_cluster_summary_only_counts_internal_matches(self):
+        sample = pd.DataFrame({
+            'building_id': ['B001', 'B002', 'B003', 'B004', 'B005'],
+            'latitude': [39.7392, 39.7395, 39.7388, 39.7401, 39.7385],
+            'longitude': [-104.9903, -104.9898, -104.9910, -104.9895, -104.9915],
+            'property_type': ['Data Center', 'Office', 'Hotel', 'Hospital', 'Multifamily Housing'],
+            'gross_floor_area': [150000, 80000, 120000, 200000, 100000],
+            'most_recent_site_eui': [250, 65, 80, 180, 55],
+            'electric_eui': [200, 40, 45, 120, 25],
+            'gas_eui': [50, 25, 35, 60, 30],
+            'opt_in_recommendation': ['Opt-In', 'Default', 'Opt-In', 'Opt-In', 'Default'],
+            'is_epb': [False, False, True, False, True],
+            'total_penalties_default': [500000, 50000, 150000, 800000, 75000]
+        })
+        analyzer = DERClusterAnalyzer(max_distance_meters=500)
+        clusters_df = analyzer.analyze_clusters(sample)
+        results = analyzer.match_heat_sources(clusters_df, sample)
+
+        # Every building sits in the single cluster, so all matched heat is internal
+        assert len(clusters_df) == 1
+        assert clusters_df['matched_thermal_mmbtu'].iloc[0] == pytest.approx(
+            results['matches']['matched_mmbtu'].sum())
+        assert clusters_df['matched_thermal_mmbtu'].iloc[0] > 0
@@ -0,0 +1,114 @@
+"""Unit tests for incrementally maintained portfolio aggregates"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from utils.incremental_aggregates import IncrementalAggregates, MaxTree
+
+YEARS = (2025, 2026, 2027, 2028, 2030)
+
+
+def _scenario(penalties, types, opt_in=None, reported=YEARS):
+    n = len(types)
+    frame = pd.DataFrame({'building_id': [f'B{i}' for i in range(n)], 'property_type': types,
+                          'sqft': np.arange(1, n + 1) * 10_000.0})
+    for j, year in enumerate(YEARS):
+        if year in reported:
+            frame[f'penalty_{year}'] = penalties[:, j]
+    if opt_in is not None:
+        frame['should_opt_in'] = opt_in
+    return frame
+
+
+def _portfolio(seed=0, n=30):
+    rng = np.random.default_rng(seed)
+    types = rng.choice(['Office', 'Hotel', 'Retail Store'], n)
+    penalties = np.where(rng.random((n, len(YEARS))) < 0.5, 0.0, rng.uniform(1e3, 1e6, (n, len(YEARS))))
+    return {
+        'all_standard': _scenario(penalties, types, reported=(2025, 2027, 2030)),
+        'hybrid': _scenario(penalties * 1.5, types, opt_in=rng.random(n) < 0.3),
+    }
+
+
+def _row(frame, i, **changes):
+    row = frame.iloc[i].to_dict()
+    row.update(changes)
+    return row
+
+
+class TestMaxTree:
+    """Test the ranking tree against sorting"""
+
+    def test_top_after_updates(self):
+        rng = np.random.default_rng(1)
+        values = rng.integers(0, 50, 37).astype(float)
+        tree = MaxTree(values)
+        for _ in range(200):
+            position, value = rng.integers(0, 37), float(rng.integers(0, 50))
+            tree.update(position, value)
+            values[position] = value
+        expected = sorted(range(37), key=lambda p: (-values[p], p))
+        assert tree.top(10) == expected[:10]
+        assert tree.top(100) == expected
+        assert MaxTree(np.array([])).top(3) == []
+
+
+class TestIncrementalAggregates:
+    """Test delta updates against a fresh build"""
+
+    def test_edits_match_fresh_build(self):
+        scenarios = _portfolio()
+        aggregates = IncrementalAggregates(scenarios, years=YEARS, top_n=5)
+        rng = np.random.default_rng(2)
+        for _ in range(40):
+            i = int(rng.integers(0, 30))
+            for name, frame in scenarios.items():
+                for year in YEARS:
+                    if f'penalty_{year}' in frame.columns:
+                        frame.loc[i, f'penalty_{year}'] = float(rng.choice([0.0, rng.uniform(0, 2e6)]))
+                if 'should_opt_in' in frame.columns:
+                    frame.loc[i, 'should_opt_in'] = bool(rng.random() < 0.5)
+            aggregates.apply(f'B{i}', {name: _row(frame, i) for name, frame in scenarios.items()})
+
+        fresh = IncrementalAggregates(scenarios, years=YEARS, top_n=5)
+        for name in scenarios:
+            pd.testing.assert_series_equal(aggregates.year_totals(name), fresh.year_totals(name))
+            pd.testing.assert_series_equal(aggregates.buildings_at_risk(name), fresh.buildings_at_risk(name))
+            pd.testing.assert_frame_equal(aggregates.property_types(name, YEARS),
+                                          fresh.property_types(name, YEARS))
+            pd.testing.assert_frame_equal(aggregates.top_buildings(name), fresh.top_buildings(name))
+            assert aggregates.total_npv(name) == pytest.approx(fresh.total_npv(name))
+        assert list(aggregates.year_totals('all_standard').index) == [2025, 2027, 2030]
+
+    def test_change_report(self):
+        scenarios = _portfolio()
+        aggregates = IncrementalAggregates(scenarios, years=YEARS, top_n=3)
+        top = list(aggregates.top_buildings('hybrid')['building_id'])
+        quiet = next(f'B{i}' for i in range(30) if f'B{i}' not in top)
+        i = int(quiet[1:])
+
+        rows = {name: _row(frame, i, property_type='Data Center',
+                           **{f'penalty_{y}': 5e7 for y in YEARS})
+                for name, frame in scenarios.items()}
+        report = aggregates.apply(quiet, rows, is_mai=True)
+        assert report.rank['hybrid'] == (None, 1)
+        assert report.entered_top['hybrid'] == [quiet] and report.left_top['hybrid'] == [top[-1]]
+        assert report.property_type[1] == 'Data Center'
+        # Only reported years appear in the change table
+        assert set(report.changes.query("scenario == 'all_standard'")['year']) <= {2025, 2027, 2030}
+        assert (report.changes['penalty_after'] == 5e7).all()
+        assert report.at_risk_flips['at_risk_before'].eq(False).all()
+
+        by_type = aggregates.property_types('hybrid', (2030,))
+        assert by_type.loc['Data Center', 'total_buildings'] == 1
+        assert by_type.loc['Data Center', 'mai_count'] == 1
+        assert by_type.loc['Data Center', 'total_penalty_2030'] == 5e7
+        assert 'Building' in report.summary()
+
+        with pytest.raises(KeyError):
+            aggregates.apply('missing', rows)
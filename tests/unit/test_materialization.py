@@ -0,0 +1,143 @@
+"""Unit tests for partitioned materialization plans, run on a local SQLite database"""
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from gcp.materialization import (BigQueryEngine, MaterializedTable, SQLiteEngine, _Engine,
+                                 materialization_ddl, plan_refresh, refresh_materialized_tables)
+
+SPEC = MaterializedTable('penalty_analysis_corrected', partition_column='reporting_year')
+
+
+@pytest.fixture
+def engine():
+    connection = sqlite3.connect(':memory:')
+    connection.execute("""
+        CREATE TABLE consumption (
+            building_id TEXT, property_type TEXT, reporting_year INTEGER, eui REAL)""")
+    rows = [(f"B{k}", 'Office' if k % 2 else 'Multifamily', year, 50.0 + k)
+            for k in range(6) for year in (2022, 2023, 2024)]
+    connection.executemany("INSERT INTO consumption VALUES (?, ?, ?, ?)", rows)
+    connection.execute("""
+        CREATE VIEW penalty_analysis_corrected AS
+        SELECT building_id, property_type, reporting_year, eui, eui * 0.15 AS penalty
+        FROM consumption""")
+    return SQLiteEngine(connection)
+
+
+def _materialized(engine):
+    return engine.fetch(f"SELECT * FROM {SPEC.name} ORDER BY building_id, reporting_year")
+
+
+def _source(engine):
+    return engine.fetch(f"SELECT * FROM {SPEC.source} ORDER BY building_id, reporting_year")
+
+
+class TestIncrementalRefresh:
+    """Test that refreshes rewrite only changed partitions"""
+
+    def test_first_refresh_builds_every_partition(self, engine):
+        plans = refresh_materialized_tables(engine, [SPEC])
+
+        plan = plans[SPEC.name]
+        assert plan.rebuild
+        assert plan.changed == [2022, 2023, 2024]
+        assert _materialized(engine).equals(_source(engine))
+
+    def test_unchanged_source_plans_nothing(self, engine):
+        refresh_materialized_tables(engine, [SPEC])
+        assert plan_refresh(engine, SPEC).is_empty
+
+    def test_only_changed_partitions_are_rewritten(self, engine):
+        refresh_materialized_tables(engine, [SPEC])
+        engine.connection.execute("UPDATE consumption SET eui = 99 WHERE building_id = 'B1' "
+                                  "AND reporting_year = 2023")
+        engine.connection.execute("DELETE FROM consumption WHERE reporting_year = 2022")
+        engine.connection.commit()
+        # Mark untouched rows so a rewrite of their partition would be visible
+        engine.connection.execute(f"UPDATE {SPEC.name} SET penalty = -1 WHERE reporting_year = 2024")
+
+        plan = refresh_materialized_tables(engine, [SPEC])[SPEC.name]
+
+        assert not plan.rebuild
+        assert plan.changed == [2023]
+        assert plan.removed == [2022]
+        result = _materialized(engine)
+        assert set(result['reporting_year']) == {2023, 2024}
+        assert (result.loc[result['reporting_year'] == 2024, 'penalty'] == -1).all()
+        assert result.loc[(result['building_id'] == 'B1') & (result['reporting_year'] == 2023),
+                          'eui'].item() == 99
+        assert plan_refresh(engine, SPEC).is_empty
+
+    def test_schema_change_triggers_rebuild(self, engine):
+        refresh_materialized_tables(engine, [SPEC])
+        engine.connection.execute("DROP VIEW penalty_analysis_corrected")
+        engine.connection.execute("""
+            CREATE VIEW penalty_analysis_corrected AS
+            SELECT building_id, property_type, reporting_year, eui, eui * 0.23 AS penalty,
+                   eui > 55 AS over_target
+            FROM consumption""")
+
+        plan = refresh_materialized_tables(engine, [SPEC])[SPEC.name]
+
+        assert plan.rebuild
+        assert 'over_target' in _materialized(engine).columns
+        assert _materialized(engine).equals(_source(engine))
+
+    def test_float_partition_column_is_materialized_as_integer(self):
+        # Loaders write reporting_year as FLOAT64; the table must still partition on an integer
+        connection = sqlite3.connect(':memory:')
+        connection.execute("""
+            CREATE TABLE penalty_analysis_corrected (
+                building_id TEXT, property_type TEXT, reporting_year REAL, penalty REAL)""")
+        connection.executemany("INSERT INTO penalty_analysis_corrected VALUES (?, ?, ?, ?)",
+                               [('B1', 'Office', 2023.0, 10.0), ('B2', 'Office', 2024.0, 20.0)])
+        engine = SQLiteEngine(connection)
+
+        plan = refresh_materialized_tables(engine, [SPEC])[SPEC.name]
+
+        assert plan.changed == [2023, 2024]
+        types = {row[1]: row[2] for row in connection.execute(f"PRAGMA table_info({SPEC.name})")}
+        assert types['reporting_year'] == 'INT'
+        assert {row[0] for row in connection.execute(
+            f"SELECT typeof(reporting_year) FROM {SPEC.name}")} == {'integer'}
+        assert plan_refresh(engine, SPEC).is_empty
+
+    def test_unpartitioned_table_refreshes_as_one_unit(self, engine):
+        spec = MaterializedTable('penalty_analysis_corrected', partition_column=None)
+        assert refresh_materialized_tables(engine, [spec])[spec.name].changed == [None]
+        assert plan_refresh(engine, spec).is_empty
+
+
+class TestBigQueryDDL:
+    """Test generated BigQuery DDL"""
+
+    def test_partitioned_and_clustered(self):
+        ddl = '\n'.join(materialization_ddl(BigQueryEngine(client=None, project_id='p', dataset_id='d')))
+
+        assert "CREATE TABLE IF NOT EXISTS `p.d.penalty_analysis_corrected_materialized`" in ddl
+        assert "PARTITION BY RANGE_BUCKET(reporting_year, GENERATE_ARRAY(2015, 2041, 1))" in ddl
+        assert "CLUSTER BY property_type, building_id" in ddl
+        assert "`p.d._materialization_state`" in ddl
+        # RANGE_BUCKET needs INT64 even when the view's year is FLOAT64
+        assert ("AS SELECT * REPLACE (CAST(reporting_year AS INT64) AS reporting_year) "
+                "FROM `p.d.penalty_analysis_corrected` WHERE FALSE") in ddl
+
+    def test_refresh_inserts_cast_partition_column(self):
+        engine = BigQueryEngine(client=None, project_id='p', dataset_id='d')
+        dml = engine.refresh_dml(SPEC, ['building_id', 'reporting_year'], [2024], [],
+                                 {2024: (1, 5)}, rebuild=False)
+        assert ("SELECT building_id, CAST(reporting_year AS INT64) AS reporting_year "
+                "FROM `p.d.penalty_analysis_corrected` WHERE reporting_year IN (2024)") in dml[1]
+
+    def test_incomplete_engine_fails_on_creation(self):
+        class NoExecute(_Engine):
+            """Engine missing execute()"""
+            table = columns = fetch = create_table_sql = row_fingerprint = lambda self, *args: None
+
+        with pytest.raises(TypeError, match='execute'):
+            NoExecute()
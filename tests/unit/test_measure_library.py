@@ -0,0 +1,83 @@
+"""Unit tests for the retrofit measure library and package frontiers"""
+import itertools
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from utils.measure_library import Measure, MeasureLibrary
+
+MEASURES = (
+    Measure('envelope', 'envelope', 0.12, 12.0, excluded_types=('Data Center',)),
+    Measure('lighting', 'lighting', {'default': 0.08, 'Office': 0.10}, 3.0),
+    Measure('controls', 'controls', 0.07, 1.5),
+    Measure('dhw', 'dhw', 0.06, 2.0, eligible_types=('Hotel',)),
+    Measure('hp', 'electrification', 0.50, 25.0, conflicts=('boiler',)),
+    Measure('boiler', 'heating', 0.15, 8.0),
+    Measure('tes', 'tes', 0.05, 5.0, requires=('hp',)),
+)
+
+
+def _exhaustive(library, property_type):
+    """(cost/sqft, EUI factor) of every allowed package by direct enumeration"""
+    points = []
+    for r in range(len(library.measures) + 1):
+        for combo in itertools.combinations(library.measures, r):
+            names = {m.name for m in combo}
+            if any(not m.eligible(property_type) for m in combo):
+                continue
+            if any(set(m.requires) - names or set(m.conflicts) & names for m in combo):
+                continue
+            points.append((sum(m.cost_per_sqft for m in combo),
+                           float(np.prod([1 - m.savings_for(property_type) for m in combo]))))
+    return points
+
+
+class TestMeasureLibrary:
+    """Test package enumeration, pruning and the frontiers"""
+
+    def test_rules_prune_packages(self):
+        library = MeasureLibrary(MEASURES)
+        packages = library.packages
+        position = {name: i for i, name in enumerate(library.names)}
+        assert not (packages[:, position['tes']] & ~packages[:, position['hp']]).any()
+        assert not (packages[:, position['hp']] & packages[:, position['boiler']]).any()
+        assert len(packages) == len(_exhaustive(library, 'Hotel'))
+
+        with pytest.raises(ValueError):
+            MeasureLibrary((Measure('a', 'x', 0.1, 1.0, requires=('missing',)),))
+
+    @pytest.mark.parametrize('property_type', ['Office', 'Hotel', 'Data Center'])
+    def test_frontier_matches_exhaustive_pareto(self, property_type):
+        library = MeasureLibrary(MEASURES)
+        frontier = library.type_frontier(property_type)
+        points = _exhaustive(library, property_type)
+        # Every package is matched or beaten by a frontier point no more expensive
+        for cost, factor in points:
+            cheaper = frontier['cost_per_sqft'] <= cost + 1e-9
+            assert frontier['factor'][cheaper].min() <= factor + 1e-12
+        # Frontier points are themselves undominated and strictly improving
+        assert (np.diff(frontier['cost_per_sqft']) > 0).all()
+        assert (np.diff(frontier['factor']) < 0).all()
+        assert frontier['cost_per_sqft'][0] == 0 and frontier['factor'][0] == 1
+
+    def test_portfolio_frontiers_and_cheapest_package(self):
+        library = MeasureLibrary(MEASURES)
+        frontier = library.evaluate([100.0, 80.0, 50.0], [10_000, 20_000, 5_000],
+                                    ['Office', 'Hotel', 'Office'], ['a', 'b', 'c'])
+        table = frontier.frame()
+        assert table['building_id'].iloc[0] == 'a'
+        hotel = frontier.frontier('b')
+        assert hotel['cost'].iloc[-1] == pytest.approx(
+            library.type_frontier('Hotel')['cost_per_sqft'][-1] * 20_000)
+        assert frontier.frontier('zzz') is None
+
+        plan = frontier.cheapest_reaching(np.array([90.0, 1.0, 60.0]))
+        assert plan['meets_target'].tolist() == [True, False, True]
+        assert plan.loc[2, 'cost'] == 0 and plan.loc[2, 'measures'] == ''
+        # 10% cut for the office: lighting alone (Office savings 10%) is the cheapest way
+        assert plan.loc[0, 'measures'] == 'lighting' and plan.loc[0, 'eui_after'] == pytest.approx(90.0)
+        assert plan.loc[1, 'eui_after'] == pytest.approx(80 * library.type_frontier('Hotel')['factor'][-1])
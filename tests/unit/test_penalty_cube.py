@@ -0,0 +1,119 @@
+"""Unit tests for the building x year x path penalty cube"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from utils.penalty_cube import PenaltyCube, PenaltyMatrix
+
+
+def _scenario(path, n=50, seed=3):
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({
+        'building_id': [str(1000 + k) for k in range(n)],
+        'property_type': rng.choice(['Office', 'Hotel'], n),
+        'sqft': rng.integers(25_000, 300_000, n).astype(float),
+        'path': path,
+    })
+    # Standard reports no 2026/2028/2029 penalties; ACO reports every year
+    years = range(2025, 2043) if path == 'aco' else [y for y in range(2025, 2043)
+                                                      if y not in (2026, 2028, 2029)]
+    scale = 0.5 if path == 'aco' else 1.0
+    for year in years:
+        frame[f'penalty_{year}'] = scale * rng.uniform(0, 1, n) * (rng.uniform(0, 1, n) > 0.4) * 1e5
+    return frame
+
+
+@pytest.fixture
+def scenarios():
+    standard, aco = _scenario('standard'), _scenario('aco', seed=4)
+    aco[['property_type', 'sqft']] = standard[['property_type', 'sqft']]
+    return standard, aco
+
+
+class TestPenaltyCube:
+    """Test scenario gathers against the wide frames they replace"""
+
+    def test_single_path_matches_frame(self, scenarios):
+        standard, aco = scenarios
+        cube = PenaltyCube.from_scenarios(standard, aco)
+
+        for frame in (standard, aco):
+            matrix = cube.scenario(frame['path'].to_numpy())
+            expected = PenaltyMatrix.from_frame(frame)
+            assert matrix.years == expected.years
+            np.testing.assert_allclose(matrix.values, expected.values)
+            assert matrix.npv() == pytest.approx(expected.npv())
+        # Years the standard path never reports are not in its scenario
+        assert not cube.scenario('standard').has_year(2026)
+        assert cube.scenario('standard').total(2026) == 0
+
+    def test_mixed_paths_gather_per_building(self, scenarios):
+        standard, aco = scenarios
+        cube = PenaltyCube.from_scenarios(standard, aco)
+        choice = np.where(np.arange(len(standard)) % 3 == 0, 'aco', 'standard')
+
+        matrix = cube.scenario(choice)
+        assert matrix.has_year(2026)
+        expected_2030 = np.where(choice == 'aco', aco['penalty_2030'], standard['penalty_2030'])
+        np.testing.assert_allclose(matrix.column(2030), expected_2030)
+        assert matrix.at_risk(2030) == int((expected_2030 > 0).sum())
+        assert cube.scenario(choice) is matrix  # cached per path vector
+
+    def test_covers_checks_building_order(self, scenarios):
+        standard, aco = scenarios
+        cube = PenaltyCube.from_scenarios(standard, aco)
+        assert cube.covers(standard)
+        assert not cube.covers(standard.iloc[::-1])
+        assert not cube.covers(standard.drop(columns='path'))
+        with pytest.raises(ValueError):
+            PenaltyCube.from_scenarios(standard, aco.iloc[::-1])
+
+    def test_building_npv_matches_row_sums(self, scenarios):
+        standard, aco = scenarios
+        cube = PenaltyCube.from_scenarios(standard, aco)
+        for path, frame in (('standard', standard), ('aco', aco)):
+            expected = [sum(row[f'penalty_{y}'] / (1.07 ** (y - 2025))
+                            for y in range(2025, 2043) if f'penalty_{y}' in frame.columns)
+                        for _, row in frame.iterrows()]
+            np.testing.assert_array_equal(cube.building_npv(path), expected)
+            assert cube.building_npv(path).sum() == pytest.approx(cube.scenario(path).npv())
+        np.testing.assert_array_equal(cube.path_penalties('aco', 2028), aco['penalty_2028'])
+
+    def test_save_and_memory_mapped_load(self, scenarios, tmp_path):
+        cube = PenaltyCube.from_scenarios(*scenarios)
+        cube.save(tmp_path / 'cube')
+
+        loaded = PenaltyCube.load(tmp_path / 'cube')
+        assert isinstance(loaded.values, np.memmap)
+        assert loaded.years == cube.years and loaded.paths == cube.paths
+        assert (loaded.defined == cube.defined).all()
+        assert loaded.buildings.equals(cube.buildings)
+        assert loaded.scenario('aco').npv() == pytest.approx(cube.scenario('aco').npv())
+
+
+class TestPenaltyMatrix:
+    """Test the cached reductions"""
+
+    def test_npv_peak_and_per_sqft(self):
+        values = np.array([[100.0, 0.0, 200.0],
+                           [0.0, 0.0, 50.0]])
+        matrix = PenaltyMatrix(values, [2025, 2026, 2027], np.array([1000.0, 4000.0]))
+
+        assert matrix.npv() == pytest.approx(100 + 250 / 1.07 ** 2)
+        assert matrix.npv(through=2026) == pytest.approx(100)
+        assert matrix.peak_year() == (2027, 250.0)
+        assert matrix.penalty_per_sqft(2025) == pytest.approx(100 / 5000)
+        assert matrix.penalty_per_sqft(2025, at_risk_only=True) == pytest.approx(0.1)
+        assert matrix.at_risk(2027) == 2 and matrix.at_risk(2040) == 0
+
+    def test_from_frame_treats_missing_as_zero(self):
+        frame = pd.DataFrame({'sqft': [1.0, 2.0], 'penalty_2030': [5.0, np.nan],
+                              'penalty_2025': [np.nan, 1.0]})
+        matrix = PenaltyMatrix.from_frame(frame)
+        assert matrix.years == (2025, 2030)
+        assert matrix.total(2030) == 5.0 and matrix.total(2025) == 1.0
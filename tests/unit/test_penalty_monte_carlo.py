@@ -0,0 +1,115 @@
+"""Unit tests for the stochastic portfolio penalty engine"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from utils.penalty_calculator import PenaltyConfig
+from utils.penalty_cube import YEARS
+from utils.penalty_monte_carlo import (MonteCarloInputs, MonteCarloParams,
+                                       penalty_schedule, retrofit_hazard, run_monte_carlo)
+
+
+N = 40
+
+
+@pytest.fixture
+def portfolio():
+    rng = np.random.default_rng(5)
+    current = rng.uniform(60, 140, N)
+    return pd.DataFrame({
+        'Building ID': [str(3000 + k) for k in range(N)],
+        'Master Property Type': rng.choice(['Office', 'Hotel', 'Retail'], N),
+        'Master Sq Ft': rng.integers(25_000, 200_000, N).astype(float),
+        'Weather Normalized Site EUI': current,
+        'First Interim Target EUI': current * rng.uniform(0.85, 1.05, N),
+        'Second Interim Target EUI': current * rng.uniform(0.8, 0.95, N),
+        'Original Final Target EUI': current * rng.uniform(0.6, 0.9, N),
+        'EUI_Trend_Pct': rng.normal(-2, 5, N),
+        'Average_EUI_Recent': current * rng.uniform(0.9, 1.1, N),
+    })
+
+
+@pytest.fixture
+def inputs(portfolio):
+    paths = np.where(np.arange(N) % 4 == 0, 'aco', 'standard')
+    return MonteCarloInputs.from_frame(portfolio, paths)
+
+
+FLAT = dict(min_volatility=0.0, max_volatility=0.0, max_drift=0.0,
+            retrofit_base_hazard=0.0, retrofit_gap_hazard=0.0)
+
+
+class TestPenaltySchedule:
+    """Test the per-path target and rate schedule"""
+
+    def test_years_follow_compliance_path(self, inputs):
+        targets, rates = penalty_schedule(inputs)
+        config = PenaltyConfig()
+        years = list(YEARS)
+        standard, aco = inputs.path_codes == 0, inputs.path_codes == 1
+
+        assert (rates[years.index(2025), standard] == config.STANDARD_RATE).all()
+        assert (rates[years.index(2025), aco] == 0).all()
+        assert (rates[years.index(2028), aco] == config.ACO_RATE).all()
+        assert (rates[years.index(2031), aco] == 0).all()
+        np.testing.assert_allclose(targets[years.index(2035), standard],
+                                   inputs.final_target[standard])
+        assert np.isinf(targets[years.index(2026)]).all()
+
+    def test_hazard_rises_with_target_gap(self, inputs):
+        hazard = retrofit_hazard(inputs, MonteCarloParams())
+        gap = (inputs.current_eui - inputs.final_target) / inputs.current_eui
+        assert (np.diff(hazard[np.argsort(gap)]) >= -1e-12).all()
+        assert (retrofit_hazard(inputs, MonteCarloParams(**FLAT)) == 0).all()
+
+
+class TestRunMonteCarlo:
+    """Test simulation results and risk measures"""
+
+    def test_flat_model_reproduces_deterministic_penalties(self, inputs):
+        result = run_monte_carlo(inputs, n_paths=5, params=MonteCarloParams(**FLAT), workers=1)
+        targets, rates = penalty_schedule(inputs)
+        expected = (np.maximum(inputs.current_eui - targets, 0) * rates * inputs.sqft).sum(axis=1)
+
+        np.testing.assert_allclose(result.yearly, np.tile(expected, (5, 1)), rtol=1e-5, atol=1.0)
+        discount = 1.07 ** -(np.array(YEARS) - 2025)
+        assert result.npv == pytest.approx(np.full(5, (expected * discount).sum()), rel=1e-5)
+
+    def test_results_independent_of_workers_and_repeatable(self, inputs):
+        single = run_monte_carlo(inputs, n_paths=60, chunk_size=16, workers=1, seed=7)
+        pooled = run_monte_carlo(inputs, n_paths=60, chunk_size=16, workers=2, seed=7)
+        np.testing.assert_array_equal(single.npv, pooled.npv)
+        np.testing.assert_array_equal(single.tail_building_npv, pooled.tail_building_npv)
+        other = run_monte_carlo(inputs, n_paths=60, chunk_size=16, workers=1, seed=8)
+        assert not np.array_equal(single.npv, other.npv)
+
+    def test_var_cvar_and_yearly_distribution(self, inputs):
+        result = run_monte_carlo(inputs, n_paths=400, workers=1)
+        assert result.cvar() >= result.var() >= np.median(result.npv)
+
+        table = result.yearly_distribution()
+        assert table['year'].tolist() == list(YEARS)
+        assert {'mean', 'p5', 'p50', 'p95', 'var_95', 'cvar_95'} <= set(table.columns)
+        assert (table['cvar_95'] >= table['var_95']).all()
+        assert (table['p95'] >= table['p5']).all()
+
+    def test_tail_drivers(self, inputs):
+        result = run_monte_carlo(inputs, n_paths=200, workers=1)
+        drivers = result.tail_drivers(top=N)
+        assert drivers['tail_npv'].is_monotonic_decreasing
+        assert drivers['tail_share'].sum() == pytest.approx(1.0)
+        # Tail paths are the costly ones, so buildings on average cost more there
+        assert drivers['tail_npv'].sum() >= drivers['mean_npv'].sum()
+
+        untracked = run_monte_carlo(inputs, n_paths=20, workers=1, tail_attribution=False)
+        with pytest.raises(ValueError):
+            untracked.tail_drivers()
+
+    def test_invalid_correlations_rejected(self):
+        with pytest.raises(ValueError):
+            MonteCarloParams(market_correlation=0.6, type_correlation=0.5)
@@ -0,0 +1,138 @@
+"""Unit tests for the precomputed scenario penalty rollup"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from utils.penalty_rollup import PenaltyRollup, rollup_dimensions
+
+
+N = 300
+
+
+@pytest.fixture
+def portfolio():
+    rng = np.random.default_rng(11)
+    return pd.DataFrame({
+        'Building ID': [str(2000 + k) for k in range(N)],
+        'Is EPB': rng.choice(['Yes', 'No', None], N),
+        'zip_code': rng.choice([80202.0, 80205.0, np.nan], N),
+        'is_mai': rng.random(N) < 0.1,
+    })
+
+
+def _scenario(portfolio, opt_in, seed):
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({
+        'building_id': portfolio['Building ID'],
+        'property_type': np.random.default_rng(0).choice(['Office', 'Hotel', 'Retail'], N),
+        'sqft': np.random.default_rng(1).integers(25_000, 300_000, N).astype(float),
+        'is_mai': portfolio['is_mai'],
+    })
+    for year in (2025, 2027, 2030, 2032):
+        frame[f'penalty_{year}'] = rng.uniform(0, 1e5, N) * (rng.random(N) > 0.5)
+    if opt_in:
+        frame['should_opt_in'] = rng.random(N) < 0.3
+        frame['npv_advantage'] = rng.normal(0, 1e4, N)
+        frame['penalty_2028'] = np.where(frame['should_opt_in'], rng.uniform(0, 1e5, N), np.nan)
+    return frame
+
+
+@pytest.fixture
+def scenarios(portfolio):
+    return {'all_standard': _scenario(portfolio, False, 2), 'hybrid': _scenario(portfolio, True, 3)}
+
+
+class TestRollupDimensions:
+    """Test building-level dimension extraction"""
+
+    def test_epb_and_zip_labels(self, portfolio):
+        dims = rollup_dimensions(portfolio)
+        assert dims.index.tolist() == portfolio['Building ID'].tolist()
+        assert dims['is_epb'].sum() == (portfolio['Is EPB'] == 'Yes').sum()
+        assert set(dims['zip_code']) == {'80202', '80205', 'Unknown'}
+
+    def test_missing_columns_default(self):
+        dims = rollup_dimensions(pd.DataFrame({'Building ID': ['1', '2']}))
+        assert not dims['is_epb'].any()
+        assert (dims['zip_code'] == 'Unknown').all()
+
+
+class TestPenaltyRollup:
+    """Test rollup queries against direct groupbys of the scenario frames"""
+
+    def test_property_type_sums_match_groupby(self, scenarios, portfolio):
+        rollup = PenaltyRollup.build(scenarios, rollup_dimensions(portfolio))
+        hybrid = scenarios['hybrid']
+        expected = hybrid.groupby('property_type').agg(
+            total_buildings=('building_id', 'count'), opt_in_rate=('should_opt_in', 'mean'),
+            avg_npv_advantage=('npv_advantage', 'mean'), total_penalty_2030=('penalty_2030', 'sum'),
+            total_sqft=('sqft', 'sum'))
+
+        table = rollup.drill_down('property_type', years=(2030,), scenario='hybrid')
+        pd.testing.assert_frame_equal(table[expected.columns], expected, check_dtype=False,
+                                      check_names=False)
+
+    def test_slices_chain(self, scenarios, portfolio):
+        dims = rollup_dimensions(portfolio)
+        rollup = PenaltyRollup.build(scenarios, dims)
+        hybrid = scenarios['hybrid']
+        epb = dims.loc[hybrid['building_id'], 'is_epb'].to_numpy()
+        mask = hybrid['is_mai'].to_numpy() & epb
+
+        mai_epb = rollup.slice(scenario='hybrid').slice(is_mai=True, is_epb=True)
+        assert mai_epb.buildings() == mask.sum()
+        assert mai_epb.penalty(2030) == pytest.approx(hybrid.loc[mask, 'penalty_2030'].sum())
+        assert mai_epb.at_risk(2032) == (hybrid.loc[mask, 'penalty_2032'] > 0).sum()
+        by_zip = rollup.slice(scenario='hybrid').query('zip_code', ['buildings'])
+        assert by_zip['buildings'].sum() == N
+
+    def test_unreported_years_and_opt_in(self, scenarios):
+        rollup = PenaltyRollup.build(scenarios)
+        standard, hybrid = rollup.slice(scenario='all_standard'), rollup.slice(scenario='hybrid')
+        assert not standard.has_year(2028) and hybrid.has_year(2028)
+        assert standard.penalty(2028) == 0 and standard.at_risk(2028) == 0
+        assert not standard.has_opt_in
+        assert hybrid.opt_in_rate() == pytest.approx(scenarios['hybrid']['should_opt_in'].mean())
+        # Missing (NaN) penalties count as no penalty
+        assert hybrid.at_risk(2028) == (scenarios['hybrid']['penalty_2028'] > 0).sum()
+
+    def test_npv_and_per_sqft(self, scenarios):
+        frame = scenarios['all_standard']
+        scenario = PenaltyRollup.build(scenarios).slice(scenario='all_standard')
+        expected = sum(frame[f'penalty_{y}'].sum() / 1.07 ** (y - 2025) for y in (2025, 2027, 2030))
+        assert scenario.npv(through=2030) == pytest.approx(expected)
+
+        at_risk = frame[frame['penalty_2030'] > 0]
+        assert scenario.penalty_per_sqft(2030, at_risk_only=True) == pytest.approx(
+            at_risk['penalty_2030'].sum() / at_risk['sqft'].sum())
+        assert scenario.penalty_per_sqft(2030) == pytest.approx(
+            frame['penalty_2030'].sum() / frame['sqft'].sum())
+
+    def test_recognises_source_frames(self, scenarios):
+        rollup = PenaltyRollup.build(scenarios)
+        assert rollup.covers(scenarios)
+        assert rollup.scenario_name(scenarios['hybrid']) == 'hybrid'
+        assert rollup.scenario_name(scenarios['hybrid'].copy()) == 'hybrid'
+        assert not rollup.covers({**scenarios, 'extra': scenarios['hybrid'].copy()})
+        assert not rollup.covers(scenarios, version='v2')
+        # Only fingerprints are kept, not references to the frames
+        assert all(isinstance(f, str) for f in rollup.fingerprints.values())
+
+        # An in-place edit is not served from the rollup built before it
+        scenarios['hybrid'].loc[scenarios['hybrid'].index[0], 'penalty_2030'] += 1.0
+        assert not rollup.covers(scenarios)
+        assert rollup.scenario_name(scenarios['hybrid']) is None
+        with pytest.raises(KeyError):
+            rollup.slice(city='Denver')
+
+    def test_time_series_lists_reported_years(self, scenarios):
+        series = PenaltyRollup.build(scenarios).time_series()
+        standard = series[series['scenario'] == 'all_standard']
+        assert standard['year'].tolist() == [2025, 2027, 2030, 2032]
+        assert standard['total_penalty'].iloc[0] == pytest.approx(
+            scenarios['all_standard']['penalty_2025'].sum())
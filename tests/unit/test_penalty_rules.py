@@ -0,0 +1,145 @@
+"""Unit tests for the declarative penalty rules and their compiled plan"""
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from utils.penalty_calculator import EnergizeDenverPenaltyCalculator, PenaltyConfig
+from utils.penalty_plan import PenaltyPlan, default_plan
+from utils.penalty_rules import RULES_PATH, load_rules
+
+
+def _building(eui=100.0, sqft=50_000.0, **actual_euis):
+    return {'sqft': sqft, 'current_eui': eui, 'first_interim_target': 90.0,
+            'second_interim_target': 80.0, 'final_target': 60.0,
+            'actual_euis': {int(year[1:]): value for year, value in actual_euis.items()}}
+
+
+def _edited_rules(tmp_path, edit):
+    with open(RULES_PATH) as f:
+        data = json.load(f)
+    edit(data)
+    path = tmp_path / 'rules.json'
+    path.write_text(json.dumps(data))
+    return load_rules(str(path))
+
+
+class TestRuleTable:
+    """Test the rules file and the modules that read it"""
+
+    def test_defaults_feed_existing_config(self):
+        rules = load_rules()
+        config = PenaltyConfig()
+        assert (config.STANDARD_RATE, config.ACO_RATE, config.EXTENSION_RATE) == (0.15, 0.23, 0.35)
+        assert config.STANDARD_TARGET_YEARS == [2025, 2027, 2030]
+        assert config.ACO_TARGET_YEARS == [2028, 2032]
+        assert EnergizeDenverPenaltyCalculator().get_target_years('extension') == [2030]
+        assert rules.normalized_years()['aco'] == {'first_interim': 2028, 'final': 2032}
+        assert rules.years == tuple(range(2025, 2043))
+
+    def test_validation(self, tmp_path):
+        with pytest.raises(ValueError, match='unknown target'):
+            _edited_rules(tmp_path, lambda d: d['paths']['aco']['targets'].append({'year': 2030, 'target': 'x'}))
+        with pytest.raises(ValueError, match='horizon'):
+            _edited_rules(tmp_path, lambda d: d['horizon'].update(last_year=2030))
+        with pytest.raises(ValueError, match='Unknown compliance path'):
+            load_rules().rate('bogus')
+
+    def test_rule_edit_propagates(self, tmp_path):
+        def edit(data):
+            data['paths']['aco']['rate'] = 0.30
+            data['paths']['aco']['targets'][1]['year'] = 2031
+            data['target_caps']['max_reduction_pct'] = 0.50
+        plan = PenaltyPlan(_edited_rules(tmp_path, edit))
+        penalties = plan.building_penalties('aco', _building())
+        assert penalties['2031'] == pytest.approx(40 * 50_000 * 0.30)
+        assert penalties['2030'] == 0 and penalties['2042'] == penalties['2031']
+        assert plan.final_targets([40.0], [100.0], [False])[0] == pytest.approx(50.0)
+        assert '0.3 as rate_aco_used' in plan.sql_penalty_columns(
+            {'first_interim': 'g1', 'second_interim': 'g2', 'final': 'g3'}, 'sqft', paths=('aco',))
+
+    def test_rule_edit_reaches_views(self, tmp_path, monkeypatch):
+        import gcp.regenerate_bigquery_views as views
+        import gcp.regenerate_bigquery_views_fixed as views_fixed
+
+        def edit(data):
+            data['discount_rate'] = 0.05
+            data['paths']['standard']['targets'][0]['year'] = 2026
+            data['paths']['aco']['targets'][1]['year'] = 2031
+        plan = PenaltyPlan(_edited_rules(tmp_path, edit))
+        assert plan.sql_npv('aco') == 'penalty_2028_aco / POWER(1.05, 4) + penalty_2031_aco / POWER(1.05, 7)'
+
+        for module in (views, views_fixed):
+            monkeypatch.setattr(module, 'PENALTY_PLAN', plan)
+            regenerator = module.BigQueryViewRegenerator.__new__(module.BigQueryViewRegenerator)
+            regenerator.dataset_ref = 'proj.ds'
+            sql = (regenerator.corrected_penalty_view_query() + regenerator.opt_in_decision_view_query()
+                   + regenerator.building_2952_query())
+            assert 'penalty_2026_standard > 100000' in sql and 'penalty_2031_aco,' in sql
+            assert 'penalty_2031_aco / POWER(1.05, 7)' in sql and 'Already meets 2026 target' in sql
+            assert not any(f'penalty_{year}' in sql for year in (2025, 2032))
+            assert '1.07' not in sql
+
+
+class TestPenaltyPlan:
+    """Test the compiled plan against the scalar calculator"""
+
+    def test_building_penalties(self):
+        plan = default_plan()
+        standard = plan.building_penalties('standard', _building(y2027=85.0))
+        assert sorted(standard) == ['2025', '2027'] + [str(y) for y in range(2030, 2043)]
+        assert standard['2025'] == pytest.approx(10 * 50_000 * 0.15)
+        assert standard['2027'] == pytest.approx(5 * 50_000 * 0.15)
+        assert standard['2042'] == standard['2030'] == pytest.approx(40 * 50_000 * 0.15)
+
+        aco = plan.building_penalties('aco', _building(), rate=0.5)
+        assert len(aco) == 18 and aco['2025'] == 0 and aco['2031'] == 0
+        assert aco['2028'] == pytest.approx(10 * 50_000 * 0.5)
+
+        extension = plan.building_penalties('extension', _building(eui=50.0))
+        assert set(extension.values()) == {0}
+
+    def test_vector_schedule_matches_building_penalties(self):
+        plan = default_plan()
+        rng = np.random.default_rng(3)
+        n = 40
+        eui, sqft = rng.uniform(40, 160, n), rng.uniform(25_000, 200_000, n)
+        first, second, final = (rng.uniform(60, 120, n) for _ in range(3))
+        paths = rng.choice(plan.paths, n)
+        yearly = plan.penalties(eui, sqft, first, second, final, plan.path_codes(paths))
+        for b in range(n):
+            expected = plan.building_penalties(paths[b], {
+                'sqft': sqft[b], 'current_eui': eui[b], 'first_interim_target': first[b],
+                'second_interim_target': second[b], 'final_target': final[b]})
+            for year, penalty in expected.items():
+                assert yearly[int(year) - 2025, b] == pytest.approx(penalty)
+
+    def test_final_targets_match_calculator(self):
+        plan = default_plan()
+        calc = EnergizeDenverPenaltyCalculator()
+        raw = np.array([30.0, 80.0, 40.0, 20.0, 60.0])
+        baseline = np.array([100.0, 90.0, 60.0, 70.0, 200.0])
+        is_mai = np.array([False, False, True, True, True])
+        mai_adjusted = np.array([np.nan, np.nan, 55.0, np.nan, 150.0])
+        expected = [calc.apply_target_caps_and_floors(r, b, m, None if np.isnan(a) else a)
+                    for r, b, m, a in zip(raw, baseline, is_mai, mai_adjusted)]
+        np.testing.assert_allclose(plan.final_targets(raw, baseline, is_mai, mai_adjusted), expected)
+
+    def test_sql(self):
+        plan = default_plan()
+        assert plan.sql_covered('gfa') == 'gfa >= 25000'
+
+        columns = plan.sql_penalty_columns(
+            {'first_interim': 'gap_first', 'second_interim': 'gap_second', 'final': 'gap_final'},
+            'gross_floor_area', paths=('standard', 'aco'),
+            conditions={('standard', 2025): 'first_target_year = 2025'})
+        assert columns[0] == ('CASE WHEN first_target_year = 2025 AND gap_first > 0 '
+                              'THEN gap_first * gross_floor_area * 0.15 ELSE 0 END as penalty_2025_standard')
+        names = [c.rsplit(' as ', 1)[1] for c in columns]
+        assert names == ['penalty_2025_standard', 'penalty_2027_standard', 'penalty_2030_standard',
+                         'penalty_2028_aco', 'penalty_2032_aco', 'total_penalties_standard',
+                         'total_penalties_aco', 'rate_standard_used', 'rate_aco_used']
@@ -0,0 +1,101 @@
+"""Unit tests for the portfolio risk analyzer's scenarios on a small synthetic portfolio"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('matplotlib')
+pytest.importorskip('seaborn')
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from analysis.portfolio_risk_analyzer import PortfolioRiskAnalyzer
+
+
+@pytest.fixture
+def analyzer(tmp_path, n=40, seed=7):
+    rng = np.random.default_rng(seed)
+    ids = [str(200000 + k) for k in range(n)]
+    baseline = rng.uniform(60, 200, n).round(1)
+    current = pd.DataFrame({
+        'Building ID': ids,
+        'Building Name': [f'Bldg {k}' for k in range(n)],
+        'Master Property Type': rng.choice(['Office', 'Hotel', 'Retail Store'], n),
+        'Master Sq Ft': rng.integers(30_000, 400_000, n).astype(float),
+        'Weather Normalized Site EUI': (baseline * rng.uniform(0.8, 1.1, n)).round(1),
+        'Year Built': rng.integers(1920, 2015, n),
+    })
+    targets = pd.DataFrame({
+        'Building ID': ids,
+        'Baseline EUI': baseline,
+        'First Interim Target EUI': (baseline * 0.9).round(1),
+        'Second Interim Target EUI': (baseline * 0.8).round(1),
+        'Original Final Target EUI': (baseline * 0.6).round(1),
+        'Adjusted Final Target EUI': (baseline * 0.65).round(1),
+        'Baseline Year': 2019,
+        'First Interim Target Year': rng.choice([2024, 2025, 2026], n),
+        'Second Interim Target Year': rng.choice([2027, 2028], n),
+    })
+    os.makedirs(tmp_path / 'processed')
+    os.makedirs(tmp_path / 'raw')
+    current.to_csv(tmp_path / 'processed' / 'energize_denver_comprehensive_latest.csv', index=False)
+    targets.to_csv(tmp_path / 'raw' / 'Building_EUI_Targets.csv', index=False)
+    return PortfolioRiskAnalyzer(str(tmp_path))
+
+
+class TestCompliancePolicyScenario:
+    """Test the hybrid scenario driven by an optimized compliance policy"""
+
+    def test_optimized_hybrid_beats_single_paths(self, analyzer):
+        policy = analyzer.optimize_compliance_paths()
+        analyzer.use_compliance_policy(policy)
+        scenarios = analyzer.analyze_all_scenarios()
+        npv = {name: analyzer.penalty_matrix(frame).npv() for name, frame in scenarios.items()}
+
+        assert npv['hybrid'] <= npv['all_standard'] and npv['hybrid'] <= npv['all_aco']
+        # The hybrid carries the planned penalties, with the retrofits installed
+        assert npv['hybrid'] == pytest.approx(policy.penalty_npv.sum())
+        hybrid = scenarios['hybrid']
+        assert (hybrid['path'].astype(str).to_numpy() == policy.path).all()
+        assert (hybrid['retrofit_option'].astype(str).to_numpy() == policy.option).all()
+
+
+def _frames_equal(left, right):
+    assert left.keys() == right.keys()
+    for name in left:
+        pd.testing.assert_frame_equal(left[name], right[name])
+
+
+class TestParallelAnalysis:
+    """Test that process-parallel runs match the sequential ones"""
+
+    def test_workers_give_identical_results(self, analyzer):
+        state = np.random.get_state()
+        sequential = analyzer.analyze_all_scenarios(workers=1)
+        parallel = analyzer.analyze_all_scenarios(workers=2)
+        _frames_equal(sequential, parallel)
+        # Building the scenarios draws nothing from numpy's global generator
+        assert all(np.array_equal(a, b) for a, b in zip(np.random.get_state(), state))
+
+        np.random.seed(5)
+        first = analyzer.run_analyses(sequential, workers=1)
+        after_sequential = np.random.get_state()
+        np.random.seed(5)
+        second = analyzer.run_analyses(sequential, workers=2)
+        _frames_equal(first['sensitivity'], second['sensitivity'])
+        _frames_equal(first['property_types'], second['property_types'])
+        pd.testing.assert_frame_equal(first['time_series'], second['time_series'])
+        # The global generator ends where the sequential draws left it
+        assert all(np.array_equal(a, b) for a, b in zip(np.random.get_state(), after_sequential))
+
+    def test_update_building_refreshes_shared_inputs(self, analyzer):
+        scenarios = analyzer.analyze_all_scenarios(workers=2)
+        analyzer.start_incremental(scenarios)
+        building_id = analyzer.building_inputs[3]['building_id']
+
+        analyzer.update_building(building_id, current_eui=55.0)
+        assert analyzer.building_inputs[3]['current_eui'] == pytest.approx(55.0)
+        risk = analyzer.building_risk()
+        assert risk.loc[risk['building_id'] == building_id, 'current_eui'].item() == pytest.approx(55.0)
@@ -0,0 +1,124 @@
+"""Unit tests for the typed, column-projected portfolio frames"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from utils.portfolio_schema import (base_frame, compact, fork, frame_memory, load_portfolio_frame,
+                                    number, scenario_frame)
+
+
+@pytest.fixture
+def csv_files(tmp_path):
+    rng = np.random.default_rng(5)
+    n = 400
+    ids = [str(5000 + k) for k in range(n)]
+    current = pd.DataFrame({
+        'Building ID': ids,
+        'Building Name': [f"Building {k}" for k in range(n)],
+        'Master Property Type': rng.choice(['Office', 'Hotel', 'Multifamily Housing'], n),
+        'Master Sq Ft': rng.integers(10_000, 400_000, n).astype(float),
+        'Weather Normalized Site EUI': rng.uniform(30, 150, n).round(1),
+        'Year Built': rng.integers(1920, 2015, n),
+    })
+    # Wide, unused text columns like the comprehensive export carries
+    for j in range(60):
+        current[f'Unused Field {j}'] = rng.choice(['some long descriptive value', 'another value'], n)
+    baseline = rng.uniform(60, 160, n).round(1)
+    targets = pd.DataFrame({
+        'Building ID': ids[:-10],
+        'Master Property Type': 'from targets',
+        'Baseline EUI': baseline[:-10],
+        'First Interim Target EUI': (baseline * 0.9).round(1)[:-10],
+        'Second Interim Target EUI': (baseline * 0.8).round(1)[:-10],
+        'Original Final Target EUI': (baseline * 0.6).round(1)[:-10],
+        'First Interim Target Year': rng.choice([2024, 2025, 2026], n - 10),
+        'Target Notes': 'unused',
+    })
+    current_path, targets_path = tmp_path / 'current.csv', tmp_path / 'targets.csv'
+    current.to_csv(current_path, index=False)
+    targets.to_csv(targets_path, index=False)
+    return current_path, targets_path
+
+
+def _rows(base, path='standard'):
+    return [{'building_id': b, 'property_type': t, 'sqft': float(s), 'path': path,
+             'normalized_first_year': 2025, 'penalty_2025': float(s) * 0.15, 'penalty_2026': 0}
+            for b, t, s in zip(base['building_id'], base['property_type'], base['sqft'])]
+
+
+class TestPortfolioFrame:
+    """Test projection, typing and the memory saving"""
+
+    def test_projects_and_types_columns(self, csv_files):
+        portfolio = load_portfolio_frame(*csv_files)
+
+        assert len(portfolio) == 390  # inner join
+        assert not any(c.startswith('Unused') or c == 'Target Notes' for c in portfolio.columns)
+        assert isinstance(portfolio['Master Property Type'].dtype, pd.CategoricalDtype)
+        assert portfolio['Weather Normalized Site EUI'].dtype == np.float32
+        assert portfolio['First Interim Target Year'].dtype == 'Int16'
+        # Shared columns come from the comprehensive file, as with suffixes=('', '_targets')
+        assert 'from targets' not in set(portfolio['Master Property Type'])
+
+    def test_severalfold_smaller_than_wide_merge(self, csv_files):
+        current_path, targets_path = csv_files
+        current, targets = pd.read_csv(current_path), pd.read_csv(targets_path)
+        current['Building ID'] = current['Building ID'].astype(str)
+        targets['Building ID'] = targets['Building ID'].astype(str)
+        wide = pd.merge(current, targets, on='Building ID', how='inner', suffixes=('', '_targets'))
+
+        typed = load_portfolio_frame(*csv_files)
+        assert frame_memory(wide) > 5 * frame_memory(typed)
+
+    def test_number_recovers_source_decimals(self, csv_files):
+        portfolio = load_portfolio_frame(*csv_files)
+        source = pd.read_csv(csv_files[0])
+        eui = [number(v) for v in portfolio['Weather Normalized Site EUI']]
+        assert eui == source['Weather Normalized Site EUI'].iloc[:390].tolist()
+        assert np.isnan(number(pd.NA)) and number(None, 0.0) == 0.0
+        assert number(0.1) == 0.1  # float64 values pass through
+
+    def test_compact_drops_filtered_categories(self, csv_files):
+        portfolio = load_portfolio_frame(*csv_files)
+        offices = compact(portfolio[portfolio['Master Property Type'] == 'Office'])
+        assert list(offices['Master Property Type'].cat.categories) == ['Office']
+        assert offices.index.equals(pd.RangeIndex(len(offices)))
+
+
+class TestScenarioFrames:
+    """Test base-frame sharing between scenarios and their variants"""
+
+    def test_scenarios_share_base_columns(self, csv_files):
+        base = base_frame(compact(load_portfolio_frame(*csv_files)))
+        standard = scenario_frame(base, _rows(base))
+        aco = scenario_frame(base, _rows(base, 'aco'))
+
+        assert list(standard.columns[:3]) == ['building_id', 'property_type', 'sqft']
+        assert np.shares_memory(standard['sqft'].to_numpy(), aco['sqft'].to_numpy())
+        assert isinstance(standard['path'].dtype, pd.CategoricalDtype)
+        assert standard['normalized_first_year'].dtype == 'Int16'
+        assert standard['penalty_2026'].dtype == np.float64
+        assert standard['penalty_2025'].sum() == pytest.approx(base['sqft'].astype(float).sum() * 0.15)
+
+    def test_rows_must_follow_base_order(self, csv_files):
+        base = base_frame(load_portfolio_frame(*csv_files))
+        with pytest.raises(ValueError):
+            scenario_frame(base, _rows(base)[::-1])
+        with pytest.raises(ValueError):
+            scenario_frame(base, _rows(base)[1:])
+
+    def test_fork_copies_only_changed_columns(self, csv_files):
+        base = base_frame(load_portfolio_frame(*csv_files))
+        hybrid = scenario_frame(base, _rows(base))
+        variant = fork(hybrid, ['path', 'penalty_2025'])
+
+        variant.loc[0, 'path'] = 'aco'
+        variant.loc[0, 'penalty_2025'] = 0.0
+        assert hybrid.loc[0, 'path'] == 'standard' and hybrid.loc[0, 'penalty_2025'] > 0
+        assert list(variant.columns) == list(hybrid.columns)
+        assert np.shares_memory(variant['sqft'].to_numpy(), hybrid['sqft'].to_numpy())
@@ -0,0 +1,130 @@
+"""Unit tests for the on-disk BigQuery result cache"""
+import os
+import sys
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from utils.local_gcp_bridge import LocalGCPBridge
+from utils.query_cache import QueryCache, normalize_sql
+
+
+class FakeClient:
+    """Counts queries; tables carry a settable modification time"""
+
+    def __init__(self):
+        self.project = 'p'
+        self.queries = []
+        self.tables = {
+            'p.d.base': SimpleNamespace(modified=datetime(2025, 1, 1, tzinfo=timezone.utc),
+                                        table_type='TABLE', view_query=None),
+            'p.d.summary_view': SimpleNamespace(modified=datetime(2025, 1, 1, tzinfo=timezone.utc),
+                                                table_type='VIEW',
+                                                view_query='SELECT * FROM `p.d.base`'),
+        }
+
+    def get_table(self, table_id):
+        return self.tables[table_id]
+
+    def query(self, sql, job_config=None):
+        self.queries.append((sql, job_config))
+        frame = pd.DataFrame({'building_id': ['1', '2'], 'value': [1.5, 2.5]})
+        return SimpleNamespace(to_dataframe=lambda: frame)
+
+
+@pytest.fixture
+def client():
+    return FakeClient()
+
+
+class TestQueryCache:
+    """Test keys, invalidation and eviction"""
+
+    def test_repeat_query_hits_disk(self, client, tmp_path):
+        cache = QueryCache(str(tmp_path))
+        first = cache.query(client, "SELECT * FROM `p.d.base`")
+        # Formatting and comments do not change the key
+        second = cache.query(client, "SELECT *   -- all columns\n  FROM `p.d.base`")
+
+        assert len(client.queries) == 1
+        assert cache.hits == 1
+        pd.testing.assert_frame_equal(first, second)
+
+    def test_refresh_and_source_changes_requery(self, client, tmp_path):
+        cache = QueryCache(str(tmp_path), metadata_ttl=0)
+        sql = "SELECT * FROM `p.d.summary_view`"
+        cache.query(client, sql)
+        cache.query(client, sql, refresh=True)
+        assert len(client.queries) == 2
+
+        # New data in the view's source table invalidates the cached result
+        client.tables['p.d.base'].modified = datetime(2025, 2, 1, tzinfo=timezone.utc)
+        cache.query(client, sql)
+        assert len(client.queries) == 3
+        cache.query(client, sql)
+        assert len(client.queries) == 3
+
+    def test_dataset_table_references_use_default_project(self, client, tmp_path):
+        cache = QueryCache(str(tmp_path), metadata_ttl=0)
+        client.tables['p.d.short_view'] = SimpleNamespace(
+            modified=datetime(2025, 1, 1, tzinfo=timezone.utc), table_type='VIEW',
+            view_query='SELECT * FROM `d.base`')
+        sql = "SELECT * FROM `d.short_view`"
+        cache.query(client, sql)
+        cache.query(client, sql)
+        assert len(client.queries) == 1
+
+        # The view's unqualified source is tracked too
+        client.tables['p.d.base'].modified = datetime(2025, 2, 1, tzinfo=timezone.utc)
+        cache.query(client, sql)
+        assert len(client.queries) == 2
+
+    def test_parameters_are_part_of_the_key(self, client, tmp_path):
+        cache = QueryCache(str(tmp_path))
+        sql = "SELECT * FROM `p.d.base` WHERE value > @threshold"
+        cache.query(client, sql, params={'threshold': 1})
+        cache.query(client, sql, params={'threshold': 2})
+        cache.query(client, sql, params={'threshold': 1})
+
+        assert len(client.queries) == 2
+        assert client.queries[0][1].query_parameters[0].type_ == 'INT64'
+
+    def test_lru_eviction_keeps_recent_results(self, client, tmp_path):
+        cache = QueryCache(str(tmp_path))
+        for k in range(3):
+            cache.query(client, f"SELECT {k} FROM `p.d.base`")
+        size = os.path.getsize(next(tmp_path.glob('*.parquet')))
+
+        # Room for two results: the oldest one goes
+        cache.max_bytes = 2 * size
+        oldest = sorted(tmp_path.glob('*.parquet'))[0]
+        os.utime(oldest, (0, 0))
+        cache.evict()
+        assert len(list(tmp_path.glob('*.parquet'))) == 2
+        assert not oldest.exists()
+
+    def test_normalize_sql_keeps_string_literals(self):
+        assert normalize_sql("SELECT  'a  -- b'  --c\n FROM t") == "SELECT 'a  -- b' FROM t"
+
+
+class TestBridgeCache:
+    """Test LocalGCPBridge routing through the cache"""
+
+    def test_bridge_methods_use_cache(self, client, tmp_path):
+        bridge = LocalGCPBridge.__new__(LocalGCPBridge)
+        bridge.project_id, bridge.dataset_id = 'p', 'd'
+        bridge.client = client
+        bridge.cache = QueryCache(str(tmp_path))
+        client.tables['p.d.opt_in_decision_analysis_v3'] = client.tables['p.d.base']
+
+        bridge.get_high_risk_buildings(penalty_threshold=5)
+        bridge.get_high_risk_buildings(penalty_threshold=5)
+        assert bridge.get_building_by_id('1')['building_id'] == '1'
+        bridge.get_building_by_id('1')
+        bridge.get_high_risk_buildings(penalty_threshold=5, refresh=True)
+
+        assert len(client.queries) == 3
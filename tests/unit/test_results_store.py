@@ -0,0 +1,128 @@
+"""Unit tests for the persistent per-building results store"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from utils.results_store import ResultsStore, input_hash
+
+
+def _inputs(n=30, seed=3):
+    rng = np.random.default_rng(seed)
+    return {str(k): {'building_id': str(k),
+                     'property_type': ['Office', 'Hotel', 'Multifamily Housing'][k % 3],
+                     'sqft': float(rng.uniform(25_000, 300_000)),
+                     'current_eui': float(rng.uniform(40, 140)),
+                     'final_target': 60.0}
+            for k in range(n)}
+
+
+class Recorder:
+    """compute() stand-in that records which buildings were recomputed"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, building):
+        self.calls.append(building['building_id'])
+        gap = max(0.0, building['current_eui'] - building['final_target'])
+        return {'property_type': building['property_type'],
+                'penalty_2030': gap * building['sqft'] * 0.15}
+
+
+def contributions(building_id, outputs):
+    yield 'property_type', outputs['property_type'], 'total_penalty_2030', outputs['penalty_2030']
+    yield 'property_type', outputs['property_type'], 'buildings', 1.0
+
+
+def _expected_totals(store):
+    totals = {}
+    for outputs in store.outputs().values():
+        for aggregate, group, metric, value in contributions(None, outputs):
+            totals[(group, metric)] = totals.get((group, metric), 0.0) + value
+    return totals
+
+
+def _stored_totals(store):
+    df = store.aggregates('property_type')
+    return {(row.group_key, row.metric): row.value for row in df.itertuples()}
+
+
+@pytest.fixture
+def store():
+    store = ResultsStore(':memory:', model_version='v1')
+    yield store
+    store.close()
+
+
+class TestInputHash:
+    """Test input hashing"""
+
+    def test_stable_across_key_order_and_nan(self):
+        a = {'x': 1.0, 'y': float('nan'), 'z': np.float64(2.5)}
+        b = {'z': 2.5, 'y': None, 'x': 1.0}
+        assert input_hash(a) == input_hash(b)
+        assert input_hash(a) != input_hash({**b, 'x': 1.5})
+
+
+class TestIncrementalRefresh:
+    """Test that reruns only recompute changed buildings"""
+
+    def test_first_run_computes_everything(self, store):
+        compute = Recorder()
+        diff = store.refresh(_inputs(), compute, contributions)
+
+        assert len(diff.added) == 30 and not diff.changed
+        assert len(compute.calls) == 30
+        assert len(store) == 30
+        assert _stored_totals(store) == pytest.approx(_expected_totals(store))
+
+    def test_rerun_recomputes_only_changes(self, store):
+        store.refresh(_inputs(), Recorder(), contributions)
+
+        inputs = _inputs()
+        inputs['4']['current_eui'] += 25
+        inputs['7']['property_type'] = 'Office'
+        del inputs['9']
+        inputs['new'] = {**inputs['1'], 'building_id': 'new'}
+
+        compute = Recorder()
+        diff = store.refresh(inputs, compute, contributions)
+
+        assert sorted(diff.changed) == ['4', '7']
+        assert diff.removed == ['9']
+        assert diff.added == ['new']
+        assert sorted(compute.calls) == ['4', '7', 'new']
+        assert '9' not in store.outputs()
+        # Delta-maintained aggregates equal a from-scratch sum
+        assert _stored_totals(store) == pytest.approx(_expected_totals(store))
+
+    def test_unchanged_rerun_is_a_no_op(self, store):
+        store.refresh(_inputs(), Recorder(), contributions)
+        compute = Recorder()
+        diff = store.refresh(_inputs(), compute, contributions)
+        assert compute.calls == [] and len(diff.unchanged) == 30
+
+    def test_model_version_change_recomputes_all(self, store, tmp_path):
+        path = str(tmp_path / 'results.sqlite')
+        first = ResultsStore(path, model_version='v1')
+        first.refresh(_inputs(), Recorder(), contributions)
+        first.close()
+
+        reopened = ResultsStore(path, model_version='v1')
+        assert len(reopened.refresh(_inputs(), Recorder(), contributions).unchanged) == 30
+        reopened.close()
+
+        bumped = ResultsStore(path, model_version='v2')
+        compute = Recorder()
+        diff = bumped.refresh(_inputs(), compute, contributions)
+        assert len(diff.changed) == 30 and len(compute.calls) == 30
+        assert _stored_totals(bumped) == pytest.approx(_expected_totals(bumped))
+        bumped.close()
+
+    def test_outputs_follow_requested_order(self, store):
+        store.refresh(_inputs(), Recorder(), contributions)
+        assert list(store.outputs(['5', '2', 'missing', '11'])) == ['5', '2', '11']
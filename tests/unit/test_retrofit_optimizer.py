@@ -0,0 +1,119 @@
+"""Unit tests for the budget-constrained retrofit allocation optimizer"""
+import itertools
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from utils.penalty_monte_carlo import MonteCarloInputs
+from utils.retrofit_optimizer import (OptimizerParams, RetrofitCandidates, RetrofitOption,
+                                      greedy_select, knapsack_select, optimize_retrofits)
+
+
+def _inputs(n, seed=0, eui_ratio=None, paths=None):
+    rng = np.random.default_rng(seed)
+    final = rng.uniform(50, 80, n)
+    frame = pd.DataFrame({
+        'Building ID': [str(k) for k in range(n)],
+        'Master Property Type': rng.choice(['Office', 'Hotel'], n),
+        'Master Sq Ft': rng.uniform(30_000, 200_000, n),
+        'Weather Normalized Site EUI': final * (rng.uniform(0.9, 1.6, n) if eui_ratio is None else eui_ratio),
+        'First Interim Target EUI': final * 1.3,
+        'Second Interim Target EUI': final * 1.15,
+        'Original Final Target EUI': final,
+    })
+    if paths is None:
+        paths = np.where(rng.random(n) < 0.3, 'aco', 'standard')
+    return MonteCarloInputs.from_frame(frame, paths)
+
+
+def _brute_force(values, costs, budget):
+    best = 0.0
+    n_options, n_buildings = values.shape
+    for combo in itertools.product(range(-1, n_options), repeat=n_buildings):
+        chosen = [(o, b) for b, o in enumerate(combo) if o >= 0]
+        if sum(costs[o, b] for o, b in chosen) <= budget:
+            best = max(best, sum(values[o, b] for o, b in chosen))
+    return best
+
+
+class TestKnapsack:
+    """Test the multiple-choice knapsack solvers against brute force"""
+
+    @pytest.mark.parametrize('seed', range(5))
+    def test_dp_matches_brute_force(self, seed):
+        rng = np.random.default_rng(seed)
+        costs = rng.integers(1, 20, (3, 6)).astype(float)
+        values = costs * rng.uniform(0.5, 3, costs.shape) - rng.uniform(0, 5, costs.shape)
+        budget = float(costs.min(axis=0).sum() * 1.5)
+
+        choice = knapsack_select(values, costs, budget, cells=int(budget))
+        picked = np.flatnonzero(choice >= 0)
+        assert costs[choice[picked], picked].sum() <= budget
+        assert values[choice[picked], picked].sum() == pytest.approx(_brute_force(values, costs, budget))
+
+    def test_greedy_is_feasible_and_bounded(self):
+        rng = np.random.default_rng(7)
+        costs = rng.uniform(1, 20, (4, 40))
+        values = costs * rng.uniform(0.5, 3, costs.shape)
+        budget = 150.0
+        choice, bound = greedy_select(values, costs, budget)
+        picked = np.flatnonzero(choice >= 0)
+        greedy = values[choice[picked], picked].sum()
+        exact = knapsack_select(values, costs, budget, 4000)
+        chosen = np.flatnonzero(exact >= 0)
+        assert costs[choice[picked], picked].sum() <= budget
+        assert greedy <= bound + 1e-9
+        assert values[exact[chosen], chosen].sum() <= bound + 1e-9
+
+
+class TestRetrofitOptimizer:
+    """Test candidate valuation and the portfolio constraints"""
+
+    def test_candidate_values(self):
+        inputs = _inputs(1, eui_ratio=1.2, paths=['standard'])
+        option = RetrofitOption('half', 10.0, 0.5, itc_eligible=True)
+        params = OptimizerParams(deployment_years=(2026, 2031), discount_rate=0.0)
+        candidates = RetrofitCandidates(inputs, np.array([True]), [option], params)
+
+        sqft, eui = inputs.sqft[0], inputs.current_eui[0]
+        gaps = [eui - inputs.second_interim_target[0], eui - inputs.final_target[0]]
+        yearly = [max(g, 0) * sqft * 0.15 for g in gaps]
+        # Deploying in 2026 avoids 2027 and every final-target year; 2031 misses 2027 and 2030
+        assert candidates.avoided[0, 0, 0] == pytest.approx(yearly[0] + 13 * yearly[1])
+        assert candidates.avoided[0, 1, 0] == pytest.approx(12 * yearly[1])
+        assert candidates.incentives[0, 0] == pytest.approx(min(10 * sqft, 10 * sqft * 0.38 + 5 * sqft))
+
+    def test_budget_objectives_and_reuse(self):
+        candidates = RetrofitCandidates(_inputs(300), np.zeros(300, dtype=bool))
+        plans = [optimize_retrofits(candidates, budget) for budget in (5e6, 20e6)]
+        for plan, budget in zip(plans, (5e6, 20e6)):
+            assert 0 < plan.spend <= budget
+            assert plan.value <= plan.upper_bound * (1 + 1e-9)
+            assert plan.selections['building_id'].is_unique
+        assert plans[1].value > plans[0].value
+
+        profit = optimize_retrofits(candidates, 20e6, objective='developer_profit')
+        assert (profit.selections['profit'] > 0).all()
+        with pytest.raises(ValueError):
+            optimize_retrofits(candidates, 1e6, objective='revenue')
+
+    def test_epb_quota_and_yearly_limits(self):
+        is_epb = np.arange(300) % 5 == 0
+        candidates = RetrofitCandidates(_inputs(300, seed=1), is_epb)
+        limits = {2026: 5, 2027: 5, 2028: 5, 2029: 5, 2030: 5}
+        plan = optimize_retrofits(candidates, 50e6, min_epb_share=0.5, yearly_limits=limits)
+
+        counts = plan.selections['year'].value_counts()
+        assert all(counts.get(year, 0) <= limit for year, limit in limits.items())
+        assert plan.epb_share() >= 0.5 - 1e-9
+        assert len(plan.selections) > 0
+        assert set(plan.by_year().index) <= set(limits)
+
+        no_epb = RetrofitCandidates(_inputs(10), np.zeros(10, dtype=bool))
+        with pytest.raises(ValueError):
+            optimize_retrofits(no_epb, 1e6, min_epb_share=0.2)
@@ -0,0 +1,64 @@
+"""Unit tests for grid-bucketed neighbor pairs and local cluster scoring"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from analytics.cluster_analysis_bigquery import local_building_clusters
+from analytics.spatial_index import bucketed_neighbor_pairs, haversine_meters, neighbor_pairs
+
+
+@pytest.fixture
+def coordinates():
+    rng = np.random.default_rng(3)
+    n = 600
+    return 39.74 + rng.uniform(-0.03, 0.03, n), -104.99 + rng.uniform(-0.03, 0.03, n)
+
+
+class TestBucketedNeighborPairs:
+    """Test the grid-cell join against exhaustive search"""
+
+    def test_matches_brute_force(self, coordinates):
+        lat, lon = coordinates
+        i, j, distance = bucketed_neighbor_pairs(lat, lon, 300)
+
+        full = haversine_meters(lat[:, None], lon[:, None], lat[None, :], lon[None, :])
+        expected_i, expected_j = np.nonzero(np.triu(full <= 300, k=1))
+        assert i.tolist() == expected_i.tolist()
+        assert j.tolist() == expected_j.tolist()
+        assert distance == pytest.approx(full[expected_i, expected_j])
+
+    def test_matches_kd_tree_pairs(self, coordinates):
+        lat, lon = coordinates
+        bucketed = bucketed_neighbor_pairs(lat, lon, 150)
+        tree = neighbor_pairs(lat, lon, 150)
+        assert all(np.array_equal(a, b) for a, b in zip(bucketed[:2], tree[:2]))
+
+
+class TestLocalBuildingClusters:
+    """Test the local version of the building_clusters view"""
+
+    def test_scores_pairs_like_the_view(self):
+        df = pd.DataFrame({
+            'building_id': ['3', '1', '2', '9'],
+            'building_name': [None, 'Office A', None, 'Far Away'],
+            'property_type': ['Data Center', 'Office', 'Office', 'Office'],
+            'gross_floor_area': [100000.0, 50000.0, 60000.0, 70000.0],
+            'annual_penalty_2024': [1000.0, None, 0.0, 500.0],
+            'is_epb': [1, 0, 0, 1],
+            'latitude': [39.7400, 39.7405, 39.7410, 39.8000],
+            'longitude': [-104.9900, -104.9900, -104.9900, -104.9900],
+        })
+
+        pairs = local_building_clusters(df, distance_meters=500)
+
+        assert set(zip(pairs['building_a'], pairs['building_b'])) == {('1', '3'), ('2', '3')}
+        top = pairs.iloc[0]
+        assert top['opportunity_type'] == 'Heat Recovery'
+        assert top['name_b'] == 'Building 3'
+        assert top['opportunity_score'] == pytest.approx(
+            1000.0 * 3.0 * 1.5 / max(top['distance_meters'], 100))
@@ -0,0 +1,50 @@
+"""Unit tests for thermal network pipe length and capex estimates"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from analytics.spatial_index import EARTH_RADIUS_M
+from analytics.thermal_network import ThermalNetworkEstimator
+
+# Degrees of latitude per 100 m
+DEG_100M = np.degrees(100 / EARTH_RADIUS_M)
+
+
+def square(lat0, lon0):
+    """Four corners of a ~100 m square (longitude scaled for latitude)"""
+    dlon = DEG_100M / np.cos(np.radians(lat0))
+    lat = np.array([lat0, lat0, lat0 + DEG_100M, lat0 + DEG_100M])
+    lon = np.array([lon0, lon0 + dlon, lon0, lon0 + dlon])
+    return lat, lon
+
+
+class TestThermalNetworkEstimator:
+    """Test MST and Steiner pipe lengths"""
+
+    def test_square_mst_and_steiner(self):
+        lat, lon = square(39.74, -104.99)
+        estimator = ThermalNetworkEstimator()
+        result = estimator.estimate(lat, lon, np.zeros(4, dtype=int), 1)
+
+        # MST uses three sides; the centroid star uses four half-diagonals
+        assert result['mst_length_m'].iloc[0] == pytest.approx(300, rel=1e-3)
+        expected_tree = 4 * 50 * np.sqrt(2)
+        assert result['network_pipe_length_m'].iloc[0] == pytest.approx(
+            expected_tree * estimator.ROUTE_FACTOR, rel=1e-3)
+        assert result['network_connections'].iloc[0] == 4
+
+    def test_clusters_are_independent(self):
+        lat_a, lon_a = square(39.74, -104.99)
+        lat_b, lon_b = square(39.75, -104.98)
+        lat = np.concatenate([lat_b, lat_a, [39.70]])
+        lon = np.concatenate([lon_b, lon_a, [-105.00]])
+        cluster_index = np.array([1, 1, 1, 1, 0, 0, 0, 0, 2])
+
+        result = ThermalNetworkEstimator(use_steiner=False).estimate(lat, lon, cluster_index, 3)
+
+        assert result['mst_length_m'].tolist() == pytest.approx([300, 300, 0], rel=1e-3)
+        assert result['network_connections'].tolist() == [4, 4, 1]
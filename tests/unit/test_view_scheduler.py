@@ -0,0 +1,139 @@
+"""Unit tests for the concurrent BigQuery view scheduler (local fake client)"""
+import os
+import sys
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from gcp.regenerate_bigquery_views import BigQueryViewRegenerator
+from gcp.view_scheduler import ViewJob, ViewScheduler
+
+
+class TransientError(Exception):
+    code = 503
+
+
+class FakeResult:
+    def __init__(self, frame):
+        self.frame = frame
+
+    def to_dataframe(self):
+        return self.frame
+
+
+class FakeJob:
+    def __init__(self, duration, error=None, frame=None):
+        self.ready_at = time.perf_counter() + duration
+        self.error = error
+        self.frame = frame if frame is not None else pd.DataFrame()
+        self.job_id = f"job_{id(self)}"
+
+    def done(self):
+        return time.perf_counter() >= self.ready_at
+
+    def result(self):
+        if self.error is not None:
+            raise self.error
+        return FakeResult(self.frame)
+
+
+class FakeClient:
+    """Jobs finish after a per-statement delay; errors are raised from result()"""
+
+    def __init__(self, durations=None, errors=None, frames=None, default_duration=0.1):
+        self.durations = durations or {}
+        self.errors = errors or {}
+        self.frames = frames or {}
+        self.default_duration = default_duration
+        self.submitted = []
+        self.lock = threading.Lock()
+
+    def query(self, sql):
+        with self.lock:
+            self.submitted.append(sql)
+        key = next((k for k in self.durations if k in sql), None)
+        errors = self.errors.get(next((k for k in self.errors if k in sql), None), [])
+        frame = self.frames.get(next((k for k in self.frames if k in sql), None))
+        return FakeJob(self.durations.get(key, self.default_duration),
+                       errors.pop(0) if errors else None, frame)
+
+
+def view(name, reads=()):
+    body = ' UNION ALL '.join(f"SELECT * FROM `proj.ds.{r}`" for r in reads) or 'SELECT 1 AS x'
+    return ViewJob(name, f"CREATE OR REPLACE VIEW `proj.ds.{name}` AS {body}")
+
+
+class TestDependencyGraph:
+    """Test dependency inference from SQL"""
+
+    def test_regeneration_jobs_dag(self):
+        regenerator = BigQueryViewRegenerator.__new__(BigQueryViewRegenerator)
+        regenerator.dataset_ref = 'proj.ds'
+        dag = ViewScheduler.build_dag(regenerator.regeneration_jobs())
+
+        assert dag['drop_opt_in_decision_analysis'] == set()
+        assert dag['building_penalties_corrected'] == set()
+        assert dag['opt_in_decision_analysis_v2'] == {'building_penalties_corrected'}
+        assert dag['validate_penalty_rates'] == {'building_penalties_corrected'}
+        assert dag['compare_results'] == {'opt_in_decision_analysis_v2', 'validate_penalty_rates'}
+        assert 'compare_results' in dag['test_building_2952']
+
+    def test_cycle_is_rejected(self):
+        dag = {'a': {'b'}, 'b': {'a'}}
+        with pytest.raises(ValueError):
+            ViewScheduler.topological_levels(dag)
+
+
+class TestViewScheduler:
+    """Test concurrent execution, retries and skips"""
+
+    def test_wall_time_follows_longest_chain(self):
+        jobs = [view('base'), view('left', ['base']), view('right', ['base']),
+                view('top', ['left', 'right']), view('side_a'), view('side_b'), view('side_c')]
+        scheduler = ViewScheduler(FakeClient(default_duration=0.2), poll_interval=0.01)
+
+        timings = scheduler.run(jobs)
+
+        assert all(t.status == 'DONE' for t in timings.values())
+        # Three levels of 0.2s each, not seven jobs in a row
+        assert 0.6 <= scheduler.wall_time < 1.0
+        assert timings['left'].submitted_at >= timings['base'].finished_at
+        assert timings['side_a'].submitted_at < timings['base'].finished_at
+        assert 'Wall time' in scheduler.format_timeline()
+
+    def test_transient_errors_are_retried(self):
+        client = FakeClient(errors={'flaky': [TransientError('backendError')]}, default_duration=0.01)
+        scheduler = ViewScheduler(client, poll_interval=0.005, retry_backoff=0.01)
+
+        timings = scheduler.run([view('flaky'), view('after', ['flaky'])])
+
+        assert timings['flaky'].status == 'DONE'
+        assert timings['flaky'].attempts == 2
+        assert timings['after'].status == 'DONE'
+
+    def test_failed_dependency_skips_dependents(self):
+        client = FakeClient(errors={'broken': [ValueError('Syntax error')]}, default_duration=0.01)
+        scheduler = ViewScheduler(client, poll_interval=0.005)
+
+        timings = scheduler.run([view('broken'), view('after', ['broken']), view('other')])
+
+        assert timings['broken'].status == 'FAILED'
+        assert timings['broken'].attempts == 1
+        assert timings['after'].status == 'SKIPPED'
+        assert timings['other'].status == 'DONE'
+        assert not any('proj.ds.after' in sql for sql in client.submitted)
+
+    def test_failed_check_marks_job_failed(self):
+        frames = {'rates': pd.DataFrame({'rate': [0.3]})}
+        client = FakeClient(frames=frames, default_duration=0.01)
+        scheduler = ViewScheduler(client, poll_interval=0.005)
+        jobs = [ViewJob('rates', "SELECT rate FROM `proj.ds.rates`",
+                        on_result=lambda df: df['rate'].iloc[0] == 0.15, check=True)]
+
+        timings = scheduler.run(jobs)
+
+        assert timings['rates'].status == 'FAILED'
@@ -0,0 +1,85 @@
+"""Unit tests for the long target table behind year normalization"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from utils.year_normalization import YearNormalizer
+
+
+def _buildings():
+    return pd.DataFrame({
+        'Building ID': ['A', 'B', 'C', 'D'],
+        'First Interim Target Year': [2024, 2025, 2026, 2025],
+        'Second Interim Target Year': [2027, 2027, 2028, 2026],
+        'penalty_first_interim': [100.0, 200.0, 300.0, 400.0],
+    })
+
+
+class TestTargetTable:
+    """Test the long table and the reductions built on it"""
+
+    def test_table_layout(self):
+        normalizer = YearNormalizer()
+        table = normalizer.target_table(_buildings(), 'standard',
+                                        {'first_interim': 'penalty_first_interim'})
+        assert list(table['target_type'].cat.categories) == ['first_interim', 'second_interim', 'final']
+        assert len(table) == 12
+        first = table[table['target_type'] == 'first_interim']
+        assert first['actual_year'].tolist() == [2024, 2025, 2026, 2025]
+        assert first['penalty'].tolist() == [100.0, 200.0, 300.0, 400.0]
+        assert table.loc[table['target_type'] == 'final', 'actual_year'].isna().all()
+        assert set(table['normalized_year']) == {2025, 2027, 2030}
+
+        aco = normalizer.target_table(_buildings(), 'aco')
+        assert aco['actual_year'].isna().all() and set(aco['normalized_year']) == {2028, 2032}
+        with pytest.raises(ValueError, match='Invalid path'):
+            normalizer.target_table(_buildings(), 'bogus')
+
+    def test_normalize_and_stats(self):
+        normalizer = YearNormalizer()
+        normalized = normalizer.normalize_building_targets(_buildings())
+        assert (normalized['normalized_second_interim_year'] == 2027).all()
+        stats = normalizer.get_year_mapping_summary()
+        assert dict(stats['standard_first_interim']) == {2024: 1, 2025: 2, 2026: 1}
+        assert dict(stats['standard_second_interim']) == {2027: 2, 2028: 1, 2026: 1}
+
+        report = normalizer.create_year_alignment_report(_buildings())
+        first = report[report['Target Type'] == 'First Interim']
+        assert first.iloc[0]['Actual Year'] == 2025 and first.iloc[0]['Building Count'] == 2
+        assert (report.loc[report['Target Type'] == 'Second Interim', 'Normalized Year (ACO)'] == '-').all()
+
+    def test_year_shift_impact(self):
+        impact = YearNormalizer().calculate_year_shift_impact(_buildings())
+        assert impact['buildings_with_earlier_penalties'] == 1
+        assert impact['buildings_with_later_penalties'] == 1
+        assert impact['buildings_unchanged'] == 2
+        # A (2024 -> 2025) compounds one year, C (2026 -> 2025) discounts one year
+        expected = 100.0 * (1 - 1.07) + 300.0 * (1 - 1.07 ** -1)
+        assert impact['total_penalty_shift_amount'] == pytest.approx(expected)
+        assert impact['average_months_shifted'] == 0.0
+        assert np.isclose(YearNormalizer().aggregate_penalties_by_normalized_year(
+            YearNormalizer().normalize_building_targets(_buildings()),
+            {'penalty_first_interim': 'normalized_first_interim_year'})[2025], 1000.0)
+
+    def test_year_shift_total_matches_building_loop_exactly(self):
+        rng = np.random.default_rng(9)
+        n = 500
+        buildings = pd.DataFrame({
+            'Building ID': [str(k) for k in range(n)],
+            'First Interim Target Year': rng.choice([2024, 2025, 2026], n),
+            'penalty_first_interim': rng.uniform(0, 1e6, n),
+        })
+        # The per-building loop the vectorized version replaced
+        expected = 0.0
+        for _, building in buildings.iterrows():
+            year_shift = 2025 - building['First Interim Target Year']
+            if year_shift != 0:
+                expected += building['penalty_first_interim'] * (1 - 1.07 ** year_shift)
+
+        impact = YearNormalizer().calculate_year_shift_impact(buildings)
+        assert impact['total_penalty_shift_amount'] == expected